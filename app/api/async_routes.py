@@ -0,0 +1,90 @@
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.api.deps import require_api_token
+from packages.adapters.hub import get_adapter_hub
+from packages.audit.service import log_event
+from packages.common.config import get_settings
+from packages.data.orderbook import book_risk_inputs
+from packages.execution.engine import get_execution_engine
+from packages.execution.idempotency import ExecutionInProgress, get_idempotency_store
+from packages.planner.batch import SymbolFeatures, llm_candidates
+from packages.planner.planner import generate_plan_async
+from packages.portfolio.state import get_portfolio
+from packages.regime.engine import infer_regime
+from packages.risk.engine import evaluate_plan_async
+from packages.risk.state import current_risk_state_async
+from packages.signals.extractors import SignalExtractor
+
+router = APIRouter(prefix="/async", dependencies=[Depends(require_api_token)])
+
+
+@router.get("/status")
+async def status() -> dict:
+    risk_state = await current_risk_state_async()
+    return {"risk_state": {"paused": risk_state.paused, "reason": risk_state.reason}}
+
+
+@router.post("/plans/generate")
+async def generate(symbol: str, market_type: str = "perp") -> dict:
+    signals = await run_in_threadpool(SignalExtractor().extract, symbol)
+    regime = await run_in_threadpool(infer_regime, symbol)
+    context = await get_adapter_hub().asnapshot(symbol)
+    log_event(
+        "signals",
+        {
+            "signals": [s.__dict__ for s in signals],
+            "regime": regime.__dict__,
+            "context": asdict(context),
+        },
+    )
+    llm_output = None
+    if get_settings().llm_planner_enabled:
+        features = SymbolFeatures(symbol, signals, regime, context)
+        candidate = (await llm_candidates([features], market_type)).get(symbol)
+        llm_output = candidate[0] if candidate else None
+    return await generate_plan_async(symbol=symbol, market_type=market_type, llm_output=llm_output)
+
+
+@router.post("/plans/execute")
+async def execute(plan: dict) -> dict:
+    plan_id = plan.get("meta", {}).get("plan_id")
+    if not plan_id:
+        raise HTTPException(status_code=400, detail="meta.plan_id is required")
+    order_error = get_execution_engine().order_error(plan)
+    if order_error is not None:
+        raise HTTPException(status_code=400, detail=order_error)
+    try:
+        result, replayed = await get_idempotency_store().execute_async(
+            plan_id, lambda: _execute(plan)
+        )
+    except ExecutionInProgress:
+        raise HTTPException(status_code=409, detail="plan execution already in progress")
+    return {**result, "replayed": replayed}
+
+
+async def _execute(plan: dict) -> dict:
+    settings = get_settings()
+    portfolio = get_portfolio()
+    if not portfolio.loaded:
+        # The first load is a sync query; later catch-up runs in the background refresh.
+        await run_in_threadpool(portfolio.rebuild)
+    risk_state = await current_risk_state_async()
+    symbol = plan.get("meta", {}).get("symbol")
+    spread_bps, depth_usd = book_risk_inputs(symbol)
+    context = portfolio.cached_risk_context(
+        symbol=symbol,
+        risk_state=risk_state.risk_state,
+        liquidation_buffer_ratio=settings.liquidation_buffer_ratio,
+        spread_bps=spread_bps,
+        depth_usd=depth_usd,
+    )
+
+    decision = await evaluate_plan_async(plan, context)
+    if not decision.allowed:
+        raise HTTPException(status_code=400, detail={"reasons": decision.reasons})
+
+    result = (await get_execution_engine().submit_orders_async([plan]))[0]
+    return {"status": result.status.value, "receipt": result.receipt}
@@ -1,25 +1,94 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import asdict
 from datetime import datetime, timezone
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Body, Depends, FastAPI, HTTPException
 from prometheus_client import make_asgi_app
 
+from app.api.async_routes import router as async_router
 from app.api.deps import require_api_token
-from packages.audit.service import log_event
+from packages.adapters.hub import get_adapter_hub
+from packages.audit.service import log_event, shutdown_audit_writer
 from packages.common.config import get_settings
-from packages.common.db import SessionLocal
+from packages.common.db import get_async_engine
 from packages.common.logging import configure_logging
-from packages.common.models import RiskState
-from packages.execution.engine import ExecutionEngine
-from packages.planner.planner import generate_plan
+from packages.common.metrics import metrics_registry
+from packages.common.notify import shutdown_notifier
+from packages.data.orderbook import book_risk_inputs, get_book_engine, run_book_feed
+from packages.execution.engine import get_execution_engine, run_order_reconcile, run_order_sync
+from packages.execution.idempotency import ExecutionInProgress, get_idempotency_store
+from packages.execution.okx import get_okx_gateway
+from packages.planner.batch import generate_plans_batch
+from packages.planner.planner import generate_plan, validate_plan
+from packages.portfolio.state import get_portfolio, run_portfolio_refresh
 from packages.regime.engine import infer_regime
-from packages.risk.engine import RiskContext, evaluate_plan, set_risk_pause
+from packages.risk.engine import evaluate_plan, set_risk_pause
+from packages.risk.state import current_risk_state, get_risk_state_cache
 from packages.signals.extractors import SignalExtractor
 
 settings = get_settings()
 configure_logging(settings.log_level)
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title=settings.app_name)
-app.mount("/metrics", make_asgi_app())
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    try:
+        get_portfolio().rebuild()
+    except Exception:
+        logger.exception("portfolio rebuild failed; retrying on first use")
+    portfolio_refresh = asyncio.create_task(
+        run_portfolio_refresh(get_portfolio(), settings.portfolio_sync_interval_sec)
+    )
+    book_feed = None
+    if settings.orderbook_feed_enabled:
+        book_feed = asyncio.create_task(
+            run_book_feed(
+                get_book_engine(),
+                settings.market_symbols,
+                settings.okx_ws_public_url,
+                settings.orderbook_channel,
+            )
+        )
+    gateway = None
+    reconcile = None
+    if settings.live_trading_enabled:
+        gateway = get_okx_gateway()
+        await gateway.start()
+        reconcile = asyncio.create_task(
+            run_order_reconcile(
+                get_execution_engine(),
+                settings.order_reconcile_interval_sec,
+                settings.order_reconcile_grace_sec,
+            )
+        )
+    order_sync = None
+    if settings.paper_matching_enabled or settings.live_trading_enabled:
+        order_sync = asyncio.create_task(
+            run_order_sync(get_execution_engine(), settings.paper_sync_interval_sec)
+        )
+    yield
+    portfolio_refresh.cancel()
+    if book_feed is not None:
+        book_feed.cancel()
+    if order_sync is not None:
+        order_sync.cancel()
+    if reconcile is not None:
+        reconcile.cancel()
+    if gateway is not None:
+        await gateway.close()
+    await get_adapter_hub().close()
+    get_risk_state_cache().stop()
+    shutdown_notifier()
+    shutdown_audit_writer()
+    await get_async_engine().dispose()
+
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
+app.mount("/metrics", make_asgi_app(metrics_registry()))
+app.include_router(async_router)
 
 
 @app.get("/health")
@@ -29,17 +98,8 @@ def health() -> dict:
 
 @app.get("/status", dependencies=[Depends(require_api_token)])
 def status() -> dict:
-    session = SessionLocal()
-    try:
-        risk_state = session.query(RiskState).order_by(RiskState.id.desc()).first()
-    finally:
-        session.close()
-    return {
-        "risk_state": {
-            "paused": risk_state.paused if risk_state else False,
-            "reason": risk_state.reason if risk_state else None,
-        }
-    }
+    risk_state = current_risk_state()
+    return {"risk_state": {"paused": risk_state.paused, "reason": risk_state.reason}}
 
 
 @app.post("/risk/pause", dependencies=[Depends(require_api_token)])
@@ -56,38 +116,97 @@ def resume_risk() -> dict:
 
 @app.post("/plans/generate", dependencies=[Depends(require_api_token)])
 def generate(symbol: str, market_type: str = "perp") -> dict:
-    signals = SignalExtractor().extract()
-    regime = infer_regime()
-    log_event("signals", {"signals": [s.__dict__ for s in signals], "regime": regime.__dict__})
+    signals = SignalExtractor().extract(symbol)
+    regime = infer_regime(symbol)
+    context = get_adapter_hub().snapshot(symbol)
+    log_event(
+        "signals",
+        {
+            "signals": [s.__dict__ for s in signals],
+            "regime": regime.__dict__,
+            "context": asdict(context),
+        },
+    )
     return generate_plan(symbol=symbol, market_type=market_type)
 
 
+@app.post("/plans/generate/batch", dependencies=[Depends(require_api_token)])
+async def generate_batch(
+    symbols: list[str] = Body(..., embed=True), market_type: str = "perp"
+) -> dict:
+    if len(symbols) > settings.plan_batch_max_symbols:
+        raise HTTPException(
+            status_code=400, detail=f"at most {settings.plan_batch_max_symbols} symbols per batch"
+        )
+    return {"results": await generate_plans_batch(symbols, market_type)}
+
+
 @app.post("/plans/execute", dependencies=[Depends(require_api_token)])
 def execute(plan: dict) -> dict:
-    session = SessionLocal()
+    plan_id = plan.get("meta", {}).get("plan_id")
+    if not plan_id:
+        raise HTTPException(status_code=400, detail="meta.plan_id is required")
+    order_error = get_execution_engine().order_error(plan)
+    if order_error is not None:
+        raise HTTPException(status_code=400, detail=order_error)
+    # Retries of an executed plan_id return its first result without re-running risk checks.
     try:
-        risk_state = session.query(RiskState).order_by(RiskState.id.desc()).first()
-    finally:
-        session.close()
-
-    context = RiskContext(
-        equity=100000,
-        peak_equity=120000,
-        daily_loss_pct=0.0,
-        consecutive_losses=0,
-        open_positions=0,
-        positions_per_symbol=0,
-        net_exposure_pct=0.0,
+        result, replayed = get_idempotency_store().execute(plan_id, lambda: _execute(plan))
+    except ExecutionInProgress:
+        raise HTTPException(status_code=409, detail="plan execution already in progress")
+    return {**result, "replayed": replayed}
+
+
+def _execute(plan: dict) -> dict:
+    symbol = plan.get("meta", {}).get("symbol")
+    spread_bps, depth_usd = book_risk_inputs(symbol)
+    context = get_portfolio().risk_context(
+        symbol=symbol,
+        risk_state=current_risk_state().risk_state,
         liquidation_buffer_ratio=settings.liquidation_buffer_ratio,
-        risk_state="LOCKDOWN" if risk_state and risk_state.paused else "NORMAL",
+        spread_bps=spread_bps,
+        depth_usd=depth_usd,
     )
 
     decision = evaluate_plan(plan, context)
     if not decision.allowed:
         raise HTTPException(status_code=400, detail={"reasons": decision.reasons})
 
-    engine = ExecutionEngine(live_trading_enabled=settings.live_trading_enabled)
-    result = engine.submit_order(plan)
+    return _submit(plan)
+
+
+# Exits only ever reduce exposure, so they skip the entry checks: a paused or locked-down
+# book must still be able to close.
+@app.post("/plans/exit", dependencies=[Depends(require_api_token)])
+def execute_exit(plan: dict) -> dict:
+    plan_id = plan.get("meta", {}).get("plan_id")
+    if not plan_id:
+        raise HTTPException(status_code=400, detail="meta.plan_id is required")
+    if not plan.get("execution", {}).get("reduce_only"):
+        raise HTTPException(status_code=400, detail="exit plans must be reduce_only")
+    is_valid, errors = validate_plan(plan)
+    if not is_valid:
+        raise HTTPException(status_code=400, detail={"errors": errors})
+    order_error = get_execution_engine().order_error(plan)
+    if order_error is not None:
+        raise HTTPException(status_code=400, detail=order_error)
+    try:
+        result, replayed = get_idempotency_store().execute(plan_id, lambda: _submit(plan))
+    except ExecutionInProgress:
+        raise HTTPException(status_code=409, detail="plan execution already in progress")
+    return {**result, "replayed": replayed}
+
+
+def _submit(plan: dict) -> dict:
+    result = get_execution_engine().submit_order(plan)
+    return {"status": result.status.value, "receipt": result.receipt}
+
+
+@app.post("/orders/{order_id}/cancel", dependencies=[Depends(require_api_token)])
+def cancel_order(order_id: str) -> dict:
+    result = get_execution_engine().cancel_order(order_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="no open order with that id")
     return {"status": result.status.value, "receipt": result.receipt}
 
 
@@ -0,0 +1,39 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from packages.data.quality import DataQualityEngine
+
+
+def make_candles(n: int, seed: int = 7) -> SimpleNamespace:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    return SimpleNamespace(
+        ts=np.arange(n) * 60000.0,
+        open=close,
+        high=close * 1.001,
+        low=close * 0.999,
+        close=close,
+        volume=np.ones(n),
+    )
+
+
+def main(n: int = 5_000_000) -> None:
+    candles = make_candles(n)
+    for batch in (100, 1000, 10000, 100000):
+        engine = DataQualityEngine()
+        started = time.perf_counter()
+        for offset in range(0, n, batch):
+            window = slice(offset, offset + batch)
+            engine.check_candles(
+                "BTC-USDT-SWAP",
+                "1m",
+                SimpleNamespace(**{name: column[window] for name, column in vars(candles).items()}),
+            )
+        elapsed = time.perf_counter() - started
+        print(f"batch={batch:>6}: {n / elapsed:>12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
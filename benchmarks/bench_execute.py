@@ -0,0 +1,74 @@
+import sys
+import time
+
+from sqlalchemy import text
+
+from packages.common.db import get_engine
+from packages.common.repository import build_repository
+from packages.execution.engine import ExecutionEngine
+from packages.planner.planner import build_rule_plan
+from packages.portfolio.state import PortfolioService
+
+
+def _plans(count: int) -> list[dict]:
+    plans = []
+    for i in range(count):
+        plan = build_rule_plan(f"SYM{i % 20}-USDT-SWAP", "perp")
+        plan["intent"]["side"] = "long" if i % 2 else "short"
+        plan["entry"]["price_range"] = [100.0 + i % 7, 100.0 + i % 7]
+        plan["sizing"]["notional_usd"] = 1000.0
+        plans.append(plan)
+    return plans
+
+
+def _postgres_reachable() -> bool:
+    try:
+        with get_engine().connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception:
+        return False
+    return True
+
+
+def bench(backend: str, orders: int, batch: int) -> None:
+    repository = build_repository(backend, max_rows=2 * orders + batch)
+    engine = ExecutionEngine(
+        live_trading_enabled=False,
+        repository=repository,
+        portfolio=PortfolioService(100000.0, repository=repository),
+        fee_bps=5.0,
+        slippage_bps=2.0,
+    )
+    # Each phase gets its own plans: a plan_id can only be executed once.
+    engine.submit_orders(_plans(batch))
+
+    singles = _plans(orders)
+    started = time.perf_counter()
+    for plan in singles:
+        engine.submit_order(plan)
+    single = time.perf_counter() - started
+
+    batches = _plans(orders)
+    started = time.perf_counter()
+    for offset in range(0, orders, batch):
+        engine.submit_orders(batches[offset : offset + batch])
+    batched = time.perf_counter() - started
+
+    print(
+        f"{backend:>8}: submit_order {single / orders * 1e6:8.1f} us/order, "
+        f"submit_orders x{batch} {batched / orders * 1e6:8.1f} us/order"
+    )
+
+
+def main(orders: int = 2000, batch: int = 50) -> None:
+    print(f"orders={orders} batch={batch}")
+    for backend in ("memory", "sqlite"):
+        bench(backend, orders, batch)
+    if _postgres_reachable():
+        bench("postgres", orders, batch)
+    else:
+        print("postgres: unreachable, skipped")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,106 @@
+import asyncio
+import socket
+import sys
+import time
+
+import numpy as np
+import uvicorn
+
+from packages.execution.fake_okx import FakeOkxExchange
+from packages.execution.okx import OkxCredentials, OkxGateway, OkxPrivateSession, OkxRestClient
+
+CREDENTIALS = OkxCredentials("bench-key", "bench-secret", "bench-passphrase")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _instruction(n: int, symbols: int) -> dict:
+    # Spread over instruments so the per-instrument rate limits never delay the run.
+    return {
+        "plan_id": f"bench-{n}",
+        "symbol": f"SYM{n % symbols}-USDT-SWAP",
+        "market_type": "perp",
+        "side": "long" if n % 2 else "short",
+        "order_type": "limit",
+        "qty": 1.0,
+        "notional_usd": 100.0,
+        "price": 90.0 if n % 2 else 110.0,
+        "tif": "GTC",
+        "post_only": False,
+        "reduce_only": False,
+        "payload": {"sizing": {"margin_mode": "cross"}},
+    }
+
+
+async def _sequential(gateway: OkxGateway, start: int, orders: int, symbols: int) -> list[float]:
+    latencies = []
+    for n in range(start, start + orders):
+        started = time.perf_counter()
+        await gateway.place_orders([_instruction(n, symbols)])
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def _concurrent(gateway: OkxGateway, start: int, orders: int, symbols: int) -> list[float]:
+    async def one(n: int) -> float:
+        started = time.perf_counter()
+        await gateway.place_orders([_instruction(n, symbols)])
+        return time.perf_counter() - started
+
+    return list(await asyncio.gather(*(one(n) for n in range(start, start + orders))))
+
+
+def _report(name: str, latencies: list[float], elapsed: float | None = None) -> None:
+    ms = np.array(latencies) * 1000
+    line = f"{name:<36} p50 {np.percentile(ms, 50):6.2f} ms  p99 {np.percentile(ms, 99):6.2f} ms"
+    if elapsed is not None:
+        line += f"  {len(latencies) / elapsed:8.0f} orders/s"
+    print(line)
+
+
+async def run(orders: int, symbols: int) -> None:
+    exchange = FakeOkxExchange(CREDENTIALS)
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(exchange.app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    rest_url = f"http://127.0.0.1:{port}"
+    session = OkxPrivateSession(f"ws://127.0.0.1:{port}/ws/v5/private", CREDENTIALS)
+    ws_gateway = OkxGateway(OkxRestClient(rest_url, CREDENTIALS), session, batch_window_sec=0)
+    rest_gateway = OkxGateway(OkxRestClient(rest_url, CREDENTIALS), batch_window_sec=0)
+    await ws_gateway.start()
+    await rest_gateway.start()
+    while not session.connected:
+        await asyncio.sleep(0.01)
+
+    print(f"orders={orders} instruments={symbols} (local fake exchange)")
+    offset = 0
+    for name, gateway in (("websocket", ws_gateway), ("rest keep-alive", rest_gateway)):
+        _report(f"{name} sequential", await _sequential(gateway, offset, orders, symbols))
+        offset += orders
+        started = time.perf_counter()
+        latencies = await _concurrent(gateway, offset, orders, symbols)
+        _report(f"{name} concurrent batched", latencies, time.perf_counter() - started)
+        offset += orders
+    batches = sum(1 for op, _, size in exchange.requests if op == "batch-orders")
+    print(f"requests sent: {len(exchange.requests)} ({batches} batch requests)")
+
+    await ws_gateway.close()
+    await rest_gateway.close()
+    server.should_exit = True
+    await serving
+
+
+def main(orders: int = 500, symbols: int = 50) -> None:
+    asyncio.run(run(orders, symbols))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
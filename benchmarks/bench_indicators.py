@@ -0,0 +1,43 @@
+import time
+
+import numpy as np
+
+from packages.signals.indicators import IndicatorParams, backfill_state
+
+
+def main(symbols: int = 500, timeframes: int = 3, bars: int = 200, history: int = 1000) -> None:
+    params = IndicatorParams()
+    rng = np.random.default_rng(7)
+    series = symbols * timeframes
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, history + bars)))
+    high, low = close * 1.001, close * 0.999
+    ts = np.arange(history + bars) * 60000
+
+    started = time.perf_counter()
+    states = [
+        backfill_state(params, ts[:history], high[:history], low[:history], close[:history])[0]
+        for _ in range(series)
+    ]
+    backfill_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(history, history + bars):
+        bar_ts, bar_high, bar_low, bar_close = (
+            int(ts[i]),
+            float(high[i]),
+            float(low[i]),
+            float(close[i]),
+        )
+        for state in states:
+            state.update(bar_ts, bar_high, bar_low, bar_close)
+    update_elapsed = time.perf_counter() - started
+
+    updates = series * bars
+    print(f"series={series} ({symbols} symbols x {timeframes} timeframes)")
+    print(f"backfill: {backfill_elapsed / series * 1e3:.2f} ms/series for {history} bars")
+    print(f"incremental: {update_elapsed / updates * 1e6:.2f} us/bar")
+    print(f"one bar across all series: {update_elapsed / bars * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
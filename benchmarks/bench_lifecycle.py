@@ -0,0 +1,81 @@
+import sys
+import time
+import tracemalloc
+
+from packages.execution.lifecycle import OrderManager
+
+
+def _instruction(n: int) -> dict:
+    return {
+        "plan_id": f"bench-{n}",
+        "cl_ord_id": f"bench{n}",
+        "symbol": f"SYM{n % 50}-USDT-SWAP",
+        "side": "long" if n % 2 else "short",
+        "order_type": "limit",
+        "tif": "GTC",
+        "qty": 10.0,
+        "notional_usd": 1000.0,
+        "price": 100.0,
+        "timeout_sec": 60,
+    }
+
+
+def _push(n: int, state: str, filled: float, ts: int) -> dict:
+    return {
+        "clOrdId": f"bench{n}",
+        "ordId": str(n),
+        "state": state,
+        "accFillSz": str(filled),
+        "avgPx": "100" if filled else "",
+        "fee": str(-0.05 * filled),
+        "uTime": str(ts),
+    }
+
+
+def run(orders: int) -> tuple[float, float, float]:
+    # Returns (bytes per tracked order, us per event, us per reconcile row).
+    manager = OrderManager()
+    instructions = [_instruction(n) for n in range(orders)]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for n, instruction in enumerate(instructions):
+        manager.track(manager.new_order(instruction, n, 0))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    per_order = sum(stat.size_diff for stat in after.compare_to(before, "filename")) / orders
+
+    # Two partial fills per order, then a duplicate, then the final fill.
+    events = []
+    for step, (state, filled) in enumerate(
+        (("partially_filled", 3.0), ("partially_filled", 6.0), ("partially_filled", 6.0))
+    ):
+        events.extend(_push(n, state, filled, step + 1) for n in range(orders))
+    pending = [_push(n, "partially_filled", 6.0, 3) for n in range(orders)]
+    events.extend(_push(n, "filled", 10.0, 4) for n in range(orders))
+
+    started = time.perf_counter()
+    for event in events[: 3 * orders]:
+        manager.apply(event, 0)
+    partial = time.perf_counter() - started
+    started = time.perf_counter()
+    manager.reconcile(pending, 0)
+    reconcile = time.perf_counter() - started
+    started = time.perf_counter()
+    for event in events[3 * orders :]:
+        manager.apply(event, 0)
+    final = time.perf_counter() - started
+    assert len(manager) == 0
+    return per_order, (partial + final) / len(events) * 1e6, reconcile / orders * 1e6
+
+
+def main(*sizes: int) -> None:
+    for orders in sizes or (1000, 10000, 50000):
+        per_order, per_event, per_row = run(orders)
+        print(
+            f"orders={orders:>6}  {per_order:7.0f} B/order  {per_event:5.2f} us/event  "
+            f"reconcile {per_row:5.2f} us/order"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
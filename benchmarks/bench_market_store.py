@@ -0,0 +1,37 @@
+import time
+
+import numpy as np
+
+from packages.data.store import CandleBar, MarketDataStore
+
+
+def main(symbols: int = 500, timeframes: int = 3, bars: int = 2000, capacity: int = 1440) -> None:
+    store = MarketDataStore(candle_capacity=capacity, max_series=symbols * timeframes)
+    keys = [(f"SYM{i}-USDT-SWAP", f"tf{j}") for i in range(symbols) for j in range(timeframes)]
+    rng = np.random.default_rng(7)
+    closes = 100 + np.cumsum(rng.normal(0, 0.1, bars))
+
+    started = time.perf_counter()
+    for n in range(bars):
+        close = float(closes[n])
+        store.append_candles(
+            [
+                CandleBar(symbol, timeframe, n * 60000, close, close, close, close, 1.0)
+                for symbol, timeframe in keys
+            ]
+        )
+    append_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for symbol, timeframe in keys:
+        store.candles(symbol, timeframe).close.mean()
+    view_elapsed = time.perf_counter() - started
+
+    total = bars * len(keys)
+    print(f"series={len(keys)} capacity={capacity} memory={store.nbytes / 1e6:.1f} MB")
+    print(f"append: {total / append_elapsed:,.0f} bars/s")
+    print(f"full-window read + mean: {view_elapsed / len(keys) * 1e6:.1f} us/series")
+
+
+if __name__ == "__main__":
+    main()
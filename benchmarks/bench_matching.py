@@ -0,0 +1,93 @@
+import sys
+import time
+
+import numpy as np
+
+from packages.data.orderbook import OrderBookEngine
+from packages.execution.matching import PaperMatchingEngine
+
+TICK = 0.1
+
+
+def _message(symbol: str, action: str, bids, asks, seq_id: int, ts: int) -> dict:
+    data = {
+        "bids": [[f"{p:.1f}", f"{s:.3f}", "0", "1"] for p, s in bids],
+        "asks": [[f"{p:.1f}", f"{s:.3f}", "0", "1"] for p, s in asks],
+        "seqId": seq_id,
+        "prevSeqId": seq_id - 1,
+        "ts": ts,
+    }
+    return {"arg": {"channel": "books", "instId": symbol}, "action": action, "data": [data]}
+
+
+def book_stream(symbols: int, updates: int, levels: int = 400, seed: int = 7) -> list[dict]:
+    # Snapshots, then updates that each touch a few levels near the touch while the mid
+    # random-walks a tick at a time, so resting orders are reached now and then.
+    rng = np.random.default_rng(seed)
+    names = [f"SYM{i}-USDT-SWAP" for i in range(symbols)]
+    mids = {name: 100.0 for name in names}
+    messages = []
+    for name in names:
+        bids = [(100.0 - TICK * (i + 1), rng.uniform(1, 50)) for i in range(levels)]
+        asks = [(100.0 + TICK * (i + 1), rng.uniform(1, 50)) for i in range(levels)]
+        messages.append(_message(name, "snapshot", bids, asks, 1, 0))
+    for n in range(updates):
+        name = names[n % symbols]
+        mid = mids[name] = round(mids[name] + TICK * rng.choice((-1, 0, 0, 0, 1)), 1)
+        offsets = rng.integers(1, 20, 4)
+        sizes = np.where(rng.random(4) < 0.2, 0.0, rng.uniform(1, 50, 4))
+        # Clearing the mid level on both sides keeps the book uncrossed as the mid moves.
+        bids = [(mid, 0.0)] + [
+            (round(mid - TICK * o, 1), s) for o, s in zip(offsets[:2], sizes[:2])
+        ]
+        asks = [(mid, 0.0)] + [
+            (round(mid + TICK * o, 1), s) for o, s in zip(offsets[2:], sizes[2:])
+        ]
+        seq_id = n // symbols + 2
+        messages.append(_message(name, "update", bids, asks, seq_id, seq_id * 10))
+    return messages
+
+
+def _replay(messages: list[dict], matcher_orders: int, symbols: int) -> tuple[float, int]:
+    books = OrderBookEngine()
+    for message in messages[:symbols]:
+        books.on_message(message)
+    filled = 0
+    if matcher_orders:
+        matcher = PaperMatchingEngine(books)
+        for i in range(matcher_orders):
+            is_buy = i % 2 == 0
+            offset = TICK * (1 + i % 30)
+            matcher.submit(
+                {
+                    "plan_id": f"bench-{i}",
+                    "symbol": f"SYM{i % symbols}-USDT-SWAP",
+                    "side": "long" if is_buy else "short",
+                    "order_type": "limit",
+                    "price": round(100.0 - offset if is_buy else 100.0 + offset, 1),
+                    "notional_usd": 500.0,
+                    "tif": "GTC",
+                },
+                0,
+            )
+    started = time.perf_counter()
+    for message in messages[symbols:]:
+        books.on_message(message)
+    elapsed = time.perf_counter() - started
+    if matcher_orders:
+        filled = sum(len(update.fills) for update in matcher.pending)
+    return elapsed, filled
+
+
+def main(symbols: int = 50, orders: int = 5000, updates: int = 100000) -> None:
+    messages = book_stream(symbols, updates)
+    base, _ = _replay(messages, 0, symbols)
+    matched, fills = _replay(messages, orders, symbols)
+    print(f"symbols={symbols} resting orders={orders} book updates={updates}")
+    print(f"book only:     {base / updates * 1e6:.2f} us/update")
+    print(f"with matching: {matched / updates * 1e6:.2f} us/update ({fills} paper fills)")
+    print(f"matching cost: {(matched - base) / updates * 1e6:.2f} us/update")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
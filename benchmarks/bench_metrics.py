@@ -0,0 +1,46 @@
+import sys
+import time
+
+from packages.common.metrics import Timed
+
+
+def _noop(x: int) -> int:
+    return x
+
+
+def _per_call_ns(fn, calls: int) -> float:
+    started = time.perf_counter()
+    for n in range(calls):
+        fn(n)
+    return (time.perf_counter() - started) / calls * 1e9
+
+
+def _span_ns(timer: Timed, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        with timer.span():
+            pass
+    return (time.perf_counter() - started) / calls * 1e9
+
+
+def main(calls: int = 1_000_000) -> None:
+    bare = _per_call_ns(_noop, calls)
+    # A period longer than the run, so no call is ever sampled in.
+    sampled_out = Timed("bench_out", sample_rate=1 / (calls * 10))
+    sampled_in = Timed("bench_in", sample_rate=1.0)
+    one_in_ten = Timed("bench_tenth", sample_rate=0.1)
+    sampled_out(_noop)(0)  # the first tick is always sampled
+    rows = [
+        ("decorator, sampled out", _per_call_ns(sampled_out(_noop), calls) - bare),
+        ("decorator, 1 in 10", _per_call_ns(one_in_ten(_noop), calls) - bare),
+        ("decorator, every call", _per_call_ns(sampled_in(_noop), calls) - bare),
+        ("span, sampled out", _span_ns(sampled_out, calls)),
+        ("span, every call", _span_ns(sampled_in, calls)),
+    ]
+    print(f"bare call {bare:.0f} ns ({calls} calls)")
+    for name, ns in rows:
+        print(f"{name:<24} +{ns:6.0f} ns/call")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
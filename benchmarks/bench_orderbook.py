@@ -0,0 +1,62 @@
+import random
+import time
+
+from packages.data.orderbook import OrderBookEngine
+
+
+def make_messages(n: int, symbol: str = "BTC-USDT-SWAP", levels: int = 400, seed: int = 7):
+    rng = random.Random(seed)
+    tick, mid = 0.1, 42000.0
+    bids = {round(mid - tick * (i + 1), 1): rng.uniform(1, 50) for i in range(levels)}
+    asks = {round(mid + tick * (i + 1), 1): rng.uniform(1, 50) for i in range(levels)}
+    arg = {"channel": "books", "instId": symbol}
+    messages = [
+        {
+            "arg": arg,
+            "action": "snapshot",
+            "data": [
+                {
+                    "bids": [[str(p), f"{s:.2f}", "0", "1"] for p, s in bids.items()],
+                    "asks": [[str(p), f"{s:.2f}", "0", "1"] for p, s in asks.items()],
+                    "ts": "1704067200000",
+                    "seqId": 1,
+                    "prevSeqId": -1,
+                }
+            ],
+        }
+    ]
+    for seq in range(2, n + 2):
+        changes = {"bids": [], "asks": []}
+        for _ in range(rng.randint(1, 6)):
+            side = rng.choice(("bids", "asks"))
+            offset = rng.randint(1, 60) * tick
+            price = round(mid - offset if side == "bids" else mid + offset, 1)
+            size = 0.0 if rng.random() < 0.3 else rng.uniform(0.1, 50)
+            changes[side].append([str(price), f"{size:.2f}", "0", "1"])
+        messages.append(
+            {
+                "arg": arg,
+                "action": "update",
+                "data": [
+                    {**changes, "ts": str(1704067200000 + seq), "seqId": seq, "prevSeqId": seq - 1}
+                ],
+            }
+        )
+    return messages
+
+
+def main(n: int = 100_000) -> None:
+    messages = make_messages(n)
+    engine = OrderBookEngine()
+    started = time.perf_counter()
+    for message in messages:
+        engine.on_message(message)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{len(messages) / elapsed:,.0f} updates/s ({elapsed / len(messages) * 1e6:.1f} us/update)"
+    )
+    print(engine.features("BTC-USDT-SWAP"))
+
+
+if __name__ == "__main__":
+    main()
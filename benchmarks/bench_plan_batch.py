@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import numpy as np
+
+from packages.common.repository import SqlRepository, sqlite_session_factory
+from packages.data.store import CandleBar
+from packages.planner.batch import generate_plans_batch
+from packages.regime.engine import get_regime_engine
+from packages.signals.engine import get_indicator_engine
+
+
+def history_loader(bars: int = 500, seed: int = 3):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.003, bars)))
+
+    # Serves the full history on first load and nothing newer afterwards.
+    def load(symbol, timeframe, since_ms=None, limit=500):
+        if since_ms is not None:
+            return []
+        return [
+            CandleBar(symbol, timeframe, i * 60000, c, c * 1.001, c * 0.999, c, 1.0)
+            for i, c in enumerate(close[-limit:])
+        ]
+
+    return load
+
+
+def main(symbols: int = 200, cycles: int = 5) -> None:
+    repository = SqlRepository(sqlite_session_factory())
+    names = [f"SYM{i}-USDT-SWAP" for i in range(symbols)]
+    get_indicator_engine().loader = get_regime_engine().loader = history_loader()
+
+    async def cycle() -> float:
+        started = time.perf_counter()
+        await generate_plans_batch(names, refresh_context=False, repository=repository)
+        return time.perf_counter() - started
+
+    warmup = asyncio.run(cycle())
+    elapsed = [asyncio.run(cycle()) for _ in range(cycles)]
+    print(f"symbols={symbols}")
+    print(f"first cycle (history backfill): {warmup * 1e3:.1f} ms")
+    print(f"cycle: best {min(elapsed) * 1e3:.1f} ms, worst {max(elapsed) * 1e3:.1f} ms")
+    print(f"per symbol: {min(elapsed) / symbols * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
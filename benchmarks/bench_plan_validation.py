@@ -0,0 +1,52 @@
+import json
+import os
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+os.environ.setdefault(
+    "PLAN_SCHEMA_PATH", str(ROOT / "packages/common/schemas/trade_plan.schema.json")
+)
+
+from jsonschema import Draft202012Validator  # noqa: E402
+
+from packages.planner.planner import (  # noqa: E402
+    load_plan_schema,
+    precheck_plan,
+    validate_plan,
+    validate_plans,
+)
+
+
+def legacy_validate_plan(plan: dict) -> tuple[bool, list[str]]:
+    validator = Draft202012Validator(load_plan_schema())
+    errors = [error.message for error in validator.iter_errors(plan)]
+    return (len(errors) == 0, errors)
+
+
+def bench(label: str, fn, plans: list[dict]) -> None:
+    started = time.perf_counter()
+    fn(plans)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed / len(plans) * 1e6:10.1f} us/plan")
+
+
+def main(n: int = 2000) -> None:
+    plan = json.loads((ROOT / "examples/plan_trend.json").read_text())
+    invalid = json.loads(json.dumps(plan))
+    invalid["intent"]["confidence"] = 2
+    del invalid["risk"]["stop_loss"]
+    plans = [plan] * n
+    bad = [invalid] * n
+
+    bench("legacy (load+compile)", lambda ps: [legacy_validate_plan(p) for p in ps], plans)
+    bench("registry validate_plan", lambda ps: [validate_plan(p) for p in ps], plans)
+    bench("validate_plans", validate_plans, plans)
+    bench("legacy invalid", lambda ps: [legacy_validate_plan(p) for p in ps], bad)
+    bench("registry invalid", lambda ps: [validate_plan(p) for p in ps], bad)
+    bench("precheck_plan invalid", lambda ps: [precheck_plan(p) for p in ps], bad)
+    bench("validate_plans fail_fast", lambda ps: validate_plans(ps, fail_fast=True), bad)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+
+from packages.regime.engine import RegimeEngine
+
+
+def main(symbols: int = 500, bars: int = 200, history: int = 1000, reads: int = 100000) -> None:
+    engine = RegimeEngine(loader=lambda *args: [])
+    rng = np.random.default_rng(11)
+    names = [f"SYM{i}-USDT-SWAP" for i in range(symbols)]
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, history + bars)))
+    spread = np.abs(rng.normal(0, 0.002, history + bars))
+    high, low = close * (1 + spread), close * (1 - spread)
+    ts = np.arange(history + bars) * 900000
+
+    started = time.perf_counter()
+    for name in names:
+        engine.backfill(name, ts[:history], high[:history], low[:history], close[:history])
+    backfill_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(history, history + bars):
+        bar_ts, bar_high, bar_low, bar_close = (
+            int(ts[i]),
+            float(high[i]),
+            float(low[i]),
+            float(close[i]),
+        )
+        for name in names:
+            engine.update(name, bar_ts, bar_high, bar_low, bar_close)
+    update_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(reads):
+        engine.state(names[i % symbols])
+    read_elapsed = time.perf_counter() - started
+
+    updates = symbols * bars
+    print(f"symbols={symbols}")
+    print(f"backfill: {backfill_elapsed / symbols * 1e3:.2f} ms/symbol for {history} bars")
+    print(f"incremental: {update_elapsed / updates * 1e6:.2f} us/bar")
+    print(f"one bar across all symbols: {update_elapsed / bars * 1e3:.2f} ms")
+    print(f"cached read: {read_elapsed / reads * 1e9:.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import json
+import random
+import time
+from pathlib import Path
+
+from packages.risk.engine import RiskContext, check_plan, check_plans
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def make_plans(n: int, seed: int = 7) -> list[dict]:
+    base = json.loads((ROOT / "examples/plan_trend.json").read_text())
+    rng = random.Random(seed)
+    plans = []
+    for i in range(n):
+        plan = json.loads(json.dumps(base))
+        entry = rng.uniform(10, 70000)
+        plan["meta"]["plan_id"] = f"bench-{i}"
+        plan["entry"]["price_range"] = [entry, entry * 1.001]
+        plan["risk"]["stop_loss"] = rng.choice([0, entry * rng.uniform(0.9, 0.999)])
+        plan["risk"]["max_loss_pct"] = rng.uniform(0, 0.15)
+        plan["risk"]["risk_budget_pct"] = rng.uniform(0.001, 0.12)
+        plan["sizing"]["leverage"] = rng.randint(1, 120)
+        plan["sizing"]["notional_usd"] = rng.uniform(100, 200000)
+        plans.append(plan)
+    return plans
+
+
+def main(n: int = 10000) -> None:
+    plans = make_plans(n)
+    context = RiskContext(
+        equity=100000,
+        peak_equity=120000,
+        daily_loss_pct=0.0,
+        consecutive_losses=0,
+        open_positions=0,
+        positions_per_symbol=0,
+        net_exposure_pct=0.0,
+        liquidation_buffer_ratio=0.2,
+        risk_state="NORMAL",
+    )
+
+    started = time.perf_counter()
+    scalar = [check_plan(plan, context) for plan in plans]
+    loop_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = check_plans(plans, context)
+    batch_elapsed = time.perf_counter() - started
+
+    assert [r.reasons for r in scalar] == [r.reasons for r in batch]
+    print(f"per-plan loop  {n / loop_elapsed:12,.0f} plans/s")
+    print(f"check_plans    {n / batch_elapsed:12,.0f} plans/s")
+    print(f"speedup        {loop_elapsed / batch_elapsed:12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import copy
+import json
+import statistics
+import time
+from pathlib import Path
+from uuid import uuid4
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+
+ENDPOINTS = {
+    "status": ("GET", "/status"),
+    "generate": ("POST", "/plans/generate?symbol=BTC-USDT&market_type=perp"),
+    "execute": ("POST", "/plans/execute"),
+}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run(
+    client: httpx.AsyncClient, prefix: str, endpoint: str, requests: int, concurrency: int
+) -> dict:
+    method, path = ENDPOINTS[endpoint]
+    plan = json.loads((ROOT / "examples/plan_trend.json").read_text())
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        nonlocal errors
+        body = None
+        if endpoint == "execute":
+            body = copy.deepcopy(plan)
+            body["meta"]["plan_id"] = f"load-{uuid4().hex[:12]}"
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, prefix + path, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "errors": errors,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare sync and /async API endpoints")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", default="change_me")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--endpoints", default="status,generate,execute")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(
+        max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=args.base_url,
+        headers={"X-API-Token": args.token},
+        limits=limits,
+        timeout=60,
+    ) as client:
+        print(f"{'endpoint':<10} {'mode':<6} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9} {'5xx':>5}")
+        for endpoint in args.endpoints.split(","):
+            for mode, prefix in (("sync", ""), ("async", "/async")):
+                result = await run(client, prefix, endpoint, args.requests, args.concurrency)
+                print(
+                    f"{endpoint:<10} {mode:<6} {result['rps']:9.0f} {result['p50_ms']:9.1f} "
+                    f"{result['p99_ms']:9.1f} {result['errors']:5d}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+import os
+import shutil
+
+from packages.common.config import get_settings
+from packages.common.metrics import mark_process_dead
+
+settings = get_settings()
+
+bind = f"{settings.api_host}:{settings.api_port}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# The API keeps the order book feed, the live gateway and the paper matcher in process; a
+# second worker would run its own copies and fill or send the same orders twice.
+if workers > 1 and (settings.live_trading_enabled or settings.paper_matching_enabled):
+    raise RuntimeError(
+        f"WEB_CONCURRENCY={workers} needs LIVE_TRADING_ENABLED=false and "
+        "PAPER_MATCHING_ENABLED=false; the API holds order state in process"
+    )
+
+
+# Samples left by a previous run would otherwise be merged into the new one.
+def on_starting(server) -> None:
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker) -> None:
+    mark_process_dead(worker.pid)
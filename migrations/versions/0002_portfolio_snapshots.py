@@ -0,0 +1,29 @@
+"""portfolio snapshots
+
+Revision ID: 0002_portfolio_snapshots
+Revises: 0001_initial
+Create Date: 2024-01-02 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_portfolio_snapshots"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "portfolio_snapshots",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("ts", sa.DateTime, nullable=False),
+        sa.Column("last_fill_id", sa.Integer, nullable=False),
+        sa.Column("last_outcome_id", sa.Integer, nullable=False),
+        sa.Column("state", sa.JSON, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("portfolio_snapshots")
@@ -0,0 +1,65 @@
+"""timescale hypertables, indexes and policies
+
+Revision ID: 0003_timescale_hypertables
+Revises: 0002_portfolio_snapshots
+Create Date: 2024-01-03 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from packages.common.config import get_settings
+from packages.common.timescale import hypertable_policies, policy_statements
+
+revision = "0003_timescale_hypertables"
+down_revision = "0002_portfolio_snapshots"
+branch_labels = None
+depends_on = None
+
+
+TABLES = ("audit_events", "fills", "order_instructions")
+
+INDEXES = [
+    ("ix_audit_events_event_type_ts", "audit_events", ["event_type", "ts"]),
+    ("ix_audit_events_plan_id_ts", "audit_events", ["plan_id", "ts"]),
+    ("ix_fills_plan_id", "fills", ["plan_id"]),
+    ("ix_fills_symbol_ts", "fills", ["symbol", "ts"]),
+    ("ix_order_instructions_plan_id", "order_instructions", ["plan_id"]),
+    ("ix_order_instructions_symbol_ts", "order_instructions", ["symbol", "ts"]),
+    ("ix_risk_decisions_plan_id", "risk_decisions", ["plan_id"]),
+]
+
+
+def upgrade() -> None:
+    settings = get_settings()
+    op.add_column("audit_events", sa.Column("plan_id", sa.String(length=64), nullable=True))
+    op.execute("CREATE EXTENSION IF NOT EXISTS timescaledb")
+    for policy in hypertable_policies(settings):
+        if policy.table not in TABLES:
+            continue
+        # Hypertable unique constraints must include the partitioning column.
+        op.execute(f"ALTER TABLE {policy.table} DROP CONSTRAINT {policy.table}_pkey")
+        op.execute(f"ALTER TABLE {policy.table} ADD PRIMARY KEY (id, ts)")
+        op.execute(
+            f"SELECT create_hypertable('{policy.table}', 'ts', "
+            f"chunk_time_interval => INTERVAL '{settings.timescale_chunk_interval_days} days', "
+            "migrate_data => true)"
+        )
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+    for statement in policy_statements(settings, TABLES):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    # Hypertables cannot be converted back in place; only policies, indexes and the
+    # audit plan_id column are reverted.
+    settings = get_settings()
+    for policy in hypertable_policies(settings):
+        if policy.table not in TABLES:
+            continue
+        op.execute(f"SELECT remove_retention_policy('{policy.table}', if_exists => true)")
+        op.execute(f"SELECT remove_compression_policy('{policy.table}', if_exists => true)")
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    op.drop_column("audit_events", "plan_id")
@@ -0,0 +1,43 @@
+"""candles hypertable
+
+Revision ID: 0004_candles
+Revises: 0003_timescale_hypertables
+Create Date: 2024-01-04 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from packages.common.config import get_settings
+from packages.common.timescale import policy_statements
+
+revision = "0004_candles"
+down_revision = "0003_timescale_hypertables"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    settings = get_settings()
+    op.create_table(
+        "candles",
+        sa.Column("symbol", sa.String(length=32), nullable=False),
+        sa.Column("timeframe", sa.String(length=8), nullable=False),
+        sa.Column("ts", sa.DateTime, nullable=False),
+        sa.Column("open", sa.Float, nullable=False),
+        sa.Column("high", sa.Float, nullable=False),
+        sa.Column("low", sa.Float, nullable=False),
+        sa.Column("close", sa.Float, nullable=False),
+        sa.Column("volume", sa.Float, nullable=False),
+        sa.PrimaryKeyConstraint("symbol", "timeframe", "ts"),
+    )
+    op.execute(
+        "SELECT create_hypertable('candles', 'ts', "
+        f"chunk_time_interval => INTERVAL '{settings.timescale_chunk_interval_days} days')"
+    )
+    for statement in policy_statements(settings, ("candles",)):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    op.drop_table("candles")
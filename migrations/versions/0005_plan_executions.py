@@ -0,0 +1,29 @@
+"""plan execution ledger
+
+Revision ID: 0005_plan_executions
+Revises: 0004_candles
+Create Date: 2024-01-05 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_plan_executions"
+down_revision = "0004_candles"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "plan_executions",
+        sa.Column("plan_id", sa.String(length=64), primary_key=True),
+        sa.Column("ts", sa.DateTime, nullable=False),
+        sa.Column("order_instruction_id", sa.Integer, nullable=True),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("receipt", sa.JSON, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("plan_executions")
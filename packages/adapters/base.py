@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+
+class AdapterError(RuntimeError):
+    pass
+
+
+class CircuitOpen(AdapterError):
+    pass
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+# Entries are fresh for `ttl_sec`, then served as stale for another `stale_ttl_sec` while a
+# refresh is attempted, then dropped. Wall-clock timestamps so entries survive a Redis hop.
+class TTLCache:
+    def __init__(self, ttl_sec: float, stale_ttl_sec: float, max_entries: int = 1024) -> None:
+        self.ttl_sec = ttl_sec
+        self.stale_ttl_sec = stale_ttl_sec
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.age > self.ttl_sec + self.stale_ttl_sec:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any, stored_at: float | None = None) -> CacheEntry:
+        entry = CacheEntry(value, stored_at if stored_at is not None else time.time())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return entry.age <= self.ttl_sec
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 3, reset_timeout_sec: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_sec = reset_timeout_sec
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout_sec:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            # A failed probe while half-open re-opens immediately.
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass, field, replace
+from functools import lru_cache
+
+import httpx
+import orjson
+from prometheus_client import Counter, Gauge, Histogram
+
+from packages.adapters.base import CircuitBreaker, CircuitOpen, TTLCache
+from packages.adapters.news import Event, NewsAdapter
+from packages.adapters.onchain import OnchainAdapter, OnchainSnapshot
+from packages.adapters.trends import TrendsAdapter, TrendsSnapshot
+from packages.common.config import get_settings
+from packages.common.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ("news", "trends", "onchain")
+
+ADAPTER_FETCH_LATENCY = Histogram(
+    "adapter_fetch_latency_seconds", "Upstream adapter fetch latency", ["source"]
+)
+ADAPTER_FALLBACKS = Counter(
+    "adapter_fallbacks_total", "Adapter fetches served from cache or defaults", ["source", "reason"]
+)
+ADAPTER_CIRCUIT_OPEN = Gauge(
+    "adapter_circuit_open",
+    "1 while the source breaker is open",
+    ["source"],
+    multiprocess_mode="livemax",
+)
+
+
+@dataclass
+class ContextSnapshot:
+    symbol: str
+    ts: float
+    events: list[Event]
+    trends: list[TrendsSnapshot]
+    onchain: OnchainSnapshot
+    degraded: list[str] = field(default_factory=list)
+
+    def to_json(self) -> bytes:
+        return orjson.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, data: bytes) -> ContextSnapshot:
+        raw = orjson.loads(data)
+        return cls(
+            symbol=raw["symbol"],
+            ts=float(raw["ts"]),
+            events=[Event(**item) for item in raw["events"]],
+            trends=[TrendsSnapshot(**item) for item in raw["trends"]],
+            onchain=OnchainSnapshot(**raw["onchain"]),
+            degraded=list(raw.get("degraded", [])),
+        )
+
+    def discounted(self, factor: float, reason: str) -> ContextSnapshot:
+        return ContextSnapshot(
+            symbol=self.symbol,
+            ts=self.ts,
+            events=_discount(self.events, factor),
+            trends=_discount(self.trends, factor),
+            onchain=_discount(self.onchain, factor),
+            degraded=[*self.degraded, reason],
+        )
+
+
+def _discount(value, factor: float):
+    if isinstance(value, list):
+        return [replace(item, confidence=item.confidence * factor) for item in value]
+    return replace(value, confidence=value.confidence * factor)
+
+
+# Prefetched snapshots shared between the Celery worker and API processes.
+class RedisSnapshotStore:
+    def __init__(
+        self, prefix: str = "adapter_context", ttl_sec: float = 600.0, redis_factory=get_redis
+    ) -> None:
+        self.prefix = prefix
+        self.ttl_sec = ttl_sec
+        self.redis_factory = redis_factory
+
+    def save(self, snapshot: ContextSnapshot) -> None:
+        try:
+            self.redis_factory().setex(
+                f"{self.prefix}:{snapshot.symbol}", max(1, int(self.ttl_sec)), snapshot.to_json()
+            )
+        except Exception:
+            logger.warning("context snapshot save failed", exc_info=True)
+
+    def load(self, symbol: str) -> ContextSnapshot | None:
+        try:
+            data = self.redis_factory().get(f"{self.prefix}:{symbol}")
+            return ContextSnapshot.from_json(data) if data else None
+        except Exception:
+            logger.warning("context snapshot load failed", exc_info=True)
+            return None
+
+
+class AdapterHub:
+    def __init__(
+        self,
+        news: NewsAdapter,
+        trends: TrendsAdapter,
+        onchain: OnchainAdapter,
+        keywords: list[str] | None = None,
+        timeout_sec: float = 3.0,
+        ttl_sec: float = 60.0,
+        stale_ttl_sec: float = 600.0,
+        breaker_failures: int = 3,
+        breaker_reset_sec: float = 30.0,
+        degraded_confidence: float = 0.5,
+        max_connections: int = 20,
+        store: RedisSnapshotStore | None = None,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
+        self.news = news
+        self.trends = trends
+        self.onchain = onchain
+        self.keywords = keywords or []
+        self.timeout_sec = timeout_sec
+        self.degraded_confidence = degraded_confidence
+        self.max_connections = max_connections
+        self.store = store
+        self.sources = TTLCache(ttl_sec, stale_ttl_sec)
+        self.snapshots = TTLCache(ttl_sec, stale_ttl_sec)
+        self.breakers = {
+            name: CircuitBreaker(breaker_failures, breaker_reset_sec) for name in SOURCES
+        }
+        self._client = client
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._revalidating: dict[str, asyncio.Task] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # One pooled client for every source, so concurrent fetches reuse connections.
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout_sec,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    def keywords_for(self, symbol: str) -> list[str]:
+        return [symbol.split("-")[0], *self.keywords]
+
+    async def refresh(self, symbol: str) -> ContextSnapshot:
+        keywords = self.keywords_for(symbol)
+        (events, news_issue), (trends, trends_issue), (onchain, onchain_issue) = (
+            await asyncio.gather(
+                self._fetch(
+                    "news", "news", lambda client: self.news.fetch_events(client), self.news.default
+                ),
+                self._fetch(
+                    "trends",
+                    "trends:" + ",".join(keywords),
+                    lambda client: self.trends.fetch_trends(client, keywords),
+                    lambda: self.trends.default(keywords),
+                ),
+                self._fetch(
+                    "onchain",
+                    f"onchain:{symbol}",
+                    lambda client: self.onchain.fetch_snapshot(client, symbol),
+                    lambda: self.onchain.default(symbol),
+                ),
+            )
+        )
+        snapshot = ContextSnapshot(
+            symbol=symbol,
+            ts=time.time(),
+            events=events,
+            trends=trends,
+            onchain=onchain,
+            degraded=[issue for issue in (news_issue, trends_issue, onchain_issue) if issue],
+        )
+        self.snapshots.set(symbol, snapshot, stored_at=snapshot.ts)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.save, snapshot)
+        return snapshot
+
+    async def prefetch(self, symbols: list[str]) -> int:
+        try:
+            snapshots = await asyncio.gather(*(self.refresh(symbol) for symbol in symbols))
+        finally:
+            await self.close()
+        return sum(1 for snapshot in snapshots if not snapshot.degraded)
+
+    def snapshot(self, symbol: str) -> ContextSnapshot:
+        # Request path: memory, then the prefetched copy in Redis. Never calls upstream.
+        entry = self.snapshots.get(symbol)
+        if (entry is None or not self.snapshots.is_fresh(entry)) and self.store is not None:
+            loaded = self.store.load(symbol)
+            if loaded is not None and (entry is None or loaded.ts > entry.stored_at):
+                entry = self.snapshots.set(symbol, loaded, stored_at=loaded.ts)
+        if entry is None:
+            keywords = self.keywords_for(symbol)
+            return ContextSnapshot(
+                symbol=symbol,
+                ts=time.time(),
+                events=self.news.default(),
+                trends=self.trends.default(keywords),
+                onchain=self.onchain.default(symbol),
+                degraded=["missing"],
+            )
+        if self.snapshots.is_fresh(entry):
+            return entry.value
+        return entry.value.discounted(self.degraded_confidence, "stale")
+
+    async def asnapshot(self, symbol: str) -> ContextSnapshot:
+        # Stale-while-revalidate: answer from cache and refresh in the background.
+        snapshot = await asyncio.to_thread(self.snapshot, symbol)
+        if "stale" in snapshot.degraded or "missing" in snapshot.degraded:
+            self._revalidate(symbol)
+        return snapshot
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _revalidate(self, symbol: str) -> None:
+        if symbol in self._revalidating:
+            return
+        task = asyncio.create_task(self.refresh(symbol))
+        self._revalidating[symbol] = task
+        task.add_done_callback(lambda _: self._revalidating.pop(symbol, None))
+
+    async def _fetch(self, name: str, key: str, call, default):
+        # The per-source cache only backs failures; symbols refreshed together still share
+        # one upstream call per key (e.g. the news feed).
+        entry = self.sources.get(key)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._call(name, call))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        try:
+            value = await asyncio.shield(future)
+        except Exception as exc:
+            if isinstance(exc, CircuitOpen):
+                reason = "circuit_open"
+            elif isinstance(exc, asyncio.TimeoutError):
+                reason = "timeout"
+            else:
+                reason = "error"
+            ADAPTER_FALLBACKS.labels(source=name, reason=reason).inc()
+            if entry is not None:
+                return _discount(entry.value, self.degraded_confidence), f"{name}:{reason}"
+            return default(), f"{name}:{reason}"
+        self.sources.set(key, value)
+        return value, None
+
+    async def _call(self, name: str, call):
+        breaker = self.breakers[name]
+        if not breaker.allow():
+            raise CircuitOpen(name)
+        started = time.perf_counter()
+        try:
+            value = await asyncio.wait_for(call(self.client), self.timeout_sec)
+        except Exception:
+            breaker.record_failure()
+            logger.warning("%s adapter fetch failed", name, exc_info=True)
+            raise
+        else:
+            breaker.record_success()
+        finally:
+            ADAPTER_FETCH_LATENCY.labels(source=name).observe(time.perf_counter() - started)
+            ADAPTER_CIRCUIT_OPEN.labels(source=name).set(1 if breaker.state == "open" else 0)
+        return value
+
+
+@lru_cache
+def get_adapter_hub() -> AdapterHub:
+    settings = get_settings()
+    return AdapterHub(
+        news=NewsAdapter(settings.news_api_url),
+        trends=TrendsAdapter(settings.trends_api_url),
+        onchain=OnchainAdapter(settings.onchain_api_url),
+        keywords=settings.adapter_keywords,
+        timeout_sec=settings.adapter_timeout_sec,
+        ttl_sec=settings.adapter_cache_ttl_sec,
+        stale_ttl_sec=settings.adapter_stale_ttl_sec,
+        breaker_failures=settings.adapter_breaker_failures,
+        breaker_reset_sec=settings.adapter_breaker_reset_sec,
+        degraded_confidence=settings.adapter_degraded_confidence,
+        store=(
+            RedisSnapshotStore(
+                ttl_sec=settings.adapter_cache_ttl_sec + settings.adapter_stale_ttl_sec
+            )
+            if settings.adapter_snapshot_store_enabled
+            else None
+        ),
+    )
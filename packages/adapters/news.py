@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from datetime import datetime, timezone
 
+import httpx
+
 
 @dataclass
 class Event:
@@ -14,12 +16,41 @@ class Event:
     confidence: float
 
 
+def parse_events(body, source: str) -> list[Event]:
+    # Accepts a bare list or a CryptoPanic-style {"results": [...]} envelope.
+    items = body.get("results", []) if isinstance(body, dict) else body
+    return [
+        Event(
+            source=item.get("source") or source,
+            ts=item.get("ts") or item.get("published_at") or "",
+            headline=item.get("headline") or item.get("title") or "",
+            keywords=list(item.get("keywords", [])),
+            topic=item.get("topic", "general"),
+            sentiment_score=float(item.get("sentiment_score", 0.0)),
+            impact_score=float(item.get("impact_score", 0.0)),
+            confidence=float(item.get("confidence", 1.0)),
+        )
+        for item in items
+    ]
+
+
 class NewsAdapter:
-    def fetch_events(self) -> list[Event]:
+    def __init__(self, url: str = "", source: str = "crypto_panic") -> None:
+        self.url = url
+        self.source = source
+
+    async def fetch_events(self, client: httpx.AsyncClient) -> list[Event]:
+        if not self.url:
+            return self.default()
+        response = await client.get(self.url)
+        response.raise_for_status()
+        return parse_events(response.json(), self.source)
+
+    def default(self) -> list[Event]:
         now = datetime.now(timezone.utc).isoformat()
         return [
             Event(
-                source="crypto_panic",
+                source=self.source,
                 ts=now,
                 headline="No major headlines",
                 keywords=[],
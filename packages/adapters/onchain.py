@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from datetime import datetime, timezone
 
+import httpx
+
 
 @dataclass
 class OnchainSnapshot:
@@ -10,6 +12,21 @@ class OnchainSnapshot:
 
 
 class OnchainAdapter:
-    def fetch_snapshot(self, symbol: str) -> OnchainSnapshot:
+    def __init__(self, url: str = "") -> None:
+        self.url = url
+
+    async def fetch_snapshot(self, client: httpx.AsyncClient, symbol: str) -> OnchainSnapshot:
+        if not self.url:
+            return self.default(symbol)
+        response = await client.get(self.url, params={"symbol": symbol})
+        response.raise_for_status()
+        body = response.json()
+        return OnchainSnapshot(
+            ts=body.get("ts") or datetime.now(timezone.utc).isoformat(),
+            metrics=dict(body.get("metrics", {})),
+            confidence=float(body.get("confidence", 1.0)),
+        )
+
+    def default(self, symbol: str) -> OnchainSnapshot:
         now = datetime.now(timezone.utc).isoformat()
         return OnchainSnapshot(ts=now, metrics={}, confidence=0.0)
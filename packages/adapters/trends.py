@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from datetime import datetime, timezone
 
+import httpx
+
 
 @dataclass
 class TrendsSnapshot:
@@ -11,9 +13,27 @@ class TrendsSnapshot:
 
 
 class TrendsAdapter:
-    def fetch_trends(self, keywords: list[str]) -> list[TrendsSnapshot]:
+    def __init__(self, url: str = "") -> None:
+        self.url = url
+
+    async def fetch_trends(
+        self, client: httpx.AsyncClient, keywords: list[str]
+    ) -> list[TrendsSnapshot]:
+        if not self.url:
+            return self.default(keywords)
+        response = await client.get(self.url, params={"keywords": ",".join(keywords)})
+        response.raise_for_status()
         now = datetime.now(timezone.utc).isoformat()
         return [
-            TrendsSnapshot(ts=now, keyword=kw, score=0.0, confidence=0.0)
-            for kw in keywords
+            TrendsSnapshot(
+                ts=item.get("ts", now),
+                keyword=item["keyword"],
+                score=float(item.get("score", 0.0)),
+                confidence=float(item.get("confidence", 1.0)),
+            )
+            for item in response.json()
         ]
+
+    def default(self, keywords: list[str]) -> list[TrendsSnapshot]:
+        now = datetime.now(timezone.utc).isoformat()
+        return [TrendsSnapshot(ts=now, keyword=kw, score=0.0, confidence=0.0) for kw in keywords]
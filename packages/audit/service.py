@@ -1,14 +1,323 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
 from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+
+import orjson
+from prometheus_client import Counter, Gauge, Histogram
 
-from packages.common.db import SessionLocal
+from packages.common.config import get_settings
 from packages.common.models import AuditEvent
+from packages.common.repository import Repository, get_repository
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop", "spill", "block")
+SPILL_REPLAY_BACKOFF_SEC = 5.0
+
+AUDIT_QUEUE_DEPTH = Gauge(
+    "audit_queue_depth", "Audit events waiting to be flushed", multiprocess_mode="livesum"
+)
+AUDIT_FLUSH_BATCH_SIZE = Histogram(
+    "audit_flush_batch_size",
+    "Audit events written per flush",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+)
+AUDIT_FLUSH_LATENCY = Histogram("audit_flush_latency_seconds", "Audit batch insert latency")
+AUDIT_EVENT_LAG = Histogram(
+    "audit_event_lag_seconds",
+    "Time between log_event and the audit row being committed",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+AUDIT_EVENTS_DROPPED = Counter("audit_events_dropped_total", "Audit events dropped", ["reason"])
+AUDIT_EVENTS_SPILLED = Counter("audit_events_spilled_total", "Audit events spilled to disk")
+
+
+def _event_row(event_type: str, payload: dict, plan_id: str | None = None) -> dict:
+    if plan_id is None and isinstance(payload, dict):
+        plan_id = payload.get("plan_id")
+    return {
+        "ts": datetime.now(timezone.utc),
+        "event_type": event_type,
+        "plan_id": plan_id,
+        "payload": payload,
+    }
+
+
+def write_events(rows: list[dict], repository: Repository | None = None) -> None:
+    if not rows:
+        return
+    (repository or get_repository()).write_events(rows)
+
+
+class AuditWriter:
+    def __init__(
+        self,
+        repository: Repository | None = None,
+        maxsize: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        overflow_policy: str = "spill",
+        spill_path: str | None = None,
+    ) -> None:
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown audit overflow policy: {overflow_policy}")
+        self.repository = repository
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.spill_path = Path(spill_path) if spill_path else None
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._spill_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._needs_replay = True
+        self._replay_after = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self.running:
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Forked child (Celery prefork, gunicorn): the parent's queue and thread are unusable.
+                self._queue = queue.Queue(maxsize=self.maxsize)
+            self._pid = os.getpid()
+            self._stop.clear()
+            # Sweeps the spill file and any claims abandoned by dead processes.
+            self._needs_replay = True
+            self._replay_after = 0.0
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("audit writer did not drain within %.1fs", timeout)
+            return
+        # Anything enqueued after the thread exited still has to land somewhere.
+        leftover = self._drain_nowait()
+        if leftover:
+            self._flush(leftover)
+
+    def submit(self, event_type: str, payload: dict, plan_id: str | None = None) -> bool:
+        if not self.running:
+            self.start()
+        row = _event_row(event_type, payload, plan_id)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            return self._overflow(row)
+        AUDIT_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    def _overflow(self, row: dict) -> bool:
+        if self.overflow_policy == "block":
+            try:
+                self._queue.put(row, timeout=self.flush_interval * 4)
+                return True
+            except queue.Full:
+                pass
+        if self.overflow_policy in ("spill", "block") and self.spill_path:
+            self._spill([row])
+            return True
+        AUDIT_EVENTS_DROPPED.labels(reason="queue_full").inc()
+        return False
+
+    def _run(self) -> None:
+        while not self._stop.is_set() or not self._queue.empty():
+            # Nothing may end the thread early: events would then queue up unwritten.
+            try:
+                if self._needs_replay and time.monotonic() >= self._replay_after:
+                    self._replay_spill()
+                batch = self._drain()
+                if batch:
+                    self._flush(batch)
+            except Exception:
+                logger.exception("audit writer iteration failed")
 
+    def _drain(self) -> list[dict]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                batch.extend(self._drain_nowait(self.batch_size - len(batch)))
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
 
-def log_event(event_type: str, payload: dict) -> None:
-    session = SessionLocal()
+    def _drain_nowait(self, limit: int | None = None) -> list[dict]:
+        rows: list[dict] = []
+        while limit is None or len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _flush(self, batch: list[dict]) -> None:
+        started = time.perf_counter()
+        try:
+            write_events(batch, self.repository)
+        except Exception:
+            logger.exception("audit flush of %d events failed", len(batch))
+            if self.overflow_policy in ("spill", "block") and self.spill_path:
+                self._spill(batch)
+            else:
+                AUDIT_EVENTS_DROPPED.labels(reason="flush_failed").inc(len(batch))
+            return
+        finally:
+            AUDIT_QUEUE_DEPTH.set(self._queue.qsize())
+        committed = datetime.now(timezone.utc)
+        AUDIT_FLUSH_LATENCY.observe(time.perf_counter() - started)
+        AUDIT_FLUSH_BATCH_SIZE.observe(len(batch))
+        for row in batch:
+            AUDIT_EVENT_LAG.observe((committed - row["ts"]).total_seconds())
+
+    def _spill(self, rows: list[dict]) -> None:
+        lines = []
+        for row in rows:
+            try:
+                lines.append(orjson.dumps(row) + b"\n")
+            except TypeError:
+                logger.exception("audit event %s is not serializable", row.get("event_type"))
+                AUDIT_EVENTS_DROPPED.labels(reason="unserializable").inc()
+        try:
+            with self._spill_lock:
+                with open(self.spill_path, "ab") as handle:
+                    handle.write(b"".join(lines))
+        except OSError:
+            logger.exception("audit spill of %d events failed", len(lines))
+            AUDIT_EVENTS_DROPPED.labels(reason="spill_failed").inc(len(lines))
+            return
+        AUDIT_EVENTS_SPILLED.inc(len(lines))
+        self._needs_replay = True
+        self._replay_after = time.monotonic() + SPILL_REPLAY_BACKOFF_SEC
+
+    def _replay_spill(self) -> None:
+        self._needs_replay = False
+        if not self.spill_path:
+            return
+        # Claimed by rename, so concurrent processes never replay the same file twice. Claims
+        # left by dead processes, or by an earlier failed replay here, are taken over.
+        leftovers = [
+            path
+            for path in self.spill_path.parent.glob(f"{self.spill_path.name}.*.replay")
+            if _claim_owner_gone(path)
+        ]
+        claimed = [self._claim(path) for path in (self.spill_path, *leftovers)]
+        for path in claimed:
+            if path is None:
+                continue
+            try:
+                self._replay_file(path)
+            except Exception:
+                logger.exception("audit spill replay of %s failed", path)
+                self._needs_replay = True
+                self._replay_after = time.monotonic() + SPILL_REPLAY_BACKOFF_SEC
+
+    def _claim(self, path: Path) -> Path | None:
+        claimed = self.spill_path.with_name(
+            f"{self.spill_path.name}.{os.getpid()}.{time.time_ns()}.replay"
+        )
+        with self._spill_lock:
+            try:
+                path.rename(claimed)
+            except FileNotFoundError:
+                return None
+        return claimed
+
+    def _replay_file(self, claimed: Path) -> None:
+        rows = []
+        for line in claimed.read_bytes().splitlines():
+            if not line.strip():
+                continue
+            # A torn or corrupt line loses that event only.
+            try:
+                row = orjson.loads(line)
+                row["ts"] = datetime.fromisoformat(row["ts"])
+            except (orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+                AUDIT_EVENTS_DROPPED.labels(reason="corrupt_spill").inc()
+                continue
+            rows.append(row)
+        try:
+            for offset in range(0, len(rows), self.batch_size):
+                write_events(rows[offset : offset + self.batch_size], self.repository)
+        except Exception:
+            logger.exception("audit spill replay failed; re-spilling remaining events")
+            self._spill(rows[offset:])
+            claimed.unlink()
+            return
+        claimed.unlink()
+        logger.info("replayed %d spilled audit events", len(rows))
+
+
+def _claim_owner_gone(path: Path) -> bool:
+    # <spill>.<pid>.<ns>.replay; this process's own leftovers count as abandoned too, since
+    # its single writer thread is not replaying while it looks.
+    try:
+        pid = int(path.name.split(".")[-3])
+    except (IndexError, ValueError):
+        return True
+    if pid == os.getpid():
+        return True
     try:
-        event = AuditEvent(ts=datetime.now(timezone.utc), event_type=event_type, payload=payload)
-        session.add(event)
-        session.commit()
-    finally:
-        session.close()
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+@lru_cache
+def get_audit_writer() -> AuditWriter:
+    settings = get_settings()
+    writer = AuditWriter(
+        maxsize=settings.audit_queue_maxsize,
+        batch_size=settings.audit_batch_size,
+        flush_interval=settings.audit_flush_interval_sec,
+        overflow_policy=settings.audit_overflow_policy,
+        spill_path=settings.audit_spill_path,
+    )
+    atexit.register(writer.stop)
+    return writer
+
+
+def shutdown_audit_writer(timeout: float = 10.0) -> None:
+    if get_settings().audit_async_enabled:
+        get_audit_writer().stop(timeout)
+
+
+def log_event(event_type: str, payload: dict, plan_id: str | None = None) -> None:
+    if get_settings().audit_async_enabled:
+        get_audit_writer().submit(event_type, payload, plan_id)
+        return
+    write_events([_event_row(event_type, payload, plan_id)])
+
+
+def audit_trail(plan_id: str, limit: int = 500) -> list[AuditEvent]:
+    return get_repository().events_for_plan(plan_id, limit)
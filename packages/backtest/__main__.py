@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timezone
+from functools import partial
+
+import orjson
+
+from packages.backtest.data import attach_books, load_series, replay_series
+from packages.backtest.engine import BacktestConfig, run_backtest, run_parallel
+from packages.common.config import get_settings
+from packages.data.quality import timeframe_ms
+
+
+def _epoch_ms(value: str | None) -> int | None:
+    if value is None:
+        return None
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(prog="python -m packages.backtest")
+    parser.add_argument("--symbols", nargs="+", default=settings.market_symbols)
+    parser.add_argument("--timeframe", default="1m")
+    parser.add_argument("--start", help="UTC date or datetime, inclusive")
+    parser.add_argument("--end", help="UTC date or datetime, exclusive")
+    parser.add_argument("--replay", help="recorded OKX candle JSONL instead of the candles table")
+    parser.add_argument("--books", help="recorded OKX books JSONL sampled into risk checks")
+    parser.add_argument("--processes", type=int, default=0, help="split symbols across processes")
+    parser.add_argument("--fee-bps", type=float, default=settings.backtest_fee_bps)
+    parser.add_argument("--slippage-bps", type=float, default=settings.backtest_slippage_bps)
+    parser.add_argument("--output", help="write trades and the equity curve as JSON")
+    args = parser.parse_args()
+
+    config = BacktestConfig.from_settings(
+        settings, fee_bps=args.fee_bps, slippage_bps=args.slippage_bps
+    )
+    if args.processes > 1 and not args.replay and not args.books:
+        loader = partial(
+            load_series,
+            timeframe=args.timeframe,
+            start_ms=_epoch_ms(args.start),
+            end_ms=_epoch_ms(args.end),
+        )
+        result = run_parallel(args.symbols, loader, config, args.processes)
+    else:
+        if args.replay:
+            series = replay_series(args.replay, args.timeframe)
+            series = {symbol: series[symbol] for symbol in args.symbols if symbol in series}
+        else:
+            series = {
+                symbol: load_series(
+                    symbol, args.timeframe, _epoch_ms(args.start), _epoch_ms(args.end)
+                )
+                for symbol in args.symbols
+            }
+        if args.books:
+            series = attach_books(
+                series,
+                args.books,
+                timeframe_ms(args.timeframe),
+                int(settings.orderbook_max_age_sec * 1000),
+            )
+        result = run_backtest(list(series.values()), config)
+
+    summary = result.summary()
+    print(orjson.dumps(summary, option=orjson.OPT_INDENT_2).decode())
+    if args.output:
+        with open(args.output, "wb") as handle:
+            handle.write(
+                orjson.dumps(
+                    {
+                        "summary": summary,
+                        "trades": result.trades,
+                        "curve": {"ts": result.curve_ts, "equity": result.equity},
+                    },
+                    option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SERIALIZE_DATACLASS,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
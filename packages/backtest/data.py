@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import orjson
+from sqlalchemy import select
+
+from packages.common.db import SessionLocal
+from packages.common.models import Candle
+from packages.data.orderbook import OrderBookEngine
+from packages.data.sources import parse_okx_candles
+from packages.data.store import CandleBar
+
+
+# Columnar history for one symbol, oldest first. `ts` is the bar open time in epoch ms.
+# Book columns are optional; NaN marks bars without a recorded book.
+@dataclass(frozen=True)
+class SymbolSeries:
+    symbol: str
+    timeframe: str
+    ts: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    spread_bps: np.ndarray | None = None
+    depth_usd: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    @classmethod
+    def from_bars(cls, symbol: str, timeframe: str, bars: list[CandleBar]) -> SymbolSeries:
+        block = np.array([bar.row() for bar in bars], dtype=np.float64).reshape(-1, 6)
+        ts, open_, high, low, close, volume = block.T
+        return cls(symbol, timeframe, ts.astype(np.int64), open_, high, low, close, volume)
+
+    def with_books(self, spread_bps: np.ndarray, depth_usd: np.ndarray) -> SymbolSeries:
+        return replace(self, spread_bps=spread_bps, depth_usd=depth_usd)
+
+
+def _naive_utc(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+
+def load_series(
+    symbol: str,
+    timeframe: str = "1m",
+    start_ms: int | None = None,
+    end_ms: int | None = None,
+    session_factory=SessionLocal,
+) -> SymbolSeries:
+    # Reads plain column tuples rather than ORM rows; a year of 1m bars is ~525k rows.
+    query = select(
+        Candle.ts, Candle.open, Candle.high, Candle.low, Candle.close, Candle.volume
+    ).where(Candle.symbol == symbol, Candle.timeframe == timeframe)
+    if start_ms is not None:
+        query = query.where(Candle.ts >= _naive_utc(start_ms))
+    if end_ms is not None:
+        query = query.where(Candle.ts < _naive_utc(end_ms))
+    session = session_factory()
+    try:
+        rows = session.execute(query.order_by(Candle.ts)).all()
+    finally:
+        session.close()
+    ts = np.fromiter(
+        (row[0].replace(tzinfo=timezone.utc).timestamp() * 1000 for row in rows),
+        dtype=np.float64,
+        count=len(rows),
+    ).astype(np.int64)
+    values = np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, 5)
+    return SymbolSeries(symbol, timeframe, ts, *values.T)
+
+
+def replay_series(path: str | Path, timeframe: str = "1m") -> dict[str, SymbolSeries]:
+    # Recorded OKX candle pages (the MARKET_REPLAY_PATH format); pages may overlap.
+    bars: dict[str, dict[int, CandleBar]] = {}
+    for line in Path(path).read_bytes().splitlines():
+        if not line.strip():
+            continue
+        record = orjson.loads(line)
+        if record.get("bar") != timeframe or "data" not in record:
+            continue
+        for bar in parse_okx_candles(record["instId"], timeframe, record["data"]):
+            if bar.confirmed:
+                bars.setdefault(bar.symbol, {})[bar.ts] = bar
+    return {
+        symbol: SymbolSeries.from_bars(symbol, timeframe, [by_ts[ts] for ts in sorted(by_ts)])
+        for symbol, by_ts in bars.items()
+    }
+
+
+def attach_books(
+    series: dict[str, SymbolSeries],
+    path: str | Path,
+    bar_ms: int,
+    max_age_ms: int = 5000,
+    engine: OrderBookEngine | None = None,
+) -> dict[str, SymbolSeries]:
+    # Replays recorded `books` messages through the live order book code and samples spread
+    # and depth as of each bar close.
+    engine = engine or OrderBookEngine()
+    samples: dict[str, list[tuple[int, float, float]]] = {}
+    with open(path, "rb") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            message = orjson.loads(line)
+            engine.on_message(message)
+            symbol = (message.get("arg") or {}).get("instId")
+            features = engine.features(symbol) if symbol in series else None
+            if features is not None:
+                samples.setdefault(symbol, []).append(
+                    (features.ts, features.spread_bps, features.depth_usd)
+                )
+    attached = dict(series)
+    for symbol, rows in samples.items():
+        item = series[symbol]
+        book_ts, spread, depth = (np.array(column) for column in zip(*rows))
+        order = np.argsort(book_ts, kind="stable")
+        book_ts, spread, depth = book_ts[order], spread[order], depth[order]
+        close_ts = item.ts + bar_ms
+        index = np.searchsorted(book_ts, close_ts, side="right") - 1
+        fresh = (index >= 0) & (close_ts - book_ts[np.maximum(index, 0)] <= max_age_ms)
+        attached[symbol] = item.with_books(
+            np.where(fresh, spread[np.maximum(index, 0)], np.nan),
+            np.where(fresh, depth[np.maximum(index, 0)], np.nan),
+        )
+    return attached
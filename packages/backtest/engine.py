@@ -0,0 +1,476 @@
+from __future__ import annotations
+
+import heapq
+import math
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from itertools import repeat
+from typing import Callable
+
+import numpy as np
+
+from packages.backtest.data import SymbolSeries
+from packages.backtest.features import CAUTION_CODES, REGIME_LABELS, regime_series
+from packages.backtest.strategy import TrendStrategy
+from packages.common.config import Settings, get_settings
+from packages.common.repository import MemoryRepository, Repository
+from packages.data.quality import timeframe_ms
+from packages.execution.engine import ExecutionEngine
+from packages.planner.planner import validate_plan
+from packages.portfolio.state import PortfolioService, PortfolioState, realized_pnl
+from packages.regime.engine import RegimeEngine
+from packages.risk.engine import check_plan
+from packages.signals.indicators import compute_indicators
+
+# Exits sort ahead of entries on the same bar: stops fire intrabar, entries at the close.
+EXIT, ENTRY = 0, 1
+YEAR_MS = 365 * 86400000
+
+
+@dataclass(frozen=True)
+class BacktestConfig:
+    initial_equity: float = 100000.0
+    market_type: str = "perp"
+    fee_bps: float = 5.0
+    slippage_bps: float = 2.0
+    regime_timeframe: str = "15m"
+    curve_interval_ms: int = 3600000
+    validate_plans: bool = True
+    # The live loss-streak lock waits for an operator; a backtest clears it after a cooldown.
+    streak_reset_minutes: int = 60
+    strategy: TrendStrategy = field(default_factory=TrendStrategy)
+
+    @classmethod
+    def from_settings(cls, settings: Settings | None = None, **overrides) -> BacktestConfig:
+        settings = settings or get_settings()
+        defaults = {
+            "initial_equity": settings.initial_equity,
+            "fee_bps": settings.backtest_fee_bps,
+            "slippage_bps": settings.backtest_slippage_bps,
+            "regime_timeframe": settings.regime_timeframe,
+            "streak_reset_minutes": settings.cooldown_minutes,
+        }
+        return cls(**{**defaults, **overrides})
+
+
+@dataclass
+class BacktestTrade:
+    plan_id: str
+    symbol: str
+    side: str
+    entry_ts: int
+    entry_price: float
+    exit_ts: int
+    exit_price: float
+    notional: float
+    fees: float
+    pnl: float
+    exit_reason: str
+
+
+@dataclass
+class BacktestResult:
+    initial_equity: float
+    curve_ts: np.ndarray
+    equity: np.ndarray
+    trades: list[BacktestTrade]
+    rejections: dict[str, int]
+    bars: int
+    elapsed_sec: float
+
+    def summary(self) -> dict:
+        final = float(self.equity[-1]) if len(self.equity) else self.initial_equity
+        peak = np.maximum.accumulate(self.equity) if len(self.equity) else self.equity
+        drawdown = float(np.max((peak - self.equity) / peak)) if len(self.equity) else 0.0
+        returns = np.diff(self.equity) / self.equity[:-1] if len(self.equity) > 1 else []
+        sharpe = 0.0
+        if len(returns) > 1 and np.std(returns) > 0:
+            periods = YEAR_MS / max(1, int(np.median(np.diff(self.curve_ts))))
+            sharpe = float(np.mean(returns) / np.std(returns) * math.sqrt(periods))
+        wins = sum(1 for trade in self.trades if trade.pnl > 0)
+        return {
+            "initial_equity": self.initial_equity,
+            "final_equity": final,
+            "total_return": final / self.initial_equity - 1,
+            "max_drawdown": drawdown,
+            "sharpe": sharpe,
+            "trades": len(self.trades),
+            "win_rate": wins / len(self.trades) if self.trades else 0.0,
+            "fees": sum(trade.fees for trade in self.trades),
+            "exit_reasons": dict(Counter(trade.exit_reason for trade in self.trades)),
+            "rejections": self.rejections,
+            "bars": self.bars,
+            "elapsed_sec": self.elapsed_sec,
+        }
+
+
+@dataclass
+class OpenTrade:
+    plan: dict
+    side: int
+    entry_index: int
+    entry_price: float
+    notional: float
+    entry_fee: float
+    exit_index: int
+    exit_price: float
+    exit_reason: str
+
+
+# Everything the event loop needs for one symbol, precomputed in bulk before the run.
+@dataclass
+class SymbolRun:
+    series: SymbolSeries
+    bar_ms: int
+    indicators: dict[str, np.ndarray]
+    regimes: np.ndarray
+    entry_index: np.ndarray
+    entry_side: np.ndarray
+    open: OpenTrade | None = None
+
+
+def _utc(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+def _no_history(*args) -> list:
+    return []
+
+
+# Replays bars through the live plan validation, risk checks, execution engine and portfolio
+# accounting. Only signal bars and exits are visited: entries come from vectorised strategy
+# signals and each position's exit bar is found with a vectorised scan when it opens, so the
+# cost per symbol-year is a few array passes plus a handful of Python steps per trade.
+class Backtester:
+    def __init__(self, config: BacktestConfig, repository: Repository | None = None) -> None:
+        self.config = config
+        self.settings = get_settings()
+        # Unbounded so orders, fills and outcomes of the whole run stay inspectable.
+        self.repository = repository or MemoryRepository(max_rows=None)
+        # Fed directly by the execution engine and exits; never synced from the database.
+        self.portfolio = PortfolioService(config.initial_equity, repository=self.repository)
+        self.now = _utc(0)
+        self.execution = ExecutionEngine(
+            live_trading_enabled=False,
+            repository=self.repository,
+            portfolio=self.portfolio,
+            fee_bps=config.fee_bps,
+            slippage_bps=config.slippage_bps,
+            clock=lambda: self.now,
+        )
+        self.trades: list[BacktestTrade] = []
+        self.rejections: Counter = Counter()
+        self._equity_ts: list[int] = []
+        self._equity: list[float] = []
+        self._last_loss_ms = 0
+
+    def run(self, series: list[SymbolSeries]) -> BacktestResult:
+        started = time.perf_counter()
+        runs = [self.prepare(item) for item in series if len(item) > 1]
+        if runs:
+            first = min(int(run.series.ts[0]) for run in runs)
+            self.portfolio.state = PortfolioState.initial(
+                self.config.initial_equity, _utc(first).date()
+            )
+        heap: list[tuple[int, int, int, int]] = []
+        for key, run in enumerate(runs):
+            self._schedule_entry(heap, key, run, 0)
+        while heap:
+            _, kind, key, index = heapq.heappop(heap)
+            run = runs[key]
+            if kind == EXIT:
+                self._exit(run)
+                self._schedule_entry(heap, key, run, index + self.config.strategy.cooldown_bars)
+            elif self._enter(run, index):
+                exit_index = run.open.exit_index
+                heapq.heappush(heap, (int(run.series.ts[exit_index]), EXIT, key, exit_index))
+            else:
+                self._schedule_entry(heap, key, run, index + 1)
+        curve_ts, equity = self._curve(runs)
+        return BacktestResult(
+            initial_equity=self.config.initial_equity,
+            curve_ts=curve_ts,
+            equity=equity,
+            trades=self.trades,
+            rejections=dict(self.rejections),
+            bars=sum(len(run.series) for run in runs),
+            elapsed_sec=time.perf_counter() - started,
+        )
+
+    def prepare(self, series: SymbolSeries) -> SymbolRun:
+        strategy = self.config.strategy
+        regime = RegimeEngine(
+            timeframe=self.config.regime_timeframe,
+            vol_window=self.settings.regime_vol_window,
+            stickiness=self.settings.regime_stickiness,
+            shock_atr_mult=self.settings.regime_shock_atr_mult,
+            params=strategy.params,
+            loader=_no_history,
+        )
+        indicators = compute_indicators(strategy.params, series.high, series.low, series.close)
+        regimes = regime_series(series, regime)
+        entry_index, entry_side = strategy.entries(indicators, regimes)
+        # A signal on the final bar has nothing left to trade against.
+        keep = entry_index < len(series) - 1
+        return SymbolRun(
+            series=series,
+            bar_ms=timeframe_ms(series.timeframe),
+            indicators=indicators,
+            regimes=regimes,
+            entry_index=entry_index[keep],
+            entry_side=entry_side[keep],
+        )
+
+    def _schedule_entry(self, heap: list, key: int, run: SymbolRun, start: int) -> None:
+        position = int(np.searchsorted(run.entry_index, start))
+        if position < len(run.entry_index):
+            index = int(run.entry_index[position])
+            heapq.heappush(heap, (int(run.series.ts[index]), ENTRY, key, index))
+
+    def _enter(self, run: SymbolRun, index: int) -> bool:
+        series, strategy = run.series, self.config.strategy
+        close_ms = int(series.ts[index]) + run.bar_ms
+        self.now = _utc(close_ms)
+        side = int(run.entry_side[np.searchsorted(run.entry_index, index)])
+        code = int(run.regimes[index])
+        plan = strategy.build_plan(
+            symbol=series.symbol,
+            market_type=self.config.market_type,
+            ts_ms=close_ms,
+            expires_ms=close_ms + strategy.max_hold_bars * run.bar_ms,
+            price=float(series.close[index]),
+            atr=float(run.indicators["atr"][index]),
+            side=side,
+            regime=REGIME_LABELS[code],
+            equity=self.portfolio.state.equity,
+        )
+        if self.config.validate_plans:
+            is_valid, _ = validate_plan(plan)
+            if not is_valid:
+                self.rejections["schema_invalid"] += 1
+                return False
+        self._reset_streak(close_ms)
+        context = self.portfolio.cached_risk_context(
+            symbol=series.symbol,
+            risk_state="CAUTION" if code in CAUTION_CODES else "NORMAL",
+            liquidation_buffer_ratio=self.settings.liquidation_buffer_ratio,
+            spread_bps=_book_value(series.spread_bps, index),
+            depth_usd=_book_value(series.depth_usd, index),
+            now=self.now,
+        )
+        decision = check_plan(plan, context)
+        if not decision.allowed:
+            self.rejections.update(decision.reasons)
+            return False
+
+        receipt = self.execution.submit_orders([plan])[0].receipt
+        exit_index, exit_price, exit_reason = self._find_exit(
+            run, index, side, plan["risk"]["stop_loss"], plan["risk"]["take_profit"][0]["price"]
+        )
+        run.open = OpenTrade(
+            plan=plan,
+            side=side,
+            entry_index=index,
+            entry_price=receipt["price"],
+            notional=plan["sizing"]["notional_usd"],
+            entry_fee=receipt["fee"],
+            exit_index=exit_index,
+            exit_price=exit_price,
+            exit_reason=exit_reason,
+        )
+        self._mark_equity(close_ms)
+        return True
+
+    def _find_exit(
+        self, run: SymbolRun, index: int, side: int, stop: float, take_profit: float
+    ) -> tuple[int, float, str]:
+        series = run.series
+        last = min(index + self.config.strategy.max_hold_bars, len(series) - 1)
+        start = index + 1
+        chunk = 256
+        while start <= last:
+            end = min(start + chunk, last + 1)
+            high, low = series.high[start:end], series.low[start:end]
+            if side > 0:
+                stopped, taken = low <= stop, high >= take_profit
+            else:
+                stopped, taken = high >= stop, low <= take_profit
+            hits = np.flatnonzero(stopped | taken)
+            if len(hits):
+                offset = int(hits[0])
+                bar = start + offset
+                bar_open = float(series.open[bar])
+                # Both touched inside one bar: assume the stop came first. Gaps fill at the open.
+                if stopped[offset]:
+                    price = min(stop, bar_open) if side > 0 else max(stop, bar_open)
+                    return bar, price, "stop_loss"
+                price = max(take_profit, bar_open) if side > 0 else min(take_profit, bar_open)
+                return bar, price, "take_profit"
+            start = end
+            chunk *= 4
+        reason = "max_hold" if last == index + self.config.strategy.max_hold_bars else "end"
+        return last, float(series.close[last]), reason
+
+    def _exit(self, run: SymbolRun) -> None:
+        trade, series = run.open, run.series
+        close_ms = int(series.ts[trade.exit_index]) + run.bar_ms
+        self.now = _utc(close_ms)
+        plan = trade.plan
+        exit_plan = {
+            **plan,
+            "meta": {
+                **plan["meta"],
+                "plan_id": f"{plan['meta']['plan_id']}-exit",
+                "closes_plan_id": plan["meta"]["plan_id"],
+                "exit_reason": trade.exit_reason,
+            },
+            "intent": {**plan["intent"], "side": "short" if trade.side > 0 else "long"},
+            "entry": {**plan["entry"], "price_range": [trade.exit_price, trade.exit_price]},
+            "execution": {**plan["execution"], "reduce_only": True},
+        }
+        # The engine books the exit fill as the trade's outcome; the same PnL is kept here.
+        receipt = self.execution.submit_orders([exit_plan])[0].receipt
+        gross = realized_pnl(
+            plan["intent"]["side"], trade.notional, trade.entry_price, receipt["price"]
+        )
+        if gross < 0:
+            self._last_loss_ms = close_ms
+        fees = trade.entry_fee + receipt["fee"]
+        self.trades.append(
+            BacktestTrade(
+                plan_id=plan["meta"]["plan_id"],
+                symbol=series.symbol,
+                side=plan["intent"]["side"],
+                entry_ts=int(series.ts[trade.entry_index]) + run.bar_ms,
+                entry_price=trade.entry_price,
+                exit_ts=close_ms,
+                exit_price=receipt["price"],
+                notional=trade.notional,
+                fees=fees,
+                pnl=gross - fees,
+                exit_reason=trade.exit_reason,
+            )
+        )
+        run.open = None
+        self._mark_equity(close_ms)
+
+    def _reset_streak(self, now_ms: int) -> None:
+        state = self.portfolio.state
+        if (
+            state.consecutive_losses >= self.settings.max_consecutive_losses
+            and now_ms - self._last_loss_ms >= self.config.streak_reset_minutes * 60000
+        ):
+            state.consecutive_losses = 0
+
+    def _mark_equity(self, ts_ms: int) -> None:
+        self._equity_ts.append(ts_ms)
+        self._equity.append(self.portfolio.state.equity)
+
+    def _curve(self, runs: list[SymbolRun]) -> tuple[np.ndarray, np.ndarray]:
+        # Realised equity stepped at fills and exits, plus open positions marked to the last
+        # closed bar at each grid point.
+        if not runs:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        interval = self.config.curve_interval_ms
+        start = min(int(run.series.ts[0]) for run in runs)
+        end = max(int(run.series.ts[-1]) + run.bar_ms for run in runs)
+        grid = np.arange(start - start % interval + interval, end + interval, interval)
+        grid[-1] = min(grid[-1], end)
+        events = np.asarray(self._equity_ts, dtype=np.int64)
+        index = np.searchsorted(events, grid, side="right") - 1
+        values = np.asarray(self._equity, dtype=np.float64)
+        equity = np.where(
+            index >= 0,
+            values[np.maximum(index, 0)] if len(values) else 0.0,
+            self.config.initial_equity,
+        )
+        by_symbol = {run.series.symbol: run for run in runs}
+        for trade in self.trades:
+            run = by_symbol[trade.symbol]
+            low = np.searchsorted(grid, trade.entry_ts)
+            high = np.searchsorted(grid, trade.exit_ts)
+            if low >= high:
+                continue
+            closed = run.series.ts + run.bar_ms
+            bars = np.searchsorted(closed, grid[low:high], side="right") - 1
+            side = 1 if trade.side == "long" else -1
+            units = trade.notional / trade.entry_price
+            equity[low:high] += side * units * (run.series.close[bars] - trade.entry_price)
+        return grid, equity
+
+
+def _book_value(column: np.ndarray | None, index: int) -> float | None:
+    if column is None:
+        return None
+    value = float(column[index])
+    return None if math.isnan(value) else value
+
+
+def run_backtest(
+    series: list[SymbolSeries], config: BacktestConfig | None = None
+) -> BacktestResult:
+    return Backtester(config or BacktestConfig.from_settings()).run(series)
+
+
+def combine_results(results: list[BacktestResult]) -> BacktestResult:
+    # Sums independent sub-portfolios; each one holds its initial equity until its curve starts.
+    grid = np.unique(np.concatenate([result.curve_ts for result in results]))
+    equity = np.zeros(len(grid))
+    rejections: Counter = Counter()
+    for result in results:
+        index = np.searchsorted(result.curve_ts, grid, side="right") - 1
+        equity += np.where(
+            index >= 0,
+            result.equity[np.maximum(index, 0)] if len(result.equity) else result.initial_equity,
+            result.initial_equity,
+        )
+        rejections.update(result.rejections)
+    trades = sorted(
+        (trade for result in results for trade in result.trades), key=lambda t: t.exit_ts
+    )
+    return BacktestResult(
+        initial_equity=sum(result.initial_equity for result in results),
+        curve_ts=grid,
+        equity=equity,
+        trades=trades,
+        rejections=dict(rejections),
+        bars=sum(result.bars for result in results),
+        elapsed_sec=max((result.elapsed_sec for result in results), default=0.0),
+    )
+
+
+def _run_symbols(
+    config: BacktestConfig, symbols: list[str], loader: Callable[[str], SymbolSeries]
+) -> BacktestResult:
+    return Backtester(config).run([loader(symbol) for symbol in symbols])
+
+
+def run_parallel(
+    symbols: list[str],
+    loader: Callable[[str], SymbolSeries],
+    config: BacktestConfig | None = None,
+    processes: int | None = None,
+) -> BacktestResult:
+    # One process per symbol, each trading an equal slice of equity. Portfolio-wide limits
+    # (open positions, net exposure) then apply per slice; run_backtest keeps them global.
+    config = config or BacktestConfig.from_settings()
+    share = replace(config, initial_equity=config.initial_equity / len(symbols))
+    with ProcessPoolExecutor(processes or get_settings().backtest_workers) as pool:
+        results = list(
+            pool.map(_run_symbols, repeat(share), [[symbol] for symbol in symbols], repeat(loader))
+        )
+    return combine_results(results)
+
+
+def sweep(
+    configs: list[BacktestConfig],
+    symbols: list[str],
+    loader: Callable[[str], SymbolSeries],
+    processes: int | None = None,
+) -> list[BacktestResult]:
+    # One shared-portfolio backtest per parameter set; the loader must be picklable.
+    with ProcessPoolExecutor(processes or get_settings().backtest_workers) as pool:
+        return list(pool.map(_run_symbols, configs, repeat(symbols), repeat(loader)))
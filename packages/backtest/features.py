@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import numpy as np
+
+from packages.backtest.data import SymbolSeries
+from packages.data.quality import timeframe_ms
+from packages.regime.engine import REGIMES, RegimeEngine
+
+REGIME_LABELS = ("neutral", *REGIMES, "event")
+REGIME_CODES = {label: code for code, label in enumerate(REGIME_LABELS)}
+CAUTION_CODES = (REGIME_CODES["high_vol"], REGIME_CODES["event"])
+
+
+def resample(
+    series: SymbolSeries, timeframe: str
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Returns (close_ts, high, low, close) of complete bars; the trailing partial bar is dropped.
+    bar_ms = timeframe_ms(series.timeframe)
+    target_ms = timeframe_ms(timeframe)
+    if target_ms <= bar_ms or not len(series):
+        return series.ts + bar_ms, series.high, series.low, series.close
+    bucket = series.ts // target_ms
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+    ends = np.concatenate((starts[1:], [len(bucket)])) - 1
+    close_ts = (bucket[starts] + 1) * target_ms
+    complete = series.ts[ends] + bar_ms >= close_ts
+    return (
+        close_ts[complete],
+        np.maximum.reduceat(series.high, starts)[complete],
+        np.minimum.reduceat(series.low, starts)[complete],
+        series.close[ends][complete],
+    )
+
+
+def regime_series(series: SymbolSeries, engine: RegimeEngine) -> np.ndarray:
+    # Runs the live regime filter over the resampled bars, then gives every bar the regime
+    # of the last regime bar closed at or before its own close.
+    close_ts, high, low, close = resample(series, engine.timeframe)
+    codes = np.empty(len(close_ts), dtype=np.int8)
+    step_ms = timeframe_ms(engine.timeframe)
+    for i, (bar_ts, bar_high, bar_low, bar_close) in enumerate(
+        zip(close_ts.tolist(), high.tolist(), low.tolist(), close.tolist())
+    ):
+        state = engine.update(series.symbol, bar_ts - step_ms, bar_high, bar_low, bar_close)
+        codes[i] = REGIME_CODES[state.regime]
+    if not len(codes):
+        return np.full(len(series), REGIME_CODES["neutral"], dtype=np.int8)
+    index = np.searchsorted(close_ts, series.ts + timeframe_ms(series.timeframe), side="right") - 1
+    return np.where(index >= 0, codes[np.maximum(index, 0)], REGIME_CODES["neutral"]).astype(
+        np.int8
+    )
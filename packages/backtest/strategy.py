@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import numpy as np
+
+from packages.backtest.features import REGIME_CODES
+from packages.common.config import get_settings
+from packages.planner.planner import build_rule_plan
+from packages.risk.engine import compute_notional
+from packages.signals.indicators import IndicatorParams
+
+
+def iso_ms(ms: int) -> str:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat()
+
+
+# EMA cross confirmed by RSI momentum, traded only in the listed regimes. Plans are built on
+# the rule-plan template so they pass the same schema and risk checks as live plans.
+@dataclass(frozen=True)
+class TrendStrategy:
+    params: IndicatorParams = field(default_factory=IndicatorParams)
+    stop_atr: float = 2.0
+    take_profit_atr: float = 4.0
+    max_hold_bars: int = 240
+    cooldown_bars: int = 15
+    rsi_band: float = 5.0
+    risk_budget_pct: float = 0.005
+    max_position_pct: float = 0.2
+    leverage: float = 1.0
+    regimes: tuple[str, ...] = ("trend",)
+
+    def entries(
+        self, indicators: dict[str, np.ndarray], regimes: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # Returns bar indices and sides (+1 long, -1 short), decided at each bar's close.
+        above = indicators["ema_fast"] > indicators["ema_slow"]
+        index = np.flatnonzero(above[1:] != above[:-1]) + 1
+        long = above[index]
+        rsi = indicators["rsi"][index]
+        confirmed = np.where(long, rsi > 50 + self.rsi_band, rsi < 50 - self.rsi_band)
+        allowed = np.isin(regimes[index], [REGIME_CODES[name] for name in self.regimes])
+        keep = confirmed & allowed & (index >= self.params.warmup)
+        return index[keep], np.where(long[keep], 1, -1)
+
+    def build_plan(
+        self,
+        symbol: str,
+        market_type: str,
+        ts_ms: int,
+        expires_ms: int,
+        price: float,
+        atr: float,
+        side: int,
+        regime: str,
+        equity: float,
+    ) -> dict:
+        settings = get_settings()
+        stop = price - side * self.stop_atr * atr
+        stop_distance_pct = abs(price - stop) / price
+        notional = min(
+            compute_notional(
+                equity=equity,
+                risk_budget_pct=self.risk_budget_pct,
+                stop_distance_pct=stop_distance_pct,
+                fee_buffer_pct=settings.fee_buffer_pct,
+                slippage_buffer_pct=settings.slippage_buffer_pct,
+                volatility_buffer_mult=settings.volatility_buffer_mult,
+            ),
+            equity * self.max_position_pct * self.leverage,
+        )
+        plan = build_rule_plan(symbol, market_type)
+        plan["meta"].update(
+            ts=iso_ms(ts_ms), timeframe="backtest", plan_id=f"bt-{symbol.lower()}-{ts_ms}"
+        )
+        plan["intent"] = {
+            "side": "long" if side > 0 else "short",
+            "regime": regime,
+            "confidence": 0.5,
+        }
+        plan["entry"] = {
+            "type": "market",
+            "price_range": [price, price],
+            "conditions": ["ema_cross", "rsi_confirm"],
+            "tif": "IOC",
+        }
+        plan["risk"] = {
+            "stop_loss": stop,
+            "take_profit": [{"price": price + side * self.take_profit_atr * atr, "size_pct": 1.0}],
+            "trailing": {"enabled": False, "distance_pct": 0.0},
+            "max_loss_pct": self.risk_budget_pct,
+            "risk_budget_pct": self.risk_budget_pct,
+        }
+        plan["sizing"] = {
+            "leverage": self.leverage,
+            "notional_usd": notional,
+            "max_position_pct": self.max_position_pct,
+            "margin_mode": "cross",
+        }
+        plan["execution"] = {
+            "post_only": False,
+            "reduce_only": False,
+            "max_slippage_bps": 10,
+            "timeout_sec": 0,
+            "retry_policy": {"max_retries": 0, "backoff_sec": 0},
+        }
+        plan["validity"] = {
+            "expires_at": iso_ms(expires_ms),
+            "invalidation_conditions": ["stop_loss", "take_profit", "max_hold"],
+        }
+        plan["rationale"]["signals_used"] = ["ema_fast", "ema_slow", "rsi", "regime"]
+        plan["rationale"]["notes"] = "Backtest trend strategy."
+        return plan
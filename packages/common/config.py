@@ -10,28 +10,151 @@ class Settings(BaseSettings):
     api_port: int = Field(default=8000, alias="API_PORT")
     api_token: str = Field(default="change_me", alias="API_TOKEN")
     log_level: str = Field(default="INFO", alias="LOG_LEVEL")
+    metrics_sample_rate: float = Field(default=0.1, ge=0, le=1, alias="METRICS_SAMPLE_RATE")
+    worker_metrics_port: int = Field(default=9808, alias="WORKER_METRICS_PORT")
 
     postgres_host: str = Field(default="postgres", alias="POSTGRES_HOST")
     postgres_port: int = Field(default=5432, alias="POSTGRES_PORT")
     postgres_db: str = Field(default="okx_trade", alias="POSTGRES_DB")
     postgres_user: str = Field(default="okx", alias="POSTGRES_USER")
     postgres_password: str = Field(default="okxpass", alias="POSTGRES_PASSWORD")
+    db_pool_size: int = Field(default=10, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=20, alias="DB_MAX_OVERFLOW")
+    db_pool_recycle_sec: int = Field(default=1800, alias="DB_POOL_RECYCLE_SEC")
+    db_pool_timeout_sec: float = Field(default=30.0, alias="DB_POOL_TIMEOUT_SEC")
+    persistence_backend: str = Field(default="postgres", alias="PERSISTENCE_BACKEND")
+    persistence_sqlite_url: str = Field(default="sqlite://", alias="PERSISTENCE_SQLITE_URL")
+    persistence_memory_max_rows: int = Field(default=100000, alias="PERSISTENCE_MEMORY_MAX_ROWS")
 
     redis_host: str = Field(default="redis", alias="REDIS_HOST")
     redis_port: int = Field(default=6379, alias="REDIS_PORT")
+    redis_db: int = Field(default=2, alias="REDIS_DB")
     celery_broker_url: str = Field(default="redis://redis:6379/0", alias="CELERY_BROKER_URL")
     celery_result_backend: str = Field(
         default="redis://redis:6379/1", alias="CELERY_RESULT_BACKEND"
     )
+    celery_result_expires_sec: int = Field(default=3600, alias="CELERY_RESULT_EXPIRES_SEC")
+    pipeline_cycle_interval_sec: float = Field(default=300.0, alias="PIPELINE_CYCLE_INTERVAL_SEC")
+    exit_check_interval_sec: float = Field(default=5.0, alias="EXIT_CHECK_INTERVAL_SEC")
+    execution_api_url: str = Field(default="http://api:8000", alias="EXECUTION_API_URL")
+    execution_api_timeout_sec: float = Field(default=5.0, alias="EXECUTION_API_TIMEOUT_SEC")
+    backfill_candle_limit: int = Field(default=300, alias="BACKFILL_CANDLE_LIMIT")
 
     okx_api_key: str | None = Field(default=None, alias="OKX_API_KEY")
     okx_api_secret: str | None = Field(default=None, alias="OKX_API_SECRET")
     okx_api_passphrase: str | None = Field(default=None, alias="OKX_API_PASSPHRASE")
     okx_use_sandbox: bool = Field(default=True, alias="OKX_USE_SANDBOX")
     live_trading_enabled: bool = Field(default=False, alias="LIVE_TRADING_ENABLED")
+    paper_matching_enabled: bool = Field(default=True, alias="PAPER_MATCHING_ENABLED")
+    paper_maker_fee_bps: float = Field(default=2.0, alias="PAPER_MAKER_FEE_BPS")
+    paper_taker_fee_bps: float = Field(default=5.0, alias="PAPER_TAKER_FEE_BPS")
+    paper_sync_interval_sec: float = Field(default=0.5, alias="PAPER_SYNC_INTERVAL_SEC")
+    idempotency_redis_enabled: bool = Field(default=True, alias="IDEMPOTENCY_REDIS_ENABLED")
+    idempotency_ttl_sec: float = Field(default=86400.0, alias="IDEMPOTENCY_TTL_SEC")
+    idempotency_claim_ttl_sec: float = Field(default=30.0, alias="IDEMPOTENCY_CLAIM_TTL_SEC")
+    idempotency_wait_sec: float = Field(default=5.0, alias="IDEMPOTENCY_WAIT_SEC")
+    idempotency_local_max_entries: int = Field(default=10000, alias="IDEMPOTENCY_LOCAL_MAX_ENTRIES")
+    order_escalation_enabled: bool = Field(default=True, alias="ORDER_ESCALATION_ENABLED")
+    order_chase_timeout_sec: float = Field(default=10.0, alias="ORDER_CHASE_TIMEOUT_SEC")
+    order_max_chases: int = Field(default=1, alias="ORDER_MAX_CHASES")
+    order_reconcile_interval_sec: float = Field(default=30.0, alias="ORDER_RECONCILE_INTERVAL_SEC")
+    order_reconcile_grace_sec: float = Field(default=5.0, alias="ORDER_RECONCILE_GRACE_SEC")
+    okx_rest_base: str = Field(default="https://www.okx.com", alias="OKX_REST_BASE")
+    okx_public_rate_per_sec: float = Field(default=10.0, alias="OKX_PUBLIC_RATE_PER_SEC")
+    okx_ws_public_url: str = Field(
+        default="wss://ws.okx.com:8443/ws/v5/public", alias="OKX_WS_PUBLIC_URL"
+    )
+    okx_ws_private_url: str | None = Field(default=None, alias="OKX_WS_PRIVATE_URL")
+    okx_ws_orders_enabled: bool = Field(default=True, alias="OKX_WS_ORDERS_ENABLED")
+    okx_rest_pool_size: int = Field(default=10, alias="OKX_REST_POOL_SIZE")
+    okx_order_timeout_sec: float = Field(default=5.0, alias="OKX_ORDER_TIMEOUT_SEC")
+    okx_batch_window_ms: float = Field(default=2.0, alias="OKX_BATCH_WINDOW_MS")
+    okx_contract_values: dict[str, float] = Field(
+        default_factory=lambda: {"BTC-USDT-SWAP": 0.01, "ETH-USDT-SWAP": 0.1},
+        alias="OKX_CONTRACT_VALUES",
+    )
+
+    market_data_source: str = Field(default="okx", alias="MARKET_DATA_SOURCE")
+    market_replay_path: str = Field(
+        default="/app/examples/market_replay.jsonl", alias="MARKET_REPLAY_PATH"
+    )
+    market_symbols: list[str] = Field(
+        default_factory=lambda: ["BTC-USDT-SWAP", "ETH-USDT-SWAP"], alias="MARKET_SYMBOLS"
+    )
+    market_timeframes: list[str] = Field(
+        default_factory=lambda: ["1m", "15m", "1H"], alias="MARKET_TIMEFRAMES"
+    )
+    market_candle_capacity: int = Field(default=1440, alias="MARKET_CANDLE_CAPACITY")
+    market_trade_capacity: int = Field(default=4096, alias="MARKET_TRADE_CAPACITY")
+    market_max_series: int = Field(default=2000, alias="MARKET_MAX_SERIES")
+    market_fetch_concurrency: int = Field(default=8, alias="MARKET_FETCH_CONCURRENCY")
+
+    signal_history_bars: int = Field(default=500, alias="SIGNAL_HISTORY_BARS")
+    signal_refresh_interval_sec: float = Field(default=5.0, alias="SIGNAL_REFRESH_INTERVAL_SEC")
+    regime_timeframe: str = Field(default="15m", alias="REGIME_TIMEFRAME")
+    regime_vol_window: int = Field(default=500, alias="REGIME_VOL_WINDOW")
+    regime_stickiness: float = Field(default=0.95, alias="REGIME_STICKINESS")
+    regime_shock_atr_mult: float = Field(default=4.0, alias="REGIME_SHOCK_ATR_MULT")
+
+    data_quality_spike_z: float = Field(default=8.0, alias="DATA_QUALITY_SPIKE_Z")
+    data_quality_spike_window: int = Field(default=100, alias="DATA_QUALITY_SPIKE_WINDOW")
+    data_quality_stale_bars: int = Field(default=10, alias="DATA_QUALITY_STALE_BARS")
+    data_quality_score_halflife_rows: int = Field(
+        default=500, alias="DATA_QUALITY_SCORE_HALFLIFE_ROWS"
+    )
+
+    plan_batch_workers: int = Field(default=16, alias="PLAN_BATCH_WORKERS")
+    plan_batch_max_symbols: int = Field(default=500, alias="PLAN_BATCH_MAX_SYMBOLS")
+
+    backtest_fee_bps: float = Field(default=5.0, alias="BACKTEST_FEE_BPS")
+    backtest_slippage_bps: float = Field(default=2.0, alias="BACKTEST_SLIPPAGE_BPS")
+    backtest_workers: int = Field(default=4, alias="BACKTEST_WORKERS")
+
+    llm_planner_enabled: bool = Field(default=False, alias="LLM_PLANNER_ENABLED")
+    llm_backend: str = Field(default="fake", alias="LLM_BACKEND")
+    llm_base_url: str = Field(default="https://api.openai.com/v1", alias="LLM_BASE_URL")
+    llm_api_key: str | None = Field(default=None, alias="LLM_API_KEY")
+    llm_model: str = Field(default="gpt-4o-mini", alias="LLM_MODEL")
+    llm_temperature: float = Field(default=0.2, alias="LLM_TEMPERATURE")
+    llm_max_concurrency: int = Field(default=4, alias="LLM_MAX_CONCURRENCY")
+    llm_cache_ttl_sec: float = Field(default=300.0, alias="LLM_CACHE_TTL_SEC")
+    llm_max_candidates: int = Field(default=3, alias="LLM_MAX_CANDIDATES")
+    llm_timeout_sec: float = Field(default=60.0, alias="LLM_TIMEOUT_SEC")
+
+    news_api_url: str = Field(default="", alias="NEWS_API_URL")
+    trends_api_url: str = Field(default="", alias="TRENDS_API_URL")
+    onchain_api_url: str = Field(default="", alias="ONCHAIN_API_URL")
+    adapter_keywords: list[str] = Field(
+        default_factory=lambda: ["crypto"], alias="ADAPTER_KEYWORDS"
+    )
+    adapter_timeout_sec: float = Field(default=3.0, alias="ADAPTER_TIMEOUT_SEC")
+    adapter_cache_ttl_sec: float = Field(default=60.0, alias="ADAPTER_CACHE_TTL_SEC")
+    adapter_stale_ttl_sec: float = Field(default=600.0, alias="ADAPTER_STALE_TTL_SEC")
+    adapter_breaker_failures: int = Field(default=3, alias="ADAPTER_BREAKER_FAILURES")
+    adapter_breaker_reset_sec: float = Field(default=30.0, alias="ADAPTER_BREAKER_RESET_SEC")
+    adapter_degraded_confidence: float = Field(default=0.5, alias="ADAPTER_DEGRADED_CONFIDENCE")
+    adapter_snapshot_store_enabled: bool = Field(
+        default=True, alias="ADAPTER_SNAPSHOT_STORE_ENABLED"
+    )
+    adapter_prefetch_interval_sec: float = Field(
+        default=30.0, alias="ADAPTER_PREFETCH_INTERVAL_SEC"
+    )
 
     telegram_bot_token: str | None = Field(default=None, alias="TELEGRAM_BOT_TOKEN")
     telegram_chat_id: str | None = Field(default=None, alias="TELEGRAM_CHAT_ID")
+    telegram_api_base: str = Field(default="https://api.telegram.org", alias="TELEGRAM_API_BASE")
+    telegram_rate_per_sec: float = Field(default=1.0, alias="TELEGRAM_RATE_PER_SEC")
+    telegram_coalesce_window_sec: float = Field(default=30.0, alias="TELEGRAM_COALESCE_WINDOW_SEC")
+    telegram_max_retries: int = Field(default=5, alias="TELEGRAM_MAX_RETRIES")
+
+    initial_equity: float = Field(default=100000.0, alias="INITIAL_EQUITY")
+    portfolio_sync_interval_sec: float = Field(default=1.0, alias="PORTFOLIO_SYNC_INTERVAL_SEC")
+    portfolio_snapshot_interval_sec: float = Field(
+        default=300.0, alias="PORTFOLIO_SNAPSHOT_INTERVAL_SEC"
+    )
+    portfolio_replay_window_rows: int = Field(
+        default=100, ge=0, alias="PORTFOLIO_REPLAY_WINDOW_ROWS"
+    )
 
     risk_budget_pct: float = Field(default=0.01, alias="RISK_BUDGET_PCT")
     max_loss_pct: float = Field(default=0.10, alias="MAX_LOSS_PCT")
@@ -46,16 +169,45 @@ class Settings(BaseSettings):
     max_consecutive_losses: int = Field(default=5, alias="MAX_CONSECUTIVE_LOSSES")
     cooldown_minutes: int = Field(default=60, alias="COOLDOWN_MINUTES")
 
+    risk_state_pubsub_enabled: bool = Field(default=True, alias="RISK_STATE_PUBSUB_ENABLED")
+    risk_state_channel: str = Field(default="risk_state", alias="RISK_STATE_CHANNEL")
+    risk_state_max_staleness_sec: float = Field(default=30.0, alias="RISK_STATE_MAX_STALENESS_SEC")
+    risk_state_fallback_ttl_sec: float = Field(default=1.0, alias="RISK_STATE_FALLBACK_TTL_SEC")
+
     fee_buffer_pct: float = Field(default=0.0005, alias="FEE_BUFFER_PCT")
     slippage_buffer_pct: float = Field(default=0.001, alias="SLIPPAGE_BUFFER_PCT")
     volatility_buffer_mult: float = Field(default=2.0, alias="VOLATILITY_BUFFER_MULT")
     orderbook_spread_limit_bps: int = Field(default=50, alias="ORDERBOOK_SPREAD_LIMIT_BPS")
     orderbook_depth_min_usd: int = Field(default=100000, alias="ORDERBOOK_DEPTH_MIN_USD")
+    orderbook_depth_bps: float = Field(default=10.0, alias="ORDERBOOK_DEPTH_BPS")
+    orderbook_max_levels: int = Field(default=400, alias="ORDERBOOK_MAX_LEVELS")
+    orderbook_max_age_sec: float = Field(default=5.0, alias="ORDERBOOK_MAX_AGE_SEC")
+    orderbook_feed_enabled: bool = Field(default=False, alias="ORDERBOOK_FEED_ENABLED")
+    orderbook_channel: str = Field(default="books", alias="ORDERBOOK_CHANNEL")
 
     plan_schema_path: str = Field(
         default="/app/packages/common/schemas/trade_plan.schema.json",
         alias="PLAN_SCHEMA_PATH",
     )
+    plan_schema_versions: dict[str, str] = Field(default_factory=dict, alias="PLAN_SCHEMA_VERSIONS")
+    plan_schema_reload_sec: float = Field(default=1.0, alias="PLAN_SCHEMA_RELOAD_SEC")
+
+    audit_async_enabled: bool = Field(default=True, alias="AUDIT_ASYNC_ENABLED")
+    audit_queue_maxsize: int = Field(default=10000, alias="AUDIT_QUEUE_MAXSIZE")
+    audit_batch_size: int = Field(default=500, alias="AUDIT_BATCH_SIZE")
+    audit_flush_interval_sec: float = Field(default=0.5, alias="AUDIT_FLUSH_INTERVAL_SEC")
+    audit_overflow_policy: str = Field(default="spill", alias="AUDIT_OVERFLOW_POLICY")
+    audit_spill_path: str = Field(default="/tmp/okx-audit-spill.jsonl", alias="AUDIT_SPILL_PATH")
+
+    timescale_chunk_interval_days: int = Field(default=7, alias="TIMESCALE_CHUNK_INTERVAL_DAYS")
+    audit_compress_after_days: int = Field(default=7, alias="AUDIT_COMPRESS_AFTER_DAYS")
+    audit_retention_days: int = Field(default=365, alias="AUDIT_RETENTION_DAYS")
+    fills_compress_after_days: int = Field(default=30, alias="FILLS_COMPRESS_AFTER_DAYS")
+    fills_retention_days: int = Field(default=0, alias="FILLS_RETENTION_DAYS")
+    orders_compress_after_days: int = Field(default=30, alias="ORDERS_COMPRESS_AFTER_DAYS")
+    orders_retention_days: int = Field(default=0, alias="ORDERS_RETENTION_DAYS")
+    candles_compress_after_days: int = Field(default=7, alias="CANDLES_COMPRESS_AFTER_DAYS")
+    candles_retention_days: int = Field(default=0, alias="CANDLES_RETENTION_DAYS")
 
     grafana_admin_user: str = Field(default="admin", alias="GRAFANA_ADMIN_USER")
     grafana_admin_password: str = Field(default="admin", alias="GRAFANA_ADMIN_PASSWORD")
@@ -71,8 +223,14 @@ class Settings(BaseSettings):
             f"@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
         )
 
+    @property
+    def async_database_url(self) -> str:
+        return (
+            f"postgresql+asyncpg://{self.postgres_user}:{self.postgres_password}"
+            f"@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
+        )
 
-@lru_cache
 
+@lru_cache
 def get_settings() -> Settings:
     return Settings()
@@ -1,14 +1,71 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import time
+from functools import lru_cache
 
-from packages.common.config import get_settings
+from prometheus_client import Histogram
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+
+from packages.common.config import Settings, get_settings
+from packages.common.metrics import LATENCY_BUCKETS, Sampler
 
 Base = declarative_base()
 
+DB_COMMIT_LATENCY = Histogram(
+    "db_commit_latency_seconds",
+    "Sampled wall time of ORM session commits, flush included",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+COMMIT_SAMPLER = Sampler()
+
+
+def _pool_options(settings: Settings) -> dict:
+    return {
+        "pool_pre_ping": True,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_recycle": settings.db_pool_recycle_sec,
+        "pool_timeout": settings.db_pool_timeout_sec,
+    }
+
 
 def get_engine():
     settings = get_settings()
-    return create_engine(settings.database_url, pool_pre_ping=True)
+    return create_engine(settings.database_url, **_pool_options(settings))
 
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+@lru_cache
+def get_async_engine():
+    settings = get_settings()
+    return create_async_engine(settings.async_database_url, **_pool_options(settings))
+
+
+@lru_cache
+def get_async_sessionmaker() -> async_sessionmaker:
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
+# Registered on the Session class, so every sync session and the sync half of every
+# AsyncSession is timed, whichever sessionmaker built it.
+@event.listens_for(Session, "before_commit")
+def _start_commit(session: Session) -> None:
+    if COMMIT_SAMPLER.hit():
+        session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _end_commit(session: Session) -> None:
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        DB_COMMIT_LATENCY.labels("ok").observe(time.perf_counter() - started)
+
+
+@event.listens_for(Session, "after_rollback")
+def _fail_commit(session: Session) -> None:
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        DB_COMMIT_LATENCY.labels("error").observe(time.perf_counter() - started)
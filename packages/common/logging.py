@@ -19,7 +19,7 @@ class JsonFormatter(logging.Formatter):
             payload["args"] = sanitize(record.args)
         if record.exc_info:
             payload["exc_info"] = self.formatException(record.exc_info)
-        return json.dumps(payload, ensure_ascii=False)
+        return json.dumps(payload, ensure_ascii=False, default=str)
 
 
 def sanitize(value: Any) -> Any:
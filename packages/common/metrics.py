@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import inspect
+import itertools
+import os
+import sys
+import time
+from functools import wraps
+
+from prometheus_client import REGISTRY, CollectorRegistry, Histogram, multiprocess
+
+from packages.common.config import get_settings
+
+LATENCY_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+)
+
+CALL_LATENCY = Histogram(
+    "call_latency_seconds",
+    "Sampled wall time of instrumented hot-path calls",
+    ["op"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+class _Idle:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *_) -> bool:
+        return False
+
+
+IDLE = _Idle()
+
+
+class _Span:
+    __slots__ = ("observe", "started")
+
+    def __init__(self, observe) -> None:
+        self.observe = observe
+        self.started = 0.0
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *_) -> bool:
+        self.observe(time.perf_counter() - self.started)
+        return False
+
+
+# Every `period`-th call is sampled. The sampled-out path is a counter tick and a modulo,
+# with no clock reads, allocation or label lookup, so hot paths can stay instrumented.
+class Sampler:
+    __slots__ = ("enabled", "period", "ticks")
+
+    def __init__(self, sample_rate: float | None = None) -> None:
+        if sample_rate is None:
+            sample_rate = get_settings().metrics_sample_rate
+        self.enabled = sample_rate > 0
+        # Disabled samplers start past the only tick they could ever hit.
+        self.period = max(round(1 / sample_rate), 1) if self.enabled else sys.maxsize
+        self.ticks = itertools.count(0 if self.enabled else 1)
+
+    def hit(self) -> bool:
+        return not next(self.ticks) % self.period
+
+
+class Timed:
+    def __init__(
+        self, op: str, sample_rate: float | None = None, histogram: Histogram = CALL_LATENCY
+    ) -> None:
+        self.op = op
+        self.sampler = Sampler(sample_rate)
+        self.observe = histogram.labels(op).observe
+        self._ticks, self._period = self.sampler.ticks, self.sampler.period
+
+    def span(self) -> _Span | _Idle:
+        if next(self._ticks) % self._period:
+            return IDLE
+        return _Span(self.observe)
+
+    def __call__(self, fn):
+        if not self.sampler.enabled:
+            return fn
+        ticks, period, observe = self._ticks, self._period, self.observe
+        clock = time.perf_counter
+
+        if inspect.iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def timed_async(*args, **kwargs):
+                if next(ticks) % period:
+                    return await fn(*args, **kwargs)
+                started = clock()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    observe(clock() - started)
+
+            return timed_async
+
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            if next(ticks) % period:
+                return fn(*args, **kwargs)
+            started = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(clock() - started)
+
+        return timed
+
+
+def timed(op: str, sample_rate: float | None = None) -> Timed:
+    return Timed(op, sample_rate)
+
+
+def multiprocess_enabled() -> bool:
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+# Under gunicorn or prefork Celery each process writes its samples to PROMETHEUS_MULTIPROC_DIR;
+# this registry merges them at scrape time.
+def metrics_registry() -> CollectorRegistry:
+    if not multiprocess_enabled():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def mark_process_dead(pid: int) -> None:
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
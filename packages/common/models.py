@@ -1,15 +1,31 @@
 from datetime import datetime
-from sqlalchemy import JSON, Boolean, Column, DateTime, Float, Integer, String, Text
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    PrimaryKeyConstraint,
+    String,
+    Text,
+)
 
 from packages.common.db import Base
 
 
 class AuditEvent(Base):
     __tablename__ = "audit_events"
+    __table_args__ = (
+        Index("ix_audit_events_event_type_ts", "event_type", "ts"),
+        Index("ix_audit_events_plan_id_ts", "plan_id", "ts"),
+    )
 
     id = Column(Integer, primary_key=True)
     ts = Column(DateTime, default=datetime.utcnow, nullable=False)
     event_type = Column(String(64), nullable=False)
+    plan_id = Column(String(64), nullable=True)
     payload = Column(JSON, nullable=False)
 
 
@@ -28,6 +44,7 @@ class TradePlan(Base):
 
 class RiskDecision(Base):
     __tablename__ = "risk_decisions"
+    __table_args__ = (Index("ix_risk_decisions_plan_id", "plan_id"),)
 
     id = Column(Integer, primary_key=True)
     plan_id = Column(String(64), nullable=False)
@@ -48,6 +65,10 @@ class RiskState(Base):
 
 class OrderInstruction(Base):
     __tablename__ = "order_instructions"
+    __table_args__ = (
+        Index("ix_order_instructions_plan_id", "plan_id"),
+        Index("ix_order_instructions_symbol_ts", "symbol", "ts"),
+    )
 
     id = Column(Integer, primary_key=True)
     plan_id = Column(String(64), nullable=False)
@@ -62,6 +83,18 @@ class OrderInstruction(Base):
     payload = Column(JSON, nullable=False)
 
 
+# First execution result per plan. The primary key is what stops a plan_id from being
+# executed twice; order_instructions is a hypertable and cannot carry that constraint.
+class PlanExecution(Base):
+    __tablename__ = "plan_executions"
+
+    plan_id = Column(String(64), primary_key=True)
+    ts = Column(DateTime, default=datetime.utcnow, nullable=False)
+    order_instruction_id = Column(Integer, nullable=True)
+    status = Column(String(16), nullable=False)
+    receipt = Column(JSON, nullable=False)
+
+
 class ExchangeReceipt(Base):
     __tablename__ = "exchange_receipts"
 
@@ -74,6 +107,10 @@ class ExchangeReceipt(Base):
 
 class Fill(Base):
     __tablename__ = "fills"
+    __table_args__ = (
+        Index("ix_fills_plan_id", "plan_id"),
+        Index("ix_fills_symbol_ts", "symbol", "ts"),
+    )
 
     id = Column(Integer, primary_key=True)
     plan_id = Column(String(64), nullable=False)
@@ -95,3 +132,27 @@ class TradeOutcome(Base):
     pnl = Column(Float, nullable=False)
     exit_reason = Column(String(64), nullable=False)
     summary = Column(Text, nullable=True)
+
+
+class PortfolioSnapshot(Base):
+    __tablename__ = "portfolio_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    ts = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_fill_id = Column(Integer, nullable=False)
+    last_outcome_id = Column(Integer, nullable=False)
+    state = Column(JSON, nullable=False)
+
+
+class Candle(Base):
+    __tablename__ = "candles"
+    __table_args__ = (PrimaryKeyConstraint("symbol", "timeframe", "ts"),)
+
+    symbol = Column(String(32), nullable=False)
+    timeframe = Column(String(8), nullable=False)
+    ts = Column(DateTime, nullable=False)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    volume = Column(Float, nullable=False)
@@ -1,13 +1,203 @@
+from __future__ import annotations
+
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
 import httpx
+from prometheus_client import Counter
 
 from packages.common.config import get_settings
+from packages.common.ratelimit import TokenBucket
 
+logger = logging.getLogger(__name__)
 
-def send_telegram(message: str) -> None:
+NOTIFY_MESSAGES = Counter("notify_messages_total", "Notifier messages by outcome", ["outcome"])
+
+
+@dataclass
+class _Pending:
+    count: int
+    not_before: float
+
+
+class TelegramNotifier:
+    def __init__(
+        self,
+        bot_token: str,
+        chat_id: str,
+        api_base: str = "https://api.telegram.org",
+        rate_per_sec: float = 1.0,
+        burst: int = 3,
+        coalesce_window_sec: float = 30.0,
+        max_retries: int = 5,
+        backoff_base_sec: float = 0.5,
+        max_pending: int = 1000,
+        timeout_sec: float = 10.0,
+    ) -> None:
+        self.url = f"{api_base.rstrip('/')}/bot{bot_token}/sendMessage"
+        self.chat_id = chat_id
+        self.coalesce_window_sec = coalesce_window_sec
+        self.max_retries = max_retries
+        self.backoff_base_sec = backoff_base_sec
+        self.max_pending = max_pending
+        self.timeout_sec = timeout_sec
+        self.bucket = TokenBucket(rate_per_sec, burst)
+        self._pending: dict[str, _Pending] = {}
+        self._last_sent: dict[str, float] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._thread: threading.Thread | None = None
+        self._ready = threading.Event()
+        self._stopping = False
+        self._start_lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._ready.clear()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+            self._thread.start()
+        self._ready.wait(timeout=5.0)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._loop.call_soon_threadsafe(self._begin_stop)
+        self._thread.join(timeout)
+
+    def notify(self, message: str) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        self._loop.call_soon_threadsafe(self._enqueue, message, time.monotonic())
+
+    def _begin_stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+
+    def _enqueue(self, message: str, received_at: float) -> None:
+        pending = self._pending.get(message)
+        if pending is not None:
+            pending.count += 1
+            NOTIFY_MESSAGES.labels(outcome="coalesced").inc()
+            return
+        if len(self._pending) >= self.max_pending:
+            NOTIFY_MESSAGES.labels(outcome="dropped").inc()
+            return
+        # A burst of the same alert is sent once, then at most once per window with a count.
+        last_sent = self._last_sent.get(message)
+        not_before = received_at
+        if last_sent is not None and received_at - last_sent < self.coalesce_window_sec:
+            not_before = last_sent + self.coalesce_window_sec
+        self._pending[message] = _Pending(count=1, not_before=not_before)
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._wakeup = asyncio.Event()
+        self._ready.set()
+        try:
+            self._loop.run_until_complete(self._worker())
+        finally:
+            self._loop.close()
+
+    async def _worker(self) -> None:
+        async with httpx.AsyncClient(timeout=self.timeout_sec) as client:
+            while True:
+                now = time.monotonic()
+                due = [
+                    message
+                    for message, pending in self._pending.items()
+                    if self._stopping or pending.not_before <= now
+                ]
+                for message in due:
+                    pending = self._pending.pop(message)
+                    await self._send(client, message, pending.count)
+                if self._stopping and not self._pending:
+                    return
+                if due:
+                    continue
+                self._prune(now)
+                waits = [pending.not_before - now for pending in self._pending.values()]
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(waits, default=None))
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _send(self, client: httpx.AsyncClient, message: str, count: int) -> None:
+        text = message if count == 1 else f"{message} (x{count})"
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            retry_after = None
+            try:
+                response = await client.post(self.url, json={"chat_id": self.chat_id, "text": text})
+                if response.status_code < 400:
+                    self._last_sent[message] = time.monotonic()
+                    NOTIFY_MESSAGES.labels(outcome="sent").inc()
+                    return
+                if response.status_code == 429:
+                    retry_after = _retry_after(response)
+                elif response.status_code < 500:
+                    logger.warning("telegram rejected message: %s", response.text)
+                    NOTIFY_MESSAGES.labels(outcome="rejected").inc()
+                    return
+            except httpx.HTTPError as exc:
+                logger.warning("telegram send failed: %s", exc)
+            if attempt < self.max_retries:
+                NOTIFY_MESSAGES.labels(outcome="retried").inc()
+                await asyncio.sleep(retry_after or self.backoff_base_sec * 2**attempt)
+        NOTIFY_MESSAGES.labels(outcome="failed").inc()
+
+    def _prune(self, now: float) -> None:
+        expired = [
+            message
+            for message, sent_at in self._last_sent.items()
+            if now - sent_at >= self.coalesce_window_sec
+        ]
+        for message in expired:
+            del self._last_sent[message]
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+@lru_cache
+def get_notifier() -> TelegramNotifier | None:
     settings = get_settings()
     if not settings.telegram_bot_token or not settings.telegram_chat_id:
+        return None
+    notifier = TelegramNotifier(
+        bot_token=settings.telegram_bot_token,
+        chat_id=settings.telegram_chat_id,
+        api_base=settings.telegram_api_base,
+        rate_per_sec=settings.telegram_rate_per_sec,
+        coalesce_window_sec=settings.telegram_coalesce_window_sec,
+        max_retries=settings.telegram_max_retries,
+    )
+    atexit.register(notifier.stop)
+    return notifier
+
+
+def shutdown_notifier(timeout: float = 10.0) -> None:
+    notifier = get_notifier()
+    if notifier is not None:
+        notifier.stop(timeout)
+
+
+def send_telegram(message: str) -> None:
+    notifier = get_notifier()
+    if notifier is None:
         return
-    url = f"https://api.telegram.org/bot{settings.telegram_bot_token}/sendMessage"
-    payload = {"chat_id": settings.telegram_chat_id, "text": message}
-    with httpx.Client(timeout=10) as client:
-        client.post(url, json=payload)
+    notifier.notify(message)
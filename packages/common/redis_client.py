@@ -0,0 +1,18 @@
+from functools import lru_cache
+
+import redis
+
+from packages.common.config import get_settings
+
+
+@lru_cache
+def get_redis() -> redis.Redis:
+    settings = get_settings()
+    return redis.Redis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        db=settings.redis_db,
+        socket_connect_timeout=1.0,
+        socket_timeout=1.0,
+        health_check_interval=15,
+    )
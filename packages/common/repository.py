@@ -0,0 +1,495 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Protocol
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from packages.common.config import get_settings
+from packages.common.db import Base, SessionLocal, get_async_sessionmaker
+from packages.common.models import (
+    AuditEvent,
+    ExchangeReceipt,
+    Fill,
+    OrderInstruction,
+    PlanExecution,
+    PortfolioSnapshot,
+    RiskDecision,
+    RiskState,
+    TradeOutcome,
+    TradePlan,
+)
+
+BACKENDS = ("postgres", "sqlite", "memory")
+
+
+class DuplicateExecution(RuntimeError):
+    def __init__(self, plan_ids: list[str]) -> None:
+        super().__init__(f"plan already executed: {', '.join(plan_ids)}")
+        self.plan_ids = plan_ids
+
+
+# One order state change as the execution engine wants it stored. New orders carry the order
+# row, whose id is assigned on write; later changes carry the id of the stored order. The id is
+# copied into the receipt before the receipt, fills and audit event are stored. Fill dicts may
+# carry their own `raw`; otherwise the receipt is used.
+@dataclass
+class ExecutionRecord:
+    order: dict | None
+    status: str
+    receipt: dict
+    fills: list[dict] = field(default_factory=list)
+    event_type: str = "order_filled"
+    order_id: int | None = None
+
+
+# Persistence the engines depend on. Rows are plain column dicts; methods that hand rows
+# back to callers return model instances, which for the memory backend are never attached
+# to a session.
+class Repository(Protocol):
+    def save_plans(self, rows: list[dict]) -> None: ...
+
+    async def save_plans_async(self, rows: list[dict]) -> None: ...
+
+    def save_risk_decisions(self, rows: list[dict]) -> None: ...
+
+    async def save_risk_decisions_async(self, rows: list[dict]) -> None: ...
+
+    def add_risk_state(self, paused: bool, reason: str | None) -> RiskState: ...
+
+    def latest_risk_state(self) -> RiskState | None: ...
+
+    async def latest_risk_state_async(self) -> RiskState | None: ...
+
+    def write_events(self, rows: list[dict]) -> None: ...
+
+    def events_for_plan(self, plan_id: str, limit: int = 500) -> list[AuditEvent]: ...
+
+    def record_executions(self, records: list[ExecutionRecord]) -> list[Fill]: ...
+
+    async def record_executions_async(self, records: list[ExecutionRecord]) -> list[Fill]: ...
+
+    def execution_for_plan(self, plan_id: str) -> dict | None: ...
+
+    async def execution_for_plan_async(self, plan_id: str) -> dict | None: ...
+
+    def save_outcome(self, row: dict) -> TradeOutcome: ...
+
+    def latest_portfolio_snapshot(self) -> PortfolioSnapshot | None: ...
+
+    def save_portfolio_snapshot(self, row: dict) -> None: ...
+
+    def ledger_since(
+        self, fill_id: int, outcome_id: int
+    ) -> tuple[list[Fill], list[TradeOutcome]]: ...
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _new_orders(records: list[ExecutionRecord]) -> list[OrderInstruction]:
+    return [OrderInstruction(**record.order) for record in records if record.order is not None]
+
+
+def _new_plan_ids(records: list[ExecutionRecord]) -> list[str]:
+    return [record.order["plan_id"] for record in records if record.order is not None]
+
+
+def _ledger_row(record: ExecutionRecord) -> dict:
+    return {
+        "plan_id": record.order["plan_id"],
+        "ts": record.order["ts"],
+        "order_instruction_id": record.order_id,
+        "status": record.status,
+        "receipt": record.receipt,
+    }
+
+
+def _execution(row: PlanExecution | dict | None) -> dict | None:
+    if row is None:
+        return None
+    if isinstance(row, dict):
+        return {"status": row["status"], "receipt": row["receipt"]}
+    return {"status": row.status, "receipt": row.receipt}
+
+
+def _plan_id(record: ExecutionRecord) -> str | None:
+    if record.order is not None:
+        return record.order["plan_id"]
+    return (record.receipt.get("instruction") or {}).get("plan_id")
+
+
+class SqlRepository:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        async_session_factory: async_sessionmaker | None = None,
+    ) -> None:
+        self.session_factory = session_factory
+        # Without an async driver the async methods run the sync ones on a worker thread.
+        self.async_session_factory = async_session_factory
+
+    def save_plans(self, rows: list[dict]) -> None:
+        self._insert(TradePlan, rows)
+
+    async def save_plans_async(self, rows: list[dict]) -> None:
+        await self._insert_async(TradePlan, rows)
+
+    def save_risk_decisions(self, rows: list[dict]) -> None:
+        self._insert(RiskDecision, rows)
+
+    async def save_risk_decisions_async(self, rows: list[dict]) -> None:
+        await self._insert_async(RiskDecision, rows)
+
+    def add_risk_state(self, paused: bool, reason: str | None) -> RiskState:
+        session = self.session_factory(expire_on_commit=False)
+        try:
+            state = RiskState(ts=_utcnow(), paused=paused, reason=reason)
+            session.add(state)
+            session.commit()
+        finally:
+            session.close()
+        return state
+
+    def latest_risk_state(self) -> RiskState | None:
+        session = self.session_factory()
+        try:
+            return session.query(RiskState).order_by(RiskState.id.desc()).first()
+        finally:
+            session.close()
+
+    async def latest_risk_state_async(self) -> RiskState | None:
+        if self.async_session_factory is None:
+            return await asyncio.to_thread(self.latest_risk_state)
+        async with self.async_session_factory() as session:
+            result = await session.execute(select(RiskState).order_by(RiskState.id.desc()).limit(1))
+            return result.scalar_one_or_none()
+
+    def write_events(self, rows: list[dict]) -> None:
+        self._insert(AuditEvent, rows)
+
+    def events_for_plan(self, plan_id: str, limit: int = 500) -> list[AuditEvent]:
+        session = self.session_factory()
+        try:
+            return (
+                session.query(AuditEvent)
+                .filter(AuditEvent.plan_id == plan_id)
+                .order_by(AuditEvent.ts)
+                .limit(limit)
+                .all()
+            )
+        finally:
+            session.close()
+
+    def record_executions(self, records: list[ExecutionRecord]) -> list[Fill]:
+        session = self.session_factory(expire_on_commit=False)
+        try:
+            orders = _new_orders(records)
+            session.add_all(orders)
+            # One INSERT ... RETURNING for the whole batch; receipts and fills then
+            # reference the primary keys directly instead of re-querying.
+            session.flush()
+            fills = self._add_results(session, orders, records)
+            try:
+                session.flush()
+            except IntegrityError as exc:
+                raise DuplicateExecution(_new_plan_ids(records)) from exc
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        return fills
+
+    async def record_executions_async(self, records: list[ExecutionRecord]) -> list[Fill]:
+        if self.async_session_factory is None:
+            return await asyncio.to_thread(self.record_executions, records)
+        async with self.async_session_factory() as session:
+            orders = _new_orders(records)
+            session.add_all(orders)
+            await session.flush()
+            fills = self._add_results(session, orders, records)
+            try:
+                await session.flush()
+            except IntegrityError as exc:
+                await session.rollback()
+                raise DuplicateExecution(_new_plan_ids(records)) from exc
+            await session.commit()
+        return fills
+
+    def execution_for_plan(self, plan_id: str) -> dict | None:
+        session = self.session_factory()
+        try:
+            return _execution(session.get(PlanExecution, plan_id))
+        finally:
+            session.close()
+
+    async def execution_for_plan_async(self, plan_id: str) -> dict | None:
+        if self.async_session_factory is None:
+            return await asyncio.to_thread(self.execution_for_plan, plan_id)
+        async with self.async_session_factory() as session:
+            return _execution(await session.get(PlanExecution, plan_id))
+
+    def save_outcome(self, row: dict) -> TradeOutcome:
+        session = self.session_factory(expire_on_commit=False)
+        try:
+            outcome = TradeOutcome(**row)
+            session.add(outcome)
+            session.commit()
+        finally:
+            session.close()
+        return outcome
+
+    def latest_portfolio_snapshot(self) -> PortfolioSnapshot | None:
+        session = self.session_factory()
+        try:
+            return session.query(PortfolioSnapshot).order_by(PortfolioSnapshot.id.desc()).first()
+        finally:
+            session.close()
+
+    def save_portfolio_snapshot(self, row: dict) -> None:
+        self._insert(PortfolioSnapshot, [row])
+
+    def ledger_since(self, fill_id: int, outcome_id: int) -> tuple[list[Fill], list[TradeOutcome]]:
+        session = self.session_factory()
+        try:
+            fills = session.query(Fill).filter(Fill.id > fill_id).order_by(Fill.id).all()
+            outcomes = (
+                session.query(TradeOutcome)
+                .filter(TradeOutcome.id > outcome_id)
+                .order_by(TradeOutcome.id)
+                .all()
+            )
+        finally:
+            session.close()
+        return fills, outcomes
+
+    def _add_results(
+        self,
+        session: Session | AsyncSession,
+        orders: list[OrderInstruction],
+        records: list[ExecutionRecord],
+    ) -> list[Fill]:
+        fills = []
+        created = iter(orders)
+        for record in records:
+            if record.order is not None:
+                record.order_id = next(created).id
+            record.receipt["order_instruction_id"] = record.order_id
+            if record.order is not None:
+                # The ledger row commits with the order or not at all.
+                session.add(PlanExecution(**_ledger_row(record)))
+            session.add(
+                ExchangeReceipt(
+                    order_instruction_id=record.order_id, status=record.status, raw=record.receipt
+                )
+            )
+            for row in record.fills:
+                fill = Fill(**{"raw": record.receipt, **row})
+                session.add(fill)
+                fills.append(fill)
+            session.add(
+                AuditEvent(
+                    ts=_utcnow(),
+                    event_type=record.event_type,
+                    plan_id=_plan_id(record),
+                    payload=record.receipt,
+                )
+            )
+        return fills
+
+    def _insert(self, model, rows: list[dict]) -> None:
+        # One multi-row INSERT per batch instead of a commit per row.
+        if not rows:
+            return
+        session = self.session_factory()
+        try:
+            session.execute(insert(model), rows)
+            session.commit()
+        finally:
+            session.close()
+
+    async def _insert_async(self, model, rows: list[dict]) -> None:
+        if not rows:
+            return
+        if self.async_session_factory is None:
+            await asyncio.to_thread(self._insert, model, rows)
+            return
+        async with self.async_session_factory() as session:
+            await session.execute(insert(model), rows)
+            await session.commit()
+
+
+# Process-local tables for hot paths, backtests and tests. Each table keeps its newest
+# `max_rows` rows; ids increase monotonically like database sequences.
+class MemoryRepository:
+    def __init__(self, max_rows: int | None = 100000) -> None:
+        self.max_rows = max_rows
+        self.tables: dict[str, deque] = {
+            name: deque(maxlen=max_rows)
+            for name in (
+                "trade_plans",
+                "risk_decisions",
+                "risk_state",
+                "order_instructions",
+                "exchange_receipts",
+                "fills",
+                "trade_outcomes",
+                "audit_events",
+                "portfolio_snapshots",
+            )
+        }
+        self._ids = {name: itertools.count(1) for name in self.tables}
+        self.executions: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def save_plans(self, rows: list[dict]) -> None:
+        self._append("trade_plans", rows)
+
+    async def save_plans_async(self, rows: list[dict]) -> None:
+        self.save_plans(rows)
+
+    def save_risk_decisions(self, rows: list[dict]) -> None:
+        self._append("risk_decisions", rows)
+
+    async def save_risk_decisions_async(self, rows: list[dict]) -> None:
+        self.save_risk_decisions(rows)
+
+    def add_risk_state(self, paused: bool, reason: str | None) -> RiskState:
+        row = self._append("risk_state", [{"ts": _utcnow(), "paused": paused, "reason": reason}])[0]
+        return RiskState(**row)
+
+    def latest_risk_state(self) -> RiskState | None:
+        table = self.tables["risk_state"]
+        return RiskState(**table[-1]) if table else None
+
+    async def latest_risk_state_async(self) -> RiskState | None:
+        return self.latest_risk_state()
+
+    def write_events(self, rows: list[dict]) -> None:
+        self._append("audit_events", rows)
+
+    def events_for_plan(self, plan_id: str, limit: int = 500) -> list[AuditEvent]:
+        rows = [row for row in list(self.tables["audit_events"]) if row["plan_id"] == plan_id]
+        rows.sort(key=lambda row: row["ts"])
+        return [AuditEvent(**row) for row in rows[:limit]]
+
+    def record_executions(self, records: list[ExecutionRecord]) -> list[Fill]:
+        fills = []
+        with self._lock:
+            plan_ids = _new_plan_ids(records)
+            if len(set(plan_ids)) < len(plan_ids) or any(
+                plan_id in self.executions for plan_id in plan_ids
+            ):
+                raise DuplicateExecution(plan_ids)
+            for record in records:
+                if record.order is not None:
+                    record.order_id = self._append("order_instructions", [record.order])[0]["id"]
+                    self._remember(_ledger_row(record))
+                record.receipt["order_instruction_id"] = record.order_id
+                self._append(
+                    "exchange_receipts",
+                    [
+                        {
+                            "ts": _utcnow(),
+                            "order_instruction_id": record.order_id,
+                            "status": record.status,
+                            "raw": record.receipt,
+                        }
+                    ],
+                )
+                rows = self._append(
+                    "fills", [{"raw": record.receipt, **row} for row in record.fills]
+                )
+                fills.extend(Fill(**row) for row in rows)
+                self._append(
+                    "audit_events",
+                    [
+                        {
+                            "ts": _utcnow(),
+                            "event_type": record.event_type,
+                            "plan_id": _plan_id(record),
+                            "payload": record.receipt,
+                        }
+                    ],
+                )
+        return fills
+
+    async def record_executions_async(self, records: list[ExecutionRecord]) -> list[Fill]:
+        return self.record_executions(records)
+
+    def execution_for_plan(self, plan_id: str) -> dict | None:
+        return _execution(self.executions.get(plan_id))
+
+    async def execution_for_plan_async(self, plan_id: str) -> dict | None:
+        return self.execution_for_plan(plan_id)
+
+    def save_outcome(self, row: dict) -> TradeOutcome:
+        return TradeOutcome(**self._append("trade_outcomes", [row])[0])
+
+    def latest_portfolio_snapshot(self) -> PortfolioSnapshot | None:
+        table = self.tables["portfolio_snapshots"]
+        return PortfolioSnapshot(**table[-1]) if table else None
+
+    def save_portfolio_snapshot(self, row: dict) -> None:
+        self._append("portfolio_snapshots", [row])
+
+    def ledger_since(self, fill_id: int, outcome_id: int) -> tuple[list[Fill], list[TradeOutcome]]:
+        fills = [Fill(**row) for row in list(self.tables["fills"]) if row["id"] > fill_id]
+        outcomes = [
+            TradeOutcome(**row)
+            for row in list(self.tables["trade_outcomes"])
+            if row["id"] > outcome_id
+        ]
+        return fills, outcomes
+
+    def _remember(self, row: dict) -> None:
+        # Bounded like the tables, oldest plans first; insertion order is age order.
+        self.executions[row["plan_id"]] = row
+        if self.max_rows is not None and len(self.executions) > self.max_rows:
+            del self.executions[next(iter(self.executions))]
+
+    def _append(self, table: str, rows: list[dict]) -> list[dict]:
+        ids, stored = self._ids[table], self.tables[table]
+        added = [{**row, "id": next(ids)} for row in rows]
+        stored.extend(added)
+        return added
+
+
+def sqlite_session_factory(url: str = "sqlite://") -> sessionmaker:
+    # The default URL is a private in-memory database shared by every session of the factory.
+    engine = create_engine(url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+
+def build_repository(backend: str, sqlite_url: str = "sqlite://", max_rows: int | None = None):
+    if backend == "postgres":
+        return SqlRepository(SessionLocal, get_async_sessionmaker())
+    if backend == "sqlite":
+        return SqlRepository(sqlite_session_factory(sqlite_url))
+    if backend == "memory":
+        return MemoryRepository(max_rows)
+    raise ValueError(f"unknown persistence backend: {backend}")
+
+
+@lru_cache
+def get_repository() -> Repository:
+    settings = get_settings()
+    return build_repository(
+        settings.persistence_backend,
+        settings.persistence_sqlite_url,
+        settings.persistence_memory_max_rows,
+    )
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from sqlalchemy import text
+
+from packages.common.config import Settings, get_settings
+from packages.common.db import get_engine
+
+
+@dataclass(frozen=True)
+class HypertablePolicy:
+    table: str
+    segment_by: str
+    compress_after_days: int
+    retention_days: int
+    order_by: str = "ts DESC, id DESC"
+
+
+def hypertable_policies(settings: Settings) -> list[HypertablePolicy]:
+    return [
+        HypertablePolicy(
+            "audit_events",
+            "event_type",
+            settings.audit_compress_after_days,
+            settings.audit_retention_days,
+        ),
+        HypertablePolicy(
+            "fills", "symbol", settings.fills_compress_after_days, settings.fills_retention_days
+        ),
+        HypertablePolicy(
+            "order_instructions",
+            "symbol",
+            settings.orders_compress_after_days,
+            settings.orders_retention_days,
+        ),
+        HypertablePolicy(
+            "candles",
+            "symbol, timeframe",
+            settings.candles_compress_after_days,
+            settings.candles_retention_days,
+            order_by="ts DESC",
+        ),
+    ]
+
+
+def policy_statements(settings: Settings, tables: tuple[str, ...] | None = None) -> list[str]:
+    statements = []
+    for policy in hypertable_policies(settings):
+        if tables is not None and policy.table not in tables:
+            continue
+        statements += [
+            f"SELECT remove_compression_policy('{policy.table}', if_exists => true)",
+            f"SELECT remove_retention_policy('{policy.table}', if_exists => true)",
+        ]
+        if policy.compress_after_days > 0:
+            statements += [
+                f"ALTER TABLE {policy.table} SET (timescaledb.compress, "
+                f"timescaledb.compress_segmentby = '{policy.segment_by}', "
+                f"timescaledb.compress_orderby = '{policy.order_by}')",
+                f"SELECT add_compression_policy('{policy.table}', "
+                f"INTERVAL '{int(policy.compress_after_days)} days')",
+            ]
+        if policy.retention_days > 0:
+            statements.append(
+                f"SELECT add_retention_policy('{policy.table}', "
+                f"INTERVAL '{int(policy.retention_days)} days')"
+            )
+    return statements
+
+
+if __name__ == "__main__":
+    with get_engine().begin() as conn:
+        for statement in policy_statements(get_settings()):
+            conn.execute(text(statement))
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from packages.common.db import SessionLocal
+from packages.common.models import Candle
+from packages.data.store import CandleBar
+
+
+def _epoch_ms(ts: datetime) -> int:
+    return int(ts.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def load_candles(
+    symbol: str,
+    timeframe: str,
+    since_ms: int | None = None,
+    limit: int = 500,
+    session_factory=SessionLocal,
+) -> list[CandleBar]:
+    session = session_factory()
+    try:
+        query = session.query(Candle).filter(Candle.symbol == symbol, Candle.timeframe == timeframe)
+        if since_ms is not None:
+            since = datetime.fromtimestamp(since_ms / 1000, tz=timezone.utc).replace(tzinfo=None)
+            query = query.filter(Candle.ts > since)
+        rows = query.order_by(Candle.ts.desc()).limit(limit).all()
+    finally:
+        session.close()
+    return [
+        CandleBar(
+            symbol=row.symbol,
+            timeframe=row.timeframe,
+            ts=_epoch_ms(row.ts),
+            open=row.open,
+            high=row.high,
+            low=row.low,
+            close=row.close,
+            volume=row.volume,
+        )
+        for row in reversed(rows)
+    ]
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import logging
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from prometheus_client import Counter, Histogram
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from packages.common.config import get_settings
+from packages.common.db import SessionLocal
+from packages.common.models import Candle
+from packages.data.quality import DataQualityEngine, get_quality_engine
+from packages.data.sources import build_market_source
+from packages.data.store import CandleBar, CandleView, MarketDataStore, get_market_store
+from packages.regime.engine import get_regime_engine
+from packages.signals.engine import get_indicator_engine
+
+logger = logging.getLogger(__name__)
+
+CANDLE_COLUMNS = ("symbol", "timeframe", "ts", "open", "high", "low", "close", "volume")
+
+MARKET_BARS_INGESTED = Counter(
+    "market_bars_ingested_total", "Candles applied to the in-memory store", ["outcome"]
+)
+MARKET_FETCH_ERRORS = Counter("market_fetch_errors_total", "Failed market data fetches")
+MARKET_CANDLES_WRITTEN = Counter("market_candles_written_total", "Closed candles persisted")
+MARKET_POLL_LATENCY = Histogram("market_poll_latency_seconds", "Market data poll duration")
+
+
+def _candle_ts(bar: CandleBar) -> datetime:
+    return datetime.fromtimestamp(bar.ts / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+
+def write_candles(bars: list[CandleBar], session_factory=SessionLocal) -> int:
+    if not bars:
+        return 0
+    session = session_factory()
+    try:
+        connection = session.connection()
+        if connection.dialect.name == "postgresql":
+            _copy_candles(connection, bars)
+        else:
+            _upsert_candles(session, bars)
+        session.commit()
+    finally:
+        session.close()
+    MARKET_CANDLES_WRITTEN.inc(len(bars))
+    return len(bars)
+
+
+# COPY into a temp table and merge from there: COPY itself cannot resolve the duplicates
+# produced by re-fetching overlapping pages.
+def _copy_candles(connection, bars: list[CandleBar]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for bar in bars:
+        writer.writerow((bar.symbol, bar.timeframe, _candle_ts(bar).isoformat(), *bar.row()[1:]))
+    buffer.seek(0)
+    columns = ", ".join(CANDLE_COLUMNS)
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in CANDLE_COLUMNS[3:])
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS candles_stage "
+            "(LIKE candles INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+        cursor.copy_expert(f"COPY candles_stage ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(
+            f"INSERT INTO candles ({columns}) SELECT DISTINCT ON (symbol, timeframe, ts) "
+            f"{columns} FROM candles_stage ORDER BY symbol, timeframe, ts "
+            f"ON CONFLICT (symbol, timeframe, ts) DO UPDATE SET {updates}"
+        )
+    finally:
+        cursor.close()
+
+
+def _upsert_candles(session, bars: list[CandleBar]) -> None:
+    rows = {
+        (bar.symbol, bar.timeframe, bar.ts): {
+            "symbol": bar.symbol,
+            "timeframe": bar.timeframe,
+            "ts": _candle_ts(bar),
+            "open": bar.open,
+            "high": bar.high,
+            "low": bar.low,
+            "close": bar.close,
+            "volume": bar.volume,
+        }
+        for bar in bars
+    }
+    statement = sqlite_insert(Candle)
+    statement = statement.on_conflict_do_update(
+        index_elements=["symbol", "timeframe", "ts"],
+        set_={column: statement.excluded[column] for column in CANDLE_COLUMNS[3:]},
+    )
+    session.execute(statement, list(rows.values()))
+
+
+class MarketDataIngestor:
+    def __init__(
+        self,
+        source,
+        store: MarketDataStore,
+        symbols: list[str],
+        timeframes: list[str],
+        concurrency: int = 8,
+        fetch_limit: int = 100,
+        fetch_trades: bool = True,
+        quality: DataQualityEngine | None = None,
+        indicators=None,
+        regimes=None,
+        session_factory=SessionLocal,
+    ) -> None:
+        self.source = source
+        self.store = store
+        self.symbols = symbols
+        self.timeframes = timeframes
+        self.concurrency = concurrency
+        self.fetch_limit = fetch_limit
+        self.fetch_trades = fetch_trades
+        self.quality = quality
+        self.indicators = indicators
+        self.regimes = regimes
+        self.session_factory = session_factory
+        self._persisted_ts: dict[tuple[str, str], int] = {}
+
+    async def poll_once(self) -> int:
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def guarded(call):
+            async with semaphore:
+                try:
+                    return await call
+                except Exception as exc:
+                    MARKET_FETCH_ERRORS.inc()
+                    logger.warning("market data fetch failed: %s", exc)
+                    return []
+
+        candle_calls = [
+            guarded(self.source.fetch_candles(symbol, timeframe, self.fetch_limit))
+            for symbol in self.symbols
+            for timeframe in self.timeframes
+        ]
+        trade_calls = (
+            [guarded(self.source.fetch_trades(symbol, self.fetch_limit)) for symbol in self.symbols]
+            if self.fetch_trades
+            else []
+        )
+        pages = await asyncio.gather(*candle_calls, *trade_calls)
+
+        closed: list[CandleBar] = []
+        for bars in pages[: len(candle_calls)]:
+            result = self.store.append_candles(bars)
+            MARKET_BARS_INGESTED.labels(outcome="appended").inc(result.appended)
+            MARKET_BARS_INGESTED.labels(outcome="updated").inc(result.updated)
+            MARKET_BARS_INGESTED.labels(outcome="stale").inc(result.stale)
+            fresh = self._unpersisted(bars)
+            if fresh and self.quality is not None:
+                # Only newly closed bars are checked, so each bar is scored exactly once.
+                self.quality.check_candles(
+                    fresh[0].symbol, fresh[0].timeframe, CandleView.from_bars(fresh)
+                )
+            closed.extend(fresh)
+        for trades in pages[len(candle_calls) :]:
+            self.store.append_trades(trades)
+
+        if self.indicators is not None:
+            self.indicators.update_bars(closed)
+        if self.regimes is not None:
+            self.regimes.update_bars(closed)
+        written = await asyncio.to_thread(write_candles, closed, self.session_factory)
+        for bar in closed:
+            key = (bar.symbol, bar.timeframe)
+            self._persisted_ts[key] = max(self._persisted_ts.get(key, 0), bar.ts)
+        MARKET_POLL_LATENCY.observe(time.perf_counter() - started)
+        return written
+
+    async def run_once(self) -> int:
+        # Celery runs each poll in a fresh event loop, so the HTTP client cannot outlive it.
+        try:
+            return await self.poll_once()
+        finally:
+            await self.source.close()
+
+    async def run(self, interval_sec: float) -> None:
+        try:
+            while True:
+                await self.poll_once()
+                await asyncio.sleep(interval_sec)
+        finally:
+            await self.source.close()
+
+    def _unpersisted(self, bars: list[CandleBar]) -> list[CandleBar]:
+        return [
+            bar
+            for bar in bars
+            if bar.confirmed and bar.ts > self._persisted_ts.get((bar.symbol, bar.timeframe), 0)
+        ]
+
+
+@lru_cache
+def get_ingestor() -> MarketDataIngestor:
+    settings = get_settings()
+    return MarketDataIngestor(
+        source=build_market_source(),
+        store=get_market_store(),
+        symbols=settings.market_symbols,
+        timeframes=settings.market_timeframes,
+        concurrency=settings.market_fetch_concurrency,
+        quality=get_quality_engine(),
+        indicators=get_indicator_engine(),
+        regimes=get_regime_engine(),
+    )
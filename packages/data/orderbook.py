@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import orjson
+import websockets
+from prometheus_client import Counter
+
+from packages.common.config import get_settings
+from packages.data.quality import DataQualityEngine, get_quality_engine
+
+logger = logging.getLogger(__name__)
+
+ORDERBOOK_UPDATES = Counter("orderbook_updates_total", "Book messages applied", ["action"])
+ORDERBOOK_RESYNCS = Counter("orderbook_resyncs_total", "Books dropped for a sequence gap")
+
+_UPDATE_COUNTERS = {
+    action: ORDERBOOK_UPDATES.labels(action=action) for action in ("snapshot", "update")
+}
+
+RECONNECT_BACKOFF_SEC = (1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+def _update_counter(action: str):
+    counter = _UPDATE_COUNTERS.get(action)
+    return counter if counter is not None else ORDERBOOK_UPDATES.labels(action=action)
+
+
+class BookOutOfSync(RuntimeError):
+    pass
+
+
+# Price levels kept sorted best-first in preallocated arrays. Keys are price for asks and
+# -price for bids so both sides use the same ascending searchsorted.
+class BookSide:
+    def __init__(self, is_bid: bool, capacity: int = 400) -> None:
+        self.sign = -1.0 if is_bid else 1.0
+        self.capacity = capacity
+        self.keys = np.empty(capacity)
+        self.prices = np.empty(capacity)
+        self.sizes = np.empty(capacity)
+        self.count = 0
+
+    def load(self, levels: list[tuple[float, float]]) -> None:
+        levels = np.array(levels, dtype=np.float64).reshape(-1, 2)
+        levels = levels[levels[:, 1] > 0]
+        order = np.argsort(self.sign * levels[:, 0], kind="stable")[: self.capacity]
+        self.count = len(order)
+        self.prices[: self.count] = levels[order, 0]
+        self.sizes[: self.count] = levels[order, 1]
+        self.keys[: self.count] = self.sign * self.prices[: self.count]
+
+    def update(self, price: float, size: float) -> tuple[float, float]:
+        # Returns (size added, size removed) at this level.
+        n = self.count
+        key = self.sign * price
+        i = int(self.keys[:n].searchsorted(key))
+        if i < n and self.keys[i] == key:
+            previous = self.sizes[i]
+            if size > 0:
+                self.sizes[i] = size
+            else:
+                self.keys[i : n - 1] = self.keys[i + 1 : n]
+                self.prices[i : n - 1] = self.prices[i + 1 : n]
+                self.sizes[i : n - 1] = self.sizes[i + 1 : n]
+                self.count = n - 1
+            change = size - previous
+            return (change, 0.0) if change > 0 else (0.0, -change)
+        if size <= 0 or i >= self.capacity:
+            return (0.0, 0.0)
+        end = min(n, self.capacity - 1)
+        self.keys[i + 1 : end + 1] = self.keys[i:end]
+        self.prices[i + 1 : end + 1] = self.prices[i:end]
+        self.sizes[i + 1 : end + 1] = self.sizes[i:end]
+        self.keys[i], self.prices[i], self.sizes[i] = key, price, size
+        self.count = end + 1
+        return (size, 0.0)
+
+    @property
+    def best(self) -> tuple[float, float] | None:
+        if self.count == 0:
+            return None
+        return (float(self.prices[0]), float(self.sizes[0]))
+
+    def size_at(self, price: float) -> float:
+        key = self.sign * price
+        i = int(self.keys[: self.count].searchsorted(key))
+        if i < self.count and self.keys[i] == key:
+            return float(self.sizes[i])
+        return 0.0
+
+    def size_within(self, limit_price: float) -> float:
+        # Size of levels at or better than limit_price.
+        end = int(self.keys[: self.count].searchsorted(self.sign * limit_price, side="right"))
+        return float(self.sizes[:end].sum())
+
+    def depth_within(self, limit_price: float) -> float:
+        # Quote notional of levels at or better than limit_price.
+        end = int(self.keys[: self.count].searchsorted(self.sign * limit_price, side="right"))
+        return float(np.dot(self.prices[:end], self.sizes[:end]))
+
+    def levels(self, n: int | None = None) -> np.ndarray:
+        end = self.count if n is None else min(n, self.count)
+        return np.column_stack((self.prices[:end], self.sizes[:end]))
+
+
+@dataclass(frozen=True)
+class BookFeatures:
+    symbol: str
+    ts: int
+    seq_id: int
+    best_bid: float
+    best_ask: float
+    mid: float
+    spread_bps: float
+    microprice: float
+    bid_depth_usd: float
+    ask_depth_usd: float
+    imbalance: float
+    cancel_rate: float
+    received_at: float
+
+    @property
+    def depth_usd(self) -> float:
+        return min(self.bid_depth_usd, self.ask_depth_usd)
+
+
+class L2Book:
+    def __init__(
+        self,
+        symbol: str,
+        max_levels: int = 400,
+        depth_bps: float = 10.0,
+        contract_value: float = 1.0,
+        cancel_halflife_updates: int = 200,
+    ) -> None:
+        self.symbol = symbol
+        self.bids = BookSide(is_bid=True, capacity=max_levels)
+        self.asks = BookSide(is_bid=False, capacity=max_levels)
+        self.depth_bps = depth_bps
+        self.contract_value = contract_value
+        self.cancel_decay = 0.5 ** (1.0 / cancel_halflife_updates)
+        self.seq_id: int | None = None
+        self.ts = 0
+        self._added = 0.0
+        self._removed = 0.0
+
+    def apply_snapshot(
+        self, bids: list[tuple[float, float]], asks: list[tuple[float, float]], seq_id: int, ts: int
+    ) -> None:
+        self.bids.load(bids)
+        self.asks.load(asks)
+        self.seq_id = seq_id
+        self.ts = ts
+
+    def apply_update(
+        self,
+        bids: list[tuple[float, float]],
+        asks: list[tuple[float, float]],
+        seq_id: int,
+        prev_seq_id: int,
+        ts: int,
+    ) -> None:
+        if self.seq_id is None or prev_seq_id != self.seq_id:
+            raise BookOutOfSync(
+                f"{self.symbol}: expected prevSeqId {self.seq_id}, got {prev_seq_id}"
+            )
+        added = removed = 0.0
+        for side, levels in ((self.bids, bids), (self.asks, asks)):
+            for price, size in levels:
+                level_added, level_removed = side.update(price, size)
+                added += level_added
+                removed += level_removed
+        # Size pulled from the book relative to size posted; fills count as pulls too.
+        self._added = self._added * self.cancel_decay + added
+        self._removed = self._removed * self.cancel_decay + removed
+        self.seq_id = seq_id
+        self.ts = ts
+
+    def features(self) -> BookFeatures | None:
+        bid, ask = self.bids.best, self.asks.best
+        if bid is None or ask is None:
+            return None
+        (bid_px, bid_sz), (ask_px, ask_sz) = bid, ask
+        mid = (bid_px + ask_px) / 2
+        band = mid * self.depth_bps / 10000
+        bid_depth = self.bids.depth_within(mid - band) * self.contract_value
+        ask_depth = self.asks.depth_within(mid + band) * self.contract_value
+        total_depth = bid_depth + ask_depth
+        flow = self._added + self._removed
+        return BookFeatures(
+            symbol=self.symbol,
+            ts=self.ts,
+            seq_id=self.seq_id or 0,
+            best_bid=bid_px,
+            best_ask=ask_px,
+            mid=mid,
+            spread_bps=(ask_px - bid_px) / mid * 10000 if mid > 0 else float("inf"),
+            microprice=(bid_px * ask_sz + ask_px * bid_sz) / (bid_sz + ask_sz),
+            bid_depth_usd=bid_depth,
+            ask_depth_usd=ask_depth,
+            imbalance=(bid_depth - ask_depth) / total_depth if total_depth > 0 else 0.0,
+            cancel_rate=float(self._removed / flow) if flow > 0 else 0.0,
+            received_at=time.monotonic(),
+        )
+
+
+# Called with the book, the bid and ask levels just applied, and whether they were a snapshot.
+BookListener = Callable[["L2Book", list, list, bool], None]
+
+
+def _levels(raw: list | None) -> list[tuple[float, float]]:
+    # OKX levels are [price, size, deprecated, order_count] strings.
+    return [(float(level[0]), float(level[1])) for level in raw or ()]
+
+
+class OrderBookEngine:
+    def __init__(
+        self,
+        max_levels: int = 400,
+        depth_bps: float = 10.0,
+        contract_values: dict[str, float] | None = None,
+        quality: DataQualityEngine | None = None,
+        quality_batch: int = 256,
+    ) -> None:
+        self.max_levels = max_levels
+        self.depth_bps = depth_bps
+        self.contract_values = contract_values or {}
+        self.quality = quality
+        self.quality_batch = quality_batch
+        self._books: dict[str, L2Book] = {}
+        self._features: dict[str, BookFeatures] = {}
+        self._pending_quality: dict[str, list[tuple[int, int, float, float]]] = {}
+        # Listeners run under this lock; anything else reading the books takes it too.
+        self.lock = threading.Lock()
+        self.listeners: list[BookListener] = []
+
+    def book(self, symbol: str) -> L2Book:
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = L2Book(
+                symbol,
+                max_levels=self.max_levels,
+                depth_bps=self.depth_bps,
+                contract_value=self.contract_values.get(symbol, 1.0),
+            )
+        return book
+
+    def add_listener(self, listener: BookListener) -> None:
+        with self.lock:
+            self.listeners.append(listener)
+
+    def features(self, symbol: str, max_age_sec: float | None = None) -> BookFeatures | None:
+        features = self._features.get(symbol)
+        if features is None:
+            return None
+        if max_age_sec is not None and time.monotonic() - features.received_at > max_age_sec:
+            return None
+        return features
+
+    def on_message(self, message: dict) -> list[str]:
+        # Applies one OKX books message; returns symbols that lost sync and need a snapshot.
+        arg = message.get("arg") or {}
+        symbol = arg.get("instId")
+        action = message.get("action", "snapshot")
+        if symbol is None or "data" not in message:
+            return []
+        out_of_sync: list[str] = []
+        with self.lock:
+            book = self.book(symbol)
+            for data in message["data"]:
+                if action != "snapshot" and book.seq_id is None:
+                    # Waiting for the snapshot a resubscribe triggers.
+                    break
+                bids, asks = _levels(data.get("bids")), _levels(data.get("asks"))
+                seq_id, ts = int(data.get("seqId", 0)), int(data.get("ts", 0))
+                try:
+                    if action == "snapshot":
+                        book.apply_snapshot(bids, asks, seq_id, ts)
+                    else:
+                        book.apply_update(bids, asks, seq_id, int(data.get("prevSeqId", -1)), ts)
+                except BookOutOfSync as exc:
+                    logger.warning("order book resync: %s", exc)
+                    ORDERBOOK_RESYNCS.inc()
+                    book.seq_id = None
+                    self._features.pop(symbol, None)
+                    out_of_sync.append(symbol)
+                    break
+                _update_counter(action).inc()
+                for listener in self.listeners:
+                    listener(book, bids, asks, action == "snapshot")
+                features = book.features()
+                if features is None:
+                    continue
+                self._features[symbol] = features
+                if self.quality is not None:
+                    self._track_quality(features)
+        return out_of_sync
+
+    def flush_quality(self) -> None:
+        with self.lock:
+            symbols = list(self._pending_quality)
+            for symbol in symbols:
+                self._check_quality(symbol)
+
+    def _track_quality(self, features: BookFeatures) -> None:
+        pending = self._pending_quality.setdefault(features.symbol, [])
+        pending.append((features.ts, features.seq_id, features.best_bid, features.best_ask))
+        if len(pending) >= self.quality_batch:
+            self._check_quality(features.symbol)
+
+    def _check_quality(self, symbol: str) -> None:
+        pending = self._pending_quality.pop(symbol, None)
+        if not pending:
+            return
+        ts, seq_id, best_bid, best_ask = np.array(pending, dtype=np.float64).T
+        self.quality.check_book(
+            symbol, _BookBatch(ts=ts, seq_id=seq_id, best_bid=best_bid, best_ask=best_ask)
+        )
+
+
+@dataclass(frozen=True)
+class _BookBatch:
+    ts: np.ndarray
+    seq_id: np.ndarray
+    best_bid: np.ndarray
+    best_ask: np.ndarray
+
+
+def replay_book_file(path: str | Path, engine: OrderBookEngine) -> int:
+    # Recorded OKX websocket messages, one JSON object per line.
+    applied = 0
+    with open(path, "rb") as handle:
+        for line in handle:
+            if line.strip():
+                engine.on_message(orjson.loads(line))
+                applied += 1
+    engine.flush_quality()
+    return applied
+
+
+async def run_book_feed(
+    engine: OrderBookEngine, symbols: list[str], url: str, channel: str = "books"
+) -> None:
+    attempt = 0
+    while True:
+        try:
+            async with websockets.connect(url, ping_interval=20) as socket:
+                await _subscribe(socket, "subscribe", channel, symbols)
+                attempt = 0
+                async for raw in socket:
+                    message = orjson.loads(raw)
+                    resync = engine.on_message(message)
+                    if resync:
+                        # Resubscribing makes OKX send a fresh snapshot for those books.
+                        await _subscribe(socket, "unsubscribe", channel, resync)
+                        await _subscribe(socket, "subscribe", channel, resync)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            delay = RECONNECT_BACKOFF_SEC[min(attempt, len(RECONNECT_BACKOFF_SEC) - 1)]
+            attempt += 1
+            logger.warning("order book feed disconnected (%s); reconnecting in %.0fs", exc, delay)
+            await asyncio.sleep(delay)
+        finally:
+            engine.flush_quality()
+
+
+async def _subscribe(socket, op: str, channel: str, symbols: list[str]) -> None:
+    args = [{"channel": channel, "instId": symbol} for symbol in symbols]
+    await socket.send(orjson.dumps({"op": op, "args": args}).decode())
+
+
+@lru_cache
+def get_book_engine() -> OrderBookEngine:
+    settings = get_settings()
+    return OrderBookEngine(
+        max_levels=settings.orderbook_max_levels,
+        depth_bps=settings.orderbook_depth_bps,
+        contract_values=settings.okx_contract_values,
+        quality=get_quality_engine(),
+    )
+
+
+def book_risk_inputs(symbol: str | None) -> tuple[float | None, float | None]:
+    if symbol is None:
+        return (None, None)
+    features = get_book_engine().features(symbol, get_settings().orderbook_max_age_sec)
+    if features is None:
+        return (None, None)
+    return (features.spread_bps, features.depth_usd)
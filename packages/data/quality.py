@@ -1,4 +1,43 @@
-from dataclasses import dataclass
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+from packages.common.config import get_settings
+
+GAP = 1
+DUPLICATE = 2
+OUT_OF_ORDER = 4
+STALE = 8
+SPIKE = 16
+INVALID = 32
+CROSSED = 64
+SEQUENCE = 128
+
+FLAG_NAMES = {
+    GAP: "gap",
+    DUPLICATE: "duplicate",
+    OUT_OF_ORDER: "out_of_order",
+    STALE: "stale",
+    SPIKE: "spike",
+    INVALID: "invalid",
+    CROSSED: "crossed",
+    SEQUENCE: "sequence",
+}
+
+TIMEFRAME_UNITS_MS = {"s": 1000, "m": 60000, "H": 3600000, "D": 86400000, "W": 604800000}
+
+DATA_QUALITY_SCORE = Gauge(
+    "data_quality_score",
+    "Decayed clean-row ratio",
+    ["symbol"],
+    multiprocess_mode="livemostrecent",
+)
+DATA_QUALITY_ISSUES = Counter("data_quality_issues_total", "Rows flagged", ["symbol", "issue"])
 
 
 @dataclass
@@ -12,3 +51,211 @@ def check_snapshot(snapshot: dict) -> DataQualityResult:
     if not snapshot:
         issues.append("empty_snapshot")
     return DataQualityResult(ok=len(issues) == 0, issues=issues)
+
+
+def timeframe_ms(timeframe: str) -> int:
+    unit = timeframe[-1]
+    if unit not in TIMEFRAME_UNITS_MS or not timeframe[:-1].isdigit():
+        raise ValueError(f"unsupported timeframe: {timeframe}")
+    return int(timeframe[:-1]) * TIMEFRAME_UNITS_MS[unit]
+
+
+@dataclass
+class QualityReport:
+    rows: int
+    flags: np.ndarray
+    counts: dict[str, int]
+    score: float
+
+    @property
+    def ok(self) -> bool:
+        return not self.counts
+
+
+# Everything a check needs from earlier batches, so each row is inspected exactly once.
+@dataclass
+class SeriesState:
+    last_ts: float | None = None
+    last_price: float | None = None
+    last_seq: float | None = None
+    stale_price: float | None = None
+    stale_run: int = 0
+    returns: np.ndarray = field(default_factory=lambda: np.empty(0))
+    bad_rate: float = 0.0
+    rows: int = 0
+
+
+class DataQualityEngine:
+    def __init__(
+        self,
+        spike_z: float = 8.0,
+        spike_window: int = 100,
+        spike_min_periods: int = 20,
+        stale_bars: int = 5,
+        score_halflife_rows: int = 500,
+    ) -> None:
+        self.spike_z = spike_z
+        self.spike_window = spike_window
+        self.spike_min_periods = spike_min_periods
+        self.stale_bars = stale_bars
+        self.decay_per_row = 0.5 ** (1.0 / score_halflife_rows)
+        self._series: dict[tuple[str, str], SeriesState] = {}
+        self._lock = threading.Lock()
+
+    def check_candles(self, symbol: str, timeframe: str, candles) -> QualityReport:
+        ts = np.asarray(candles.ts, dtype=np.float64)
+        open_ = np.asarray(candles.open, dtype=np.float64)
+        high = np.asarray(candles.high, dtype=np.float64)
+        low = np.asarray(candles.low, dtype=np.float64)
+        close = np.asarray(candles.close, dtype=np.float64)
+        volume = np.asarray(candles.volume, dtype=np.float64)
+        with self._lock:
+            state = self._series.setdefault((symbol, timeframe), SeriesState())
+            flags = self._timestamp_flags(state, ts, timeframe_ms(timeframe))
+            flags |= np.where(
+                ~(low > 0)
+                | ~(volume >= 0)
+                | (high < np.maximum(open_, close))
+                | (low > np.minimum(open_, close)),
+                INVALID,
+                0,
+            ).astype(np.uint8)
+            flags |= self._stale_flags(state, close)
+            flags |= self._spike_flags(state, close)
+            return self._report(symbol, state, flags)
+
+    def check_book(self, symbol: str, book) -> QualityReport:
+        ts = np.asarray(book.ts, dtype=np.float64)
+        seq = np.asarray(book.seq_id, dtype=np.float64)
+        bid = np.asarray(book.best_bid, dtype=np.float64)
+        ask = np.asarray(book.best_ask, dtype=np.float64)
+        with self._lock:
+            state = self._series.setdefault((symbol, "book"), SeriesState())
+            flags = self._timestamp_flags(state, ts, None)
+            if len(seq):
+                previous = np.concatenate(
+                    ([state.last_seq if state.last_seq is not None else -np.inf], seq[:-1])
+                )
+                # Compare against the running max so one bad id does not flag its successors.
+                previous = np.maximum.accumulate(previous)
+                flags |= np.where(seq <= previous, SEQUENCE, 0).astype(np.uint8)
+                state.last_seq = float(max(previous[-1], seq[-1]))
+            flags |= np.where(~(bid > 0) | ~(ask > 0), INVALID, 0).astype(np.uint8)
+            flags |= np.where(bid >= ask, CROSSED, 0).astype(np.uint8)
+            valid = (flags & (INVALID | CROSSED)) == 0
+            mid = (bid + ask) / 2
+            flags[valid] |= self._spike_flags(state, mid[valid])
+            return self._report(symbol, state, flags)
+
+    # Readers on other threads take the lock: checks add series and update rates under it.
+    def score(self, symbol: str) -> float:
+        with self._lock:
+            return self._score(symbol)
+
+    def scores(self) -> dict[str, float]:
+        result: dict[str, float] = {}
+        with self._lock:
+            for (symbol, _), state in self._series.items():
+                result[symbol] = min(result.get(symbol, 1.0), 1.0 - state.bad_rate)
+        return result
+
+    def _score(self, symbol: str) -> float:
+        scores = [
+            1.0 - state.bad_rate for (name, _), state in self._series.items() if name == symbol
+        ]
+        return min(scores, default=1.0)
+
+    def _timestamp_flags(
+        self, state: SeriesState, ts: np.ndarray, interval: int | None
+    ) -> np.ndarray:
+        flags = np.zeros(len(ts), dtype=np.uint8)
+        if not len(ts):
+            return flags
+        previous = np.concatenate(
+            ([state.last_ts if state.last_ts is not None else -np.inf], ts[:-1])
+        )
+        previous = np.maximum.accumulate(previous)
+        delta = ts - previous
+        flags[delta == 0] |= DUPLICATE
+        flags[delta < 0] |= OUT_OF_ORDER
+        if interval is not None:
+            flags[(delta > interval) & np.isfinite(previous)] |= GAP
+        state.last_ts = float(max(previous[-1], ts[-1]))
+        return flags
+
+    def _stale_flags(self, state: SeriesState, price: np.ndarray) -> np.ndarray:
+        n = len(price)
+        if not n:
+            return np.zeros(0, dtype=np.uint8)
+        previous = np.concatenate(
+            ([state.stale_price if state.stale_price is not None else np.nan], price[:-1])
+        )
+        same = price == previous
+        index = np.arange(n)
+        last_change = np.maximum.accumulate(np.where(same, -1, index))
+        run = np.where(last_change >= 0, index - last_change, index + 1 + state.stale_run)
+        state.stale_run = int(run[-1])
+        state.stale_price = float(price[-1])
+        return np.where(run >= self.stale_bars, STALE, 0).astype(np.uint8)
+
+    # Rolling z-score of log returns against the `spike_window` returns before each one,
+    # computed from prefix sums over the carried tail plus the new batch.
+    def _spike_flags(self, state: SeriesState, price: np.ndarray) -> np.ndarray:
+        n = len(price)
+        if not n:
+            return np.zeros(0, dtype=np.uint8)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            logs = np.log(price)
+            anchor = np.log(state.last_price) if state.last_price else np.nan
+            returns = np.diff(logs, prepend=anchor)
+        tail = state.returns
+        series = np.concatenate((tail, returns))
+        finite = np.isfinite(series)
+        values = np.where(finite, series, 0.0)
+        sums = np.concatenate(([0.0], np.cumsum(values)))
+        squares = np.concatenate(([0.0], np.cumsum(values * values)))
+        counts = np.concatenate(([0], np.cumsum(finite)))
+        end = np.arange(len(tail), len(series))
+        start = np.maximum(end - self.spike_window, 0)
+        count = counts[end] - counts[start]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = (sums[end] - sums[start]) / count
+            var = (squares[end] - squares[start]) / count - mean * mean
+            z = np.abs(returns - mean) / np.sqrt(np.maximum(var, 0.0))
+        spike = (count >= self.spike_min_periods) & np.isfinite(z) & (z > self.spike_z)
+        state.returns = series[finite][-self.spike_window :]
+        state.last_price = float(price[-1])
+        return np.where(spike, SPIKE, 0).astype(np.uint8)
+
+    def _report(self, symbol: str, state: SeriesState, flags: np.ndarray) -> QualityReport:
+        n = len(flags)
+        counts: dict[str, int] = {}
+        if n:
+            bad = int(np.count_nonzero(flags))
+            decay = self.decay_per_row**n
+            state.bad_rate = state.bad_rate * decay + (bad / n) * (1 - decay)
+            state.rows += n
+            if bad:
+                for bit, name in FLAG_NAMES.items():
+                    hits = int(np.count_nonzero(flags & bit))
+                    if hits:
+                        counts[name] = hits
+                        DATA_QUALITY_ISSUES.labels(symbol=symbol, issue=name).inc(hits)
+        score = self._score(symbol)
+        DATA_QUALITY_SCORE.labels(symbol=symbol).set(score)
+        return QualityReport(rows=n, flags=flags, counts=counts, score=score)
+
+
+@lru_cache
+def get_quality_engine() -> DataQualityEngine:
+    settings = get_settings()
+    return DataQualityEngine(
+        spike_z=settings.data_quality_spike_z,
+        spike_window=settings.data_quality_spike_window,
+        stale_bars=settings.data_quality_stale_bars,
+        score_halflife_rows=settings.data_quality_score_halflife_rows,
+    )
+
+
+def quality_score(symbol: str) -> float:
+    return get_quality_engine().score(symbol)
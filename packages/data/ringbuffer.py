@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+
+
+# Fixed-capacity columnar ring. Every row is written twice, at `pos` and `pos + capacity`,
+# so the most recent `capacity` rows are always one contiguous slice of the backing array
+# and reads never have to copy or concatenate. Views stay valid until the ring wraps past
+# them; the last row changes in place while a candle is still forming.
+class ColumnarRing:
+    def __init__(self, fields: tuple[str, ...], capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.fields = fields
+        self.capacity = capacity
+        self._index = {name: i for i, name in enumerate(fields)}
+        self._data = np.full((len(fields), 2 * capacity), np.nan)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    @property
+    def total(self) -> int:
+        return self._count
+
+    def last(self, field: str) -> float | None:
+        if self._count == 0:
+            return None
+        return float(self._data[self._index[field], self._end - 1])
+
+    def append(self, row: tuple[float, ...]) -> None:
+        with self._lock:
+            pos = self._count % self.capacity
+            self._data[:, pos] = row
+            self._data[:, pos + self.capacity] = row
+            self._count += 1
+
+    def replace_last(self, row: tuple[float, ...]) -> None:
+        with self._lock:
+            if self._count == 0:
+                raise IndexError("replace_last on an empty ring")
+            pos = (self._count - 1) % self.capacity
+            self._data[:, pos] = row
+            self._data[:, pos + self.capacity] = row
+
+    def extend(self, rows: np.ndarray) -> None:
+        # rows has shape (n, len(fields)); only the newest `capacity` rows can survive.
+        rows = np.asarray(rows, dtype=np.float64)[-self.capacity :]
+        if len(rows) == 0:
+            return
+        with self._lock:
+            pos = (self._count + np.arange(len(rows))) % self.capacity
+            self._data[:, pos] = rows.T
+            self._data[:, pos + self.capacity] = rows.T
+            self._count += len(rows)
+
+    def view(self, n: int | None = None) -> np.ndarray:
+        size = len(self) if n is None else min(n, len(self))
+        end = self._end
+        block = self._data[:, end - size : end]
+        block.flags.writeable = False
+        return block
+
+    def column(self, field: str, n: int | None = None) -> np.ndarray:
+        return self.view(n)[self._index[field]]
+
+    @property
+    def _end(self) -> int:
+        if self._count == 0:
+            return self.capacity
+        return (self._count - 1) % self.capacity + self.capacity + 1
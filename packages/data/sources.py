@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import httpx
+import orjson
+from prometheus_client import Histogram
+
+from packages.common.config import get_settings
+from packages.common.ratelimit import TokenBucket
+from packages.data.store import CandleBar, Trade
+
+MARKET_FETCH_LATENCY = Histogram(
+    "market_fetch_latency_seconds", "OKX public REST fetch latency", ["endpoint"]
+)
+
+
+class MarketDataError(RuntimeError):
+    pass
+
+
+def parse_okx_candles(symbol: str, timeframe: str, data: list[list[str]]) -> list[CandleBar]:
+    # OKX returns [ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm], newest first.
+    bars = [
+        CandleBar(
+            symbol=symbol,
+            timeframe=timeframe,
+            ts=int(row[0]),
+            open=float(row[1]),
+            high=float(row[2]),
+            low=float(row[3]),
+            close=float(row[4]),
+            volume=float(row[5]),
+            confirmed=row[8] == "1" if len(row) > 8 else True,
+        )
+        for row in data
+    ]
+    bars.sort(key=lambda bar: bar.ts)
+    return bars
+
+
+def parse_okx_trades(symbol: str, data: list[dict]) -> list[Trade]:
+    trades = [
+        Trade(
+            symbol=symbol,
+            trade_id=str(row["tradeId"]),
+            ts=int(row["ts"]),
+            price=float(row["px"]),
+            size=float(row["sz"]),
+            side=row["side"],
+        )
+        for row in data
+    ]
+    trades.sort(key=lambda trade: trade.ts)
+    return trades
+
+
+class OkxMarketSource:
+    def __init__(
+        self,
+        base_url: str = "https://www.okx.com",
+        rate_per_sec: float = 10.0,
+        timeout_sec: float = 10.0,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout_sec = timeout_sec
+        self.bucket = TokenBucket(rate_per_sec, rate_per_sec)
+        self._client = client
+
+    async def fetch_candles(self, symbol: str, timeframe: str, limit: int = 100) -> list[CandleBar]:
+        data = await self._get(
+            "/api/v5/market/candles", {"instId": symbol, "bar": timeframe, "limit": limit}
+        )
+        return parse_okx_candles(symbol, timeframe, data)
+
+    async def fetch_trades(self, symbol: str, limit: int = 100) -> list[Trade]:
+        data = await self._get("/api/v5/market/trades", {"instId": symbol, "limit": limit})
+        return parse_okx_trades(symbol, data)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get(self, path: str, params: dict) -> list:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout_sec)
+        await self.bucket.acquire()
+        with MARKET_FETCH_LATENCY.labels(endpoint=path).time():
+            response = await self._client.get(path, params=params)
+        response.raise_for_status()
+        body = response.json()
+        if body.get("code") != "0":
+            raise MarketDataError(f"okx {path} failed: {body.get('code')} {body.get('msg')}")
+        return body["data"]
+
+
+# Offline stand-in for OkxMarketSource. The file holds one JSON object per line in the OKX
+# response shape, {"instId": ..., "bar": ..., "data": [...]} for candles and
+# {"instId": ..., "trades": [...]} for trades. Each fetch returns the next recorded page.
+class ReplayMarketSource:
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._candles: dict[tuple[str, str], list[list[CandleBar]]] = {}
+        self._trades: dict[str, list[list[Trade]]] = {}
+        self._load()
+
+    async def fetch_candles(self, symbol: str, timeframe: str, limit: int = 100) -> list[CandleBar]:
+        pages = self._candles.get((symbol, timeframe))
+        return pages.pop(0)[-limit:] if pages else []
+
+    async def fetch_trades(self, symbol: str, limit: int = 100) -> list[Trade]:
+        pages = self._trades.get(symbol)
+        return pages.pop(0)[-limit:] if pages else []
+
+    async def close(self) -> None:
+        return None
+
+    def _load(self) -> None:
+        for line in self.path.read_bytes().splitlines():
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            symbol = record["instId"]
+            if "trades" in record:
+                page = parse_okx_trades(symbol, record["trades"])
+                self._trades.setdefault(symbol, []).append(page)
+            else:
+                page = parse_okx_candles(symbol, record["bar"], record["data"])
+                self._candles.setdefault((symbol, record["bar"]), []).append(page)
+
+
+def build_market_source() -> OkxMarketSource | ReplayMarketSource:
+    settings = get_settings()
+    if settings.market_data_source == "replay":
+        return ReplayMarketSource(settings.market_replay_path)
+    return OkxMarketSource(
+        base_url=settings.okx_rest_base, rate_per_sec=settings.okx_public_rate_per_sec
+    )
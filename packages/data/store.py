@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from packages.common.config import get_settings
+from packages.data.ringbuffer import ColumnarRing
+
+CANDLE_FIELDS = ("ts", "open", "high", "low", "close", "volume")
+TRADE_FIELDS = ("ts", "price", "size", "side")
+
+
+@dataclass(frozen=True)
+class CandleBar:
+    symbol: str
+    timeframe: str
+    ts: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    confirmed: bool = True
+
+    def row(self) -> tuple[float, ...]:
+        return (self.ts, self.open, self.high, self.low, self.close, self.volume)
+
+
+@dataclass(frozen=True)
+class Trade:
+    symbol: str
+    trade_id: str
+    ts: int
+    price: float
+    size: float
+    side: str
+
+    def row(self) -> tuple[float, ...]:
+        return (self.ts, self.price, self.size, 1.0 if self.side == "buy" else -1.0)
+
+
+# Read-only views into the ring; `ts` is epoch milliseconds stored as float64.
+@dataclass(frozen=True)
+class CandleView:
+    ts: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    @classmethod
+    def from_bars(cls, bars: list[CandleBar]) -> CandleView:
+        block = np.array([bar.row() for bar in bars], dtype=np.float64).reshape(-1, 6)
+        return cls(*block.T)
+
+
+@dataclass(frozen=True)
+class TradeView:
+    ts: np.ndarray
+    price: np.ndarray
+    size: np.ndarray
+    side: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+
+@dataclass
+class AppendResult:
+    appended: int = 0
+    updated: int = 0
+    stale: int = 0
+
+
+class MarketDataStore:
+    def __init__(
+        self,
+        candle_capacity: int = 1440,
+        trade_capacity: int = 4096,
+        max_series: int = 2000,
+    ) -> None:
+        self.candle_capacity = candle_capacity
+        self.trade_capacity = trade_capacity
+        self.max_series = max_series
+        self._candles: dict[tuple[str, str], ColumnarRing] = {}
+        self._trades: dict[str, ColumnarRing] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        rings = list(self._candles.values()) + list(self._trades.values())
+        return sum(ring.nbytes for ring in rings)
+
+    def series(self) -> list[tuple[str, str]]:
+        return list(self._candles)
+
+    def candle_ring(self, symbol: str, timeframe: str) -> ColumnarRing:
+        key = (symbol, timeframe)
+        ring = self._candles.get(key)
+        if ring is None:
+            with self._lock:
+                ring = self._candles.get(key)
+                if ring is None:
+                    self._check_capacity()
+                    ring = ColumnarRing(CANDLE_FIELDS, self.candle_capacity)
+                    self._candles[key] = ring
+        return ring
+
+    def trade_ring(self, symbol: str) -> ColumnarRing:
+        ring = self._trades.get(symbol)
+        if ring is None:
+            with self._lock:
+                ring = self._trades.get(symbol)
+                if ring is None:
+                    self._check_capacity()
+                    ring = ColumnarRing(TRADE_FIELDS, self.trade_capacity)
+                    self._trades[symbol] = ring
+        return ring
+
+    def append_candles(self, bars: list[CandleBar]) -> AppendResult:
+        # Bars for one series must arrive oldest first. A bar with the latest ts updates
+        # the forming candle in place; anything older than that is already final.
+        result = AppendResult()
+        for bar in bars:
+            ring = self.candle_ring(bar.symbol, bar.timeframe)
+            last_ts = ring.last("ts")
+            if last_ts is None or bar.ts > last_ts:
+                ring.append(bar.row())
+                result.appended += 1
+            elif bar.ts == last_ts:
+                ring.replace_last(bar.row())
+                result.updated += 1
+            else:
+                result.stale += 1
+        return result
+
+    def append_trades(self, trades: list[Trade]) -> int:
+        appended = 0
+        for trade in trades:
+            ring = self.trade_ring(trade.symbol)
+            last_ts = ring.last("ts")
+            if last_ts is not None and trade.ts < last_ts:
+                continue
+            ring.append(trade.row())
+            appended += 1
+        return appended
+
+    def candles(self, symbol: str, timeframe: str, n: int | None = None) -> CandleView:
+        block = self.candle_ring(symbol, timeframe).view(n)
+        return CandleView(*block)
+
+    def trades(self, symbol: str, n: int | None = None) -> TradeView:
+        block = self.trade_ring(symbol).view(n)
+        return TradeView(*block)
+
+    def last_ts(self, symbol: str, timeframe: str) -> int | None:
+        ring = self._candles.get((symbol, timeframe))
+        last = ring.last("ts") if ring is not None else None
+        return int(last) if last is not None else None
+
+    def _check_capacity(self) -> None:
+        if len(self._candles) + len(self._trades) >= self.max_series:
+            raise ValueError(f"market data store is limited to {self.max_series} series")
+
+
+@lru_cache
+def get_market_store() -> MarketDataStore:
+    settings = get_settings()
+    return MarketDataStore(
+        candle_capacity=settings.market_candle_capacity,
+        trade_capacity=settings.market_trade_capacity,
+        max_series=settings.market_max_series,
+    )
@@ -1,21 +1,41 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from enum import Enum
+from functools import lru_cache
+from typing import Callable
 
-from packages.audit.service import log_event
-from packages.common.db import SessionLocal
-from packages.common.models import ExchangeReceipt, Fill, OrderInstruction
+from packages.common.config import get_settings
+from packages.common.metrics import timed
+from packages.common.repository import ExecutionRecord, Repository, get_repository
+from packages.execution.lifecycle import (
+    LifecycleUpdate,
+    LiveOrder,
+    OrderManager,
+    Reconciliation,
+    get_order_manager,
+)
+from packages.execution.matching import (
+    OrderUpdate,
+    PaperMatchingEngine,
+    PaperOrder,
+    get_paper_matcher,
+)
+from packages.execution.okx import (
+    LIVE_ORDER_TYPES,
+    OkxGateway,
+    OrderAck,
+    client_order_id,
+    get_okx_gateway,
+    order_side,
+    order_type,
+)
+from packages.execution.orders import OPEN_STATUSES, OrderStatus
+from packages.portfolio.state import SIDE_SIGN, PortfolioService, get_portfolio
 
-
-class OrderStatus(str, Enum):
-    NEW = "NEW"
-    PARTIAL = "PARTIAL"
-    FILLED = "FILLED"
-    CANCELED = "CANCELED"
-    REJECTED = "REJECTED"
-    ERROR = "ERROR"
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -24,79 +44,569 @@ class ExecutionResult:
     receipt: dict
 
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _event_type(status: str) -> str:
+    return f"order_{status.lower()}"
+
+
+# Repository, portfolio and clock are injectable so the backtester can drive this same code
+# against in-memory persistence, its own portfolio and simulated time. With a matcher, paper
+# orders are matched against the order book; without one, or while a symbol has no fresh
+# book, they fill at once at the plan price with the flat fee and slippage below. Live orders
+# go to OKX through the gateway; their fills arrive later as pushes on the orders channel.
 class ExecutionEngine:
-    def __init__(self, live_trading_enabled: bool) -> None:
+    def __init__(
+        self,
+        live_trading_enabled: bool,
+        repository: Repository | None = None,
+        portfolio: PortfolioService | None = None,
+        fee_bps: float = 0.0,
+        slippage_bps: float = 0.0,
+        clock: Callable[[], datetime] = _utcnow,
+        matcher: PaperMatchingEngine | None = None,
+        gateway: OkxGateway | None = None,
+        orders: OrderManager | None = None,
+    ) -> None:
         self.live_trading_enabled = live_trading_enabled
+        self.repository = repository or get_repository()
+        self.portfolio = portfolio
+        self.fee_bps = fee_bps
+        self.slippage_bps = slippage_bps
+        self.clock = clock
+        self.matcher = matcher
+        self.gateway = gateway
+        self.orders = orders if orders is not None else OrderManager()
 
+    @timed("submit_order", sample_rate=1.0)
     def submit_order(self, plan: dict) -> ExecutionResult:
-        instruction = self._build_instruction(plan)
-        self._persist_instruction(instruction)
-        receipt = self._paper_fill(instruction)
-        status = OrderStatus.FILLED if receipt["status"] == "filled" else OrderStatus.ERROR
-        return ExecutionResult(status=status, receipt=receipt)
+        return self.submit_orders([plan])[0]
+
+    # Raises DuplicateExecution, and stores nothing, if any plan_id was executed before.
+    def submit_orders(self, plans: list[dict]) -> list[ExecutionResult]:
+        if self.live_trading_enabled:
+            records = self._live_records(plans)
+            # Stored before sending, so a duplicate plan never reaches the exchange.
+            self.repository.record_executions(records)
+            acked = self._send_live(self._track_live(records))
+            self.repository.record_executions(acked)
+            return self._results(acked)
+        submitted = [self._execute(instruction) for instruction in self._paper_instructions(plans)]
+        records = [record for record, _ in submitted]
+        try:
+            fills = self.repository.record_executions(records)
+        except BaseException:
+            # Nothing was stored, so nothing may keep resting (and filling) in the matcher.
+            self._discard(submitted)
+            raise
+        self._apply(records, fills, submitted)
+        return self._results(records)
+
+    @timed("submit_orders_async", sample_rate=1.0)
+    async def submit_orders_async(self, plans: list[dict]) -> list[ExecutionResult]:
+        if self.live_trading_enabled:
+            records = self._live_records(plans)
+            await self.repository.record_executions_async(records)
+            orders = self._track_live(records)
+            try:
+                acks = await self._live_gateway().place_orders(
+                    [order.instruction for order in orders]
+                )
+            except Exception as exc:
+                logger.exception("live order submit failed")
+                acks = [exc] * len(orders)
+            acked = self._ack_records(orders, acks)
+            await self.repository.record_executions_async(acked)
+            return self._results(acked)
+        submitted = [self._execute(instruction) for instruction in self._paper_instructions(plans)]
+        records = [record for record, _ in submitted]
+        try:
+            fills = await self.repository.record_executions_async(records)
+        except BaseException:
+            # Nothing was stored, so nothing may keep resting (and filling) in the matcher.
+            self._discard(submitted)
+            raise
+        self._apply(records, fills, submitted)
+        return self._results(records)
+
+    def order_error(self, plan: dict) -> str | None:
+        # Why the plan cannot become an order here, for callers to refuse it up front.
+        side = (plan.get("intent") or {}).get("side")
+        entry_type = (plan.get("entry") or {}).get("type")
+        try:
+            order_side(side)
+        except ValueError as exc:
+            return str(exc)
+        if self.live_trading_enabled and entry_type not in LIVE_ORDER_TYPES:
+            return f"unsupported order type: {entry_type!r}"
+        return None
+
+    def cancel_order(self, order_id: str) -> ExecutionResult | None:
+        if self.live_trading_enabled:
+            return self._cancel_live(order_id)
+        if self.matcher is None:
+            return None
+        update = self.matcher.cancel(order_id, self._now_ms())
+        if update is None:
+            return None
+        record = self._update_record(update)
+        self._apply([record], self.repository.record_executions([record]), [])
+        return self._results([record])[0]
+
+    def sync_order_updates(self) -> int:
+        # Persists what resting paper orders did on book updates, and the live order pushes
+        # received, since the last call; then escalates live orders past their deadline.
+        records = []
+        if self.matcher is not None:
+            records.extend(self._update_record(update) for update in self.matcher.drain())
+        if self.gateway is not None:
+            now_ms = self._now_ms()
+            updates = [self.orders.apply(push, now_ms) for push in self.gateway.drain()]
+            records.extend(self._lifecycle_records(updates))
+            self._escalate(now_ms)
+        if records:
+            self._apply(records, self.repository.record_executions(records), [])
+        return len(records)
+
+    def reconcile_live(self, grace_sec: float = 5.0) -> Reconciliation | None:
+        # Diffs tracked orders and fill-implied positions against the exchange's open orders
+        # and positions, and settles orders that closed without us seeing the push.
+        if self.gateway is None:
+            return None
+        gateway = self.gateway
+        now_ms = self._now_ms()
+        pending = gateway.run_blocking(gateway.pending_orders())
+        result = self.orders.reconcile(pending, now_ms, int(grace_sec * 1000))
+        updates = list(result.updates)
+        for order in result.missing:
+            row = gateway.run_blocking(gateway.order_details(order.symbol, order.cl_ord_id))
+            if row is None:
+                updates.append(self.orders.fail(order.cl_ord_id, "unknown to exchange", now_ms))
+            else:
+                updates.append(self.orders.apply(row, now_ms))
+        records = self._lifecycle_records(updates)
+        if records:
+            self._apply(records, self.repository.record_executions(records), [])
+        result.drift = self.orders.position_drift(gateway.run_blocking(gateway.positions()))
+        if result.orphans:
+            logger.warning(
+                "%d open exchange orders are not tracked: %s",
+                len(result.orphans),
+                ", ".join(row.get("clOrdId") or row.get("ordId", "") for row in result.orphans),
+            )
+        for symbol, drift in result.drift.items():
+            logger.warning("position drift on %s: %+.8g contracts", symbol, drift)
+        return result
+
+    def _apply(
+        self,
+        records: list[ExecutionRecord],
+        fills: list,
+        submitted: list[tuple[ExecutionRecord, PaperOrder | None]],
+    ) -> None:
+        for record, order in submitted:
+            if order is not None:
+                order.record_id = record.order_id
+        portfolio = self.portfolio or get_portfolio()
+        portfolio.apply_fills(fills)
+        # A closing order's fills become one trade outcome once the order, and any escalation
+        # replacing it, is done.
+        done = [
+            record.receipt["instruction"]["plan_id"]
+            for record in records
+            if OrderStatus(record.status) not in OPEN_STATUSES
+            and not any(
+                order.is_open
+                for order in self.orders.for_plan(record.receipt["instruction"]["plan_id"])
+            )
+        ]
+        if done:
+            portfolio.settle(done, self.clock())
+
+    def _discard(self, submitted: list[tuple[ExecutionRecord, PaperOrder | None]]) -> None:
+        for _, order in submitted:
+            if order is not None:
+                self.matcher.discard(order.order_id)
+
+    def _results(self, records: list[ExecutionRecord]) -> list[ExecutionResult]:
+        return [
+            ExecutionResult(status=OrderStatus(record.status), receipt=record.receipt)
+            for record in records
+        ]
+
+    def _now_ms(self) -> int:
+        return int(self.clock().timestamp() * 1000)
+
+    def _paper_instructions(self, plans: list[dict]) -> list[dict]:
+        instructions = [self._build_instruction(plan) for plan in plans]
+        # All checked before any reaches the matcher, where a flat side has no book side.
+        for instruction in instructions:
+            order_side(instruction["side"])
+        return instructions
 
     def _build_instruction(self, plan: dict) -> dict:
+        price = plan["entry"]["price_range"][0]
+        notional = plan["sizing"]["notional_usd"]
+        contract_value = get_settings().okx_contract_values.get(plan["meta"]["symbol"], 1.0)
         return {
             "plan_id": plan["meta"]["plan_id"],
             "symbol": plan["meta"]["symbol"],
             "market_type": plan["meta"]["market_type"],
             "side": plan["intent"]["side"],
             "order_type": plan["entry"]["type"],
-            "qty": plan["sizing"]["notional_usd"],
-            "price": plan["entry"]["price_range"][0],
+            "qty": notional / (price * contract_value) if price else notional,
+            "notional_usd": notional,
+            "price": price,
+            "tif": plan["entry"].get("tif"),
+            "post_only": plan["execution"]["post_only"],
             "reduce_only": plan["execution"]["reduce_only"],
+            "max_slippage_bps": plan["execution"].get("max_slippage_bps"),
+            "timeout_sec": plan["execution"].get("timeout_sec"),
+            "closes_plan_id": plan["meta"].get("closes_plan_id"),
+            "closes_notional": plan["meta"].get("closes_notional"),
+            "exit_reason": plan["meta"].get("exit_reason"),
             "payload": plan,
         }
 
-    def _persist_instruction(self, instruction: dict) -> None:
-        session = SessionLocal()
+    def _order_row(self, instruction: dict, now: datetime) -> dict:
+        return {
+            "plan_id": instruction["plan_id"],
+            "ts": now,
+            "symbol": instruction["symbol"],
+            "market_type": instruction["market_type"],
+            "side": instruction["side"],
+            "order_type": instruction["order_type"],
+            "qty": instruction["qty"],
+            "price": instruction["price"],
+            "reduce_only": instruction["reduce_only"],
+            "payload": instruction,
+        }
+
+    def _execute(self, instruction: dict) -> tuple[ExecutionRecord, PaperOrder | None]:
+        if self.matcher is not None:
+            update = self.matcher.submit(instruction, self._now_ms())
+            if update is not None:
+                instruction["qty"] = update.order.qty
+                record = self._update_record(update)
+                record.order = self._order_row(instruction, self.clock())
+                return record, update.order
+        return self._paper_fill(instruction), None
+
+    def _update_record(self, update: OrderUpdate) -> ExecutionRecord:
+        order = update.order
+        ts = datetime.fromtimestamp(update.ts_ms / 1000, tz=timezone.utc)
+        fills = update.fills
+        qty = sum(fill.qty for fill in fills)
+        receipt = {
+            "status": update.status.value.lower(),
+            "ts": ts.isoformat(),
+            "order_instruction_id": order.record_id,
+            "instruction": order.instruction,
+            "order_id": order.order_id,
+            "price": sum(fill.price * fill.qty for fill in fills) / qty if qty else None,
+            "fee": sum(fill.fee for fill in fills),
+            "filled_qty": order.filled_qty,
+            "avg_price": order.avg_price,
+            "queue_ahead": order.queue_ahead,
+            "reason": order.reason,
+            "paper": True,
+        }
+        return ExecutionRecord(
+            order=None,
+            order_id=order.record_id,
+            status=update.status.value,
+            receipt=receipt,
+            event_type=_event_type(update.status.value),
+            fills=[
+                {
+                    "plan_id": order.instruction["plan_id"],
+                    "ts": ts,
+                    "symbol": order.symbol,
+                    "price": fill.price,
+                    "qty": fill.qty,
+                    "fee": fill.fee,
+                    "slippage": fill.slippage,
+                    "raw": {
+                        **receipt,
+                        "fill": {"notional_usd": fill.notional, "liquidity": fill.liquidity},
+                    },
+                }
+                for fill in fills
+            ],
+        )
+
+    def _live_gateway(self) -> OkxGateway:
+        if self.gateway is None:
+            self.gateway = get_okx_gateway()
+        return self.gateway
+
+    def _live_records(self, plans: list[dict]) -> list[ExecutionRecord]:
+        now = self.clock()
+        records = []
+        for plan in plans:
+            instruction = self._build_instruction(plan)
+            # Checked before anything is stored, so a bad side or order type never leaves a
+            # dangling NEW row.
+            order_side(instruction["side"])
+            order_type(instruction)
+            records.append(
+                ExecutionRecord(
+                    order=self._order_row(instruction, now),
+                    status=OrderStatus.NEW.value,
+                    receipt={
+                        "status": "submitted",
+                        "ts": now.isoformat(),
+                        "order_instruction_id": None,
+                        "instruction": instruction,
+                        "cl_ord_id": client_order_id(instruction["plan_id"]),
+                        "paper": False,
+                    },
+                    event_type="order_submitted",
+                )
+            )
+        return records
+
+    def _track_live(self, records: list[ExecutionRecord]) -> list[LiveOrder]:
+        # Tracked before sending so pushes racing the ack are not dropped.
+        now_ms = self._now_ms()
+        orders = [
+            self.orders.new_order(record.receipt["instruction"], record.order_id, now_ms)
+            for record in records
+        ]
+        for order in orders:
+            self.orders.track(order)
+        return orders
+
+    def _send_live(self, orders: list[LiveOrder]) -> list[ExecutionRecord]:
+        try:
+            acks = self._live_gateway().place_orders_blocking(
+                [order.instruction for order in orders]
+            )
+        except Exception as exc:
+            logger.exception("live order submit failed")
+            acks = [exc] * len(orders)
+        return self._ack_records(orders, acks)
+
+    def _ack_records(
+        self, orders: list[LiveOrder], acks: list[OrderAck | Exception]
+    ) -> list[ExecutionRecord]:
+        acked = []
+        for order, ack in zip(orders, acks):
+            receipt = {
+                "status": "error",
+                "ts": self.clock().isoformat(),
+                "order_instruction_id": order.record_id,
+                "instruction": order.instruction,
+                "cl_ord_id": order.cl_ord_id,
+                "stage": order.stage,
+                "paper": False,
+            }
+            if isinstance(ack, OrderAck):
+                status = OrderStatus.NEW if ack.accepted else OrderStatus.REJECTED
+                receipt.update(
+                    status=status.value.lower(),
+                    order_id=ack.ord_id,
+                    code=ack.code,
+                    reason=ack.message or None,
+                    transport=ack.transport,
+                    ack_ms=ack.latency_sec * 1000,
+                )
+                if ack.accepted:
+                    order.ord_id = ack.ord_id
+                else:
+                    self.orders.forget(order.cl_ord_id)
+            else:
+                # Unknown outcome: the order stays tracked and reconciliation settles it.
+                status = OrderStatus.ERROR
+                receipt["reason"] = str(ack) or type(ack).__name__
+            acked.append(
+                ExecutionRecord(
+                    order=None,
+                    order_id=order.record_id,
+                    status=status.value,
+                    receipt=receipt,
+                    event_type=_event_type(status.value),
+                )
+            )
+        return acked
+
+    def _escalate(self, now_ms: int) -> None:
+        expired = self.orders.due(now_ms)
+        if not expired:
+            return
         try:
-            order = OrderInstruction(
-                plan_id=instruction["plan_id"],
-                symbol=instruction["symbol"],
-                market_type=instruction["market_type"],
-                side=instruction["side"],
-                order_type=instruction["order_type"],
-                qty=instruction["qty"],
-                price=instruction["price"],
-                reduce_only=instruction["reduce_only"],
-                payload=instruction,
+            acks = self.gateway.cancel_orders_blocking(
+                [(order.symbol, order.cl_ord_id) for order in expired]
+            )
+        except Exception:
+            logger.exception("escalation cancel failed")
+            acks = [None] * len(expired)
+        for order, ack in zip(expired, acks):
+            # 51400: already filled or canceled; the push settles it either way.
+            if ack is None or not (ack.accepted or ack.code == "51400"):
+                self.orders.rearm(order, now_ms)
+
+    def _cancel_live(self, cl_ord_id: str) -> ExecutionResult | None:
+        order = self.orders.get(cl_ord_id)
+        if order is None:
+            return None
+        ack = self._live_gateway().cancel_orders_blocking([(order.symbol, cl_ord_id)])[0]
+        # The order stays open until the orders channel reports it canceled.
+        return ExecutionResult(
+            status=order.status,
+            receipt={
+                "status": "cancel_requested" if ack.accepted else "cancel_rejected",
+                "ts": self.clock().isoformat(),
+                "order_instruction_id": order.record_id,
+                "cl_ord_id": cl_ord_id,
+                "code": ack.code,
+                "reason": ack.message or None,
+                "paper": False,
+            },
+        )
+
+    def _lifecycle_records(self, updates: list[LifecycleUpdate | None]) -> list[ExecutionRecord]:
+        # Records for applied exchange events, plus the acks of any escalation replacements.
+        records, replacements = [], []
+        for update in updates:
+            if update is None:
+                continue
+            records.append(self._lifecycle_record(update))
+            if update.status == OrderStatus.CANCELED:
+                instruction = self.orders.replacement(update.order)
+                if instruction is not None:
+                    order = self.orders.new_order(
+                        instruction, update.order.record_id, self._now_ms()
+                    )
+                    self.orders.track(order)
+                    replacements.append(order)
+        if replacements:
+            records.extend(self._send_live(replacements))
+        return records
+
+    def _lifecycle_record(self, update: LifecycleUpdate) -> ExecutionRecord:
+        order = update.order
+        instruction = order.instruction
+        ts = datetime.fromtimestamp(update.ts_ms / 1000, tz=timezone.utc)
+        fill = update.fill
+        receipt = {
+            "status": update.status.value.lower(),
+            "ts": ts.isoformat(),
+            "order_instruction_id": order.record_id,
+            "instruction": instruction,
+            "order_id": order.ord_id,
+            "cl_ord_id": order.cl_ord_id,
+            "stage": order.stage,
+            "price": fill.price if fill else None,
+            "fee": fill.fee if fill else 0.0,
+            "filled_qty": order.filled_qty,
+            "avg_price": order.avg_price,
+            "reason": update.reason,
+            "paper": False,
+        }
+        fills = []
+        if fill is not None:
+            contract_value = get_settings().okx_contract_values.get(order.symbol, 1.0)
+            sign = 1.0 if order.is_buy else -1.0
+            # Replacements keep the first order's price as the slippage reference.
+            reference = instruction.get("arrival_price") or instruction.get("price") or fill.price
+            fills.append(
+                {
+                    "plan_id": order.plan_id,
+                    "ts": ts,
+                    "symbol": order.symbol,
+                    "price": fill.price,
+                    "qty": fill.qty,
+                    "fee": fill.fee,
+                    "slippage": sign * (fill.price - reference) * fill.qty * contract_value,
+                    "raw": {
+                        **receipt,
+                        "fill": {
+                            "notional_usd": fill.price * fill.qty * contract_value,
+                            "liquidity": fill.liquidity,
+                            "trade_id": fill.trade_id,
+                        },
+                    },
+                }
             )
-            session.add(order)
-            session.commit()
-        finally:
-            session.close()
+        return ExecutionRecord(
+            order=None,
+            order_id=order.record_id,
+            status=update.status.value,
+            receipt=receipt,
+            event_type=_event_type(update.status.value),
+            fills=fills,
+        )
 
-    def _paper_fill(self, instruction: dict) -> dict:
+    def _paper_fill(self, instruction: dict) -> ExecutionRecord:
+        now = self.clock()
+        price = instruction.get("price") or 0.0
+        notional = instruction["notional_usd"]
+        # Slippage always moves the fill against the order's direction.
+        sign = SIDE_SIGN.get(instruction["side"], 0.0)
+        fill_price = price * (1 + sign * self.slippage_bps / 10000)
+        fee = notional * self.fee_bps / 10000
         receipt = {
             "status": "filled",
-            "ts": datetime.now(timezone.utc).isoformat(),
+            "ts": now.isoformat(),
+            "order_instruction_id": None,
             "instruction": instruction,
+            "price": fill_price,
+            "fee": fee,
             "paper": True,
         }
-        session = SessionLocal()
+        return ExecutionRecord(
+            order=self._order_row(instruction, now),
+            status=OrderStatus.FILLED.value,
+            receipt=receipt,
+            fills=[
+                {
+                    "plan_id": instruction["plan_id"],
+                    "ts": now,
+                    "symbol": instruction["symbol"],
+                    "price": fill_price,
+                    "qty": instruction["qty"],
+                    "fee": fee,
+                    "slippage": notional * self.slippage_bps / 10000 if sign else 0.0,
+                }
+            ],
+        )
+
+
+async def run_order_sync(engine: ExecutionEngine, interval_sec: float) -> None:
+    while True:
         try:
-            order = session.query(OrderInstruction).order_by(OrderInstruction.id.desc()).first()
-            if order:
-                exchange_receipt = ExchangeReceipt(
-                    order_instruction_id=order.id,
-                    status=OrderStatus.FILLED.value,
-                    raw=receipt,
-                )
-                session.add(exchange_receipt)
-                fill = Fill(
-                    plan_id=instruction["plan_id"],
-                    symbol=instruction["symbol"],
-                    price=instruction.get("price") or 0.0,
-                    qty=instruction["qty"],
-                    fee=0.0,
-                    slippage=0.0,
-                    raw=receipt,
-                )
-                session.add(fill)
-                session.commit()
-        finally:
-            session.close()
+            await asyncio.to_thread(engine.sync_order_updates)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("order update sync failed")
+        await asyncio.sleep(interval_sec)
+
+
+async def run_order_reconcile(
+    engine: ExecutionEngine, interval_sec: float, grace_sec: float
+) -> None:
+    # The first pass runs at startup so positions opened before it become the baseline.
+    while True:
+        try:
+            await asyncio.to_thread(engine.reconcile_live, grace_sec)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("live order reconcile failed")
+        await asyncio.sleep(interval_sec)
+
 
-        log_event("order_filled", receipt)
-        return receipt
+@lru_cache
+def get_execution_engine() -> ExecutionEngine:
+    settings = get_settings()
+    return ExecutionEngine(
+        live_trading_enabled=settings.live_trading_enabled,
+        fee_bps=settings.paper_taker_fee_bps,
+        matcher=get_paper_matcher() if settings.paper_matching_enabled else None,
+        gateway=get_okx_gateway() if settings.live_trading_enabled else None,
+        orders=get_order_manager(),
+    )
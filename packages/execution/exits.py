@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from packages.common.repository import Repository, get_repository
+from packages.portfolio.state import SIDE_SIGN, Position
+
+CLOSING_SIDE = {"long": "short", "short": "long"}
+
+
+def executed_plan(plan_id: str, repository: Repository | None = None) -> dict | None:
+    execution = (repository or get_repository()).execution_for_plan(plan_id)
+    if execution is None:
+        return None
+    return (execution["receipt"].get("instruction") or {}).get("payload")
+
+
+def exit_plan_id(plan_id: str, reason: str) -> str:
+    # One exit per plan and level, so a stop re-triggered before it fills replays the first.
+    return f"{plan_id}-{reason}"
+
+
+# `notional` is the entry cost to close. The order is sized at its current value, so it is for
+# the contracts that cost bought, and each fill closes its share of that cost.
+def exit_plan(position: Position, plan: dict, price: float, reason: str, notional: float) -> dict:
+    now = datetime.now(timezone.utc).isoformat()
+    value = notional * price / position.entry_price if position.entry_price > 0 else notional
+    return {
+        "meta": {
+            "symbol": position.symbol,
+            "market_type": plan["meta"]["market_type"],
+            "ts": now,
+            "timeframe": plan["meta"].get("timeframe", "1h"),
+            "plan_id": exit_plan_id(position.plan_id, reason),
+            # The engine reduces this position first and books the exit's PnL against it.
+            "closes_plan_id": position.plan_id,
+            "closes_notional": notional,
+            "exit_reason": reason,
+        },
+        "intent": {"side": CLOSING_SIDE[position.side], "regime": "exit", "confidence": 1.0},
+        "entry": {
+            "type": "market",
+            "price_range": [price, price],
+            "conditions": [reason],
+            "tif": "IOC",
+        },
+        "risk": {
+            "stop_loss": 0,
+            "take_profit": [],
+            "trailing": {"enabled": False, "distance_pct": 0.0},
+            "max_loss_pct": 0.0,
+            "risk_budget_pct": 0.0,
+        },
+        "sizing": {
+            "leverage": plan["sizing"].get("leverage", 1),
+            "notional_usd": value,
+            "max_position_pct": 0,
+            "margin_mode": plan["sizing"].get("margin_mode", "cross"),
+        },
+        "execution": {
+            "post_only": False,
+            "reduce_only": True,
+            "max_slippage_bps": plan["execution"].get("max_slippage_bps", 0),
+            "timeout_sec": 0,
+            "retry_policy": {"max_retries": 0, "backoff_sec": 0},
+        },
+        "validity": {"expires_at": now, "invalidation_conditions": []},
+        "rationale": {
+            "signals_used": [],
+            "event_summary": "N/A",
+            "onchain_summary": "N/A",
+            "key_levels": [price],
+            "notes": f"{reason} exit of {position.plan_id}",
+        },
+    }
+
+
+def triggered_exits(position: Position, plan: dict, price: float) -> list[dict]:
+    # The stop closes the whole position; take-profit sizes are fractions of the planned notional.
+    sign = SIDE_SIGN.get(position.side, 0.0)
+    risk = plan.get("risk") or {}
+    stop = risk.get("stop_loss") or 0.0
+    if not sign or price <= 0:
+        return []
+    if stop and sign * (price - stop) <= 0:
+        return [exit_plan(position, plan, price, "sl", position.notional)]
+    planned = plan["sizing"].get("notional_usd") or position.notional
+    return [
+        exit_plan(
+            position,
+            plan,
+            price,
+            f"tp{level}",
+            min(position.notional, planned * target.get("size_pct", 1.0)),
+        )
+        for level, target in enumerate(risk.get("take_profit") or [], start=1)
+        if target.get("price") and sign * (price - target["price"]) >= 0
+    ]
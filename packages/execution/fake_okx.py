@@ -0,0 +1,450 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import time
+from decimal import Decimal
+
+import orjson
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+from packages.common.ratelimit import TokenBucket
+from packages.execution.okx import RATE_LIMITS, OkxCredentials
+
+OPEN_STATES = ("live", "partially_filled")
+ORDER_OPS = ("order", "batch-orders", "cancel-order", "batch-cancel-orders")
+
+
+def _now_ms() -> str:
+    return str(int(time.time() * 1000))
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.8f}".rstrip("0").rstrip(".")
+
+
+def _result(item: dict, ord_id: str, code: str = "0", message: str = "") -> dict:
+    return {
+        "clOrdId": item.get("clOrdId", ""),
+        "ordId": ord_id,
+        "tag": "",
+        "sCode": code,
+        "sMsg": message,
+    }
+
+
+def _response(results: list[dict]) -> dict:
+    # OKX batch semantics: "0" all succeeded, "1" all failed, "2" mixed.
+    failed = sum(result["sCode"] != "0" for result in results)
+    if not failed:
+        return {"code": "0", "msg": "", "data": results}
+    if failed == len(results):
+        return {"code": "1", "msg": "All operations failed", "data": results}
+    return {"code": "2", "msg": "Bulk operation partially succeeded", "data": results}
+
+
+# Local stand-in for the OKX private trade API: the REST order endpoints, the instruments
+# endpoint and the private websocket (login, orders channel, order ops) with OKX's message
+# shapes, rate limits and lot and tick checks, so the live gateway can run without an account. Market, IOC/FOK and marketable limit orders
+# fill in full at the instrument's price and unmarketable IOC/FOK orders are canceled. Other
+# limit orders rest until set_price crosses them, fill() fills them (in part) or they are
+# canceled. Marketable post-only orders are canceled, as on OKX. Net positions follow fills
+# for the positions endpoint.
+class FakeOkxExchange:
+    def __init__(
+        self,
+        credentials: OkxCredentials,
+        prices: dict[str, float] | None = None,
+        contract_values: dict[str, float] | None = None,
+        instruments: dict[str, dict] | None = None,
+        default_price: float = 100.0,
+        maker_fee_bps: float = 2.0,
+        taker_fee_bps: float = 5.0,
+        ack_delay_sec: float = 0.0,
+    ) -> None:
+        self.credentials = credentials
+        self.prices = dict(prices or {})
+        self.contract_values = contract_values or {}
+        # instId -> {"tickSz", "lotSz", "minSz"} overrides of the defaults below.
+        self.instruments = instruments or {}
+        self.default_price = default_price
+        self.maker_fee_bps = maker_fee_bps
+        self.taker_fee_bps = taker_fee_bps
+        self.ack_delay_sec = ack_delay_sec
+        # False drops order pushes, as if the private websocket missed them.
+        self.push_enabled = True
+        self.orders: dict[str, dict] = {}
+        self.positions: dict[str, float] = {}
+        self.requests: list[tuple[str, str, int]] = []
+        self._ord_ids = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+        self._sockets: set[WebSocket] = set()
+        self._subscribers: set[WebSocket] = set()
+        self.app = self._build_app()
+
+    def price(self, inst_id: str) -> float:
+        return self.prices.get(inst_id, self.default_price)
+
+    def instrument(self, inst_id: str) -> dict:
+        spec = {
+            "tickSz": "0.1",
+            "lotSz": "0.01",
+            "minSz": "0.01",
+            **self.instruments.get(inst_id, {}),
+        }
+        return {
+            "instType": "SWAP" if inst_id.endswith("-SWAP") else "SPOT",
+            "instId": inst_id,
+            "ctVal": _fmt(self.contract_values.get(inst_id, 1.0)),
+            "state": "live",
+            **spec,
+        }
+
+    async def set_price(self, inst_id: str, price: float) -> None:
+        # Resting limit orders the new price crosses fill in full as maker at their limit.
+        self.prices[inst_id] = price
+        pushes = []
+        for order in self.orders.values():
+            if order["instId"] != inst_id or order["state"] not in OPEN_STATES:
+                continue
+            limit = float(order["px"])
+            if (order["side"] == "buy" and price <= limit) or (
+                order["side"] == "sell" and price >= limit
+            ):
+                pushes.append(self._fill(order, limit, maker=True))
+        await self._publish(pushes)
+
+    async def fill(
+        self, cl_ord_id: str, qty: float | None = None, price: float | None = None
+    ) -> None:
+        # Fills an open order, in part when qty is below its remaining size, as maker.
+        order = self.orders[cl_ord_id]
+        if order["state"] in OPEN_STATES:
+            limit = float(order["px"]) if order["px"] else self.price(order["instId"])
+            await self._publish([self._fill(order, price or limit, maker=True, qty=qty)])
+
+    async def disconnect_all(self) -> None:
+        for websocket in list(self._sockets):
+            await websocket.close()
+
+    def handle(self, op: str, args: list[dict], transport: str) -> tuple[dict, list[dict]]:
+        self.requests.append((op, transport, len(args)))
+        handler = self._place if op in ("order", "batch-orders") else self._cancel
+        results, pushes = [], []
+        for item in args:
+            if not self._allow(op, item.get("instId", "")):
+                results.append(_result(item, "", "50011", "Too Many Requests"))
+                continue
+            result, order_pushes = handler(item)
+            results.append(result)
+            pushes.extend(order_pushes)
+        response = _response(results)
+        if len(results) == 1 and op in ("order", "cancel-order") and response["code"] == "1":
+            response["msg"] = "Operation failed."
+        return response, pushes
+
+    def _allow(self, op: str, inst_id: str) -> bool:
+        bucket = self._buckets.get((op, inst_id))
+        if bucket is None:
+            rate, capacity = RATE_LIMITS[op]
+            bucket = self._buckets[(op, inst_id)] = TokenBucket(rate, capacity)
+        return bucket.try_acquire()
+
+    def _place(self, item: dict) -> tuple[dict, list[dict]]:
+        cl_ord_id = item.get("clOrdId", "")
+        existing = self.orders.get(cl_ord_id)
+        if cl_ord_id and existing is not None and existing["state"] in OPEN_STATES:
+            return _result(item, "", "51016", "Duplicated clOrdId"), []
+        try:
+            size = float(item["sz"])
+        except (KeyError, ValueError):
+            size = 0.0
+        if size <= 0 or item.get("side") not in ("buy", "sell"):
+            return _result(item, "", "51000", "Parameter sz error"), []
+        inst_id = item["instId"]
+        spec = self.instrument(inst_id)
+        if Decimal(item["sz"]) % Decimal(spec["lotSz"]) or Decimal(item["sz"]) < Decimal(
+            spec["minSz"]
+        ):
+            return (
+                _result(item, "", "51121", "Order quantity must be a multiple of the lot size"),
+                [],
+            )
+        if item.get("px") and Decimal(item["px"]) % Decimal(spec["tickSz"]):
+            return _result(item, "", "51000", "Parameter px error"), []
+        ord_type = item.get("ordType", "limit")
+        now = _now_ms()
+        order = {
+            "instType": "SWAP" if inst_id.endswith("-SWAP") else "SPOT",
+            "instId": inst_id,
+            "ordId": str(next(self._ord_ids)),
+            "clOrdId": cl_ord_id,
+            "tag": "",
+            "px": item.get("px", ""),
+            "sz": item["sz"],
+            "ordType": ord_type,
+            "side": item["side"],
+            "posSide": "net",
+            "tdMode": item.get("tdMode", "cross"),
+            "reduceOnly": "true" if item.get("reduceOnly") else "false",
+            "state": "live",
+            "accFillSz": "0",
+            "fillSz": "0",
+            "fillPx": "",
+            "avgPx": "",
+            "fillFee": "0",
+            "fillFeeCcy": "USDT",
+            "fee": "0",
+            "feeCcy": "USDT",
+            "tradeId": "",
+            "execType": "",
+            "cTime": now,
+            "uTime": now,
+            "fillTime": "",
+            "cancelSource": "",
+            "code": "0",
+            "msg": "",
+        }
+        self.orders[cl_ord_id or order["ordId"]] = order
+        pushes = [dict(order)]
+        price = self.price(inst_id)
+        limit = float(item["px"]) if item.get("px") else None
+        crosses = limit is None or (limit >= price if item["side"] == "buy" else limit <= price)
+        if ord_type == "post_only" and crosses:
+            pushes.append(self._set_state(order, "canceled", cancelSource="31"))
+        elif crosses:
+            pushes.append(self._fill(order, price, maker=False))
+        elif ord_type in ("ioc", "fok"):
+            pushes.append(self._set_state(order, "canceled"))
+        return _result(item, order["ordId"]), pushes
+
+    def _cancel(self, item: dict) -> tuple[dict, list[dict]]:
+        order = self.orders.get(item.get("clOrdId", ""))
+        if order is None and item.get("ordId"):
+            order = next((o for o in self.orders.values() if o["ordId"] == item["ordId"]), None)
+        if order is None or order["state"] not in OPEN_STATES:
+            message = (
+                "Order cancellation failed as the order has been filled, canceled or does not exist"
+            )
+            return _result(item, item.get("ordId", ""), "51400", message), []
+        return _result(item, order["ordId"]), [self._set_state(order, "canceled")]
+
+    def _fill(self, order: dict, price: float, maker: bool, qty: float | None = None) -> dict:
+        size = float(order["sz"])
+        filled = float(order["accFillSz"])
+        qty = min(qty or size - filled, size - filled)
+        contract_value = self.contract_values.get(order["instId"], 1.0)
+        fee_bps = self.maker_fee_bps if maker else self.taker_fee_bps
+        fee = -price * qty * contract_value * fee_bps / 10000
+        avg_price = float(order["avgPx"] or 0)
+        signed = qty if order["side"] == "buy" else -qty
+        self.positions[order["instId"]] = self.positions.get(order["instId"], 0.0) + signed
+        return self._set_state(
+            order,
+            "filled" if filled + qty >= size else "partially_filled",
+            accFillSz=_fmt(filled + qty),
+            fillSz=_fmt(qty),
+            fillPx=_fmt(price),
+            avgPx=_fmt((avg_price * filled + price * qty) / (filled + qty)),
+            fillFee=_fmt(fee),
+            fee=_fmt(float(order["fee"]) + fee),
+            tradeId=str(next(self._trade_ids)),
+            execType="M" if maker else "T",
+            fillTime=_now_ms(),
+        )
+
+    def _set_state(self, order: dict, state: str, **changes) -> dict:
+        order.update(fillSz="0", fillPx="", fillFee="0", tradeId="", execType="")
+        order.update(changes, state=state, uTime=_now_ms())
+        return dict(order)
+
+    async def _publish(self, pushes: list[dict]) -> None:
+        if not pushes or not self.push_enabled:
+            return
+        message = orjson.dumps(
+            {"arg": {"channel": "orders", "instType": "ANY", "uid": "fake"}, "data": pushes}
+        ).decode()
+        for websocket in list(self._subscribers):
+            try:
+                await websocket.send_text(message)
+            except Exception:
+                self._subscribers.discard(websocket)
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="fake-okx")
+
+        async def rest_op(op: str, request: Request) -> JSONResponse:
+            body = (await request.body()).decode()
+            if not self._signed(request, body):
+                return JSONResponse(
+                    {"code": "50113", "msg": "Invalid Sign", "data": []}, status_code=401
+                )
+            if self.ack_delay_sec:
+                await asyncio.sleep(self.ack_delay_sec)
+            payload = orjson.loads(body)
+            response, pushes = self.handle(
+                op, payload if isinstance(payload, list) else [payload], "rest"
+            )
+            await self._publish(pushes)
+            return JSONResponse(response)
+
+        for op, path in (
+            ("order", "/api/v5/trade/order"),
+            ("batch-orders", "/api/v5/trade/batch-orders"),
+            ("cancel-order", "/api/v5/trade/cancel-order"),
+            ("batch-cancel-orders", "/api/v5/trade/cancel-batch-orders"),
+        ):
+            app.add_api_route(path, self._rest_route(rest_op, op), methods=["POST"])
+
+        @app.get("/api/v5/trade/order")
+        async def order_details(request: Request, instId: str, clOrdId: str = "", ordId: str = ""):
+            if not self._signed(request, ""):
+                return JSONResponse(
+                    {"code": "50113", "msg": "Invalid Sign", "data": []}, status_code=401
+                )
+            order = self.orders.get(clOrdId)
+            if order is None and ordId:
+                order = next((o for o in self.orders.values() if o["ordId"] == ordId), None)
+            if order is None or order["instId"] != instId:
+                return {"code": "51603", "msg": "Order does not exist", "data": []}
+            return {"code": "0", "msg": "", "data": [order]}
+
+        @app.get("/api/v5/trade/orders-pending")
+        async def orders_pending(request: Request, limit: int = 100, after: str = ""):
+            if not self._signed(request, ""):
+                return JSONResponse(
+                    {"code": "50113", "msg": "Invalid Sign", "data": []}, status_code=401
+                )
+            # Newest first; `after` pages to older orders.
+            rows = sorted(
+                (o for o in self.orders.values() if o["state"] in OPEN_STATES),
+                key=lambda o: int(o["ordId"]),
+                reverse=True,
+            )
+            if after:
+                rows = [o for o in rows if int(o["ordId"]) < int(after)]
+            return {"code": "0", "msg": "", "data": rows[: min(limit, 100)]}
+
+        @app.get("/api/v5/public/instruments")
+        async def instruments(instType: str, instId: str = ""):
+            if not instId:
+                return {"code": "0", "msg": "", "data": []}
+            return {"code": "0", "msg": "", "data": [self.instrument(instId)]}
+
+        @app.get("/api/v5/account/positions")
+        async def positions(request: Request):
+            if not self._signed(request, ""):
+                return JSONResponse(
+                    {"code": "50113", "msg": "Invalid Sign", "data": []}, status_code=401
+                )
+            data = [
+                {"instType": "SWAP", "instId": inst_id, "pos": _fmt(pos), "posSide": "net"}
+                for inst_id, pos in self.positions.items()
+                if pos
+            ]
+            return {"code": "0", "msg": "", "data": data}
+
+        @app.websocket("/ws/v5/private")
+        async def private(websocket: WebSocket) -> None:
+            await self._session(websocket)
+
+        return app
+
+    @staticmethod
+    def _rest_route(handler, op: str):
+        async def route(request: Request) -> JSONResponse:
+            return await handler(op, request)
+
+        return route
+
+    def _signed(self, request: Request, body: str) -> bool:
+        headers = request.headers
+        path = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+        expected = self.credentials.sign(
+            f"{headers.get('OK-ACCESS-TIMESTAMP', '')}{request.method}{path}{body}"
+        )
+        return (
+            headers.get("OK-ACCESS-KEY") == self.credentials.api_key
+            and headers.get("OK-ACCESS-PASSPHRASE") == self.credentials.passphrase
+            and headers.get("OK-ACCESS-SIGN") == expected
+        )
+
+    async def _session(self, websocket: WebSocket) -> None:
+        await websocket.accept()
+        self._sockets.add(websocket)
+        conn_id = f"fake-{id(websocket):x}"
+        logged_in = False
+        try:
+            while True:
+                raw = await websocket.receive_text()
+                if raw == "ping":
+                    await websocket.send_text("pong")
+                    continue
+                message = orjson.loads(raw)
+                op = message.get("op")
+                if op == "login":
+                    args = message["args"][0]
+                    logged_in = args.get("apiKey") == self.credentials.api_key and args.get(
+                        "sign"
+                    ) == self.credentials.sign(f"{args.get('timestamp')}GET/users/self/verify")
+                    reply = (
+                        {"event": "login", "code": "0", "msg": "", "connId": conn_id}
+                        if logged_in
+                        else {"event": "error", "code": "60009", "msg": "Login failed."}
+                    )
+                elif not logged_in:
+                    reply = {"event": "error", "code": "60011", "msg": "Please log in"}
+                elif op == "subscribe":
+                    self._subscribers.add(websocket)
+                    reply = {"event": "subscribe", "arg": message["args"][0], "connId": conn_id}
+                elif op in ORDER_OPS:
+                    in_time = str(int(time.time() * 1e6))
+                    if self.ack_delay_sec:
+                        await asyncio.sleep(self.ack_delay_sec)
+                    response, pushes = self.handle(op, message["args"], "ws")
+                    reply = {
+                        "id": message.get("id"),
+                        "op": op,
+                        **response,
+                        "inTime": in_time,
+                        "outTime": str(int(time.time() * 1e6)),
+                    }
+                    await websocket.send_text(orjson.dumps(reply).decode())
+                    await self._publish(pushes)
+                    continue
+                else:
+                    reply = {"event": "error", "code": "60012", "msg": f"Invalid request: {raw}"}
+                await websocket.send_text(orjson.dumps(reply).decode())
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._sockets.discard(websocket)
+            self._subscribers.discard(websocket)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m packages.execution.fake_okx")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--api-key", default="fake-key")
+    parser.add_argument("--secret", default="fake-secret")
+    parser.add_argument("--passphrase", default="fake-passphrase")
+    parser.add_argument("--price", type=float, default=100.0, help="fill price for all symbols")
+    parser.add_argument("--ack-delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    exchange = FakeOkxExchange(
+        OkxCredentials(args.api_key, args.secret, args.passphrase),
+        default_price=args.price,
+        ack_delay_sec=args.ack_delay_ms / 1000,
+    )
+    # Point the app at it with OKX_REST_BASE=http://host:port and
+    # OKX_WS_PRIVATE_URL=ws://host:port/ws/v5/private.
+    uvicorn.run(exchange.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
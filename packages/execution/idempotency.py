@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Awaitable, Callable
+
+import orjson
+
+from packages.common.config import get_settings
+from packages.common.redis_client import get_redis
+from packages.common.repository import DuplicateExecution, Repository, get_repository
+
+logger = logging.getLogger(__name__)
+
+PENDING = b"pending"
+WAIT_POLL_SEC = 0.05
+
+
+class ExecutionInProgress(RuntimeError):
+    pass
+
+
+# plan_id -> first execution result. Lookups hit an in-process LRU, then Redis. A Redis
+# SET NX claim lets one worker execute a plan while racing workers wait for its result.
+# plan_executions is read before every run, so a lapsed Redis key never re-runs a plan, and
+# its primary key is the final guard for two runs racing past that read.
+# Failed executions (risk rejections included) release the claim and are not remembered.
+class IdempotencyStore:
+    def __init__(
+        self,
+        repository: Repository | None = None,
+        prefix: str = "plan_execution",
+        ttl_sec: float = 86400.0,
+        claim_ttl_sec: float = 30.0,
+        wait_sec: float = 5.0,
+        max_entries: int = 10000,
+        redis_enabled: bool = True,
+        redis_factory=get_redis,
+    ) -> None:
+        self.repository = repository
+        self.prefix = prefix
+        self.ttl_sec = ttl_sec
+        self.claim_ttl_sec = claim_ttl_sec
+        self.wait_sec = wait_sec
+        self.max_entries = max_entries
+        self.redis_enabled = redis_enabled
+        self.redis_factory = redis_factory
+        self._local: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def execute(self, plan_id: str, run: Callable[[], dict]) -> tuple[dict, bool]:
+        # Returns (result, replayed).
+        result = self.lookup(plan_id)
+        if result is not None:
+            return result, True
+        claimed = self._claim(plan_id)
+        if claimed is False:
+            return self._wait(plan_id), True
+        # Checked even with a claim: an expired or evicted result key lets SET NX succeed
+        # again, and the plan must not reach risk or the exchange a second time.
+        stored = self._repository().execution_for_plan(plan_id)
+        if stored is not None:
+            self._remember(plan_id, stored)
+            return stored, True
+        try:
+            result = run()
+        except DuplicateExecution:
+            # Lost the race at the database; the winner's ledger row is the answer.
+            stored = self._repository().execution_for_plan(plan_id)
+            if stored is None:
+                if claimed:
+                    self._release(plan_id)
+                raise
+            self._remember(plan_id, stored)
+            return stored, True
+        except BaseException:
+            if claimed:
+                self._release(plan_id)
+            raise
+        self._remember(plan_id, result)
+        return result, False
+
+    async def execute_async(
+        self, plan_id: str, run: Callable[[], Awaitable[dict]]
+    ) -> tuple[dict, bool]:
+        result = self._local_get(plan_id)
+        if result is None and self.redis_enabled:
+            result = await asyncio.to_thread(self._redis_get, plan_id)
+        if result is not None:
+            return result, True
+        claimed = await asyncio.to_thread(self._claim, plan_id)
+        if claimed is False:
+            return await self._wait_async(plan_id), True
+        stored = await self._repository().execution_for_plan_async(plan_id)
+        if stored is not None:
+            self._remember_local(plan_id, stored)
+            await asyncio.to_thread(self._redis_set, plan_id, stored)
+            return stored, True
+        try:
+            result = await run()
+        except DuplicateExecution:
+            stored = await self._repository().execution_for_plan_async(plan_id)
+            if stored is None:
+                if claimed:
+                    await asyncio.to_thread(self._release, plan_id)
+                raise
+            self._remember_local(plan_id, stored)
+            await asyncio.to_thread(self._redis_set, plan_id, stored)
+            return stored, True
+        except BaseException:
+            if claimed:
+                await asyncio.to_thread(self._release, plan_id)
+            raise
+        self._remember_local(plan_id, result)
+        await asyncio.to_thread(self._redis_set, plan_id, result)
+        return result, False
+
+    def lookup(self, plan_id: str) -> dict | None:
+        result = self._local_get(plan_id)
+        if result is None and self.redis_enabled:
+            result = self._redis_get(plan_id)
+        return result
+
+    def _repository(self) -> Repository:
+        return self.repository or get_repository()
+
+    def _wait(self, plan_id: str) -> dict:
+        deadline = time.monotonic() + self.wait_sec
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_POLL_SEC)
+            result = self._redis_get(plan_id)
+            if result is not None:
+                return result
+        raise ExecutionInProgress(plan_id)
+
+    async def _wait_async(self, plan_id: str) -> dict:
+        deadline = time.monotonic() + self.wait_sec
+        while time.monotonic() < deadline:
+            await asyncio.sleep(WAIT_POLL_SEC)
+            result = await asyncio.to_thread(self._redis_get, plan_id)
+            if result is not None:
+                return result
+        raise ExecutionInProgress(plan_id)
+
+    def _remember(self, plan_id: str, result: dict) -> None:
+        self._remember_local(plan_id, result)
+        self._redis_set(plan_id, result)
+
+    def _local_get(self, plan_id: str) -> dict | None:
+        with self._lock:
+            result = self._local.get(plan_id)
+            if result is not None:
+                self._local.move_to_end(plan_id)
+            return result
+
+    def _remember_local(self, plan_id: str, result: dict) -> None:
+        with self._lock:
+            self._local[plan_id] = result
+            self._local.move_to_end(plan_id)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def _key(self, plan_id: str) -> str:
+        return f"{self.prefix}:{plan_id}"
+
+    def _claim(self, plan_id: str) -> bool | None:
+        # True when claimed, False when another worker holds or finished it, None without Redis.
+        if not self.redis_enabled:
+            return None
+        try:
+            claimed = self.redis_factory().set(
+                self._key(plan_id), PENDING, nx=True, px=int(self.claim_ttl_sec * 1000)
+            )
+        except Exception:
+            logger.warning("idempotency claim failed; relying on the database", exc_info=True)
+            return None
+        return bool(claimed)
+
+    def _release(self, plan_id: str) -> None:
+        try:
+            client = self.redis_factory()
+            # Only drop our own pending claim, never a stored result.
+            if client.get(self._key(plan_id)) == PENDING:
+                client.delete(self._key(plan_id))
+        except Exception:
+            logger.warning("idempotency claim release failed", exc_info=True)
+
+    def _redis_get(self, plan_id: str) -> dict | None:
+        try:
+            data = self.redis_factory().get(self._key(plan_id))
+        except Exception:
+            logger.warning("idempotency lookup failed", exc_info=True)
+            return None
+        if data is None or data == PENDING:
+            return None
+        result = orjson.loads(data)
+        self._remember_local(plan_id, result)
+        return result
+
+    def _redis_set(self, plan_id: str, result: dict) -> None:
+        if not self.redis_enabled:
+            return
+        try:
+            self.redis_factory().set(
+                self._key(plan_id), orjson.dumps(result), px=int(self.ttl_sec * 1000)
+            )
+        except Exception:
+            logger.warning("idempotency store failed", exc_info=True)
+
+
+@lru_cache
+def get_idempotency_store() -> IdempotencyStore:
+    settings = get_settings()
+    return IdempotencyStore(
+        ttl_sec=settings.idempotency_ttl_sec,
+        claim_ttl_sec=settings.idempotency_claim_ttl_sec,
+        wait_sec=settings.idempotency_wait_sec,
+        max_entries=settings.idempotency_local_max_entries,
+        redis_enabled=settings.idempotency_redis_enabled,
+    )
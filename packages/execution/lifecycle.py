@@ -0,0 +1,374 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable
+
+from prometheus_client import Counter, Gauge
+
+from packages.common.config import get_settings
+from packages.data.orderbook import get_book_engine
+from packages.execution.okx import ORDER_STATES, client_order_id, order_side
+from packages.execution.orders import OPEN_STATUSES, InvalidTransition, OrderStatus, transition
+
+logger = logging.getLogger(__name__)
+
+QTY_EPSILON = 1e-9
+
+TRACKED_ORDERS = Gauge(
+    "live_orders_tracked", "Live orders held by the lifecycle manager", multiprocess_mode="livesum"
+)
+INVALID_TRANSITIONS = Counter(
+    "live_order_invalid_transitions_total",
+    "Exchange order events rejected by the order state machine",
+    ["from_status", "to_status"],
+)
+ESCALATIONS = Counter("live_order_escalations_total", "Timed-out live orders replaced", ["stage"])
+ORPHAN_ORDERS = Gauge(
+    "live_order_reconcile_orphans",
+    "Open exchange orders with no local record at last reconcile",
+    multiprocess_mode="livemostrecent",
+)
+POSITION_DRIFT = Gauge(
+    "live_position_drift_contracts",
+    "Exchange position minus the position implied by tracked fills",
+    ["symbol"],
+    multiprocess_mode="livemostrecent",
+)
+
+PriceSource = Callable[[str, bool], "float | None"]
+
+
+# One working exchange order. A plan's order_instructions row (record_id) can own several in
+# turn when a timed-out limit order is replaced; `stage` counts those replacements.
+@dataclass(slots=True, eq=False)
+class LiveOrder:
+    cl_ord_id: str
+    plan_id: str
+    symbol: str
+    is_buy: bool
+    qty: float
+    instruction: dict
+    record_id: int | None = None
+    ord_id: str | None = None
+    status: OrderStatus = OrderStatus.NEW
+    filled_qty: float = 0.0
+    avg_price: float | None = None
+    fees: float = 0.0
+    stage: int = 0
+    created_ms: int = 0
+    # Exchange uTime of the last applied event; older events are stale.
+    updated_ms: int = 0
+    deadline_ms: int | None = None
+    # A cancel was sent because the deadline passed; a replacement follows the CANCELED event.
+    escalating: bool = False
+
+    @property
+    def remaining(self) -> float:
+        return max(self.qty - self.filled_qty, 0.0)
+
+    @property
+    def is_open(self) -> bool:
+        return self.status in OPEN_STATUSES
+
+
+@dataclass(slots=True)
+class LiveFill:
+    price: float
+    qty: float
+    fee: float
+    liquidity: str
+    trade_id: str | None
+
+
+@dataclass(slots=True)
+class LifecycleUpdate:
+    order: LiveOrder
+    status: OrderStatus
+    ts_ms: int
+    fill: LiveFill | None = None
+    reason: str | None = None
+
+
+@dataclass
+class Reconciliation:
+    updates: list[LifecycleUpdate] = field(default_factory=list)
+    # Open locally, absent from the exchange's open orders; their final state needs a lookup.
+    missing: list[LiveOrder] = field(default_factory=list)
+    # Open on the exchange with a clOrdId we are not tracking.
+    orphans: list[dict] = field(default_factory=list)
+    drift: dict[str, float] = field(default_factory=dict)
+
+
+def book_touch(symbol: str, is_buy: bool) -> float | None:
+    features = get_book_engine().features(symbol, get_settings().orderbook_max_age_sec)
+    if features is None:
+        return None
+    return features.best_bid if is_buy else features.best_ask
+
+
+# Live orders indexed by clOrdId, plan and symbol. Exchange events (pushes, or rows from the
+# pending-orders and order-details queries) are applied as validated transitions; fills are
+# derived from the cumulative accFillSz/avgPx/fee fields, so duplicate, late or missed events
+# never double count. Terminal orders leave every index, and deadlines sit in a heap with lazy
+# deletion, so memory and per-event work stay flat in the number of working orders.
+#
+# Escalation: an order past its deadline is canceled; once the cancel is confirmed the
+# remainder is re-placed as a limit at our side's touch (up to max_chases times), then as a
+# market order.
+class OrderManager:
+    def __init__(
+        self,
+        escalation_enabled: bool = True,
+        chase_timeout_sec: float = 10.0,
+        max_chases: int = 1,
+        price_source: PriceSource | None = None,
+    ) -> None:
+        self.escalation_enabled = escalation_enabled
+        self.chase_timeout_sec = chase_timeout_sec
+        self.max_chases = max_chases
+        self.price_source = price_source
+        self.orders: dict[str, LiveOrder] = {}
+        self.by_plan: dict[str, set[str]] = {}
+        self.by_symbol: dict[str, set[str]] = {}
+        # Net contracts implied by applied fills, and the exchange offset seen at first reconcile.
+        self.positions: dict[str, float] = {}
+        self._position_base: dict[str, float] = {}
+        self._deadlines: list[tuple[int, str]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def get(self, cl_ord_id: str) -> LiveOrder | None:
+        return self.orders.get(cl_ord_id)
+
+    def for_plan(self, plan_id: str) -> list[LiveOrder]:
+        with self._lock:
+            return [self.orders[cl_ord_id] for cl_ord_id in self.by_plan.get(plan_id, ())]
+
+    def for_symbol(self, symbol: str) -> list[LiveOrder]:
+        with self._lock:
+            return [self.orders[cl_ord_id] for cl_ord_id in self.by_symbol.get(symbol, ())]
+
+    def new_order(self, instruction: dict, record_id: int | None, now_ms: int) -> LiveOrder:
+        timeout_sec = instruction.get("timeout_sec") or 0
+        resting = instruction["order_type"] != "market" and instruction.get("tif") not in (
+            "IOC",
+            "FOK",
+        )
+        return LiveOrder(
+            cl_ord_id=instruction.get("cl_ord_id") or client_order_id(instruction["plan_id"]),
+            plan_id=instruction["plan_id"],
+            symbol=instruction["symbol"],
+            is_buy=order_side(instruction["side"]) == "buy",
+            qty=instruction["qty"],
+            instruction=instruction,
+            record_id=record_id,
+            stage=instruction.get("stage", 0),
+            created_ms=now_ms,
+            deadline_ms=now_ms + int(timeout_sec * 1000) if timeout_sec > 0 and resting else None,
+        )
+
+    def track(self, order: LiveOrder) -> None:
+        with self._lock:
+            self.orders[order.cl_ord_id] = order
+            self.by_plan.setdefault(order.plan_id, set()).add(order.cl_ord_id)
+            self.by_symbol.setdefault(order.symbol, set()).add(order.cl_ord_id)
+            if order.deadline_ms is not None and self.escalation_enabled:
+                heapq.heappush(self._deadlines, (order.deadline_ms, order.cl_ord_id))
+            TRACKED_ORDERS.set(len(self.orders))
+
+    def forget(self, cl_ord_id: str) -> LiveOrder | None:
+        with self._lock:
+            return self._remove(cl_ord_id)
+
+    def apply(self, event: dict, now_ms: int) -> LifecycleUpdate | None:
+        # Returns None for unknown orders and events that change nothing.
+        with self._lock:
+            order = self.orders.get(event.get("clOrdId"))
+            target = ORDER_STATES.get(event.get("state"))
+            if order is None or target is None:
+                return None
+            target = OrderStatus(target)
+            ts_ms = int(event.get("uTime") or now_ms)
+            fill = self._fill(order, event)
+            if fill is None and (target == order.status or ts_ms < order.updated_ms):
+                return None
+            if fill is not None and target == OrderStatus.NEW:
+                # Fills seen before the state caught up (a stale row) still count as partial.
+                target = OrderStatus.PARTIAL
+            if target != order.status or target == OrderStatus.PARTIAL:
+                try:
+                    order.status = transition(order.status, target)
+                except InvalidTransition:
+                    INVALID_TRANSITIONS.labels(
+                        from_status=order.status.value, to_status=target.value
+                    ).inc()
+                    logger.warning(
+                        "ignoring %s -> %s for order %s",
+                        order.status.value,
+                        target.value,
+                        order.cl_ord_id,
+                    )
+                    return None
+            if fill is not None:
+                self._add_fill(order, fill)
+            order.ord_id = event.get("ordId") or order.ord_id
+            order.updated_ms = max(order.updated_ms, ts_ms)
+            if not order.is_open:
+                self._remove(order.cl_ord_id)
+            return LifecycleUpdate(
+                order, order.status, ts_ms, fill, event.get("cancelSource") or None
+            )
+
+    def fail(self, cl_ord_id: str, reason: str, now_ms: int) -> LifecycleUpdate | None:
+        # For orders the exchange has no record of.
+        with self._lock:
+            order = self.orders.get(cl_ord_id)
+            if order is None:
+                return None
+            order.status = transition(order.status, OrderStatus.ERROR)
+            order.updated_ms = now_ms
+            self._remove(cl_ord_id)
+            return LifecycleUpdate(order, order.status, now_ms, reason=reason)
+
+    def due(self, now_ms: int) -> list[LiveOrder]:
+        # Open orders whose deadline passed, marked escalating; the caller cancels them.
+        expired = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now_ms:
+                deadline_ms, cl_ord_id = heapq.heappop(self._deadlines)
+                order = self.orders.get(cl_ord_id)
+                if order is None or order.deadline_ms != deadline_ms or order.escalating:
+                    continue
+                order.escalating = True
+                expired.append(order)
+        return expired
+
+    def rearm(self, order: LiveOrder, now_ms: int) -> None:
+        # The escalation cancel did not go through; try again after another chase timeout.
+        with self._lock:
+            if order.cl_ord_id not in self.orders:
+                return
+            order.escalating = False
+            order.deadline_ms = now_ms + int(self.chase_timeout_sec * 1000)
+            heapq.heappush(self._deadlines, (order.deadline_ms, order.cl_ord_id))
+
+    def replacement(self, order: LiveOrder) -> dict | None:
+        # Instruction for the next stage of an escalated order, or None if nothing is left.
+        if not (self.escalation_enabled and order.escalating) or order.remaining <= QTY_EPSILON:
+            return None
+        stage = order.stage + 1
+        market = stage > self.max_chases
+        touch = self.price_source(order.symbol, order.is_buy) if self.price_source else None
+        instruction = order.instruction
+        ESCALATIONS.labels(stage="market" if market else "chase").inc()
+        return {
+            **instruction,
+            "cl_ord_id": client_order_id(f"{order.plan_id}#{stage}"),
+            "stage": stage,
+            "parent_cl_ord_id": order.cl_ord_id,
+            "arrival_price": instruction.get("arrival_price") or instruction["price"],
+            "order_type": "market" if market else "limit",
+            "tif": "IOC" if market else "GTC",
+            "post_only": False,
+            "price": touch or instruction["price"],
+            "qty": order.remaining,
+            "notional_usd": instruction["notional_usd"] * order.remaining / order.qty,
+            "closes_notional": (
+                instruction["closes_notional"] * order.remaining / order.qty
+                if instruction.get("closes_notional")
+                else None
+            ),
+            "timeout_sec": None if market else self.chase_timeout_sec,
+        }
+
+    def reconcile(self, pending: list[dict], now_ms: int, grace_ms: int = 5000) -> Reconciliation:
+        # pending: the exchange's open orders.
+        result = Reconciliation()
+        seen = set()
+        for row in pending:
+            cl_ord_id = row.get("clOrdId")
+            if cl_ord_id not in self.orders:
+                result.orphans.append(row)
+                continue
+            seen.add(cl_ord_id)
+            update = self.apply(row, now_ms)
+            if update is not None:
+                result.updates.append(update)
+        with self._lock:
+            result.missing = [
+                order
+                for cl_ord_id, order in self.orders.items()
+                if cl_ord_id not in seen and now_ms - order.created_ms >= grace_ms
+            ]
+        ORPHAN_ORDERS.set(len(result.orphans))
+        return result
+
+    def position_drift(self, positions: dict[str, float]) -> dict[str, float]:
+        # positions: exchange net contracts per instrument, taken after missing orders are
+        # settled. The first call per instrument takes what was already open as the baseline.
+        drift = {}
+        with self._lock:
+            for symbol in positions.keys() | self._position_base.keys():
+                exchange = positions.get(symbol, 0.0)
+                local = self.positions.get(symbol, 0.0)
+                base = self._position_base.setdefault(symbol, exchange - local)
+                value = exchange - local - base
+                POSITION_DRIFT.labels(symbol=symbol).set(value)
+                if abs(value) > QTY_EPSILON:
+                    drift[symbol] = value
+        return drift
+
+    def _fill(self, order: LiveOrder, event: dict) -> LiveFill | None:
+        filled = float(event.get("accFillSz") or 0)
+        qty = filled - order.filled_qty
+        if qty <= QTY_EPSILON:
+            return None
+        avg_price = float(event.get("avgPx") or event.get("fillPx") or 0)
+        price = (avg_price * filled - (order.avg_price or 0.0) * order.filled_qty) / qty
+        # OKX reports the cumulative fee as a negative amount charged.
+        fee = -float(event.get("fee") or 0) - order.fees
+        return LiveFill(
+            price=price,
+            qty=qty,
+            fee=fee,
+            liquidity="maker" if event.get("execType") == "M" else "taker",
+            trade_id=event.get("tradeId") or None,
+        )
+
+    def _add_fill(self, order: LiveOrder, fill: LiveFill) -> None:
+        notional = (order.avg_price or 0.0) * order.filled_qty + fill.price * fill.qty
+        order.filled_qty += fill.qty
+        order.avg_price = notional / order.filled_qty
+        order.fees += fill.fee
+        signed = fill.qty if order.is_buy else -fill.qty
+        self.positions[order.symbol] = self.positions.get(order.symbol, 0.0) + signed
+
+    def _remove(self, cl_ord_id: str) -> LiveOrder | None:
+        order = self.orders.pop(cl_ord_id, None)
+        if order is None:
+            return None
+        for index, key in ((self.by_plan, order.plan_id), (self.by_symbol, order.symbol)):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(cl_ord_id)
+                if not ids:
+                    del index[key]
+        TRACKED_ORDERS.set(len(self.orders))
+        return order
+
+
+@lru_cache
+def get_order_manager() -> OrderManager:
+    settings = get_settings()
+    return OrderManager(
+        escalation_enabled=settings.order_escalation_enabled,
+        chase_timeout_sec=settings.order_chase_timeout_sec,
+        max_chases=settings.order_max_chases,
+        price_source=book_touch,
+    )
@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+import bisect
+import heapq
+import itertools
+import math
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from packages.common.config import get_settings
+from packages.data.orderbook import BookSide, L2Book, OrderBookEngine, get_book_engine
+from packages.execution.orders import OPEN_STATUSES, OrderStatus, transition
+
+IS_BUY = {"long": True, "buy": True, "short": False, "sell": False}
+IMMEDIATE_TIFS = ("IOC", "FOK")
+
+# Fractions of an order below this are treated as done, so float dust never leaves it open.
+QTY_EPSILON = 1e-9
+
+
+@dataclass(eq=False)
+class PaperOrder:
+    order_id: str
+    instruction: dict
+    symbol: str
+    is_buy: bool
+    order_type: str
+    # Limit price; for market orders the slippage protection price.
+    price: float
+    qty: float
+    contract_value: float = 1.0
+    post_only: bool = False
+    tif: str = "GTC"
+    expires_ms: int | None = None
+    arrival_mid: float = 0.0
+    status: OrderStatus = OrderStatus.NEW
+    filled_qty: float = 0.0
+    filled_notional: float = 0.0
+    fees: float = 0.0
+    # Public size estimated ahead of the order at its price level.
+    queue_ahead: float = 0.0
+    reason: str | None = None
+    # order_instructions id, set once the submission is persisted.
+    record_id: int | None = None
+
+    @property
+    def remaining(self) -> float:
+        return max(self.qty - self.filled_qty, 0.0)
+
+    @property
+    def is_open(self) -> bool:
+        return self.status in OPEN_STATUSES
+
+    @property
+    def avg_price(self) -> float | None:
+        if self.filled_qty <= 0:
+            return None
+        return self.filled_notional / (self.filled_qty * self.contract_value)
+
+
+@dataclass(frozen=True)
+class PaperFill:
+    price: float
+    qty: float
+    notional: float
+    fee: float
+    slippage: float
+    liquidity: str
+
+
+# Everything that happened to one order in one submit, book update or cancel.
+@dataclass
+class OrderUpdate:
+    order: PaperOrder
+    status: OrderStatus
+    ts_ms: int
+    fills: list[PaperFill] = field(default_factory=list)
+
+
+# Our resting orders for one symbol, indexed by side and price. Keys are kept sorted
+# best-first (-price for bids, like BookSide) so crossing checks only look at the head.
+class _Resting:
+    def __init__(self) -> None:
+        self.levels: dict[bool, dict[float, list[PaperOrder]]] = {True: {}, False: {}}
+        self.keys: dict[bool, list[float]] = {True: [], False: []}
+        self.visible: dict[bool, dict[float, float]] = {True: {}, False: {}}
+        self.expiries: list[tuple[int, str]] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.levels[True] or self.levels[False])
+
+
+def _key(is_buy: bool, price: float) -> float:
+    return -price if is_buy else price
+
+
+# Simulates paper orders against the live or replayed L2 books of an OrderBookEngine.
+# Market and marketable limit orders walk the opposite side at submission; the rest rest
+# behind the public size at their price and are matched on each book update, looking only
+# at the levels that update touched plus the top of the opposite side. The simulation never
+# removes liquidity from the public book, so concurrent paper takers can see the same size.
+class PaperMatchingEngine:
+    def __init__(
+        self,
+        books: OrderBookEngine,
+        maker_fee_bps: float = 2.0,
+        taker_fee_bps: float = 5.0,
+        max_book_age_sec: float | None = None,
+    ) -> None:
+        self.books = books
+        self.maker_fee_bps = maker_fee_bps
+        self.taker_fee_bps = taker_fee_bps
+        self.max_book_age_sec = max_book_age_sec
+        self.orders: dict[str, PaperOrder] = {}
+        self.pending: deque[OrderUpdate] = deque()
+        self._resting: dict[str, _Resting] = {}
+        self._ids = itertools.count(1)
+        books.add_listener(self.on_book)
+
+    def can_match(self, symbol: str) -> bool:
+        return self.books.features(symbol, self.max_book_age_sec) is not None
+
+    def submit(self, instruction: dict, now_ms: int) -> OrderUpdate | None:
+        # Returns None when there is no usable book, so the caller can fall back.
+        symbol = instruction["symbol"]
+        if not self.can_match(symbol):
+            return None
+        with self.books.lock:
+            book = self.books.book(symbol)
+            bid, ask = book.bids.best, book.asks.best
+            if bid is None or ask is None:
+                return None
+            order = self._new_order(instruction, book, bid[0], ask[0], now_ms)
+            update = OrderUpdate(order, order.status, now_ms)
+            opposite = book.asks if order.is_buy else book.bids
+            if self._crosses(order.is_buy, order.price, opposite):
+                if order.post_only:
+                    self._cancel(order, "post_only_would_take", update)
+                    return update
+                if order.tif == "FOK" and opposite.size_within(order.price) < order.qty:
+                    self._cancel(order, "fok_unfilled", update)
+                    return update
+                self._take(order, opposite, update)
+            if order.is_open:
+                if order.order_type == "market" or order.tif in IMMEDIATE_TIFS:
+                    self._cancel(order, "unfilled_remainder", update)
+                else:
+                    self._rest(order, book)
+            return update
+
+    def cancel(self, order_id: str, now_ms: int, reason: str = "canceled") -> OrderUpdate | None:
+        with self.books.lock:
+            order = self.orders.get(order_id)
+            if order is None or not order.is_open:
+                return None
+            update = OrderUpdate(order, order.status, now_ms)
+            self._cancel(order, reason, update)
+            return update
+
+    def discard(self, order_id: str) -> None:
+        # Forgets an order whose submission was never persisted, without reporting it.
+        with self.books.lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                return
+            if order.is_open:
+                self._cancel(order, "discarded", OrderUpdate(order, order.status, 0))
+            self.pending = deque(update for update in self.pending if update.order is not order)
+
+    def drain(self) -> list[OrderUpdate]:
+        # Updates for orders whose submission is not persisted yet stay queued.
+        with self.books.lock:
+            ready = [update for update in self.pending if update.order.record_id is not None]
+            if len(ready) < len(self.pending):
+                self.pending = deque(
+                    update for update in self.pending if update.order.record_id is None
+                )
+            else:
+                self.pending.clear()
+        return ready
+
+    def on_book(self, book: L2Book, bids: list, asks: list, snapshot: bool) -> None:
+        resting = self._resting.get(book.symbol)
+        if not resting:
+            return
+        updates: dict[str, OrderUpdate] = {}
+        for is_buy, side, changes in ((True, book.bids, bids), (False, book.asks, asks)):
+            levels = resting.levels[is_buy]
+            if not levels:
+                continue
+            if snapshot:
+                # After a resync sizes can jump arbitrarily: refresh them without
+                # inferring any trades.
+                for price, queue in levels.items():
+                    size = side.size_at(price)
+                    resting.visible[is_buy][price] = size
+                    for order in queue:
+                        order.queue_ahead = min(order.queue_ahead, size)
+                continue
+            best = side.best
+            for price, size in changes:
+                queue = levels.get(price)
+                if queue is None:
+                    continue
+                at_touch = best is None or (price >= best[0] if is_buy else price <= best[0])
+                self._advance(resting, is_buy, price, size, at_touch, book.ts, updates)
+        for is_buy in (True, False):
+            self._match_crossed(resting, is_buy, book, updates)
+        while resting.expiries and resting.expiries[0][0] <= book.ts:
+            _, order_id = heapq.heappop(resting.expiries)
+            order = self.orders.get(order_id)
+            if order is not None and order.is_open:
+                self._cancel(order, "expired", self._update(updates, order, book.ts))
+        if not resting:
+            del self._resting[book.symbol]
+        self.pending.extend(updates.values())
+
+    def _new_order(
+        self, instruction: dict, book: L2Book, bid: float, ask: float, now_ms: int
+    ) -> PaperOrder:
+        is_buy = IS_BUY[instruction["side"]]
+        touch = ask if is_buy else bid
+        order_type = instruction["order_type"]
+        if order_type == "market":
+            slippage = instruction.get("max_slippage_bps") or 0.0
+            if slippage > 0:
+                price = touch * (1 + (slippage if is_buy else -slippage) / 10000)
+            else:
+                price = math.inf if is_buy else 0.0
+            reference = touch
+        else:
+            price = instruction.get("price") or touch
+            reference = price
+        timeout = instruction.get("timeout_sec") or 0
+        return PaperOrder(
+            order_id=f"paper-{next(self._ids)}",
+            instruction=instruction,
+            symbol=instruction["symbol"],
+            is_buy=is_buy,
+            order_type=order_type,
+            price=price,
+            qty=instruction["notional_usd"] / (reference * book.contract_value),
+            contract_value=book.contract_value,
+            post_only=bool(instruction.get("post_only")),
+            tif=(instruction.get("tif") or "GTC").upper(),
+            expires_ms=now_ms + int(timeout * 1000) if timeout > 0 else None,
+            arrival_mid=(bid + ask) / 2,
+        )
+
+    def _crosses(self, is_buy: bool, price: float, opposite: BookSide) -> bool:
+        best = opposite.best
+        if best is None:
+            return False
+        return best[0] <= price if is_buy else best[0] >= price
+
+    def _take(self, order: PaperOrder, opposite: BookSide, update: OrderUpdate) -> None:
+        end = int(
+            opposite.keys[: opposite.count].searchsorted(opposite.sign * order.price, side="right")
+        )
+        remaining = order.remaining
+        qty = cost = 0.0
+        for i in range(end):
+            take = min(float(opposite.sizes[i]), remaining - qty)
+            qty += take
+            cost += take * float(opposite.prices[i])
+            if qty >= remaining:
+                break
+        if qty > 0:
+            self._fill(order, cost / qty, qty, "taker", update)
+
+    def _rest(self, order: PaperOrder, book: L2Book) -> None:
+        resting = self._resting.setdefault(order.symbol, _Resting())
+        levels = resting.levels[order.is_buy]
+        queue = levels.get(order.price)
+        if queue is None:
+            queue = levels[order.price] = []
+            bisect.insort(resting.keys[order.is_buy], _key(order.is_buy, order.price))
+            side = book.bids if order.is_buy else book.asks
+            resting.visible[order.is_buy][order.price] = side.size_at(order.price)
+        # Joins behind everything currently shown at its price.
+        order.queue_ahead = resting.visible[order.is_buy][order.price]
+        queue.append(order)
+        self.orders[order.order_id] = order
+        if order.expires_ms is not None:
+            heapq.heappush(resting.expiries, (order.expires_ms, order.order_id))
+
+    def _advance(
+        self,
+        resting: _Resting,
+        is_buy: bool,
+        price: float,
+        size: float,
+        at_touch: bool,
+        ts_ms: int,
+        updates: dict[str, OrderUpdate],
+    ) -> None:
+        visible = resting.visible[is_buy]
+        previous = visible[price]
+        visible[price] = size
+        decrease = previous - size
+        if decrease <= 0:
+            # New size queues behind ours.
+            return
+        # Shrinking size at the touch is read as trades eating the queue from the front;
+        # deeper in the book it is read as cancels spread evenly through the queue.
+        executed = 0.0
+        for order in resting.levels[is_buy][price]:
+            ahead = order.queue_ahead
+            if not at_touch:
+                order.queue_ahead = ahead - decrease * ahead / previous
+                continue
+            order.queue_ahead = max(ahead - decrease, 0.0)
+            available = decrease - ahead - executed
+            if available > 0 and order.is_open:
+                qty = min(order.remaining, available)
+                executed += qty
+                self._fill(order, price, qty, "maker", self._update(updates, order, ts_ms))
+        self._prune(resting, is_buy, price)
+
+    def _match_crossed(
+        self, resting: _Resting, is_buy: bool, book: L2Book, updates: dict[str, OrderUpdate]
+    ) -> None:
+        # The opposite side trading at or through a resting price means it was hit.
+        keys = resting.keys[is_buy]
+        opposite = book.asks if is_buy else book.bids
+        while keys:
+            price = -keys[0] if is_buy else keys[0]
+            if not self._crosses(is_buy, price, opposite):
+                return
+            available = opposite.size_within(price)
+            for order in resting.levels[is_buy][price]:
+                if available <= 0:
+                    break
+                qty = min(order.remaining, available)
+                available -= qty
+                self._fill(order, price, qty, "maker", self._update(updates, order, book.ts))
+            if not self._prune(resting, is_buy, price):
+                return
+
+    def _fill(
+        self, order: PaperOrder, price: float, qty: float, liquidity: str, update: OrderUpdate
+    ) -> None:
+        notional = price * qty * order.contract_value
+        fee_bps = self.maker_fee_bps if liquidity == "maker" else self.taker_fee_bps
+        fee = notional * fee_bps / 10000
+        direction = 1.0 if order.is_buy else -1.0
+        slippage = direction * (price - order.arrival_mid) * qty * order.contract_value
+        order.filled_qty += qty
+        order.filled_notional += notional
+        order.fees += fee
+        done = order.remaining <= order.qty * QTY_EPSILON
+        order.status = transition(order.status, OrderStatus.FILLED if done else OrderStatus.PARTIAL)
+        update.status = order.status
+        update.fills.append(PaperFill(price, qty, notional, fee, slippage, liquidity))
+
+    def _cancel(self, order: PaperOrder, reason: str, update: OrderUpdate) -> None:
+        order.status = transition(order.status, OrderStatus.CANCELED)
+        order.reason = reason
+        update.status = order.status
+        resting = self._resting.get(order.symbol)
+        if resting is not None and order.order_id in self.orders:
+            self._prune(resting, order.is_buy, order.price)
+
+    def _prune(self, resting: _Resting, is_buy: bool, price: float) -> bool:
+        # Drops closed orders from a level; returns True when the level is gone.
+        levels = resting.levels[is_buy]
+        queue = levels[price]
+        live = [order for order in queue if order.is_open]
+        for order in queue:
+            if not order.is_open:
+                self.orders.pop(order.order_id, None)
+        if live:
+            levels[price] = live
+            return False
+        del levels[price]
+        del resting.visible[is_buy][price]
+        keys = resting.keys[is_buy]
+        keys.pop(bisect.bisect_left(keys, _key(is_buy, price)))
+        return True
+
+    def _update(
+        self, updates: dict[str, OrderUpdate], order: PaperOrder, ts_ms: int
+    ) -> OrderUpdate:
+        update = updates.get(order.order_id)
+        if update is None:
+            update = updates[order.order_id] = OrderUpdate(order, order.status, ts_ms)
+        return update
+
+
+@lru_cache
+def get_paper_matcher() -> PaperMatchingEngine:
+    settings = get_settings()
+    return PaperMatchingEngine(
+        get_book_engine(),
+        maker_fee_bps=settings.paper_maker_fee_bps,
+        taker_fee_bps=settings.paper_taker_fee_bps,
+        max_book_age_sec=settings.orderbook_max_age_sec,
+    )
@@ -0,0 +1,687 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import itertools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+from functools import lru_cache
+from urllib.parse import urlencode
+
+import httpx
+import orjson
+import websockets
+from prometheus_client import Counter, Histogram
+
+from packages.common.config import get_settings
+from packages.common.ratelimit import TokenBucket
+from packages.data.orderbook import RECONNECT_BACKOFF_SEC
+
+logger = logging.getLogger(__name__)
+
+ORDER_ACK_LATENCY = Histogram(
+    "okx_order_ack_seconds",
+    "Order request submit to exchange ack",
+    ["op", "transport"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+REST_FALLBACKS = Counter(
+    "okx_order_rest_fallbacks_total",
+    "Order requests sent over REST because the private websocket was down",
+    ["op"],
+)
+SESSION_RECONNECTS = Counter(
+    "okx_private_ws_reconnects_total", "Private websocket reconnect attempts"
+)
+
+WS_PRIVATE_URL = "wss://ws.okx.com:8443/ws/v5/private"
+WS_PRIVATE_DEMO_URL = "wss://wspap.okx.com:8443/ws/v5/private?brokerId=9999"
+MAX_BATCH = 20
+# OKX drops a private connection after 30s without traffic.
+PING_INTERVAL_SEC = 25.0
+
+# OKX derivatives trade limits as (per second, burst): 60 requests per 2s for single orders
+# and cancels, 300 orders per 2s for the batch endpoints. Both are counted per instrument
+# and shared between REST and the websocket, so one budget covers both transports.
+RATE_LIMITS: dict[str, tuple[float, float]] = {
+    "order": (30.0, 60.0),
+    "batch-orders": (150.0, 300.0),
+    "cancel-order": (30.0, 60.0),
+    "batch-cancel-orders": (150.0, 300.0),
+    "orders-pending": (30.0, 60.0),
+    "order-details": (30.0, 60.0),
+    "positions": (5.0, 10.0),
+    "instruments": (10.0, 20.0),
+}
+REST_PATHS = {
+    "order": "/api/v5/trade/order",
+    "batch-orders": "/api/v5/trade/batch-orders",
+    "cancel-order": "/api/v5/trade/cancel-order",
+    "batch-cancel-orders": "/api/v5/trade/cancel-batch-orders",
+    "orders-pending": "/api/v5/trade/orders-pending",
+    "order-details": "/api/v5/trade/order",
+    "positions": "/api/v5/account/positions",
+    "instruments": "/api/v5/public/instruments",
+}
+PAGE_LIMIT = 100
+BATCH_OPS = {"order": "batch-orders", "cancel-order": "batch-cancel-orders"}
+ORDER_STATES = {
+    "live": "NEW",
+    "partially_filled": "PARTIAL",
+    "filled": "FILLED",
+    "canceled": "CANCELED",
+    "mmp_canceled": "CANCELED",
+}
+
+
+class GatewayError(RuntimeError):
+    pass
+
+
+# The request never reached the exchange; safe to resend on another transport.
+class SessionUnavailable(GatewayError):
+    pass
+
+
+# The request was sent but no ack came back, so the order state is unknown.
+class AckTimeout(GatewayError):
+    pass
+
+
+@dataclass(frozen=True)
+class OkxCredentials:
+    api_key: str
+    secret: str
+    passphrase: str
+
+    def sign(self, message: str) -> str:
+        digest = hmac.new(self.secret.encode(), message.encode(), hashlib.sha256).digest()
+        return base64.b64encode(digest).decode()
+
+    def login_args(self) -> dict:
+        timestamp = str(int(time.time()))
+        return {
+            "apiKey": self.api_key,
+            "passphrase": self.passphrase,
+            "timestamp": timestamp,
+            "sign": self.sign(f"{timestamp}GET/users/self/verify"),
+        }
+
+
+@dataclass
+class OrderAck:
+    cl_ord_id: str
+    ord_id: str | None
+    accepted: bool
+    code: str
+    message: str
+    transport: str
+    latency_sec: float
+
+
+def client_order_id(plan_id: str) -> str:
+    # Deterministic so a resent plan hits OKX's duplicate clOrdId check.
+    return hashlib.sha1(plan_id.encode()).hexdigest()[:32]
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.8f}".rstrip("0").rstrip(".")
+
+
+ORDER_SIDES = {"long": "buy", "short": "sell"}
+INST_TYPES = {"perp": "SWAP", "spot": "SPOT"}
+# Entry types sent as plain orders; stop and if-touched entries would need OKX algo orders.
+LIVE_ORDER_TYPES = ("limit", "market")
+# Marks an ack for an order refused here, before it was sent.
+LOCAL_REJECT = "local"
+
+
+# Anything but an explicit long or short is refused rather than defaulted to a side.
+def order_side(side: str) -> str:
+    try:
+        return ORDER_SIDES[side]
+    except KeyError:
+        raise ValueError(f"unsupported order side: {side!r}") from None
+
+
+# Sizes and prices OKX accepts for one instrument, as the decimal strings it publishes.
+@dataclass(frozen=True)
+class InstrumentSpec:
+    inst_id: str
+    tick_sz: str
+    lot_sz: str
+    min_sz: str
+
+    @classmethod
+    def from_row(cls, row: dict) -> InstrumentSpec:
+        return cls(row["instId"], row["tickSz"], row["lotSz"], row["minSz"])
+
+
+def _to_step(value: float, step: str, rounding: str) -> str:
+    # Float noise is rounded off first, so 990.0899999999999 floors to 990.09, not 990.08.
+    step = Decimal(step)
+    steps = (Decimal(repr(round(value, 9))) / step).to_integral_value(rounding=rounding)
+    return _fmt(float(steps * step))
+
+
+def order_type(instruction: dict) -> str:
+    # Anything else would rest as a plain limit at a marketable price, so it is refused.
+    if instruction["order_type"] not in LIVE_ORDER_TYPES:
+        raise ValueError(f"unsupported order type: {instruction['order_type']!r}")
+    if instruction["post_only"]:
+        return "post_only"
+    if instruction["order_type"] == "market":
+        return "market"
+    if instruction.get("tif") in ("IOC", "FOK"):
+        return instruction["tif"].lower()
+    return "limit"
+
+
+# With a spec the size is floored to the lot size and the price rounded away from the touch
+# to the tick size, so rounding never makes an order bigger or more aggressive.
+def order_args(instruction: dict, spec: InstrumentSpec | None = None) -> dict:
+    ord_type = order_type(instruction)
+    side = order_side(instruction["side"])
+    margin_mode = instruction["payload"]["sizing"].get("margin_mode", "cross")
+    size = _fmt(instruction["qty"])
+    price = _fmt(instruction["price"]) if ord_type != "market" else None
+    if spec is not None:
+        size = _to_step(instruction["qty"], spec.lot_sz, ROUND_FLOOR)
+        if Decimal(size) < Decimal(spec.min_sz):
+            raise ValueError(f"size {instruction['qty']:.8g} is below the minimum {spec.min_sz}")
+        if price is not None:
+            price = _to_step(
+                instruction["price"], spec.tick_sz, ROUND_FLOOR if side == "buy" else ROUND_CEILING
+            )
+    args = {
+        "instId": instruction["symbol"],
+        "tdMode": "cash" if instruction["market_type"] == "spot" else margin_mode,
+        "clOrdId": instruction.get("cl_ord_id") or client_order_id(instruction["plan_id"]),
+        "side": side,
+        "ordType": ord_type,
+        "sz": size,
+    }
+    if price is not None:
+        args["px"] = price
+    if instruction["reduce_only"]:
+        args["reduceOnly"] = True
+    return args
+
+
+# Paces requests below the exchange limits; headroom absorbs clock drift against OKX's own
+# windows so bursts are delayed here rather than rejected with 50011.
+class RateScheduler:
+    def __init__(
+        self, limits: dict[str, tuple[float, float]] = RATE_LIMITS, headroom: float = 0.9
+    ) -> None:
+        self.limits = limits
+        self.headroom = headroom
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+
+    def _bucket(self, op: str, inst_id: str) -> TokenBucket:
+        bucket = self._buckets.get((op, inst_id))
+        if bucket is None:
+            rate, capacity = self.limits[op]
+            bucket = TokenBucket(rate * self.headroom, capacity * self.headroom)
+            self._buckets[(op, inst_id)] = bucket
+        return bucket
+
+    async def acquire(self, op: str, inst_ids: list[str]) -> None:
+        # Batch requests spend one token per order on each order's instrument.
+        counts: dict[str, int] = {}
+        for inst_id in inst_ids:
+            counts[inst_id] = counts.get(inst_id, 0) + 1
+        delay = max(self._bucket(op, inst_id).reserve(n) for inst_id, n in counts.items())
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class OkxRestClient:
+    def __init__(
+        self,
+        base_url: str,
+        credentials: OkxCredentials,
+        simulated: bool = False,
+        pool_size: int = 10,
+        timeout_sec: float = 5.0,
+    ) -> None:
+        self.base_url = base_url
+        self.credentials = credentials
+        self.simulated = simulated
+        self.pool_size = pool_size
+        self.timeout_sec = timeout_sec
+        self._client: httpx.AsyncClient | None = None
+
+    def _headers(self, method: str, request_path: str, body: str) -> dict:
+        now = datetime.now(timezone.utc)
+        timestamp = now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}Z"
+        headers = {
+            "OK-ACCESS-KEY": self.credentials.api_key,
+            "OK-ACCESS-SIGN": self.credentials.sign(f"{timestamp}{method}{request_path}{body}"),
+            "OK-ACCESS-TIMESTAMP": timestamp,
+            "OK-ACCESS-PASSPHRASE": self.credentials.passphrase,
+            "Content-Type": "application/json",
+        }
+        if self.simulated:
+            headers["x-simulated-trading"] = "1"
+        return headers
+
+    async def request(
+        self, method: str, path: str, body: dict | list | None = None, params: dict | None = None
+    ) -> dict:
+        if self._client is None:
+            # Keep-alive pool so fallbacks skip the TCP and TLS handshake.
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout_sec,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                    keepalive_expiry=60.0,
+                ),
+            )
+        request_path = f"{path}?{urlencode(params)}" if params else path
+        content = orjson.dumps(body).decode() if body is not None else ""
+        response = await self._client.request(
+            method,
+            request_path,
+            content=content or None,
+            headers=self._headers(method, request_path, content),
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# One authenticated connection carrying order requests and the orders channel. Requests
+# are matched to responses by id. On disconnect it logs in and resubscribes with backoff;
+# requests in flight fail with AckTimeout since the exchange may already have them.
+class OkxPrivateSession:
+    def __init__(
+        self,
+        url: str,
+        credentials: OkxCredentials,
+        on_orders=None,
+        timeout_sec: float = 5.0,
+    ) -> None:
+        self.url = url
+        self.credentials = credentials
+        self.on_orders = on_orders
+        self.timeout_sec = timeout_sec
+        self._socket = None
+        self._pending: dict[str, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._task: asyncio.Task | None = None
+
+    @property
+    def connected(self) -> bool:
+        return self._socket is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def request(self, op: str, args: list[dict]) -> dict:
+        socket = self._socket
+        if socket is None:
+            raise SessionUnavailable("private websocket not connected")
+        request_id = str(next(self._ids))
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            try:
+                await socket.send(orjson.dumps({"id": request_id, "op": op, "args": args}).decode())
+            except websockets.ConnectionClosed as exc:
+                raise SessionUnavailable("private websocket closed") from exc
+            try:
+                return await asyncio.wait_for(future, self.timeout_sec)
+            except asyncio.TimeoutError as exc:
+                raise AckTimeout(f"no ack for {op} request {request_id}") from exc
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _run(self) -> None:
+        attempt = 0
+        while True:
+            try:
+                async with websockets.connect(self.url, ping_interval=None) as socket:
+                    await self._handshake(socket)
+                    self._socket = socket
+                    attempt = 0
+                    logger.info("okx private session ready")
+                    pinger = asyncio.create_task(self._ping(socket))
+                    try:
+                        async for raw in socket:
+                            self._dispatch(raw)
+                    finally:
+                        pinger.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("okx private session dropped", exc_info=True)
+            finally:
+                self._socket = None
+                self._fail_pending()
+            delay = RECONNECT_BACKOFF_SEC[min(attempt, len(RECONNECT_BACKOFF_SEC) - 1)]
+            attempt += 1
+            SESSION_RECONNECTS.inc()
+            await asyncio.sleep(delay)
+
+    async def _handshake(self, socket) -> None:
+        login = {"op": "login", "args": [self.credentials.login_args()]}
+        await socket.send(orjson.dumps(login).decode())
+        await self._expect(socket, "login")
+        subscribe = {"op": "subscribe", "args": [{"channel": "orders", "instType": "ANY"}]}
+        await socket.send(orjson.dumps(subscribe).decode())
+        await self._expect(socket, "subscribe")
+
+    async def _expect(self, socket, event: str) -> None:
+        while True:
+            raw = await asyncio.wait_for(socket.recv(), self.timeout_sec)
+            message = orjson.loads(raw)
+            if message.get("event") == "error" or message.get("code") not in (None, "0"):
+                raise GatewayError(
+                    f"okx {event} failed: {message.get('code')} {message.get('msg')}"
+                )
+            if message.get("event") == event:
+                return
+
+    async def _ping(self, socket) -> None:
+        while True:
+            await asyncio.sleep(PING_INTERVAL_SEC)
+            await socket.send("ping")
+
+    def _dispatch(self, raw: str | bytes) -> None:
+        if raw == "pong":
+            return
+        message = orjson.loads(raw)
+        request_id = message.get("id")
+        if request_id is not None:
+            future = self._pending.get(request_id)
+            if future is not None and not future.done():
+                future.set_result(message)
+            return
+        if message.get("arg", {}).get("channel") == "orders" and "data" in message:
+            if self.on_orders is not None:
+                self.on_orders(message["data"])
+        elif message.get("event") == "error":
+            logger.warning(
+                "okx private session error: %s %s", message.get("code"), message.get("msg")
+            )
+
+    def _fail_pending(self) -> None:
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(AckTimeout("private websocket closed before the ack"))
+
+
+# Live order entry. Orders and cancels queued within batch_window_sec of each other go out
+# as one batch request of up to 20, over the private websocket when it is up and the pooled
+# REST client otherwise. Order pushes from the orders channel collect in `updates`.
+class OkxGateway:
+    def __init__(
+        self,
+        rest: OkxRestClient,
+        session: OkxPrivateSession | None = None,
+        scheduler: RateScheduler | None = None,
+        batch_window_sec: float = 0.002,
+        timeout_sec: float = 5.0,
+    ) -> None:
+        self.rest = rest
+        self.session = session
+        self.scheduler = scheduler or RateScheduler()
+        self.batch_window_sec = batch_window_sec
+        self.timeout_sec = timeout_sec
+        self.updates: deque[dict] = deque()
+        self.instruments: dict[str, InstrumentSpec] = {}
+        self._instrument_fetches: dict[str, asyncio.Future] = {}
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._queues: dict[str, list[tuple[dict, asyncio.Future]]] = {
+            "order": [],
+            "cancel-order": [],
+        }
+        self._flushes: dict[str, asyncio.TimerHandle | None] = {"order": None, "cancel-order": None}
+        if session is not None:
+            session.on_orders = self.updates.extend
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        if self.session is not None:
+            self.session.start()
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+        await self.rest.close()
+
+    def drain(self) -> list[dict]:
+        pushes = []
+        while self.updates:
+            pushes.append(self.updates.popleft())
+        return pushes
+
+    async def place_orders(self, instructions: list[dict]) -> list[OrderAck]:
+        return list(
+            await asyncio.gather(*(self._place(instruction) for instruction in instructions))
+        )
+
+    async def cancel_orders(self, orders: list[tuple[str, str]]) -> list[OrderAck]:
+        # orders: (instId, clOrdId) pairs.
+        return list(
+            await asyncio.gather(
+                *(
+                    self._enqueue("cancel-order", {"instId": inst_id, "clOrdId": cl_ord_id})
+                    for inst_id, cl_ord_id in orders
+                )
+            )
+        )
+
+    async def pending_orders(self) -> list[dict]:
+        rows: list[dict] = []
+        params = {"limit": str(PAGE_LIMIT)}
+        while True:
+            page = await self._query("orders-pending", params)
+            rows.extend(page)
+            if len(page) < PAGE_LIMIT:
+                return rows
+            params["after"] = page[-1]["ordId"]
+
+    async def order_details(self, inst_id: str, cl_ord_id: str) -> dict | None:
+        rows = await self._query(
+            "order-details", {"instId": inst_id, "clOrdId": cl_ord_id}, inst_id
+        )
+        return rows[0] if rows else None
+
+    async def instrument(self, inst_id: str, market_type: str = "perp") -> InstrumentSpec:
+        # Fetched once per instrument and kept for the life of the gateway; orders arriving
+        # together share the one fetch, so they still land in the same batch window.
+        spec = self.instruments.get(inst_id)
+        if spec is not None:
+            return spec
+        fetch = self._instrument_fetches.get(inst_id)
+        if fetch is None:
+            fetch = asyncio.ensure_future(self._fetch_instrument(inst_id, market_type))
+            self._instrument_fetches[inst_id] = fetch
+            fetch.add_done_callback(lambda _: self._instrument_fetches.pop(inst_id, None))
+        return await asyncio.shield(fetch)
+
+    async def positions(self) -> dict[str, float]:
+        # Net contracts per instrument; long/short mode legs are netted.
+        net: dict[str, float] = {}
+        for row in await self._query("positions", {}):
+            pos = float(row.get("pos") or 0)
+            if row.get("posSide") == "short":
+                pos = -abs(pos)
+            net[row["instId"]] = net.get(row["instId"], 0.0) + pos
+        return net
+
+    # Blocking wrappers for sync callers on worker threads; the gateway lives on self.loop.
+    def place_orders_blocking(self, instructions: list[dict]) -> list[OrderAck]:
+        return self.run_blocking(self.place_orders(instructions))
+
+    def cancel_orders_blocking(self, orders: list[tuple[str, str]]) -> list[OrderAck]:
+        return self.run_blocking(self.cancel_orders(orders))
+
+    def run_blocking(self, coro):
+        if self.loop is None:
+            coro.close()
+            raise GatewayError("okx gateway not started")
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return future.result(self.timeout_sec * 2)
+
+    async def _fetch_instrument(self, inst_id: str, market_type: str) -> InstrumentSpec:
+        rows = await self._query(
+            "instruments", {"instType": INST_TYPES[market_type], "instId": inst_id}
+        )
+        if not rows:
+            raise GatewayError(f"okx instrument {inst_id} not found")
+        spec = self.instruments[inst_id] = InstrumentSpec.from_row(rows[0])
+        return spec
+
+    async def _place(self, instruction: dict) -> OrderAck:
+        spec = await self.instrument(instruction["symbol"], instruction["market_type"])
+        try:
+            args = order_args(instruction, spec)
+        except ValueError as exc:
+            return OrderAck(
+                cl_ord_id=instruction.get("cl_ord_id") or client_order_id(instruction["plan_id"]),
+                ord_id=None,
+                accepted=False,
+                code=LOCAL_REJECT,
+                message=str(exc),
+                transport="none",
+                latency_sec=0.0,
+            )
+        return await self._enqueue("order", args)
+
+    async def _enqueue(self, op: str, args: dict) -> OrderAck:
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues[op]
+        queue.append((args, future))
+        if len(queue) >= MAX_BATCH:
+            self._flush(op)
+        elif self._flushes[op] is None:
+            self._flushes[op] = asyncio.get_running_loop().call_later(
+                self.batch_window_sec, self._flush, op
+            )
+        return await future
+
+    def _flush(self, op: str) -> None:
+        handle = self._flushes[op]
+        if handle is not None:
+            handle.cancel()
+            self._flushes[op] = None
+        queue = self._queues[op]
+        while queue:
+            batch, queue[:] = queue[:MAX_BATCH], queue[MAX_BATCH:]
+            asyncio.create_task(self._send_batch(op, batch))
+
+    async def _send_batch(self, op: str, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        args = [item for item, _ in batch]
+        try:
+            acks = await self._send(op if len(args) == 1 else BATCH_OPS[op], args)
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), ack in zip(batch, acks):
+            if not future.done():
+                future.set_result(ack)
+
+    async def _query(self, op: str, params: dict, inst_id: str = "") -> list[dict]:
+        await self.scheduler.acquire(op, [inst_id])
+        body = await self.rest.request("GET", REST_PATHS[op], params=params)
+        code = body.get("code")
+        if code == "51603":
+            # Order does not exist.
+            return []
+        if code != "0":
+            raise GatewayError(f"okx {op} failed: {code} {body.get('msg')}")
+        return body.get("data") or []
+
+    async def _send(self, op: str, args: list[dict]) -> list[OrderAck]:
+        await self.scheduler.acquire(op, [item["instId"] for item in args])
+        started = time.perf_counter()
+        transport = "ws"
+        try:
+            if self.session is None:
+                raise SessionUnavailable("no private websocket")
+            response = await self.session.request(op, args)
+        except SessionUnavailable:
+            transport = "rest"
+            REST_FALLBACKS.labels(op=op).inc()
+            body = args if op in BATCH_OPS.values() else args[0]
+            response = await self.rest.request("POST", REST_PATHS[op], body)
+        latency = time.perf_counter() - started
+        ORDER_ACK_LATENCY.labels(op=op, transport=transport).observe(latency)
+        return _acks(args, response, transport, latency)
+
+
+def _acks(args: list[dict], response: dict, transport: str, latency: float) -> list[OrderAck]:
+    # code "0" all accepted, "1" all failed, "2" partial; per-order sCode decides.
+    by_id = {item.get("clOrdId"): item for item in response.get("data") or []}
+    acks = []
+    for item in args:
+        data = by_id.get(item["clOrdId"], {})
+        code = data.get("sCode", response.get("code", ""))
+        acks.append(
+            OrderAck(
+                cl_ord_id=item["clOrdId"],
+                ord_id=data.get("ordId") or None,
+                accepted=code == "0",
+                code=code,
+                message=data.get("sMsg") or response.get("msg", ""),
+                transport=transport,
+                latency_sec=latency,
+            )
+        )
+    return acks
+
+
+@lru_cache
+def get_okx_gateway() -> OkxGateway:
+    settings = get_settings()
+    if not (settings.okx_api_key and settings.okx_api_secret and settings.okx_api_passphrase):
+        raise GatewayError("OKX_API_KEY, OKX_API_SECRET and OKX_API_PASSPHRASE are required")
+    credentials = OkxCredentials(
+        settings.okx_api_key, settings.okx_api_secret, settings.okx_api_passphrase
+    )
+    ws_url = settings.okx_ws_private_url or (
+        WS_PRIVATE_DEMO_URL if settings.okx_use_sandbox else WS_PRIVATE_URL
+    )
+    return OkxGateway(
+        rest=OkxRestClient(
+            settings.okx_rest_base,
+            credentials,
+            simulated=settings.okx_use_sandbox,
+            pool_size=settings.okx_rest_pool_size,
+            timeout_sec=settings.okx_order_timeout_sec,
+        ),
+        session=(
+            OkxPrivateSession(ws_url, credentials, timeout_sec=settings.okx_order_timeout_sec)
+            if settings.okx_ws_orders_enabled
+            else None
+        ),
+        batch_window_sec=settings.okx_batch_window_ms / 1000,
+        timeout_sec=settings.okx_order_timeout_sec,
+    )
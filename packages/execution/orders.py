@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from enum import Enum
+
+
+class OrderStatus(str, Enum):
+    NEW = "NEW"
+    PARTIAL = "PARTIAL"
+    FILLED = "FILLED"
+    CANCELED = "CANCELED"
+    REJECTED = "REJECTED"
+    ERROR = "ERROR"
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+OPEN_STATUSES = frozenset({OrderStatus.NEW, OrderStatus.PARTIAL})
+
+TRANSITIONS: dict[OrderStatus, frozenset[OrderStatus]] = {
+    OrderStatus.NEW: frozenset(
+        {
+            OrderStatus.PARTIAL,
+            OrderStatus.FILLED,
+            OrderStatus.CANCELED,
+            OrderStatus.REJECTED,
+            OrderStatus.ERROR,
+        }
+    ),
+    OrderStatus.PARTIAL: frozenset(
+        {OrderStatus.PARTIAL, OrderStatus.FILLED, OrderStatus.CANCELED, OrderStatus.ERROR}
+    ),
+}
+
+
+def transition(current: OrderStatus, target: OrderStatus) -> OrderStatus:
+    if target not in TRANSITIONS.get(current, ()):
+        raise InvalidTransition(f"order cannot move from {current.value} to {target.value}")
+    return target
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+
+from prometheus_client import Counter, Histogram
+
+from packages.adapters.hub import ContextSnapshot, get_adapter_hub
+from packages.audit.service import log_event
+from packages.common.config import get_settings
+from packages.common.repository import Repository
+from packages.planner.llm import get_planner_llm
+from packages.planner.planner import build_rule_plan, persist_plans, plan_row, validate_plans
+from packages.regime.engine import RegimeState, infer_regime
+from packages.risk.state import current_risk_state
+from packages.signals.extractors import Signal, SignalExtractor
+
+logger = logging.getLogger(__name__)
+
+PLAN_BATCH_LATENCY = Histogram(
+    "plan_batch_latency_seconds",
+    "Wall time of one multi-symbol plan generation cycle",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90),
+)
+PLAN_BATCH_PLANS = Counter("plan_batch_plans_total", "Plans produced by batch cycles", ["valid"])
+
+
+@dataclass
+class SymbolFeatures:
+    symbol: str
+    signals: list[Signal]
+    regime: RegimeState
+    context: ContextSnapshot
+
+
+def extract_features(symbol: str) -> SymbolFeatures:
+    return SymbolFeatures(
+        symbol=symbol,
+        signals=SignalExtractor().extract(symbol),
+        regime=infer_regime(symbol),
+        context=get_adapter_hub().snapshot(symbol),
+    )
+
+
+def feature_summary(item: SymbolFeatures, risk_state: str) -> dict:
+    context = item.context
+    return {
+        "risk_state": risk_state,
+        "regime": item.regime.__dict__,
+        "signals": {signal.name: [signal.value, signal.confidence] for signal in item.signals},
+        "events": [
+            {
+                "headline": event.headline,
+                "impact": event.impact_score,
+                "sentiment": event.sentiment_score,
+            }
+            for event in context.events
+            if event.confidence > 0
+        ],
+        "trends": {trend.keyword: trend.score for trend in context.trends if trend.confidence > 0},
+        "onchain": context.onchain.metrics,
+        "degraded_sources": context.degraded,
+    }
+
+
+async def llm_candidates(
+    features: list[SymbolFeatures], market_type: str
+) -> dict[str, tuple[dict, dict]]:
+    # Returns symbol -> (first candidate, audited LLM output). Failed calls fall back to rules.
+    llm = get_planner_llm()
+    risk_state = current_risk_state().risk_state
+    results = await asyncio.gather(
+        *(
+            llm.plan(item.symbol, market_type, feature_summary(item, risk_state))
+            for item in features
+        ),
+        return_exceptions=True,
+    )
+    candidates = {}
+    for item, result in zip(features, results):
+        if isinstance(result, BaseException):
+            logger.warning("llm planner failed for %s: %s", item.symbol, result)
+            continue
+        output = {"plans": result.plans, "explanation": result.explanation, "cached": result.cached}
+        candidates[item.symbol] = (result.plans[0], output)
+    return candidates
+
+
+# Feature extraction reads incrementally maintained in-process state and only blocks on
+# the throttled DB catch-up, so threads beat a process pool that would have to ship it.
+@lru_cache
+def get_feature_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=get_settings().plan_batch_workers, thread_name_prefix="plan-features"
+    )
+
+
+async def generate_plans_batch(
+    symbols: list[str],
+    market_type: str = "perp",
+    llm_outputs: dict[str, dict] | None = None,
+    refresh_context: bool = True,
+    use_llm: bool | None = None,
+    executor: ThreadPoolExecutor | None = None,
+    repository: Repository | None = None,
+) -> list[dict]:
+    started = time.perf_counter()
+    symbols = list(dict.fromkeys(symbols))
+    llm_outputs = llm_outputs or {}
+    loop = asyncio.get_running_loop()
+    executor = executor or get_feature_executor()
+    features = await asyncio.gather(
+        *(loop.run_in_executor(executor, extract_features, symbol) for symbol in symbols)
+    )
+
+    if refresh_context:
+        # Refreshed together, so sources shared across symbols (the news feed) are fetched once.
+        hub = get_adapter_hub()
+        outdated = [
+            item
+            for item in features
+            if "missing" in item.context.degraded or "stale" in item.context.degraded
+        ]
+        refreshed = await asyncio.gather(*(hub.refresh(item.symbol) for item in outdated))
+        for item, context in zip(outdated, refreshed):
+            item.context = context
+
+    if use_llm is None:
+        use_llm = get_settings().llm_planner_enabled
+    if use_llm:
+        pending = [item for item in features if item.symbol not in llm_outputs]
+        generated = await llm_candidates(pending, market_type)
+    else:
+        generated = {}
+
+    plans = []
+    outputs = []
+    for symbol in symbols:
+        if symbol in llm_outputs:
+            plans.append(llm_outputs[symbol])
+            outputs.append(llm_outputs[symbol])
+        elif symbol in generated:
+            plans.append(generated[symbol][0])
+            outputs.append(generated[symbol][1])
+        else:
+            plans.append(build_rule_plan(symbol, market_type))
+            outputs.append(None)
+    results = validate_plans(plans)
+    rows = [
+        plan_row(plan, output, is_valid)
+        for plan, output, (is_valid, _) in zip(plans, outputs, results)
+    ]
+    await asyncio.to_thread(persist_plans, rows, repository)
+
+    output = []
+    for item, plan, (is_valid, errors) in zip(features, plans, results):
+        plan_id = plan["meta"]["plan_id"]
+        log_event(
+            "signals",
+            {
+                "signals": [signal.__dict__ for signal in item.signals],
+                "regime": item.regime.__dict__,
+                "context": asdict(item.context),
+            },
+            plan_id=plan_id,
+        )
+        log_event(
+            "plan_generated",
+            {"plan": plan, "schema_valid": is_valid, "errors": errors},
+            plan_id=plan_id,
+        )
+        PLAN_BATCH_PLANS.labels(valid=str(is_valid).lower()).inc()
+        output.append({"plan": plan, "schema_valid": is_valid, "errors": errors})
+    PLAN_BATCH_LATENCY.observe(time.perf_counter() - started)
+    return output
+
+
+async def run_plans(symbols: list[str], market_type: str = "perp") -> list[dict]:
+    # Celery runs each cycle in a fresh event loop, so the HTTP clients cannot outlive it.
+    try:
+        return await generate_plans_batch(symbols, market_type)
+    finally:
+        await get_adapter_hub().close()
+        await get_planner_llm().close()
+
+
+async def run_plan_batch(symbols: list[str], market_type: str = "perp") -> int:
+    return len(await run_plans(symbols, market_type))
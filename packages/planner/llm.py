@@ -0,0 +1,373 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import time
+import weakref
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import AsyncIterator, Protocol
+from uuid import uuid4
+
+import httpx
+import orjson
+from prometheus_client import Counter, Histogram
+
+from packages.adapters.base import TTLCache
+from packages.audit.service import log_event
+from packages.common.config import get_settings
+from packages.common.logging import sanitize
+from packages.planner.planner import build_rule_plan, precheck_plan
+from packages.planner.stream import PlanStream, PlanStreamError
+
+SYSTEM_PROMPT = (
+    "You are the trade planner of an automated crypto trading system. Reply with one JSON "
+    'object {{"plans": [...], "explanation": "..."}} and nothing else. "plans" holds 1 to '
+    "{max_candidates} candidate trade plans, each following the trade plan schema; every plan "
+    "must carry a stop loss. The explanation is at most three sentences. Never include code, "
+    "tool calls or requests for credentials. Plans are only candidates: the risk engine "
+    "decides what is executed."
+)
+
+LLM_CALL_LATENCY = Histogram(
+    "llm_call_latency_seconds",
+    "Planner LLM call latency",
+    ["backend", "outcome"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120),
+)
+LLM_FIRST_TOKEN_LATENCY = Histogram(
+    "llm_first_token_latency_seconds",
+    "Time until the first streamed token",
+    ["backend"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15),
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Planner LLM tokens", ["backend", "kind"])
+LLM_REQUESTS = Counter("llm_requests_total", "Planner LLM requests by cache result", ["result"])
+LLM_ABORTS = Counter("llm_aborts_total", "Planner LLM calls aborted", ["reason"])
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+@dataclass
+class Delta:
+    text: str = ""
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+
+
+class LLMBackend(Protocol):
+    name: str
+
+    def stream(
+        self, messages: list[dict], model: str, temperature: float
+    ) -> AsyncIterator[Delta]: ...
+
+    async def close(self) -> None: ...
+
+
+@dataclass
+class LLMResult:
+    plans: list[dict]
+    explanation: str
+    raw: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency_sec: float
+    cached: bool = False
+    candidates: list[str] = field(default_factory=list)
+
+
+# Deterministic stand-in for tests and offline runs. Streams a canned or computed response
+# in small chunks, so callers exercise the same incremental parsing as a real model.
+class FakeLLMBackend:
+    name = "fake"
+
+    def __init__(self, responder=None, chunk_chars: int = 24, delay_sec: float = 0.0) -> None:
+        self.responder = responder or self._flat_plan
+        self.chunk_chars = chunk_chars
+        self.delay_sec = delay_sec
+        self.calls = 0
+
+    async def stream(
+        self, messages: list[dict], model: str, temperature: float
+    ) -> AsyncIterator[Delta]:
+        self.calls += 1
+        request = orjson.loads(messages[-1]["content"])
+        text = self.responder(request)
+        if not isinstance(text, str):
+            text = orjson.dumps(text).decode()
+        for start in range(0, len(text), self.chunk_chars):
+            if self.delay_sec:
+                await asyncio.sleep(self.delay_sec)
+            yield Delta(text=text[start : start + self.chunk_chars])
+        prompt_chars = sum(len(message["content"]) for message in messages)
+        yield Delta(prompt_tokens=prompt_chars // 4, completion_tokens=len(text) // 4)
+
+    async def close(self) -> None:
+        return None
+
+    @staticmethod
+    def _flat_plan(request: dict) -> dict:
+        plan = build_rule_plan(request["symbol"], request["market_type"])
+        plan["rationale"]["notes"] = "fake model: no edge, stay flat"
+        return {"plans": [plan], "explanation": "No edge in the supplied features."}
+
+
+# Any server speaking the OpenAI chat completions API with server-sent events.
+class OpenAICompatibleBackend:
+    name = "openai"
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str | None = None,
+        timeout_sec: float = 60.0,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout_sec = timeout_sec
+        self._client = client
+
+    async def stream(
+        self, messages: list[dict], model: str, temperature: float
+    ) -> AsyncIterator[Delta]:
+        if self._client is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url, timeout=self.timeout_sec, headers=headers
+            )
+        body = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+            "response_format": {"type": "json_object"},
+        }
+        async with self._client.stream("POST", "/chat/completions", json=body) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise LLMError(f"llm backend returned {response.status_code}: {response.text}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                event = orjson.loads(data)
+                for choice in event.get("choices") or []:
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        yield Delta(text=content)
+                usage = event.get("usage")
+                if usage:
+                    yield Delta(
+                        prompt_tokens=usage.get("prompt_tokens"),
+                        completion_tokens=usage.get("completion_tokens"),
+                    )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def build_messages(
+    symbol: str, market_type: str, features: dict, max_candidates: int = 3
+) -> list[dict]:
+    request = {"symbol": symbol, "market_type": market_type, **sanitize(features)}
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT.format(max_candidates=max_candidates)},
+        {"role": "user", "content": orjson.dumps(request, option=orjson.OPT_SORT_KEYS).decode()},
+    ]
+
+
+def prompt_key(backend: str, model: str, temperature: float, messages: list[dict]) -> str:
+    payload = {"backend": backend, "model": model, "temperature": temperature, "messages": messages}
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def candidate_check(symbol: str, market_type: str):
+    def check(plan: dict) -> str | None:
+        error = precheck_plan(plan)
+        if error is not None:
+            return error
+        meta = plan["meta"]
+        if meta["symbol"] != symbol or meta["market_type"] != market_type:
+            return f"plan is for {meta['symbol']}/{meta['market_type']}"
+        return None
+
+    return check
+
+
+class PlannerLLM:
+    def __init__(
+        self,
+        backend: LLMBackend,
+        model: str = "",
+        temperature: float = 0.2,
+        max_concurrency: int = 4,
+        cache_ttl_sec: float = 300.0,
+        max_candidates: int = 3,
+        timeout_sec: float = 60.0,
+    ) -> None:
+        self.backend = backend
+        self.model = model
+        self.temperature = temperature
+        self.max_concurrency = max_concurrency
+        self.max_candidates = max_candidates
+        self.timeout_sec = timeout_sec
+        self.cache = TTLCache(cache_ttl_sec, 0.0)
+        self._inflight: dict[str, asyncio.Future] = {}
+        # Semaphores bind to an event loop; Celery tasks each run in a fresh one.
+        self._semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    async def plan(self, symbol: str, market_type: str, features: dict) -> LLMResult:
+        messages = build_messages(symbol, market_type, features, self.max_candidates)
+        key = prompt_key(self.backend.name, self.model, self.temperature, messages)
+        entry = self.cache.get(key)
+        if entry is not None:
+            LLM_REQUESTS.labels(result="hit").inc()
+            result = copy.deepcopy(entry.value)
+            result.cached = True
+            return self._stamp(result, symbol)
+        # Identical prompts already in flight share one backend call.
+        future = self._inflight.get(key)
+        if future is None:
+            LLM_REQUESTS.labels(result="miss").inc()
+            future = asyncio.ensure_future(self._call(key, symbol, market_type, messages))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            LLM_REQUESTS.labels(result="coalesced").inc()
+        result = await asyncio.shield(future)
+        return self._stamp(copy.deepcopy(result), symbol)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def _call(
+        self, key: str, symbol: str, market_type: str, messages: list[dict]
+    ) -> LLMResult:
+        backend = self.backend.name
+        parser = PlanStream(candidate_check(symbol, market_type), self.max_candidates)
+        prompt_tokens = completion_tokens = 0
+        async with self._semaphore():
+            started = time.perf_counter()
+            first_token = None
+            stream = self.backend.stream(messages, self.model, self.temperature)
+            outcome = "error"
+            try:
+                async with asyncio.timeout(self.timeout_sec):
+                    async for delta in stream:
+                        if delta.text:
+                            if first_token is None:
+                                first_token = time.perf_counter()
+                                LLM_FIRST_TOKEN_LATENCY.labels(backend=backend).observe(
+                                    first_token - started
+                                )
+                            parser.feed(delta.text)
+                        prompt_tokens = delta.prompt_tokens or prompt_tokens
+                        completion_tokens = delta.completion_tokens or completion_tokens
+                body = parser.finish()
+                outcome = "ok"
+            except PlanStreamError as exc:
+                outcome = "invalid"
+                LLM_ABORTS.labels(reason="schema").inc()
+                self._audit(key, messages, parser.text, started, outcome, str(exc))
+                raise
+            except TimeoutError:
+                outcome = "timeout"
+                LLM_ABORTS.labels(reason="timeout").inc()
+                self._audit(key, messages, parser.text, started, outcome, "timeout")
+                raise
+            except Exception as exc:
+                self._audit(key, messages, parser.text, started, outcome, str(exc))
+                raise
+            finally:
+                # Stops generation upstream when the parser aborts early.
+                await stream.aclose()
+                LLM_CALL_LATENCY.labels(backend=backend, outcome=outcome).observe(
+                    time.perf_counter() - started
+                )
+                LLM_TOKENS.labels(backend=backend, kind="prompt").inc(prompt_tokens)
+                LLM_TOKENS.labels(backend=backend, kind="completion").inc(completion_tokens)
+        result = LLMResult(
+            plans=parser.plans,
+            explanation=str(body.get("explanation", "")),
+            raw=parser.text,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency_sec=time.perf_counter() - started,
+        )
+        self.cache.set(key, result)
+        self._audit(key, messages, parser.text, started, outcome, None, result)
+        return result
+
+    def _stamp(self, result: LLMResult, symbol: str) -> LLMResult:
+        # Model-chosen ids are neither unique nor trustworthy.
+        result.candidates = []
+        for plan in result.plans:
+            plan["meta"]["plan_id"] = f"llm-{symbol.lower()}-{uuid4().hex[:8]}"
+            result.candidates.append(plan["meta"]["plan_id"])
+        return result
+
+    def _audit(
+        self,
+        key: str,
+        messages: list[dict],
+        response: str,
+        started: float,
+        outcome: str,
+        error: str | None,
+        result: LLMResult | None = None,
+    ) -> None:
+        log_event(
+            "llm_call",
+            {
+                "backend": self.backend.name,
+                "model": self.model,
+                "prompt_key": key,
+                "messages": messages,
+                "response": response,
+                "outcome": outcome,
+                "error": error,
+                "latency_sec": time.perf_counter() - started,
+                "prompt_tokens": result.prompt_tokens if result else None,
+                "completion_tokens": result.completion_tokens if result else None,
+            },
+        )
+
+
+def build_llm_backend() -> LLMBackend:
+    settings = get_settings()
+    if settings.llm_backend == "openai":
+        return OpenAICompatibleBackend(
+            settings.llm_base_url, settings.llm_api_key, settings.llm_timeout_sec
+        )
+    return FakeLLMBackend()
+
+
+@lru_cache
+def get_planner_llm() -> PlannerLLM:
+    settings = get_settings()
+    return PlannerLLM(
+        backend=build_llm_backend(),
+        model=settings.llm_model,
+        temperature=settings.llm_temperature,
+        max_concurrency=settings.llm_max_concurrency,
+        cache_ttl_sec=settings.llm_cache_ttl_sec,
+        max_candidates=settings.llm_max_candidates,
+        timeout_sec=settings.llm_timeout_sec,
+    )
@@ -1,23 +1,14 @@
 from __future__ import annotations
 
-import json
 from datetime import datetime, timezone
-from pathlib import Path
 from uuid import uuid4
 
 import orjson
-from jsonschema import Draft202012Validator
 
 from packages.audit.service import log_event
-from packages.common.config import get_settings
-from packages.common.models import TradePlan
-from packages.common.db import SessionLocal
-
-
-def load_plan_schema() -> dict:
-    settings = get_settings()
-    schema_path = Path(settings.plan_schema_path)
-    return json.loads(schema_path.read_text())
+from packages.common.metrics import timed
+from packages.common.repository import Repository, get_repository
+from packages.planner.schema import get_plan_validators, load_plan_schema  # noqa: F401
 
 
 def build_rule_plan(symbol: str, market_type: str) -> dict:
@@ -72,36 +63,72 @@ def build_rule_plan(symbol: str, market_type: str) -> dict:
     }
 
 
+@timed("validate_plan")
 def validate_plan(plan: dict) -> tuple[bool, list[str]]:
-    schema = load_plan_schema()
-    validator = Draft202012Validator(schema)
-    errors = [error.message for error in validator.iter_errors(plan)]
-    return (len(errors) == 0, errors)
+    return get_plan_validators().validate(plan)
+
+
+def precheck_plan(plan: dict) -> str | None:
+    return get_plan_validators().first_error(plan)
+
+
+@timed("validate_plans")
+def validate_plans(plans: list[dict], fail_fast: bool = False) -> list[tuple[bool, list[str]]]:
+    registry = get_plan_validators()
+    if not fail_fast:
+        return [registry.validate(plan) for plan in plans]
+    results = []
+    for plan in plans:
+        error = registry.first_error(plan)
+        results.append((True, []) if error is None else (False, [error]))
+    return results
+
+
+def plan_row(plan: dict, llm_output: dict | None, is_valid: bool) -> dict:
+    return {
+        "plan_id": plan["meta"]["plan_id"],
+        "symbol": plan["meta"]["symbol"],
+        "market_type": plan["meta"]["market_type"],
+        "ts": datetime.fromisoformat(plan["meta"]["ts"].replace("Z", "+00:00")),
+        "raw_plan": plan,
+        "llm_output": llm_output,
+        "schema_valid": is_valid,
+    }
+
+
+def persist_plans(rows: list[dict], repository: Repository | None = None) -> None:
+    # One multi-row INSERT for the whole batch instead of a commit per plan.
+    (repository or get_repository()).save_plans(rows)
 
 
+@timed("generate_plan", sample_rate=1.0)
 def generate_plan(symbol: str, market_type: str, llm_output: dict | None = None) -> dict:
     plan = llm_output or build_rule_plan(symbol, market_type)
     is_valid, errors = validate_plan(plan)
 
-    session = SessionLocal()
-    try:
-        record = TradePlan(
-            plan_id=plan["meta"]["plan_id"],
-            symbol=plan["meta"]["symbol"],
-            market_type=plan["meta"]["market_type"],
-            ts=datetime.fromisoformat(plan["meta"]["ts"].replace("Z", "+00:00")),
-            raw_plan=plan,
-            llm_output=llm_output,
-            schema_valid=is_valid,
-        )
-        session.add(record)
-        session.commit()
-    finally:
-        session.close()
+    get_repository().save_plans([plan_row(plan, llm_output, is_valid)])
+
+    log_event(
+        "plan_generated",
+        {"plan": plan, "schema_valid": is_valid, "errors": errors},
+        plan_id=plan["meta"]["plan_id"],
+    )
+    return {"plan": plan, "schema_valid": is_valid, "errors": errors}
+
+
+@timed("generate_plan_async", sample_rate=1.0)
+async def generate_plan_async(
+    symbol: str, market_type: str, llm_output: dict | None = None
+) -> dict:
+    plan = llm_output or build_rule_plan(symbol, market_type)
+    is_valid, errors = validate_plan(plan)
+
+    await get_repository().save_plans_async([plan_row(plan, llm_output, is_valid)])
 
     log_event(
         "plan_generated",
         {"plan": plan, "schema_valid": is_valid, "errors": errors},
+        plan_id=plan["meta"]["plan_id"],
     )
     return {"plan": plan, "schema_valid": is_valid, "errors": errors}
 
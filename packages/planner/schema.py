@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable
+
+from jsonschema import Draft202012Validator
+
+from packages.common.config import get_settings
+
+DEFAULT_SCHEMA_VERSION = "1"
+
+Check = Callable[[Any], "str | None"]
+
+ANNOTATION_KEYWORDS = {"$schema", "$id", "title", "description", "format", "examples", "default"}
+
+TYPE_CHECKS: dict[str, Callable[[Any], bool]] = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "integer": lambda value: (
+        (isinstance(value, int) and not isinstance(value, bool))
+        or (isinstance(value, float) and value.is_integer())
+    ),
+}
+
+
+# JSON equality as jsonschema applies it to enum: booleans never equal numbers, while 1
+# and 1.0 are the same number.
+def json_equal(value: Any, other: Any) -> bool:
+    if isinstance(value, bool) or isinstance(other, bool):
+        return isinstance(value, bool) and isinstance(other, bool) and value == other
+    if TYPE_CHECKS["number"](value) and TYPE_CHECKS["number"](other):
+        return value == other
+    if isinstance(value, dict) and isinstance(other, dict):
+        return value.keys() == other.keys() and all(
+            json_equal(value[key], other[key]) for key in value
+        )
+    if isinstance(value, list) and isinstance(other, list):
+        return len(value) == len(other) and all(map(json_equal, value, other))
+    return type(value) is type(other) and value == other
+
+
+def load_plan_schema(path: str | Path | None = None) -> dict:
+    schema_path = Path(path or get_settings().plan_schema_path)
+    return json.loads(schema_path.read_text())
+
+
+# Compiles the JSON Schema subset used by plan schemas into plain closures. Returns None
+# for schemas using anything else; callers then fall back to the jsonschema validator.
+def compile_schema(schema: dict) -> Check | None:
+    unsupported = (
+        set(schema)
+        - ANNOTATION_KEYWORDS
+        - {
+            "type",
+            "required",
+            "properties",
+            "enum",
+            "minimum",
+            "maximum",
+            "items",
+            "minItems",
+            "maxItems",
+        }
+    )
+    if unsupported:
+        return None
+
+    checks: list[Check] = []
+
+    if "type" in schema:
+        expected = schema["type"]
+        # Union types ("type": [...]) are left to the full validator.
+        type_check = TYPE_CHECKS.get(expected) if isinstance(expected, str) else None
+        if type_check is None:
+            return None
+        checks.append(
+            lambda value: None if type_check(value) else f"{value!r} is not of type {expected!r}"
+        )
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+        checks.append(
+            lambda value: (
+                None
+                if any(json_equal(value, option) for option in allowed)
+                else f"{value!r} is not one of {allowed!r}"
+            )
+        )
+
+    if "minimum" in schema:
+        minimum = schema["minimum"]
+        checks.append(
+            lambda value: (
+                f"{value!r} is less than the minimum of {minimum!r}"
+                if TYPE_CHECKS["number"](value) and value < minimum
+                else None
+            )
+        )
+
+    if "maximum" in schema:
+        maximum = schema["maximum"]
+        checks.append(
+            lambda value: (
+                f"{value!r} is greater than the maximum of {maximum!r}"
+                if TYPE_CHECKS["number"](value) and value > maximum
+                else None
+            )
+        )
+
+    if "required" in schema:
+        required = tuple(schema["required"])
+
+        def check_required(value: Any) -> str | None:
+            if isinstance(value, dict):
+                for key in required:
+                    if key not in value:
+                        return f"{key!r} is a required property"
+            return None
+
+        checks.append(check_required)
+
+    if "properties" in schema:
+        properties: list[tuple[str, Check]] = []
+        for key, subschema in schema["properties"].items():
+            sub_check = compile_schema(subschema)
+            if sub_check is None:
+                return None
+            properties.append((key, sub_check))
+
+        def check_properties(value: Any) -> str | None:
+            if isinstance(value, dict):
+                for key, sub_check in properties:
+                    if key in value:
+                        error = sub_check(value[key])
+                        if error is not None:
+                            return error
+            return None
+
+        checks.append(check_properties)
+
+    if "minItems" in schema or "maxItems" in schema:
+        min_items = schema.get("minItems", 0)
+        max_items = schema.get("maxItems")
+
+        def check_length(value: Any) -> str | None:
+            if isinstance(value, list):
+                if len(value) < min_items:
+                    return f"{value!r} is too short"
+                if max_items is not None and len(value) > max_items:
+                    return f"{value!r} is too long"
+            return None
+
+        checks.append(check_length)
+
+    if "items" in schema:
+        item_check = compile_schema(schema["items"])
+        if item_check is None:
+            return None
+
+        def check_items(value: Any) -> str | None:
+            if isinstance(value, list):
+                for item in value:
+                    error = item_check(item)
+                    if error is not None:
+                        return error
+            return None
+
+        checks.append(check_items)
+
+    def check(value: Any) -> str | None:
+        for sub_check in checks:
+            error = sub_check(value)
+            if error is not None:
+                return error
+        return None
+
+    return check
+
+
+@dataclass
+class CompiledSchema:
+    path: Path
+    mtime_ns: int
+    checked_at: float
+    validator: Draft202012Validator
+    fast_check: Check | None
+
+    def first_error(self, plan: dict) -> str | None:
+        if self.fast_check is not None:
+            return self.fast_check(plan)
+        error = next(self.validator.iter_errors(plan), None)
+        return error.message if error is not None else None
+
+
+class PlanValidatorRegistry:
+    def __init__(self, paths: dict[str, str], reload_check_sec: float = 1.0) -> None:
+        self.paths = {version: Path(path) for version, path in paths.items()}
+        self.reload_check_sec = reload_check_sec
+        self._compiled: dict[str, CompiledSchema] = {}
+        self._lock = threading.Lock()
+
+    def register(self, version: str, path: str | Path) -> None:
+        with self._lock:
+            self.paths[version] = Path(path)
+            self._compiled.pop(version, None)
+
+    def schema_version(self, plan: dict) -> str:
+        meta = plan.get("meta") if isinstance(plan, dict) else None
+        if isinstance(meta, dict):
+            return str(meta.get("schema_version", DEFAULT_SCHEMA_VERSION))
+        return DEFAULT_SCHEMA_VERSION
+
+    def get(self, version: str = DEFAULT_SCHEMA_VERSION) -> CompiledSchema:
+        compiled = self._compiled.get(version)
+        now = time.monotonic()
+        if compiled is not None and now - compiled.checked_at < self.reload_check_sec:
+            return compiled
+        with self._lock:
+            path = self.paths.get(version)
+            if path is None:
+                raise KeyError(f"unknown plan schema version: {version}")
+            mtime_ns = os.stat(path).st_mtime_ns
+            compiled = self._compiled.get(version)
+            if compiled is None or compiled.mtime_ns != mtime_ns or compiled.path != path:
+                schema = load_plan_schema(path)
+                Draft202012Validator.check_schema(schema)
+                compiled = CompiledSchema(
+                    path=path,
+                    mtime_ns=mtime_ns,
+                    checked_at=now,
+                    validator=Draft202012Validator(schema),
+                    fast_check=compile_schema(schema),
+                )
+                self._compiled[version] = compiled
+            else:
+                compiled.checked_at = now
+            return compiled
+
+    def validate(self, plan: dict) -> tuple[bool, list[str]]:
+        compiled = self._compiled_for(plan)
+        if compiled is None:
+            return (False, [f"unknown schema_version: {self.schema_version(plan)}"])
+        # Valid plans are the common case: only pay for full error collection on failure.
+        if compiled.fast_check is not None and compiled.fast_check(plan) is None:
+            return (True, [])
+        errors = [error.message for error in compiled.validator.iter_errors(plan)]
+        return (len(errors) == 0, errors)
+
+    def first_error(self, plan: dict) -> str | None:
+        compiled = self._compiled_for(plan)
+        if compiled is None:
+            return f"unknown schema_version: {self.schema_version(plan)}"
+        return compiled.first_error(plan)
+
+    def _compiled_for(self, plan: dict) -> CompiledSchema | None:
+        try:
+            return self.get(self.schema_version(plan))
+        except KeyError:
+            return None
+
+
+@lru_cache
+def get_plan_validators() -> PlanValidatorRegistry:
+    settings = get_settings()
+    paths = {DEFAULT_SCHEMA_VERSION: settings.plan_schema_path, **settings.plan_schema_versions}
+    return PlanValidatorRegistry(paths, reload_check_sec=settings.plan_schema_reload_sec)
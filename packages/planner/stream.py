@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from typing import Callable
+
+import orjson
+
+MAX_PREAMBLE_CHARS = 64
+WHITESPACE = " \t\r\n"
+
+
+class PlanStreamError(ValueError):
+    pass
+
+
+# Scans an LLM response as chunks arrive, tracking just enough JSON structure to find each
+# element of the top-level "plans" array. Every candidate is checked the moment its closing
+# brace arrives, so a bad first plan aborts the call before the rest is generated.
+class PlanStream:
+    def __init__(
+        self,
+        check: Callable[[dict], str | None],
+        max_candidates: int = 3,
+        max_chars: int = 50000,
+    ) -> None:
+        self.check = check
+        self.max_candidates = max_candidates
+        self.max_chars = max_chars
+        self.plans: list[dict] = []
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = ""
+        self._key = ""
+        self._in_plans = False
+        self._candidate_start: int | None = None
+        self._object_start: int | None = None
+        self._object_end: int | None = None
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> list[dict]:
+        self._text += chunk
+        if len(self._text) > self.max_chars:
+            raise PlanStreamError(f"response exceeds {self.max_chars} chars")
+        found = len(self.plans)
+        text = self._text
+        for pos in range(self._pos, len(text)):
+            self._scan(text, pos, text[pos])
+        self._pos = len(text)
+        return self.plans[found:]
+
+    def finish(self) -> dict:
+        if self._object_end is None:
+            raise PlanStreamError("response ended before the JSON object closed")
+        try:
+            body = orjson.loads(self._text[self._object_start : self._object_end + 1])
+        except orjson.JSONDecodeError as exc:
+            raise PlanStreamError(f"invalid JSON: {exc}") from exc
+        if not self.plans:
+            raise PlanStreamError("response contains no candidate plans")
+        return body
+
+    def _scan(self, text: str, pos: int, char: str) -> None:
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._depth == 1:
+                    self._last_string = text[self._string_start + 1 : pos]
+            return
+        if self._object_end is not None:
+            return
+        if self._depth == 0:
+            if char == "{":
+                self._object_start = pos
+                self._depth = 1
+            elif pos >= MAX_PREAMBLE_CHARS:
+                # Tolerates a short preamble such as a ```json fence, nothing more.
+                raise PlanStreamError("response does not start with a JSON object")
+            return
+        if self._in_plans and self._depth == 2 and char not in WHITESPACE + ",{]":
+            raise PlanStreamError("candidate plans must be JSON objects")
+        if char == '"':
+            self._in_string = True
+            self._string_start = pos
+        elif char == ":" and self._depth == 1:
+            self._key = self._last_string
+        elif char in "{[":
+            if self._in_plans and self._depth == 2 and char == "{":
+                self._candidate_start = pos
+            if char == "[" and self._depth == 1 and self._key == "plans":
+                self._in_plans = True
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self._object_end = pos
+            elif self._in_plans and self._depth == 2 and char == "}":
+                self._close_candidate(text, pos)
+            elif self._in_plans and self._depth == 1:
+                self._in_plans = False
+        elif char == "," and self._depth == 1:
+            self._key = ""
+
+    def _close_candidate(self, text: str, pos: int) -> None:
+        index = len(self.plans)
+        if index >= self.max_candidates:
+            raise PlanStreamError(f"more than {self.max_candidates} candidate plans")
+        try:
+            plan = orjson.loads(text[self._candidate_start : pos + 1])
+        except orjson.JSONDecodeError as exc:
+            raise PlanStreamError(f"candidate {index} is not valid JSON: {exc}") from exc
+        error = self.check(plan)
+        if error is not None:
+            raise PlanStreamError(f"candidate {index}: {error}")
+        self.plans.append(plan)
+        self._candidate_start = None
@@ -0,0 +1,465 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timezone
+from functools import lru_cache
+
+from packages.common.config import get_settings
+from packages.common.models import Fill, TradeOutcome
+from packages.common.repository import Repository, get_repository
+from packages.risk.engine import RiskContext
+
+logger = logging.getLogger(__name__)
+
+SIDE_SIGN = {"long": 1.0, "buy": 1.0, "short": -1.0, "sell": -1.0}
+# Notional left over from contract rounding; anything at or below it counts as closed.
+DUST_NOTIONAL = 1e-6
+
+
+@dataclass
+class Position:
+    plan_id: str
+    symbol: str
+    side: str
+    notional: float
+    entry_price: float = 0.0
+
+
+# A closing order's realised PnL, held until the order is done so one exit is one outcome.
+@dataclass
+class Realized:
+    plan_id: str
+    exit_reason: str
+    pnl: float = 0.0
+
+
+def realized_pnl(side: str, notional: float, entry_price: float, exit_price: float) -> float:
+    if entry_price <= 0 or exit_price <= 0:
+        return 0.0
+    return SIDE_SIGN[side] * notional / entry_price * (exit_price - entry_price)
+
+
+@dataclass
+class PortfolioState:
+    equity: float
+    peak_equity: float
+    day: str
+    day_start_equity: float
+    daily_loss: float = 0.0
+    consecutive_losses: int = 0
+    net_exposure: float = 0.0
+    positions: dict[str, Position] = field(default_factory=dict)
+    positions_per_symbol: dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def initial(cls, equity: float, day: date | None = None) -> PortfolioState:
+        today = (day or datetime.now(timezone.utc).date()).isoformat()
+        return cls(equity=equity, peak_equity=equity, day=today, day_start_equity=equity)
+
+    def apply_fill(
+        self,
+        plan_id: str,
+        symbol: str,
+        side: str,
+        notional: float,
+        fee: float = 0.0,
+        reduce_only: bool = False,
+        price: float = 0.0,
+        closes: str | None = None,
+        at_fill_price: bool = False,
+    ) -> float | None:
+        # Returns the PnL realised by a reduce-only fill, or None if it closed nothing.
+        self.equity -= fee
+        if reduce_only:
+            return self._reduce(symbol, notional, price, closes, at_fill_price)
+        sign = SIDE_SIGN.get(side)
+        if sign is None or notional <= 0:
+            return None
+        position = self.positions.get(plan_id)
+        if position is None:
+            self.positions[plan_id] = Position(plan_id, symbol, side, notional, price)
+            self.positions_per_symbol[symbol] = self.positions_per_symbol.get(symbol, 0) + 1
+        else:
+            if price > 0 and position.entry_price > 0:
+                position.entry_price = (
+                    position.entry_price * position.notional + price * notional
+                ) / (position.notional + notional)
+            position.notional += notional
+        self.net_exposure += sign * notional
+        return None
+
+    # Positions open and close only through fills; outcomes move equity and the loss streak.
+    def apply_outcome(self, pnl: float, ts: datetime | None = None) -> None:
+        self._roll_day((ts or datetime.now(timezone.utc)).date())
+        self.equity += pnl
+        self.peak_equity = max(self.peak_equity, self.equity)
+        if pnl < 0:
+            self.daily_loss += -pnl
+            self.consecutive_losses += 1
+        else:
+            self.consecutive_losses = 0
+
+    def risk_context(
+        self,
+        symbol: str | None,
+        risk_state: str,
+        liquidation_buffer_ratio: float,
+        spread_bps: float | None = None,
+        depth_usd: float | None = None,
+        now: datetime | None = None,
+    ) -> RiskContext:
+        today = (now or datetime.now(timezone.utc)).date().isoformat()
+        daily_loss = self.daily_loss if today == self.day else 0.0
+        day_start = self.day_start_equity if today == self.day else self.equity
+        return RiskContext(
+            equity=self.equity,
+            peak_equity=self.peak_equity,
+            daily_loss_pct=daily_loss / day_start if day_start > 0 else 0.0,
+            consecutive_losses=self.consecutive_losses,
+            open_positions=len(self.positions),
+            positions_per_symbol=self.positions_per_symbol.get(symbol, 0) if symbol else 0,
+            net_exposure_pct=abs(self.net_exposure) / self.equity if self.equity > 0 else 0.0,
+            liquidation_buffer_ratio=liquidation_buffer_ratio,
+            risk_state=risk_state,
+            spread_bps=spread_bps,
+            depth_usd=depth_usd,
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> PortfolioState:
+        data = dict(data)
+        data["positions"] = {
+            plan_id: Position(**position) for plan_id, position in data["positions"].items()
+        }
+        return cls(**data)
+
+    def _roll_day(self, day: date) -> None:
+        if day.isoformat() > self.day:
+            self.day = day.isoformat()
+            self.day_start_equity = self.equity
+            self.daily_loss = 0.0
+
+    def _reduce(
+        self,
+        symbol: str,
+        notional: float,
+        price: float,
+        closes: str | None,
+        at_fill_price: bool,
+    ) -> float | None:
+        # The position an exit names goes first, then the symbol's others oldest first.
+        positions = [p for p in self.positions.values() if p.symbol == symbol]
+        positions.sort(key=lambda p: p.plan_id != closes)
+        pnl = None
+        for position in positions:
+            if notional <= DUST_NOTIONAL:
+                break
+            # Fills valued at their own price close that many contracts' worth of entry cost.
+            scale = 1.0
+            if at_fill_price and position.entry_price > 0 and price > 0:
+                scale = position.entry_price / price
+            reduced = min(position.notional, notional * scale)
+            position.notional -= reduced
+            notional -= reduced / scale
+            self.net_exposure -= SIDE_SIGN[position.side] * reduced
+            pnl = (pnl or 0.0) + realized_pnl(position.side, reduced, position.entry_price, price)
+            if position.notional <= DUST_NOTIONAL:
+                self.net_exposure -= SIDE_SIGN[position.side] * position.notional
+                self._remove(position)
+        return pnl
+
+    def _remove(self, position: Position) -> None:
+        del self.positions[position.plan_id]
+        remaining = self.positions_per_symbol.get(position.symbol, 1) - 1
+        if remaining > 0:
+            self.positions_per_symbol[position.symbol] = remaining
+        else:
+            self.positions_per_symbol.pop(position.symbol, None)
+
+
+def fill_notional(fill: Fill) -> float:
+    # Partial fills record their own notional; full fills fall back to the order's.
+    raw = fill.raw or {}
+    if (raw.get("fill") or {}).get("notional_usd") is not None:
+        return float(raw["fill"]["notional_usd"])
+    instruction = raw.get("instruction") or {}
+    if instruction.get("notional_usd") is not None:
+        return float(instruction["notional_usd"])
+    return abs(fill.price * fill.qty)
+
+
+# Ledger rows are applied at most once. Each sync reads only rows past the last applied ids,
+# reaching back `replay_window_rows` so rows other processes commit out of id order are still
+# picked up; ids seen within that window are remembered.
+class PortfolioService:
+    def __init__(
+        self,
+        initial_equity: float,
+        sync_interval_sec: float = 1.0,
+        snapshot_interval_sec: float = 300.0,
+        replay_window_rows: int = 100,
+        repository: Repository | None = None,
+    ) -> None:
+        self.initial_equity = initial_equity
+        self.sync_interval_sec = sync_interval_sec
+        self.snapshot_interval_sec = snapshot_interval_sec
+        self.replay_window_rows = replay_window_rows
+        self.repository = repository or get_repository()
+        self.state = PortfolioState.initial(initial_equity)
+        self._seen_fills: set[int] = set()
+        self._seen_outcomes: set[int] = set()
+        self._realized: dict[str, Realized] = {}
+        self._last_fill_id = 0
+        self._last_outcome_id = 0
+        self._loaded = False
+        self._last_sync = 0.0
+        self._last_snapshot = time.monotonic()
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def sync_due(self) -> bool:
+        return not self._loaded or time.monotonic() - self._last_sync >= self.sync_interval_sec
+
+    def risk_context(
+        self,
+        symbol: str | None,
+        risk_state: str,
+        liquidation_buffer_ratio: float,
+        spread_bps: float | None = None,
+        depth_usd: float | None = None,
+    ) -> RiskContext:
+        # Fills this process executes are applied as they happen; other processes' rows are
+        # caught up by run_portfolio_refresh, so the request path only ever loads once.
+        if not self._loaded:
+            self.rebuild()
+        return self.cached_risk_context(
+            symbol, risk_state, liquidation_buffer_ratio, spread_bps, depth_usd
+        )
+
+    def cached_risk_context(
+        self,
+        symbol: str | None,
+        risk_state: str,
+        liquidation_buffer_ratio: float,
+        spread_bps: float | None = None,
+        depth_usd: float | None = None,
+        now: datetime | None = None,
+    ) -> RiskContext:
+        with self._lock:
+            return self.state.risk_context(
+                symbol, risk_state, liquidation_buffer_ratio, spread_bps, depth_usd, now
+            )
+
+    def open_positions(self) -> list[Position]:
+        if self.sync_due:
+            self.sync()
+        with self._lock:
+            return [Position(**asdict(position)) for position in self.state.positions.values()]
+
+    # For fills this process executed. Closing fills add up per closing order until the
+    # engine settles the order, which books them as one outcome.
+    def apply_fills(self, fills: list[Fill]) -> None:
+        with self._lock:
+            for fill in fills:
+                pnl = self._apply_fill(fill)
+                if pnl is not None:
+                    self._realize(fill, pnl)
+
+    def settle(self, plan_ids: list[str], ts: datetime | None = None) -> list[TradeOutcome]:
+        with self._lock:
+            realized = [
+                self._realized.pop(plan_id) for plan_id in plan_ids if plan_id in self._realized
+            ]
+        return [
+            self.record_outcome(item.plan_id, item.pnl, item.exit_reason, ts=ts)
+            for item in realized
+        ]
+
+    def record_outcome(
+        self,
+        plan_id: str,
+        pnl: float,
+        exit_reason: str,
+        summary: str | None = None,
+        ts: datetime | None = None,
+    ) -> TradeOutcome:
+        ts = ts or datetime.now(timezone.utc)
+        outcome = self.repository.save_outcome(
+            {
+                "plan_id": plan_id,
+                "ts": ts,
+                "pnl": pnl,
+                "exit_reason": exit_reason,
+                "summary": summary,
+            }
+        )
+        with self._lock:
+            self._apply_outcome(outcome)
+        self.repository.write_events(
+            [
+                {
+                    "ts": ts,
+                    "event_type": "trade_outcome",
+                    "plan_id": plan_id,
+                    "payload": {"plan_id": plan_id, "pnl": pnl, "exit_reason": exit_reason},
+                }
+            ]
+        )
+        return outcome
+
+    def rebuild(self) -> None:
+        snapshot = self.repository.latest_portfolio_snapshot()
+        with self._lock:
+            if snapshot is None:
+                self.state = PortfolioState.initial(self.initial_equity)
+                self._seen_fills, self._seen_outcomes = set(), set()
+                self._last_fill_id = self._last_outcome_id = 0
+            else:
+                self.state = PortfolioState.from_dict(snapshot.state["portfolio"])
+                self._seen_fills = set(snapshot.state.get("seen_fills", []))
+                self._seen_outcomes = set(snapshot.state.get("seen_outcomes", []))
+                self._last_fill_id = snapshot.last_fill_id
+                self._last_outcome_id = snapshot.last_outcome_id
+            self._replay()
+            self._loaded = True
+        logger.info(
+            "portfolio rebuilt: equity=%.2f positions=%d",
+            self.state.equity,
+            len(self.state.positions),
+        )
+
+    def sync(self) -> None:
+        if not self._loaded:
+            self.rebuild()
+            return
+        with self._lock:
+            self._replay()
+        self.maybe_snapshot()
+
+    def maybe_snapshot(self) -> None:
+        if time.monotonic() - self._last_snapshot >= self.snapshot_interval_sec:
+            self.snapshot()
+
+    def snapshot(self) -> None:
+        with self._lock:
+            row = {
+                "ts": datetime.now(timezone.utc),
+                "last_fill_id": self._last_fill_id,
+                "last_outcome_id": self._last_outcome_id,
+                "state": {
+                    "portfolio": self.state.to_dict(),
+                    "seen_fills": sorted(self._seen_fills),
+                    "seen_outcomes": sorted(self._seen_outcomes),
+                },
+            }
+            self._last_snapshot = time.monotonic()
+        self.repository.save_portfolio_snapshot(row)
+
+    def _replay(self) -> None:
+        fills, outcomes = self.repository.ledger_since(
+            self._last_fill_id - self.replay_window_rows,
+            self._last_outcome_id - self.replay_window_rows,
+        )
+        events = [(fill.ts, 0, fill) for fill in fills if fill.id not in self._seen_fills]
+        events += [
+            (outcome.ts, 1, outcome)
+            for outcome in outcomes
+            if outcome.id not in self._seen_outcomes
+        ]
+        events.sort(key=lambda event: (_naive(event[0]), event[1], event[2].id))
+        for _, kind, row in events:
+            if kind == 0:
+                self._apply_fill(row)
+            else:
+                self._apply_outcome(row)
+        self._prune()
+        self._last_sync = time.monotonic()
+
+    def _apply_fill(self, fill: Fill) -> float | None:
+        if fill.id in self._seen_fills:
+            return None
+        self._seen_fills.add(fill.id)
+        self._last_fill_id = max(self._last_fill_id, fill.id)
+        raw = fill.raw or {}
+        instruction = raw.get("instruction") or {}
+        notional = fill_notional(fill)
+        at_fill_price = (raw.get("fill") or {}).get("notional_usd") is not None
+        if instruction.get("closes_notional") and instruction.get("qty"):
+            # Exits name the entry cost they close; each fill closes its share of it.
+            notional = instruction["closes_notional"] * fill.qty / instruction["qty"]
+            at_fill_price = False
+        return self.state.apply_fill(
+            plan_id=fill.plan_id,
+            symbol=fill.symbol,
+            side=instruction.get("side", ""),
+            notional=notional,
+            fee=fill.fee or 0.0,
+            reduce_only=bool(instruction.get("reduce_only")),
+            price=fill.price,
+            closes=instruction.get("closes_plan_id"),
+            at_fill_price=at_fill_price,
+        )
+
+    def _realize(self, fill: Fill, pnl: float) -> None:
+        realized = self._realized.get(fill.plan_id)
+        if realized is None:
+            instruction = (fill.raw or {}).get("instruction") or {}
+            realized = self._realized[fill.plan_id] = Realized(
+                plan_id=instruction.get("closes_plan_id") or fill.plan_id,
+                exit_reason=instruction.get("exit_reason") or "reduce_only",
+            )
+        realized.pnl += pnl
+
+    def _apply_outcome(self, outcome: TradeOutcome) -> None:
+        if outcome.id in self._seen_outcomes:
+            return
+        self._seen_outcomes.add(outcome.id)
+        self._last_outcome_id = max(self._last_outcome_id, outcome.id)
+        ts = outcome.ts if outcome.ts.tzinfo else outcome.ts.replace(tzinfo=timezone.utc)
+        self.state.apply_outcome(outcome.pnl, ts)
+
+    def _prune(self) -> None:
+        fill_floor = self._last_fill_id - self.replay_window_rows
+        outcome_floor = self._last_outcome_id - self.replay_window_rows
+        self._seen_fills = {fill_id for fill_id in self._seen_fills if fill_id > fill_floor}
+        self._seen_outcomes = {
+            outcome_id for outcome_id in self._seen_outcomes if outcome_id > outcome_floor
+        }
+
+
+def _naive(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=None) if ts.tzinfo else ts
+
+
+async def run_portfolio_refresh(portfolio: PortfolioService, interval_sec: float) -> None:
+    while True:
+        try:
+            await asyncio.to_thread(portfolio.sync)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("portfolio refresh failed")
+        await asyncio.sleep(interval_sec)
+
+
+@lru_cache
+def get_portfolio() -> PortfolioService:
+    settings = get_settings()
+    return PortfolioService(
+        initial_equity=settings.initial_equity,
+        sync_interval_sec=settings.portfolio_sync_interval_sec,
+        snapshot_interval_sec=settings.portfolio_snapshot_interval_sec,
+        replay_window_rows=settings.portfolio_replay_window_rows,
+        repository=get_repository(),
+    )
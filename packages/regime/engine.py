@@ -1,7 +1,28 @@
-from dataclasses import dataclass
+from __future__ import annotations
 
+import bisect
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
 
-@dataclass
+import numpy as np
+
+from packages.common.config import get_settings
+from packages.data.history import load_candles
+from packages.data.store import CandleBar
+from packages.signals.indicators import IndicatorParams, IndicatorState, backfill_state
+
+REGIMES = ("trend", "range", "high_vol")
+
+# Emission model per hidden regime: mean and spread of (trend strength, vol percentile).
+# Three states is small enough that plain floats beat numpy on every bar.
+EMISSIONS = ((0.6, 0.2, 0.5, 0.3), (0.1, 0.15, 0.35, 0.25), (0.3, 0.3, 0.9, 0.1))
+
+
+@dataclass(frozen=True)
 class RegimeState:
     regime: str
     regime_prob: float
@@ -9,5 +30,216 @@ class RegimeState:
     risk_state: str
 
 
-def infer_regime() -> RegimeState:
-    return RegimeState(regime="neutral", regime_prob=0.5, signal_confidence=0.2, risk_state="NORMAL")
+NEUTRAL = RegimeState(regime="neutral", regime_prob=0.5, signal_confidence=0.2, risk_state="NORMAL")
+UNIFORM = (1.0 / len(REGIMES),) * len(REGIMES)
+
+
+def emission_likelihood(trend_strength: float, vol_pct: float) -> list[float]:
+    likelihood = []
+    for trend_mean, trend_sigma, vol_mean, vol_sigma in EMISSIONS:
+        z_trend = (trend_strength - trend_mean) / trend_sigma
+        z_vol = (vol_pct - vol_mean) / vol_sigma
+        likelihood.append(
+            math.exp(-0.5 * (z_trend * z_trend + z_vol * z_vol)) / (trend_sigma * vol_sigma)
+        )
+    return likelihood
+
+
+def forward_step(
+    posterior: tuple[float, ...], stickiness: float, likelihood: list[float]
+) -> tuple[float, ...]:
+    # With a symmetric sticky transition matrix the predict step is `off + (stay - off) * p`.
+    off = (1.0 - stickiness) / (len(posterior) - 1)
+    belief = [(off + (stickiness - off) * p) * lik for p, lik in zip(posterior, likelihood)]
+    total = sum(belief)
+    if not total > 0:
+        return UNIFORM
+    return tuple(b / total for b in belief)
+
+
+# Per-symbol filter state. The volatility window is kept sorted so the percentile of a new
+# reading costs one bisect instead of a pass over the window.
+@dataclass
+class SymbolRegime:
+    indicators: IndicatorState
+    window: int
+    posterior: tuple[float, ...] = UNIFORM
+    vols: deque = field(default_factory=deque)
+    sorted_vols: list = field(default_factory=list)
+    event_bars_left: int = 0
+    event_impact: float = 0.0
+    last_state: RegimeState = NEUTRAL
+
+    def vol_percentile(self, vol: float) -> float:
+        self.vols.append(vol)
+        bisect.insort(self.sorted_vols, vol)
+        if len(self.vols) > self.window:
+            expired = self.vols.popleft()
+            del self.sorted_vols[bisect.bisect_left(self.sorted_vols, expired)]
+        # Mid-rank, so a flat volatility history sits at the median rather than the top.
+        below = bisect.bisect_left(self.sorted_vols, vol)
+        upto = bisect.bisect_right(self.sorted_vols, vol)
+        return (below + upto) / 2 / len(self.sorted_vols)
+
+
+class RegimeEngine:
+    def __init__(
+        self,
+        timeframe: str = "15m",
+        vol_window: int = 500,
+        stickiness: float = 0.95,
+        shock_atr_mult: float = 4.0,
+        event_bars: int = 4,
+        refresh_interval_sec: float = 5.0,
+        history_bars: int = 500,
+        params: IndicatorParams | None = None,
+        loader=load_candles,
+    ) -> None:
+        self.timeframe = timeframe
+        self.vol_window = vol_window
+        self.stickiness = stickiness
+        self.shock_atr_mult = shock_atr_mult
+        self.event_bars = event_bars
+        self.refresh_interval_sec = refresh_interval_sec
+        self.history_bars = history_bars
+        self.params = params or IndicatorParams()
+        self.loader = loader
+        self._symbols: dict[str, SymbolRegime] = {}
+        self._refreshed: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def state(self, symbol: str) -> RegimeState:
+        tracked = self._symbols.get(symbol)
+        return tracked.last_state if tracked is not None else NEUTRAL
+
+    def mark_event(self, symbol: str, impact: float) -> None:
+        # External events (news, on-chain alerts) force the event regime for a few bars.
+        with self._lock:
+            tracked = self._track(symbol)
+            tracked.event_bars_left = self.event_bars
+            tracked.event_impact = max(tracked.event_impact, min(1.0, impact))
+            tracked.last_state = self._label(tracked)
+
+    def update(self, symbol: str, ts: int, high: float, low: float, close: float) -> RegimeState:
+        with self._lock:
+            tracked = self._track(symbol)
+            indicators = tracked.indicators
+            if indicators.last_ts is not None and ts <= indicators.last_ts:
+                return tracked.last_state
+            previous_close = indicators.close
+            previous_atr = indicators.atr
+            indicators.update(ts, high, low, close)
+            self._step(tracked, close, previous_close, previous_atr)
+            tracked.last_state = self._label(tracked)
+            return tracked.last_state
+
+    def update_bars(self, bars: list[CandleBar]) -> None:
+        for bar in bars:
+            if bar.timeframe == self.timeframe:
+                self.update(bar.symbol, bar.ts, bar.high, bar.low, bar.close)
+
+    def backfill(
+        self, symbol: str, ts: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray
+    ) -> RegimeState:
+        # Same per-bar arithmetic as update(), with the indicator pass done in batch.
+        with self._lock:
+            tracked = SymbolRegime(IndicatorState(self.params), self.vol_window)
+            if len(close):
+                state, series = backfill_state(self.params, ts, high, low, close)
+                atr = series["atr"]
+                for i in range(len(close)):
+                    indicators = tracked.indicators
+                    indicators.bars = i + 1
+                    indicators.close = float(close[i])
+                    indicators.ema_fast = float(series["ema_fast"][i])
+                    indicators.ema_slow = float(series["ema_slow"][i])
+                    indicators.atr = float(atr[i])
+                    previous_close = float(close[i - 1]) if i else math.nan
+                    previous_atr = float(atr[i - 1]) if i else math.nan
+                    self._step(tracked, float(close[i]), previous_close, previous_atr)
+                tracked.indicators = state
+            self._symbols[symbol] = tracked
+            tracked.last_state = self._label(tracked)
+            return tracked.last_state
+
+    def refresh(self, symbol: str) -> None:
+        # Catches up from the candles table, for processes that do not run the ingestor.
+        now = time.monotonic()
+        if now - self._refreshed.get(symbol, 0.0) < self.refresh_interval_sec:
+            return
+        self._refreshed[symbol] = now
+        tracked = self._symbols.get(symbol)
+        since = tracked.indicators.last_ts if tracked is not None else None
+        bars = self.loader(symbol, self.timeframe, since, self.history_bars)
+        if tracked is None and len(bars) > 1:
+            ts, high, low, close = np.array([(b.ts, b.high, b.low, b.close) for b in bars]).T
+            self.backfill(symbol, ts, high, low, close)
+        else:
+            self.update_bars(bars)
+
+    def _track(self, symbol: str) -> SymbolRegime:
+        tracked = self._symbols.get(symbol)
+        if tracked is None:
+            tracked = SymbolRegime(IndicatorState(self.params), self.vol_window)
+            self._symbols[symbol] = tracked
+        return tracked
+
+    def _step(
+        self, tracked: SymbolRegime, close: float, previous_close: float, previous_atr: float
+    ) -> None:
+        indicators = tracked.indicators
+        trend_strength = abs(math.tanh(indicators.trend))
+        vol_pct = tracked.vol_percentile(indicators.atr_pct)
+        likelihood = emission_likelihood(trend_strength, vol_pct)
+        tracked.posterior = forward_step(tracked.posterior, self.stickiness, likelihood)
+        if tracked.event_bars_left > 0:
+            tracked.event_bars_left -= 1
+            if tracked.event_bars_left == 0:
+                tracked.event_impact = 0.0
+        # A bar moving several prior ATRs is treated as an event until proven otherwise.
+        if previous_atr > 0 and abs(close - previous_close) > self.shock_atr_mult * previous_atr:
+            tracked.event_bars_left = self.event_bars
+            tracked.event_impact = max(
+                tracked.event_impact,
+                min(1.0, abs(close - previous_close) / (2 * self.shock_atr_mult * previous_atr)),
+            )
+
+    def _label(self, tracked: SymbolRegime) -> RegimeState:
+        warm = tracked.indicators.warm
+        if tracked.event_bars_left > 0:
+            return RegimeState(
+                regime="event",
+                regime_prob=max(0.5, tracked.event_impact),
+                signal_confidence=0.2 * warm,
+                risk_state="CAUTION",
+            )
+        probability = max(tracked.posterior)
+        index = tracked.posterior.index(probability)
+        regime = REGIMES[index]
+        return RegimeState(
+            regime=regime,
+            regime_prob=probability,
+            signal_confidence=probability * warm,
+            risk_state="CAUTION" if regime == "high_vol" else "NORMAL",
+        )
+
+
+@lru_cache
+def get_regime_engine() -> RegimeEngine:
+    settings = get_settings()
+    return RegimeEngine(
+        timeframe=settings.regime_timeframe,
+        vol_window=settings.regime_vol_window,
+        stickiness=settings.regime_stickiness,
+        shock_atr_mult=settings.regime_shock_atr_mult,
+        refresh_interval_sec=settings.signal_refresh_interval_sec,
+        history_bars=settings.signal_history_bars,
+    )
+
+
+def infer_regime(symbol: str | None = None) -> RegimeState:
+    if symbol is None:
+        return NEUTRAL
+    engine = get_regime_engine()
+    engine.refresh(symbol)
+    return engine.state(symbol)
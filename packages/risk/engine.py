@@ -1,13 +1,24 @@
 from __future__ import annotations
 
+from collections.abc import Sequence
 from dataclasses import dataclass
 from datetime import datetime, timezone
 
+import numpy as np
+from prometheus_client import Counter
+from sqlalchemy.orm import Session
+
 from packages.audit.service import log_event
 from packages.common.config import get_settings
-from packages.common.db import SessionLocal
-from packages.common.models import RiskDecision, RiskState
+from packages.common.metrics import timed
+from packages.common.models import RiskState
 from packages.common.notify import send_telegram
+from packages.common.repository import get_repository
+from packages.risk.state import RiskStateSnapshot, get_risk_state_cache
+
+RISK_REJECTIONS = Counter(
+    "risk_rejections_total", "Reasons behind rejected plans on the live path", ["reason"]
+)
 
 
 @dataclass
@@ -21,6 +32,8 @@ class RiskContext:
     net_exposure_pct: float
     liquidation_buffer_ratio: float
     risk_state: str
+    spread_bps: float | None = None
+    depth_usd: float | None = None
 
 
 @dataclass
@@ -31,7 +44,7 @@ class RiskResult:
     metrics: dict
 
 
-def get_risk_state(session: SessionLocal) -> RiskState:
+def get_risk_state(session: Session) -> RiskState:
     state = session.query(RiskState).order_by(RiskState.id.desc()).first()
     if not state:
         state = RiskState(paused=False, reason=None)
@@ -41,13 +54,9 @@ def get_risk_state(session: SessionLocal) -> RiskState:
 
 
 def set_risk_pause(paused: bool, reason: str | None = None) -> None:
-    session = SessionLocal()
-    try:
-        state = RiskState(paused=paused, reason=reason)
-        session.add(state)
-        session.commit()
-    finally:
-        session.close()
+    state = get_repository().add_risk_state(paused, reason)
+    snapshot = RiskStateSnapshot(id=state.id, paused=paused, reason=reason, ts=state.ts)
+    get_risk_state_cache().publish(snapshot)
     log_event("risk_pause", {"paused": paused, "reason": reason})
     if paused:
         send_telegram(f"Risk pause triggered: {reason or 'manual'}")
@@ -68,7 +77,7 @@ def compute_notional(
     return equity * risk_budget_pct / denominator
 
 
-def evaluate_plan(plan: dict, context: RiskContext) -> RiskResult:
+def check_plan(plan: dict, context: RiskContext) -> RiskResult:
     settings = get_settings()
     reasons: list[str] = []
 
@@ -130,6 +139,13 @@ def evaluate_plan(plan: dict, context: RiskContext) -> RiskResult:
     if plan_loss_pct > settings.max_loss_pct:
         reasons.append("single_trade_loss_exceeds")
 
+    # Book checks only apply when a fresh local order book is available.
+    if context.spread_bps is not None and context.spread_bps > settings.orderbook_spread_limit_bps:
+        reasons.append("orderbook_spread_too_wide")
+
+    if context.depth_usd is not None and context.depth_usd < settings.orderbook_depth_min_usd:
+        reasons.append("orderbook_depth_insufficient")
+
     allowed = len(reasons) == 0
     status = "APPROVED" if allowed else "REJECTED"
 
@@ -140,20 +156,192 @@ def evaluate_plan(plan: dict, context: RiskContext) -> RiskResult:
         "risk_budget_pct": plan["risk"]["risk_budget_pct"],
     }
 
-    session = SessionLocal()
-    try:
-        decision = RiskDecision(
-            plan_id=plan["meta"]["plan_id"],
-            ts=datetime.now(timezone.utc),
-            status=status,
-            reasons=reasons,
-            metrics=metrics,
+    return RiskResult(allowed=allowed, status=status, reasons=reasons, metrics=metrics)
+
+
+# Column order matches the order in which check_plan appends reasons.
+BATCH_REASONS = (
+    "missing_stop_loss",
+    "max_loss_pct_exceeds",
+    "max_leverage_exceeds",
+    "max_open_positions",
+    "max_positions_per_symbol",
+    "max_net_exposure_pct",
+    "max_daily_loss",
+    "max_consecutive_losses",
+    "max_drawdown",
+    "lockdown",
+    "missing_stop_distance_pct",
+    "notional_exceeds_risk_budget",
+    "single_trade_loss_exceeds",
+    "orderbook_spread_too_wide",
+    "orderbook_depth_insufficient",
+)
+
+
+def _context_column(contexts: RiskContext | Sequence[RiskContext], field: str, n: int):
+    # Optional fields left as None become NaN, which fails every comparison.
+    if isinstance(contexts, RiskContext):
+        value = getattr(contexts, field)
+        return np.full(n, np.nan if value is None else value, dtype=np.float64)
+    return np.fromiter(
+        (np.nan if getattr(ctx, field) is None else getattr(ctx, field) for ctx in contexts),
+        dtype=np.float64,
+        count=n,
+    )
+
+
+def check_plans(
+    plans: Sequence[dict], contexts: RiskContext | Sequence[RiskContext]
+) -> list[RiskResult]:
+    settings = get_settings()
+    n = len(plans)
+    if n == 0:
+        return []
+    if not isinstance(contexts, RiskContext) and len(contexts) != n:
+        raise ValueError("contexts must be a single RiskContext or one per plan")
+
+    fields = np.empty((n, 6), dtype=np.float64)
+    for row, plan in enumerate(plans):
+        risk = plan["risk"]
+        stop_loss = risk.get("stop_loss")
+        entry_range = plan.get("entry", {}).get("price_range") or [0, 0]
+        fields[row] = (
+            stop_loss or 0.0,
+            risk["max_loss_pct"],
+            plan["sizing"]["leverage"],
+            entry_range[0] or entry_range[1] or 0.0,
+            risk["risk_budget_pct"],
+            plan["sizing"]["notional_usd"],
+        )
+    stop_loss, max_loss_pct, leverage, entry_price, risk_budget_pct, notional = fields.T
+
+    equity = _context_column(contexts, "equity", n)
+    peak_equity = _context_column(contexts, "peak_equity", n)
+    if isinstance(contexts, RiskContext):
+        lockdown = np.full(n, contexts.risk_state == "LOCKDOWN")
+    else:
+        lockdown = np.fromiter((ctx.risk_state == "LOCKDOWN" for ctx in contexts), bool, n)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = np.where(peak_equity > 0, (peak_equity - equity) / peak_equity, 0.0)
+        has_distance = (entry_price != 0) & (stop_loss != 0)
+        stop_distance_pct = np.where(
+            has_distance, np.abs(entry_price - stop_loss) / entry_price, 0.0
+        )
+        buffer_total = (
+            settings.fee_buffer_pct + settings.slippage_buffer_pct
+        ) * settings.volatility_buffer_mult
+        denominator = stop_distance_pct + buffer_total
+        notional_limit = np.where(denominator > 0, equity * risk_budget_pct / denominator, 0.0)
+
+    masks = np.column_stack(
+        (
+            stop_loss == 0,
+            max_loss_pct > settings.max_loss_pct,
+            leverage > settings.max_leverage,
+            _context_column(contexts, "open_positions", n) >= settings.max_open_positions,
+            _context_column(contexts, "positions_per_symbol", n)
+            >= settings.max_positions_per_symbol,
+            _context_column(contexts, "net_exposure_pct", n) > settings.max_net_exposure_pct,
+            _context_column(contexts, "daily_loss_pct", n) >= settings.max_daily_loss_pct,
+            _context_column(contexts, "consecutive_losses", n) >= settings.max_consecutive_losses,
+            (peak_equity > 0) & (drawdown >= settings.max_drawdown_pct),
+            lockdown,
+            stop_distance_pct <= 0,
+            notional > notional_limit,
+            risk_budget_pct > settings.max_loss_pct,
+            _context_column(contexts, "spread_bps", n) > settings.orderbook_spread_limit_bps,
+            _context_column(contexts, "depth_usd", n) < settings.orderbook_depth_min_usd,
+        )
+    )
+    # Pack each row of flags into an int so reason lists are built once per distinct
+    # combination rather than once per plan.
+    codes = masks.astype(np.int64) @ (1 << np.arange(len(BATCH_REASONS), dtype=np.int64))
+    reasons_by_code: dict[int, tuple[str, ...]] = {}
+    for code in np.unique(codes).tolist():
+        reasons_by_code[code] = tuple(
+            name for bit, name in enumerate(BATCH_REASONS) if code >> bit & 1
         )
-        session.add(decision)
-        session.commit()
-    finally:
-        session.close()
 
-    log_event("risk_decision", {"plan_id": plan["meta"]["plan_id"], "status": status})
+    results = []
+    for code, eq, dd, limit, budget in zip(
+        codes.tolist(),
+        equity.tolist(),
+        drawdown.tolist(),
+        notional_limit.tolist(),
+        risk_budget_pct.tolist(),
+    ):
+        allowed = code == 0
+        results.append(
+            RiskResult(
+                allowed=allowed,
+                status="APPROVED" if allowed else "REJECTED",
+                reasons=list(reasons_by_code[code]),
+                metrics={
+                    "equity": eq,
+                    "drawdown": dd,
+                    "notional_limit": limit,
+                    "risk_budget_pct": budget,
+                },
+            )
+        )
+    return results
 
-    return RiskResult(allowed=allowed, status=status, reasons=reasons, metrics=metrics)
+
+def _decision_rows(plans: Sequence[dict], results: Sequence[RiskResult]) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "plan_id": plan["meta"]["plan_id"],
+            "ts": now,
+            "status": result.status,
+            "reasons": result.reasons,
+            "metrics": result.metrics,
+        }
+        for plan, result in zip(plans, results)
+    ]
+
+
+def _persist_decisions(plans: Sequence[dict], results: Sequence[RiskResult]) -> None:
+    get_repository().save_risk_decisions(_decision_rows(plans, results))
+
+
+# Counted on the evaluate_* path only, so backtests running check_plan do not show up.
+def _count_rejections(results: Sequence[RiskResult]) -> None:
+    for result in results:
+        for reason in result.reasons:
+            RISK_REJECTIONS.labels(reason).inc()
+
+
+@timed("evaluate_plan")
+def evaluate_plan(plan: dict, context: RiskContext) -> RiskResult:
+    result = check_plan(plan, context)
+    _count_rejections([result])
+    _persist_decisions([plan], [result])
+    log_event("risk_decision", {"plan_id": plan["meta"]["plan_id"], "status": result.status})
+    return result
+
+
+@timed("evaluate_plan_async")
+async def evaluate_plan_async(plan: dict, context: RiskContext) -> RiskResult:
+    result = check_plan(plan, context)
+    _count_rejections([result])
+    await get_repository().save_risk_decisions_async(_decision_rows([plan], [result]))
+    log_event("risk_decision", {"plan_id": plan["meta"]["plan_id"], "status": result.status})
+    return result
+
+
+@timed("evaluate_plans")
+def evaluate_plans(
+    plans: Sequence[dict], contexts: RiskContext | Sequence[RiskContext]
+) -> list[RiskResult]:
+    results = check_plans(plans, contexts)
+    _count_rejections(results)
+    if results:
+        _persist_decisions(plans, results)
+        for plan, result in zip(plans, results):
+            log_event(
+                "risk_decision", {"plan_id": plan["meta"]["plan_id"], "status": result.status}
+            )
+    return results
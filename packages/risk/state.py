@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from functools import lru_cache
+
+import orjson
+
+from packages.common.config import get_settings
+from packages.common.models import RiskState
+from packages.common.redis_client import get_redis
+from packages.common.repository import get_repository
+
+logger = logging.getLogger(__name__)
+
+LISTENER_RETRY_SEC = 2.0
+
+
+@dataclass(frozen=True)
+class RiskStateSnapshot:
+    id: int | None
+    paused: bool
+    reason: str | None
+    ts: datetime | None = None
+
+    @property
+    def risk_state(self) -> str:
+        return "LOCKDOWN" if self.paused else "NORMAL"
+
+
+def _to_snapshot(state: RiskState | None) -> RiskStateSnapshot:
+    if state is None:
+        return RiskStateSnapshot(id=None, paused=False, reason=None)
+    return RiskStateSnapshot(id=state.id, paused=state.paused, reason=state.reason, ts=state.ts)
+
+
+def load_risk_state() -> RiskStateSnapshot:
+    return _to_snapshot(get_repository().latest_risk_state())
+
+
+async def load_risk_state_async() -> RiskStateSnapshot:
+    return _to_snapshot(await get_repository().latest_risk_state_async())
+
+
+class RiskStateCache:
+    def __init__(
+        self,
+        loader=load_risk_state,
+        async_loader=load_risk_state_async,
+        channel: str = "risk_state",
+        max_staleness_sec: float = 30.0,
+        fallback_ttl_sec: float = 1.0,
+        pubsub_enabled: bool = True,
+        redis_factory=get_redis,
+    ) -> None:
+        self.loader = loader
+        self.async_loader = async_loader
+        self.channel = channel
+        self.max_staleness_sec = max_staleness_sec
+        self.fallback_ttl_sec = fallback_ttl_sec
+        self.pubsub_enabled = pubsub_enabled
+        self.redis_factory = redis_factory
+        self._snapshot: RiskStateSnapshot | None = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._subscribed = threading.Event()
+        self._stop = threading.Event()
+        self._listener: threading.Thread | None = None
+        self._pid: int | None = None
+
+    @property
+    def ttl(self) -> float:
+        # Notifications keep the cache fresh; the TTL only bounds staleness if they stop.
+        return self.max_staleness_sec if self._subscribed.is_set() else self.fallback_ttl_sec
+
+    def get(self) -> RiskStateSnapshot:
+        if self.pubsub_enabled and self._pid != os.getpid():
+            self.start()
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return snapshot
+        return self.refresh()
+
+    async def aget(self) -> RiskStateSnapshot:
+        if self.pubsub_enabled and self._pid != os.getpid():
+            self.start()
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return snapshot
+        snapshot = await self.async_loader()
+        self.set(snapshot, force=True)
+        return snapshot
+
+    def refresh(self) -> RiskStateSnapshot:
+        snapshot = self.loader()
+        self.set(snapshot, force=True)
+        return snapshot
+
+    def set(self, snapshot: RiskStateSnapshot, force: bool = False) -> None:
+        with self._lock:
+            current = self._snapshot
+            if (
+                not force
+                and current is not None
+                and current.id is not None
+                and snapshot.id is not None
+                and snapshot.id < current.id
+            ):
+                return
+            self._snapshot = snapshot
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def publish(self, snapshot: RiskStateSnapshot) -> None:
+        self.set(snapshot)
+        if not self.pubsub_enabled:
+            return
+        try:
+            self.redis_factory().publish(self.channel, orjson.dumps(asdict(snapshot)))
+        except Exception:
+            # Other processes fall back to their TTL-bounded DB read.
+            logger.warning("risk state publish failed", exc_info=True)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid() and self._listener and self._listener.is_alive():
+                return
+            self._pid = os.getpid()
+            self._subscribed.clear()
+            self._stop.clear()
+            self._listener = threading.Thread(
+                target=self._listen, name="risk-state-listener", daemon=True
+            )
+            self._listener.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=2.0)
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self.redis_factory().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Anything published while we were disconnected is lost: reload once.
+                self.invalidate()
+                self._subscribed.set()
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        self._on_message(message["data"])
+            except Exception as exc:
+                logger.warning("risk state listener disconnected: %s", exc)
+            finally:
+                self._subscribed.clear()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            self._stop.wait(LISTENER_RETRY_SEC)
+
+    def _on_message(self, data: bytes) -> None:
+        try:
+            raw = orjson.loads(data)
+            ts = datetime.fromisoformat(raw["ts"]) if raw.get("ts") else None
+            snapshot = RiskStateSnapshot(
+                id=raw.get("id"), paused=bool(raw["paused"]), reason=raw.get("reason"), ts=ts
+            )
+        except Exception:
+            logger.warning("ignoring malformed risk state message", exc_info=True)
+            self.invalidate()
+            return
+        self.set(snapshot)
+
+
+@lru_cache
+def get_risk_state_cache() -> RiskStateCache:
+    settings = get_settings()
+    return RiskStateCache(
+        channel=settings.risk_state_channel,
+        max_staleness_sec=settings.risk_state_max_staleness_sec,
+        fallback_ttl_sec=settings.risk_state_fallback_ttl_sec,
+        pubsub_enabled=settings.risk_state_pubsub_enabled,
+    )
+
+
+def current_risk_state() -> RiskStateSnapshot:
+    return get_risk_state_cache().get()
+
+
+async def current_risk_state_async() -> RiskStateSnapshot:
+    return await get_risk_state_cache().aget()
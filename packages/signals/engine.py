@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from packages.common.config import get_settings
+from packages.data.history import load_candles
+from packages.data.store import CandleBar
+from packages.signals.indicators import IndicatorParams, IndicatorState, backfill_state
+
+
+class IndicatorEngine:
+    def __init__(
+        self,
+        timeframes: list[str],
+        params: IndicatorParams | None = None,
+        history_bars: int = 500,
+        refresh_interval_sec: float = 5.0,
+        loader=load_candles,
+    ) -> None:
+        self.timeframes = timeframes
+        self.params = params or IndicatorParams()
+        self.history_bars = history_bars
+        self.refresh_interval_sec = refresh_interval_sec
+        self.loader = loader
+        self._states: dict[tuple[str, str], IndicatorState] = {}
+        self._refreshed: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def state(self, symbol: str, timeframe: str) -> IndicatorState | None:
+        return self._states.get((symbol, timeframe))
+
+    def update_bars(self, bars: list[CandleBar]) -> int:
+        # Bars must be closed and oldest first; anything at or before the last seen ts is skipped.
+        applied = 0
+        with self._lock:
+            for (symbol, timeframe), series in _group(bars).items():
+                state = self._states.get((symbol, timeframe))
+                if state is None and len(series) > 1:
+                    ts, high, low, close = np.array(
+                        [(bar.ts, bar.high, bar.low, bar.close) for bar in series]
+                    ).T
+                    self._states[(symbol, timeframe)], _ = backfill_state(
+                        self.params, ts, high, low, close
+                    )
+                    applied += len(series)
+                    continue
+                if state is None:
+                    state = self._states[(symbol, timeframe)] = IndicatorState(self.params)
+                for bar in series:
+                    if state.last_ts is None or bar.ts > state.last_ts:
+                        state.update(bar.ts, bar.high, bar.low, bar.close)
+                        applied += 1
+        return applied
+
+    def refresh(self, symbol: str) -> None:
+        # Catches up from the candles table, for processes that do not run the ingestor.
+        now = time.monotonic()
+        if now - self._refreshed.get(symbol, 0.0) < self.refresh_interval_sec:
+            return
+        self._refreshed[symbol] = now
+        for timeframe in self.timeframes:
+            state = self._states.get((symbol, timeframe))
+            since = state.last_ts if state is not None else None
+            self.update_bars(self.loader(symbol, timeframe, since, self.history_bars))
+
+
+def _group(bars: list[CandleBar]) -> dict[tuple[str, str], list[CandleBar]]:
+    groups: dict[tuple[str, str], list[CandleBar]] = {}
+    for bar in bars:
+        groups.setdefault((bar.symbol, bar.timeframe), []).append(bar)
+    return groups
+
+
+@lru_cache
+def get_indicator_engine() -> IndicatorEngine:
+    settings = get_settings()
+    return IndicatorEngine(
+        timeframes=settings.market_timeframes,
+        history_bars=settings.signal_history_bars,
+        refresh_interval_sec=settings.signal_refresh_interval_sec,
+    )
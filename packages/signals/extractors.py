@@ -1,5 +1,12 @@
+from __future__ import annotations
+
+import math
 from dataclasses import dataclass
 
+from packages.common.config import get_settings
+from packages.data.orderbook import OrderBookEngine, get_book_engine
+from packages.signals.engine import IndicatorEngine, get_indicator_engine
+
 
 @dataclass
 class Signal:
@@ -9,5 +16,53 @@ class Signal:
 
 
 class SignalExtractor:
-    def extract(self) -> list[Signal]:
+    def __init__(
+        self, engine: IndicatorEngine | None = None, books: OrderBookEngine | None = None
+    ) -> None:
+        self.engine = engine or get_indicator_engine()
+        self.books = books or get_book_engine()
+
+    def extract(self, symbol: str | None = None) -> list[Signal]:
+        if symbol is not None:
+            self.engine.refresh(symbol)
+            signals = self._indicator_signals(symbol) + self._book_signals(symbol)
+            if signals:
+                return signals
         return [Signal(name="baseline", value=0.0, confidence=0.1)]
+
+    def _indicator_signals(self, symbol: str) -> list[Signal]:
+        signals: list[Signal] = []
+        trends: list[tuple[float, float]] = []
+        for timeframe in self.engine.timeframes:
+            state = self.engine.state(symbol, timeframe)
+            if state is None or state.bars < 2:
+                continue
+            trend = math.tanh(state.trend)
+            momentum = (state.rsi - 50.0) / 50.0
+            trends.append((trend, state.warm))
+            signals += [
+                Signal(f"trend_{timeframe}", trend, state.warm * abs(trend)),
+                Signal(f"momentum_{timeframe}", momentum, state.warm * abs(momentum)),
+                Signal(f"volatility_{timeframe}", state.atr_pct, state.warm),
+            ]
+        if trends:
+            # Multi-timeframe trend: confident only when the timeframes agree and are warm.
+            value = sum(trend for trend, _ in trends) / len(trends)
+            agreeing = sum(1 for trend, _ in trends if trend * value > 0)
+            warm = min(warm for _, warm in trends)
+            signals.append(
+                Signal("trend_mtf", value, warm * agreeing / len(self.engine.timeframes))
+            )
+        return signals
+
+    def _book_signals(self, symbol: str) -> list[Signal]:
+        features = self.books.features(symbol, get_settings().orderbook_max_age_sec)
+        if features is None:
+            return []
+        # Resting depth that keeps getting pulled says little about real interest.
+        confidence = 1.0 - features.cancel_rate
+        edge_bps = (features.microprice - features.mid) / features.mid * 10000
+        return [
+            Signal("book_imbalance", features.imbalance, confidence),
+            Signal("microprice_edge_bps", edge_bps, confidence),
+        ]
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class IndicatorParams:
+    ema_fast: int = 12
+    ema_slow: int = 26
+    atr_period: int = 14
+    rsi_period: int = 14
+
+    @property
+    def warmup(self) -> int:
+        return max(self.ema_slow, self.atr_period, self.rsi_period) * 2
+
+
+# O(1) per bar. Every recurrence is written as `(1 - a) * prev + a * x`, the same form
+# pandas' ewm(adjust=False) evaluates, so `compute_indicators` reproduces it bit for bit.
+@dataclass
+class IndicatorState:
+    params: IndicatorParams
+    bars: int = 0
+    last_ts: int | None = None
+    close: float = math.nan
+    ema_fast: float = math.nan
+    ema_slow: float = math.nan
+    atr: float = math.nan
+    avg_gain: float = math.nan
+    avg_loss: float = math.nan
+
+    @property
+    def rsi(self) -> float:
+        if math.isnan(self.avg_gain):
+            return math.nan
+        if self.avg_loss == 0:
+            return 100.0 if self.avg_gain > 0 else 50.0
+        return 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+
+    @property
+    def atr_pct(self) -> float:
+        return self.atr / self.close if self.close > 0 else math.nan
+
+    @property
+    def trend(self) -> float:
+        # EMA spread in ATR units.
+        if not self.atr > 0:
+            return 0.0
+        return (self.ema_fast - self.ema_slow) / self.atr
+
+    @property
+    def warm(self) -> float:
+        return min(1.0, self.bars / self.params.warmup)
+
+    def update(self, ts: int, high: float, low: float, close: float) -> None:
+        params = self.params
+        if self.bars == 0:
+            self.ema_fast = self.ema_slow = close
+            self.atr = high - low
+        else:
+            fast = 2.0 / (params.ema_fast + 1)
+            slow = 2.0 / (params.ema_slow + 1)
+            wilder_atr = 1.0 / params.atr_period
+            wilder_rsi = 1.0 / params.rsi_period
+            previous = self.close
+            true_range = max(high - low, abs(high - previous), abs(low - previous))
+            change = close - previous
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            self.ema_fast = (1 - fast) * self.ema_fast + fast * close
+            self.ema_slow = (1 - slow) * self.ema_slow + slow * close
+            self.atr = (1 - wilder_atr) * self.atr + wilder_atr * true_range
+            if self.bars == 1:
+                self.avg_gain, self.avg_loss = gain, loss
+            else:
+                self.avg_gain = (1 - wilder_rsi) * self.avg_gain + wilder_rsi * gain
+                self.avg_loss = (1 - wilder_rsi) * self.avg_loss + wilder_rsi * loss
+        self.close = close
+        self.last_ts = int(ts)
+        self.bars += 1
+
+
+def _ewm(values: np.ndarray, alpha: float) -> np.ndarray:
+    return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+def compute_indicators(
+    params: IndicatorParams, high: np.ndarray, low: np.ndarray, close: np.ndarray
+) -> dict[str, np.ndarray]:
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    previous = np.concatenate(([np.nan], close[:-1]))
+    true_range = np.maximum.reduce([high - low, np.abs(high - previous), np.abs(low - previous)])
+    if n:
+        true_range[0] = high[0] - low[0]
+    change = close - previous
+    avg_gain = np.full(n, np.nan)
+    avg_loss = np.full(n, np.nan)
+    if n > 1:
+        avg_gain[1:] = _ewm(np.maximum(change[1:], 0.0), 1.0 / params.rsi_period)
+        avg_loss[1:] = _ewm(np.maximum(-change[1:], 0.0), 1.0 / params.rsi_period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    rsi = np.where(avg_loss == 0, np.where(avg_gain > 0, 100.0, 50.0), rsi)
+    rsi[np.isnan(avg_gain)] = np.nan
+    return {
+        "ema_fast": _ewm(close, 2.0 / (params.ema_fast + 1)),
+        "ema_slow": _ewm(close, 2.0 / (params.ema_slow + 1)),
+        "atr": _ewm(true_range, 1.0 / params.atr_period),
+        "avg_gain": avg_gain,
+        "avg_loss": avg_loss,
+        "rsi": rsi,
+    }
+
+
+def backfill_state(
+    params: IndicatorParams,
+    ts: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+) -> tuple[IndicatorState, dict[str, np.ndarray]]:
+    series = compute_indicators(params, high, low, close)
+    state = IndicatorState(params)
+    if len(close):
+        state.bars = len(close)
+        state.last_ts = int(ts[-1])
+        state.close = float(close[-1])
+        for name in ("ema_fast", "ema_slow", "atr", "avg_gain", "avg_loss"):
+            setattr(state, name, float(series[name][-1]))
+    return state, series
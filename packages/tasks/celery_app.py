@@ -1,13 +1,136 @@
+import os
+import time
+
 from celery import Celery
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_shutdown,
+)
+from kombu import Queue
+from prometheus_client import Histogram, start_http_server
 
+from packages.audit.service import shutdown_audit_writer
 from packages.common.config import get_settings
+from packages.common.metrics import mark_process_dead, metrics_registry
+from packages.common.notify import shutdown_notifier
 
 settings = get_settings()
 
+# Stop-loss and take-profit exits get their own queue and worker, so they never wait behind
+# a plan cycle or a backfill.
+CRITICAL_QUEUE = "critical"
+PIPELINE_QUEUE = "pipeline"
+BULK_QUEUE = "bulk"
+
+TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Celery task run time",
+    ["task", "queue", "state"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+TASK_QUEUE_WAIT = Histogram(
+    "celery_task_queue_wait_seconds",
+    "Time from publish to the start of a Celery task",
+    ["queue"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
 celery_app = Celery(
     "okx_tasks",
     broker=settings.celery_broker_url,
     backend=settings.celery_result_backend,
 )
 
-celery_app.autodiscover_tasks(["packages.tasks"]) 
+celery_app.conf.update(
+    task_queues=(Queue(CRITICAL_QUEUE), Queue(PIPELINE_QUEUE), Queue(BULK_QUEUE)),
+    task_default_queue=BULK_QUEUE,
+    task_routes={
+        "packages.tasks.jobs.check_exits": {"queue": CRITICAL_QUEUE},
+        "packages.tasks.jobs.exit_position": {"queue": CRITICAL_QUEUE},
+        "packages.tasks.jobs.run_cycle": {"queue": PIPELINE_QUEUE},
+        "packages.tasks.jobs.ingest_market_data": {"queue": PIPELINE_QUEUE},
+        "packages.tasks.jobs.plan_symbol": {"queue": PIPELINE_QUEUE},
+        "packages.tasks.jobs.dispatch_plans": {"queue": PIPELINE_QUEUE},
+        "packages.tasks.jobs.execute_plan": {"queue": PIPELINE_QUEUE},
+    },
+    # Tasks are short and idempotent: ack after the run so a killed worker's task is
+    # redelivered, and reserve one message at a time so a slow task never sits on queued ones.
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    # Only the chord header stores results; everything else is fire-and-forget.
+    task_ignore_result=True,
+    result_expires=settings.celery_result_expires_sec,
+)
+
+celery_app.autodiscover_tasks(["packages.tasks"])
+
+# Checks and cycles expire after one interval: a late one is superseded by the next.
+celery_app.conf.beat_schedule = {
+    "check-exits": {
+        "task": "packages.tasks.jobs.check_exits",
+        "schedule": settings.exit_check_interval_sec,
+        "options": {"expires": settings.exit_check_interval_sec},
+    },
+    "pipeline-cycle": {
+        "task": "packages.tasks.jobs.run_cycle",
+        "schedule": settings.pipeline_cycle_interval_sec,
+        "options": {"expires": settings.pipeline_cycle_interval_sec},
+    },
+    # Keeps the adapter snapshots in Redis warm so the plan path never waits on providers.
+    "prefetch-context": {
+        "task": "packages.tasks.jobs.prefetch_context",
+        "schedule": settings.adapter_prefetch_interval_sec,
+    },
+    "portfolio-snapshot": {
+        "task": "packages.tasks.jobs.portfolio_snapshot",
+        "schedule": settings.portfolio_snapshot_interval_sec,
+    },
+    "health-tick": {"task": "packages.tasks.jobs.health_tick", "schedule": 60.0},
+}
+
+_started: dict[str, float] = {}
+
+
+def _queue(task) -> str:
+    return (task.request.delivery_info or {}).get("routing_key") or "direct"
+
+
+@before_task_publish.connect
+def stamp_publish_time(headers: dict | None = None, **_) -> None:
+    if headers is not None:
+        headers["published_at"] = time.time()
+
+
+@task_prerun.connect
+def start_task_timer(task_id: str, task, **_) -> None:
+    _started[task_id] = time.perf_counter()
+    published_at = task.request.get("published_at")
+    if published_at:
+        TASK_QUEUE_WAIT.labels(queue=_queue(task)).observe(max(time.time() - published_at, 0.0))
+
+
+@task_postrun.connect
+def record_task_duration(task_id: str, task, state: str | None = None, **_) -> None:
+    started = _started.pop(task_id, None)
+    if started is not None:
+        TASK_DURATION.labels(task=task.name, queue=_queue(task), state=state or "UNKNOWN").observe(
+            time.perf_counter() - started
+        )
+
+
+# Served from the parent process; with PROMETHEUS_MULTIPROC_DIR set it merges every child.
+@worker_init.connect
+def serve_metrics(**_) -> None:
+    if settings.worker_metrics_port:
+        start_http_server(settings.worker_metrics_port, registry=metrics_registry())
+
+
+@worker_process_shutdown.connect
+def flush_on_shutdown(**_) -> None:
+    shutdown_notifier()
+    shutdown_audit_writer()
+    mark_process_dead(os.getpid())
@@ -1,9 +1,186 @@
-from celery import shared_task
+import asyncio
+import logging
+from functools import lru_cache
 
+import httpx
+from celery import chain, chord, group, shared_task
+
+from packages.adapters.hub import get_adapter_hub
 from packages.audit.service import log_event
+from packages.common.config import get_settings
+from packages.data.ingest import get_ingestor, write_candles
+from packages.data.sources import build_market_source
+from packages.execution.exits import executed_plan, triggered_exits
+from packages.planner.batch import run_plan_batch, run_plans
+from packages.portfolio.state import get_portfolio
 
+logger = logging.getLogger(__name__)
+
+# Execution is idempotent per plan_id, so a send that may or may not have landed is retried.
+RETRYABLE = (httpx.TransportError, httpx.HTTPStatusError)
 
-@shared_task
 
+@shared_task
 def health_tick() -> None:
     log_event("heartbeat", {"status": "ok"})
+
+
+@shared_task
+def portfolio_snapshot() -> None:
+    portfolio = get_portfolio()
+    portfolio.sync()
+    portfolio.snapshot()
+
+
+@shared_task
+def ingest_market_data() -> int:
+    return asyncio.run(get_ingestor().run_once())
+
+
+@shared_task
+def prefetch_context() -> int:
+    return asyncio.run(get_adapter_hub().prefetch(get_settings().market_symbols))
+
+
+@shared_task
+def generate_plan_batch(symbols: list[str] | None = None, market_type: str = "perp") -> int:
+    return asyncio.run(run_plan_batch(symbols or get_settings().market_symbols, market_type))
+
+
+@shared_task
+def backfill_candles(
+    symbols: list[str] | None = None,
+    timeframes: list[str] | None = None,
+    limit: int | None = None,
+) -> int:
+    settings = get_settings()
+    return asyncio.run(
+        _backfill(
+            symbols or settings.market_symbols,
+            timeframes or settings.market_timeframes,
+            limit or settings.backfill_candle_limit,
+        )
+    )
+
+
+# One cycle: ingest, then a chord with one features -> signals -> regime -> plan task per
+# symbol, whose callback fans the tradeable plans out to risk + execution.
+@shared_task
+def run_cycle(symbols: list[str] | None = None, market_type: str = "perp") -> None:
+    symbols = list(dict.fromkeys(symbols or get_settings().market_symbols))
+    chain(
+        ingest_market_data.si(),
+        chord(
+            (plan_symbol.si(symbol, market_type) for symbol in symbols),
+            dispatch_plans.s(),
+        ),
+    ).apply_async()
+
+
+# The only result-bearing task: the chord callback needs the header results.
+@shared_task(ignore_result=False)
+def plan_symbol(symbol: str, market_type: str = "perp") -> dict | None:
+    result = asyncio.run(run_plans([symbol], market_type))[0]
+    plan = result["plan"]
+    if not result["schema_valid"] or plan["intent"]["side"] not in ("long", "short"):
+        return None
+    return plan
+
+
+@shared_task
+def dispatch_plans(plans: list[dict | None]) -> int:
+    plans = [plan for plan in plans if plan is not None]
+    if plans:
+        group(execute_plan.s(plan) for plan in plans).apply_async()
+    return len(plans)
+
+
+# Risk runs in the API next to execution: it is the only process holding the order book
+# (spread/depth inputs) and the live order state.
+@shared_task(autoretry_for=RETRYABLE, retry_backoff=True, max_retries=3)
+def execute_plan(plan: dict) -> None:
+    response = _post("/plans/execute", plan)
+    if response.status_code != 200:
+        logger.info(
+            "plan %s not executed: %s %s",
+            plan["meta"]["plan_id"],
+            response.status_code,
+            response.text,
+        )
+
+
+@shared_task
+def check_exits() -> int:
+    positions = get_portfolio().open_positions()
+    if not positions:
+        return 0
+    prices = asyncio.run(_last_prices(sorted({position.symbol for position in positions})))
+    exits = []
+    for position in positions:
+        plan = executed_plan(position.plan_id)
+        if plan is None or position.symbol not in prices:
+            continue
+        exits += triggered_exits(position, plan, prices[position.symbol])
+    # Exits that already ran replay their first result, so re-sending them is harmless.
+    for plan in exits:
+        exit_position.delay(plan)
+    return len(exits)
+
+
+@shared_task(autoretry_for=RETRYABLE, retry_backoff=True, retry_backoff_max=5, max_retries=5)
+def exit_position(plan: dict) -> None:
+    response = _post("/plans/exit", plan)
+    if response.status_code != 200:
+        logger.warning(
+            "exit %s rejected: %s %s", plan["meta"]["plan_id"], response.status_code, response.text
+        )
+
+
+@lru_cache
+def get_execution_client() -> httpx.Client:
+    settings = get_settings()
+    return httpx.Client(
+        base_url=settings.execution_api_url,
+        headers={"X-API-Token": settings.api_token},
+        timeout=settings.execution_api_timeout_sec,
+    )
+
+
+def _post(path: str, plan: dict) -> httpx.Response:
+    response = get_execution_client().post(path, json=plan)
+    if response.status_code >= 500:
+        response.raise_for_status()
+    return response
+
+
+async def _last_prices(symbols: list[str]) -> dict[str, float]:
+    source = build_market_source()
+    try:
+        pages = await asyncio.gather(
+            *(source.fetch_trades(symbol, 1) for symbol in symbols), return_exceptions=True
+        )
+    finally:
+        await source.close()
+    prices = {}
+    for symbol, trades in zip(symbols, pages):
+        if isinstance(trades, BaseException):
+            logger.warning("last price fetch failed for %s: %s", symbol, trades)
+        elif trades:
+            prices[symbol] = trades[-1].price
+    return prices
+
+
+async def _backfill(symbols: list[str], timeframes: list[str], limit: int) -> int:
+    source = build_market_source()
+    try:
+        pages = await asyncio.gather(
+            *(
+                source.fetch_candles(symbol, timeframe, limit)
+                for symbol in symbols
+                for timeframe in timeframes
+            )
+        )
+    finally:
+        await source.close()
+    bars = [bar for page in pages for bar in page if bar.confirmed]
+    return await asyncio.to_thread(write_candles, bars)
@@ -0,0 +1,15 @@
+import os
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Settings are cached on first use, so the test environment is fixed before any import.
+os.environ.setdefault("PERSISTENCE_BACKEND", "memory")
+os.environ.setdefault("AUDIT_ASYNC_ENABLED", "false")
+os.environ.setdefault("RISK_STATE_PUBSUB_ENABLED", "false")
+os.environ.setdefault("ADAPTER_SNAPSHOT_STORE_ENABLED", "false")
+os.environ.setdefault("IDEMPOTENCY_REDIS_ENABLED", "false")
+os.environ.setdefault("API_TOKEN", "test-token")
+os.environ.setdefault(
+    "PLAN_SCHEMA_PATH", str(ROOT / "packages" / "common" / "schemas" / "trade_plan.schema.json")
+)
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import httpx
+
+from packages.adapters.hub import AdapterHub
+from packages.adapters.news import NewsAdapter
+from packages.adapters.onchain import OnchainAdapter
+from packages.adapters.trends import TrendsAdapter
+
+NEWS_URL = "http://news.test/feed"
+HEADLINE = {"headline": "ETF inflows", "sentiment_score": 0.6, "impact_score": 0.4}
+
+
+# A local news upstream answering each request with the next scripted status.
+class StubNews:
+    def __init__(self, *statuses: int) -> None:
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        status = self.statuses.pop(0) if self.statuses else 200
+        return httpx.Response(status, json={"results": [HEADLINE] if status == 200 else []})
+
+
+def hub(upstream: StubNews) -> AdapterHub:
+    # Only news has an upstream; trends and onchain serve their defaults without a call.
+    return AdapterHub(
+        news=NewsAdapter(NEWS_URL),
+        trends=TrendsAdapter(""),
+        onchain=OnchainAdapter(""),
+        breaker_failures=2,
+        breaker_reset_sec=0.05,
+        client=httpx.AsyncClient(transport=httpx.MockTransport(upstream)),
+    )
+
+
+def refresh(context: AdapterHub) -> list[str]:
+    return asyncio.run(context.refresh("BTC-USDT-SWAP")).degraded
+
+
+def wait_half_open(context: AdapterHub) -> None:
+    time.sleep(0.06)
+    assert context.breakers["news"].state == "half_open"
+
+
+def test_breaker_opens_after_consecutive_failures():
+    upstream = StubNews(500, 500)
+    context = hub(upstream)
+    assert refresh(context) == ["news:error"]
+    assert context.breakers["news"].state == "closed"
+    assert refresh(context) == ["news:error"]
+    assert context.breakers["news"].state == "open"
+    # Open: served from defaults without touching the upstream.
+    assert refresh(context) == ["news:circuit_open"]
+    assert upstream.calls == 2
+
+
+def test_successful_half_open_probe_closes_the_breaker():
+    upstream = StubNews(500, 500, 200)
+    context = hub(upstream)
+    refresh(context)
+    refresh(context)
+    wait_half_open(context)
+    assert refresh(context) == []
+    assert context.breakers["news"].state == "closed"
+    assert context.breakers["news"].failures == 0
+    assert upstream.calls == 3
+
+
+def test_failed_half_open_probe_reopens_immediately():
+    upstream = StubNews(500, 500, 500)
+    context = hub(upstream)
+    refresh(context)
+    refresh(context)
+    wait_half_open(context)
+    assert refresh(context) == ["news:error"]
+    assert context.breakers["news"].state == "open"
+    assert refresh(context) == ["news:circuit_open"]
+    assert upstream.calls == 3
+
+
+def test_open_breaker_serves_the_last_good_value_discounted():
+    upstream = StubNews(200, 500, 500)
+    context = hub(upstream)
+    assert refresh(context) == []
+    refresh(context)
+    refresh(context)
+    snapshot = asyncio.run(context.refresh("BTC-USDT-SWAP"))
+    assert snapshot.degraded == ["news:circuit_open"]
+    assert [event.headline for event in snapshot.events] == ["ETF inflows"]
+    assert snapshot.events[0].confidence == context.degraded_confidence
@@ -0,0 +1,107 @@
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import orjson
+from prometheus_client import REGISTRY
+
+from packages.audit.service import AuditWriter
+from packages.common.repository import MemoryRepository
+
+
+def dropped(reason: str) -> float:
+    return REGISTRY.get_sample_value("audit_events_dropped_total", {"reason": reason}) or 0.0
+
+
+def spilled_line(event_type: str) -> bytes:
+    row = {"ts": datetime.now(timezone.utc), "event_type": event_type, "plan_id": None}
+    return orjson.dumps({**row, "payload": {}}) + b"\n"
+
+
+def wait_for_events(repository: MemoryRepository, count: int) -> list[str]:
+    for _ in range(200):
+        rows = list(repository.tables["audit_events"])
+        if len(rows) >= count:
+            return [row["event_type"] for row in rows]
+        time.sleep(0.01)
+    raise AssertionError(f"{len(rows)} of {count} audit events written")
+
+
+def writer(repository: MemoryRepository, spill_path) -> AuditWriter:
+    return AuditWriter(repository=repository, flush_interval=0.02, spill_path=str(spill_path))
+
+
+def test_corrupt_spill_lines_are_skipped(tmp_path):
+    spill = tmp_path / "audit.spill"
+    spill.write_bytes(
+        spilled_line("first")
+        + b'{"ts": "2024-01-01T00:00:00+00:00", "event_ty'
+        + b"\n"
+        + b'{"ts": "not a time", "event_type": "bad", "plan_id": null, "payload": {}}\n'
+        + spilled_line("second")
+    )
+    before = dropped("corrupt_spill")
+    repository = MemoryRepository(None)
+    audit = writer(repository, spill)
+    audit.start()
+    try:
+        assert wait_for_events(repository, 2) == ["first", "second"]
+    finally:
+        audit.stop()
+    assert dropped("corrupt_spill") - before == 2
+    assert not list(tmp_path.iterdir())
+
+
+def test_claims_left_by_dead_processes_are_replayed(tmp_path):
+    spill = tmp_path / "audit.spill"
+    finished = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True
+    )
+    dead_pid = int(finished.stdout)
+    (tmp_path / f"audit.spill.{dead_pid}.1.replay").write_bytes(spilled_line("orphaned"))
+    repository = MemoryRepository(None)
+    audit = writer(repository, spill)
+    audit.start()
+    try:
+        assert wait_for_events(repository, 1) == ["orphaned"]
+    finally:
+        audit.stop()
+    assert not list(tmp_path.iterdir())
+
+
+class DownRepository(MemoryRepository):
+    # Fails every write while `down`, as a database outage would.
+    def __init__(self) -> None:
+        super().__init__(None)
+        self.down = True
+
+    def write_events(self, rows):
+        if self.down:
+            raise RuntimeError("database unavailable")
+        return super().write_events(rows)
+
+
+def test_unserializable_event_does_not_stop_the_writer(tmp_path):
+    spill = tmp_path / "audit.spill"
+    before = dropped("unserializable")
+    repository = DownRepository()
+    audit = writer(repository, spill)
+    # Failed flushes spill their batch; the set payload cannot be written to the spill file.
+    audit.submit("broken", {"ids": {1, 2}})
+    audit.submit("spilled", {"plan_id": "plan-1"})
+    try:
+        for _ in range(200):
+            if dropped("unserializable") > before and spill.exists():
+                break
+            time.sleep(0.01)
+        repository.down = False
+        audit.submit("after", {})
+        assert wait_for_events(repository, 1) == ["after"]
+        assert audit.running
+    finally:
+        audit.stop()
+    assert dropped("unserializable") - before == 1
+    assert [orjson.loads(line)["event_type"] for line in spill.read_bytes().splitlines()] == [
+        "spilled"
+    ]
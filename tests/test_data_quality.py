@@ -0,0 +1,44 @@
+import threading
+from types import SimpleNamespace
+
+from packages.data.quality import DataQualityEngine
+
+
+def candles(start_ms: int, count: int = 3) -> SimpleNamespace:
+    ts = [start_ms + i * 60000 for i in range(count)]
+    close = [100.0 + i for i in range(count)]
+    return SimpleNamespace(
+        ts=ts,
+        open=close,
+        high=[c + 1 for c in close],
+        low=[c - 1 for c in close],
+        close=close,
+        volume=[1.0] * count,
+    )
+
+
+def test_scores_can_be_read_while_new_series_are_checked():
+    quality = DataQualityEngine()
+    errors: list[BaseException] = []
+    done = threading.Event()
+
+    def read() -> None:
+        try:
+            while not done.is_set():
+                quality.score("SYM-0")
+                quality.scores()
+        except BaseException as exc:
+            errors.append(exc)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    # Every check adds a new series, so the series map grows under the readers.
+    for n in range(2000):
+        quality.check_candles(f"SYM-{n}", "1m", candles(0))
+    done.set()
+    for reader in readers:
+        reader.join()
+    assert not errors
+    assert quality.score("SYM-0") == 1.0
+    assert len(quality.scores()) == 2000
@@ -0,0 +1,42 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from packages.execution.exits import exit_plan
+from packages.planner.planner import build_rule_plan
+from packages.portfolio.state import Position
+
+HEADERS = {"X-API-Token": "test-token"}
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def flat_plan() -> dict:
+    plan = build_rule_plan("BTC-USDT-SWAP", "perp")
+    plan["intent"]["side"] = "flat"
+    return plan
+
+
+@pytest.mark.parametrize("path", ["/plans/execute", "/async/plans/execute"])
+def test_flat_plan_is_refused_before_execution(client, path):
+    response = client.post(path, json=flat_plan(), headers=HEADERS)
+    assert response.status_code == 400
+    assert "unsupported order side" in response.json()["detail"]
+
+
+def test_flat_exit_is_refused(client):
+    position = Position("plan-flat", "BTC-USDT-SWAP", "long", 500.0, entry_price=100.0)
+    plan = exit_plan(
+        position,
+        {"meta": {"market_type": "perp"}, "sizing": {}, "execution": {}},
+        95.0,
+        "sl",
+        500.0,
+    )
+    plan["intent"]["side"] = "flat"
+    response = client.post("/plans/exit", json=plan, headers=HEADERS)
+    assert response.status_code == 400
+    assert "unsupported order side" in response.json()["detail"]
@@ -0,0 +1,112 @@
+import asyncio
+from pathlib import Path
+
+import orjson
+import pytest
+
+from packages.common.repository import MemoryRepository
+from packages.data.orderbook import OrderBookEngine
+from packages.execution.engine import ExecutionEngine
+from packages.execution.matching import PaperMatchingEngine
+from packages.planner.planner import build_rule_plan
+from packages.portfolio.state import PortfolioService
+
+REPLAY = Path(__file__).resolve().parent.parent / "examples" / "book_replay.jsonl"
+SYMBOL = "BTC-USDT-SWAP"
+
+
+class FailingRepository(MemoryRepository):
+    # Fails the next execution write, as a database outage would.
+    def __init__(self) -> None:
+        super().__init__(None)
+        self.fail = True
+
+    def record_executions(self, records):
+        if self.fail:
+            self.fail = False
+            raise RuntimeError("database unavailable")
+        return super().record_executions(records)
+
+    async def record_executions_async(self, records):
+        return self.record_executions(records)
+
+
+@pytest.fixture
+def market():
+    lines = REPLAY.read_bytes().splitlines()
+    books = OrderBookEngine()
+    books.on_message(orjson.loads(lines[0]))
+    return books, lines[1:]
+
+
+def engine(books: OrderBookEngine, repository: MemoryRepository) -> ExecutionEngine:
+    return ExecutionEngine(
+        False,
+        repository=repository,
+        portfolio=PortfolioService(100000.0, repository=repository),
+        matcher=PaperMatchingEngine(books),
+    )
+
+
+def resting_bid(books: OrderBookEngine, plan_id: str) -> dict:
+    plan = build_rule_plan(SYMBOL, "perp")
+    price = books.features(SYMBOL).best_bid
+    plan["meta"]["plan_id"] = plan_id
+    plan["intent"]["side"] = "long"
+    plan["entry"].update({"type": "limit", "price_range": [price, price], "tif": "GTC"})
+    plan["sizing"]["notional_usd"] = 50000.0
+    plan["execution"].update({"post_only": False, "reduce_only": False, "timeout_sec": 0})
+    return plan
+
+
+def replay(books: OrderBookEngine, lines: list[bytes]) -> None:
+    for line in lines:
+        books.on_message(orjson.loads(line))
+
+
+def test_resting_order_fills_are_booked_on_sync(market):
+    books, lines = market
+    repository = MemoryRepository(None)
+    paper = engine(books, repository)
+    result = paper.submit_order(resting_bid(books, "plan-rest"))
+    assert result.status.value == "NEW"
+    replay(books, lines)
+    assert paper.sync_order_updates() > 0
+    assert repository.tables["fills"]
+    assert not paper.matcher.pending
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_failed_write_leaves_nothing_resting_in_the_matcher(market, use_async):
+    books, lines = market
+    repository = FailingRepository()
+    paper = engine(books, repository)
+    plan = resting_bid(books, "plan-outage")
+    with pytest.raises(RuntimeError):
+        if use_async:
+            asyncio.run(paper.submit_orders_async([plan]))
+        else:
+            paper.submit_orders([plan])
+    assert not any(order.is_open for order in paper.matcher.orders.values())
+
+    replay(books, lines)
+    assert not paper.matcher.pending
+    assert paper.sync_order_updates() == 0
+    assert not repository.tables["fills"]
+
+    # The retry is the only order left working.
+    assert paper.submit_order(plan).status.value == "NEW"
+    assert sum(order.is_open for order in paper.matcher.orders.values()) == 1
+
+
+def test_flat_side_is_refused_before_anything_is_matched(market):
+    books, _ = market
+    repository = MemoryRepository(None)
+    paper = engine(books, repository)
+    flat = resting_bid(books, "plan-flat")
+    flat["intent"]["side"] = "flat"
+    assert paper.order_error(flat) == "unsupported order side: 'flat'"
+    with pytest.raises(ValueError):
+        paper.submit_orders([resting_bid(books, "plan-ok"), flat])
+    assert not paper.matcher.orders
+    assert not repository.executions
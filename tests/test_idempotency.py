@@ -0,0 +1,157 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from packages.common.repository import ExecutionRecord, MemoryRepository
+from packages.execution.idempotency import PENDING, IdempotencyStore
+
+
+# The slice of Redis the store uses: GET, SET with NX/PX and DELETE. Expiry is explicit.
+class StubRedis:
+    def __init__(self) -> None:
+        self.data: dict[str, bytes] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        return self.data.get(key)
+
+    def set(self, key: str, value: bytes, nx: bool = False, px: int | None = None) -> bool | None:
+        with self.lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value
+            return True
+
+    def delete(self, key: str) -> None:
+        self.data.pop(key, None)
+
+    def expire_all(self) -> None:
+        self.data.clear()
+
+
+class Plan:
+    # A plan execution that records its ledger row, as the engine does, and counts its runs.
+    def __init__(self, repository: MemoryRepository, plan_id: str = "plan-1") -> None:
+        self.repository = repository
+        self.plan_id = plan_id
+        self.runs = 0
+
+    def run(self) -> dict:
+        self.runs += 1
+        receipt = {"status": "filled", "instruction": {"plan_id": self.plan_id}}
+        self.repository.record_executions(
+            [
+                ExecutionRecord(
+                    order={"plan_id": self.plan_id, "ts": datetime.now(timezone.utc)},
+                    status="FILLED",
+                    receipt=receipt,
+                )
+            ]
+        )
+        return {"status": "FILLED", "receipt": receipt}
+
+    async def run_async(self) -> dict:
+        return self.run()
+
+
+@pytest.fixture
+def redis():
+    return StubRedis()
+
+
+def store(repository: MemoryRepository, redis: StubRedis, **kwargs) -> IdempotencyStore:
+    return IdempotencyStore(
+        repository=repository, redis_factory=lambda: redis, wait_sec=0.2, **kwargs
+    )
+
+
+def execute(idempotency: IdempotencyStore, plan: Plan, use_async: bool) -> tuple[dict, bool]:
+    if use_async:
+        return asyncio.run(idempotency.execute_async(plan.plan_id, plan.run_async))
+    return idempotency.execute(plan.plan_id, plan.run)
+
+
+@pytest.fixture(params=[False, True], ids=["sync", "async"])
+def use_async(request):
+    return request.param
+
+
+def test_retry_replays_the_first_result(redis, use_async):
+    plan = Plan(MemoryRepository(None))
+    first, replayed = execute(store(plan.repository, redis), plan, use_async)
+    assert not replayed
+    # Another process: nothing in its local cache, the result comes from Redis.
+    again, replayed = execute(store(plan.repository, redis), plan, use_async)
+    assert replayed and again == first
+    assert plan.runs == 1
+
+
+def test_expired_result_key_does_not_run_the_plan_again(redis, use_async):
+    plan = Plan(MemoryRepository(None))
+    first, _ = execute(store(plan.repository, redis), plan, use_async)
+    redis.expire_all()
+    again, replayed = execute(store(plan.repository, redis), plan, use_async)
+    assert replayed and again == first
+    assert plan.runs == 1
+    # The replay restores the result key for the next retry.
+    assert redis.get("plan_execution:plan-1") not in (None, PENDING)
+
+
+def test_without_redis_the_ledger_is_checked_first(use_async):
+    plan = Plan(MemoryRepository(None))
+    execute(store(plan.repository, StubRedis(), redis_enabled=False), plan, use_async)
+    _, replayed = execute(store(plan.repository, StubRedis(), redis_enabled=False), plan, use_async)
+    assert replayed
+    assert plan.runs == 1
+
+
+def test_lost_claim_race_waits_for_the_winner(redis, use_async):
+    plan = Plan(MemoryRepository(None))
+    winner = store(plan.repository, redis)
+    redis.set("plan_execution:plan-1", PENDING, nx=True)
+    # The winner finishes while the loser is polling for its result.
+    threading.Timer(0.05, lambda: winner._redis_set("plan-1", {"status": "FILLED"})).start()
+    result, replayed = execute(store(plan.repository, redis), plan, use_async)
+    assert replayed and result == {"status": "FILLED"}
+    assert plan.runs == 0
+
+
+def test_lost_database_race_returns_the_winners_row(redis, use_async):
+    repository = MemoryRepository(None)
+    winner = Plan(repository)
+    loser = Plan(repository)
+
+    # Both passed the ledger read; the winner's row lands before the loser's insert.
+    def race() -> dict:
+        winner.run()
+        return loser.run()
+
+    idempotency = store(repository, redis)
+    if use_async:
+
+        async def race_async() -> dict:
+            return race()
+
+        result, replayed = asyncio.run(idempotency.execute_async("plan-1", race_async))
+    else:
+        result, replayed = idempotency.execute("plan-1", race)
+    assert replayed and result["status"] == "FILLED"
+    assert redis.get("plan_execution:plan-1") not in (None, PENDING)
+
+
+def test_failed_run_releases_the_claim(redis, use_async):
+    def reject() -> dict:
+        raise ValueError("risk rejected")
+
+    async def reject_async() -> dict:
+        return reject()
+
+    idempotency = store(MemoryRepository(None), redis)
+    with pytest.raises(ValueError):
+        if use_async:
+            asyncio.run(idempotency.execute_async("plan-1", reject_async))
+        else:
+            idempotency.execute("plan-1", reject)
+    assert redis.get("plan_execution:plan-1") is None
@@ -0,0 +1,96 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from packages.common.notify import TelegramNotifier
+
+
+# A local Telegram Bot API: answers each sendMessage with the next scripted status.
+class StubTelegram:
+    def __init__(self, statuses: list[int]) -> None:
+        self.statuses = list(statuses)
+        self.requests: list[dict] = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                stub.requests.append(json.loads(self.rfile.read(length)))
+                status = stub.statuses.pop(0) if stub.statuses else 200
+                body = {"ok": status < 400}
+                if status == 429:
+                    body["parameters"] = {"retry_after": 0}
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *_) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def telegram(request):
+    stub = StubTelegram(getattr(request, "param", []))
+    yield stub
+    stub.close()
+
+
+def notifier(url: str, max_retries: int = 3) -> TelegramNotifier:
+    return TelegramNotifier(
+        bot_token="token",
+        chat_id="chat",
+        api_base=url,
+        rate_per_sec=1000.0,
+        burst=10,
+        max_retries=max_retries,
+        backoff_base_sec=0.01,
+        timeout_sec=2.0,
+    )
+
+
+@pytest.mark.parametrize("telegram", [[500, 429, 200]], indirect=True)
+def test_server_errors_and_rate_limits_are_retried(telegram):
+    sender = notifier(telegram.url)
+    sender.notify("stop hit")
+    sender.stop()
+    assert [request["text"] for request in telegram.requests] == ["stop hit"] * 3
+    assert telegram.requests[-1]["chat_id"] == "chat"
+
+
+@pytest.mark.parametrize("telegram", [[400]], indirect=True)
+def test_client_errors_are_not_retried(telegram):
+    sender = notifier(telegram.url)
+    sender.notify("bad message")
+    sender.stop()
+    assert len(telegram.requests) == 1
+
+
+@pytest.mark.parametrize("telegram", [[500] * 10], indirect=True)
+def test_gives_up_after_max_retries(telegram):
+    sender = notifier(telegram.url, max_retries=2)
+    sender.notify("exchange down")
+    sender.stop()
+    assert len(telegram.requests) == 3
+
+
+def test_burst_of_one_alert_is_coalesced(telegram):
+    sender = notifier(telegram.url)
+    sender.start()
+    # Queue the burst on the notifier loop before its worker gets a chance to send.
+    sender._loop.call_soon_threadsafe(lambda: [sender._enqueue("fill", 0.0) for _ in range(3)])
+    sender.stop()
+    assert [request["text"] for request in telegram.requests] == ["fill (x3)"]
@@ -0,0 +1,174 @@
+import asyncio
+import socket
+from contextlib import asynccontextmanager
+
+import pytest
+import uvicorn
+
+from packages.execution.fake_okx import FakeOkxExchange
+from packages.execution.okx import (
+    LOCAL_REJECT,
+    MAX_BATCH,
+    InstrumentSpec,
+    OkxCredentials,
+    OkxGateway,
+    OkxPrivateSession,
+    OkxRestClient,
+    order_args,
+)
+
+CREDENTIALS = OkxCredentials("key", "secret", "passphrase")
+
+
+def instruction(n: int, side: str = "long", **changes) -> dict:
+    return {
+        "plan_id": f"plan-{n}",
+        "symbol": "BTC-USDT-SWAP",
+        "market_type": "perp",
+        "side": side,
+        "order_type": "market",
+        "qty": 1.5,
+        "notional_usd": 150.0,
+        "price": 100.0,
+        "tif": None,
+        "post_only": False,
+        "reduce_only": False,
+        "payload": {"sizing": {"margin_mode": "isolated"}},
+        **changes,
+    }
+
+
+async def until(condition, timeout: float = 5.0) -> None:
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+# The fake exchange served on a free local port, with a gateway connected to it over the
+# private websocket, or over REST only when `websocket` is off.
+@asynccontextmanager
+async def okx(websocket: bool = True, instruments: dict | None = None):
+    exchange = FakeOkxExchange(CREDENTIALS, instruments=instruments)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config(exchange.app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    serving = asyncio.create_task(server.serve())
+    await until(lambda: server.started)
+    session = (
+        OkxPrivateSession(f"ws://127.0.0.1:{port}/ws/v5/private", CREDENTIALS, timeout_sec=2.0)
+        if websocket
+        else None
+    )
+    gateway = OkxGateway(OkxRestClient(f"http://127.0.0.1:{port}", CREDENTIALS), session)
+    await gateway.start()
+    if session is not None:
+        await until(lambda: session.connected)
+    try:
+        yield exchange, gateway
+    finally:
+        await gateway.close()
+        server.should_exit = True
+        await serving
+
+
+def test_orders_in_one_window_go_out_in_batches():
+    async def scenario():
+        async with okx() as (exchange, gateway):
+            acks = await gateway.place_orders([instruction(n) for n in range(MAX_BATCH + 5)])
+            assert all(ack.accepted and ack.transport == "ws" for ack in acks)
+            assert exchange.requests == [
+                ("batch-orders", "ws", MAX_BATCH),
+                ("batch-orders", "ws", 5),
+            ]
+            assert len({ack.ord_id for ack in acks}) == MAX_BATCH + 5
+
+            cancels = await gateway.cancel_orders(
+                [("BTC-USDT-SWAP", ack.cl_ord_id) for ack in acks[:2]]
+            )
+            assert [ack.cl_ord_id for ack in cancels] == [ack.cl_ord_id for ack in acks[:2]]
+            assert exchange.requests[-1] == ("batch-cancel-orders", "ws", 2)
+
+    asyncio.run(scenario())
+
+
+def test_single_order_uses_the_single_op():
+    async def scenario():
+        async with okx() as (exchange, gateway):
+            (ack,) = await gateway.place_orders([instruction(0, side="short")])
+            assert ack.accepted
+            assert exchange.requests == [("order", "ws", 1)]
+            assert exchange.orders[ack.cl_ord_id]["side"] == "sell"
+
+    asyncio.run(scenario())
+
+
+def test_dropped_websocket_falls_back_to_rest_then_reconnects():
+    async def scenario():
+        async with okx() as (exchange, gateway):
+            await exchange.disconnect_all()
+            await until(lambda: not gateway.session.connected)
+            acks = await gateway.place_orders([instruction(n) for n in range(3)])
+            assert all(ack.accepted and ack.transport == "rest" for ack in acks)
+            assert exchange.requests == [("batch-orders", "rest", 3)]
+
+            await until(lambda: gateway.session.connected)
+            (ack,) = await gateway.place_orders([instruction(3)])
+            assert ack.transport == "ws"
+
+    asyncio.run(scenario())
+
+
+def test_gateway_without_a_websocket_uses_rest():
+    async def scenario():
+        async with okx(websocket=False) as (exchange, gateway):
+            acks = await gateway.place_orders([instruction(n) for n in range(2)])
+            assert [ack.transport for ack in acks] == ["rest", "rest"]
+            assert exchange.requests == [("batch-orders", "rest", 2)]
+
+    asyncio.run(scenario())
+
+
+def test_order_args_round_to_the_instrument_steps():
+    spec = InstrumentSpec("BTC-USDT-SWAP", tick_sz="0.1", lot_sz="0.01", min_sz="0.01")
+    buy = order_args(instruction(0, order_type="limit", qty=1.23789, price=100.07), spec)
+    sell = order_args(
+        instruction(1, side="short", order_type="limit", qty=1.23789, price=100.01), spec
+    )
+    assert (buy["sz"], buy["px"]) == ("1.23", "100")
+    assert (sell["sz"], sell["px"]) == ("1.23", "100.1")
+    with pytest.raises(ValueError, match="below the minimum"):
+        order_args(instruction(2, qty=0.009), spec)
+
+
+@pytest.mark.parametrize("entry", ["stop", "if_touched"])
+def test_stop_entries_are_refused(entry):
+    with pytest.raises(ValueError, match="unsupported order type"):
+        order_args(instruction(0, order_type=entry))
+
+
+def test_orders_are_sized_to_the_exchange_lot():
+    async def scenario():
+        lots = {"BTC-USDT-SWAP": {"tickSz": "0.5", "lotSz": "1", "minSz": "1"}}
+        async with okx(instruments=lots) as (exchange, gateway):
+            limit, small = await gateway.place_orders(
+                [
+                    instruction(0, order_type="limit", qty=3.7, price=90.3),
+                    instruction(1, qty=0.6),
+                ]
+            )
+            assert limit.accepted
+            assert (
+                exchange.orders[limit.cl_ord_id]["sz"],
+                exchange.orders[limit.cl_ord_id]["px"],
+            ) == ("3", "90")
+            # Below the minimum: refused here and never sent.
+            assert not small.accepted and small.code == LOCAL_REJECT
+            assert exchange.requests == [("order", "ws", 1)]
+            assert gateway.instruments["BTC-USDT-SWAP"].lot_sz == "1"
+
+    asyncio.run(scenario())
@@ -0,0 +1,71 @@
+import pytest
+from jsonschema import Draft202012Validator
+
+from packages.planner.planner import build_rule_plan
+from packages.planner.schema import compile_schema, load_plan_schema
+
+SCHEMA = load_plan_schema()
+
+
+def mutated(path: str, value=None, delete: bool = False) -> dict:
+    plan = build_rule_plan("BTC-USDT-SWAP", "perp")
+    *parents, key = path.split(".")
+    target = plan
+    for part in parents:
+        target = target[int(part)] if isinstance(target, list) else target[part]
+    if delete:
+        del target[key]
+    elif isinstance(target, list):
+        target[int(key)] = value
+    else:
+        target[key] = value
+    return plan
+
+
+PLANS = {
+    "valid": build_rule_plan("BTC-USDT-SWAP", "perp"),
+    "missing section": mutated("risk", delete=True),
+    "missing field": mutated("meta.plan_id", delete=True),
+    "enum miss": mutated("intent.side", "sideways"),
+    "enum bool": mutated("meta.market_type", True),
+    "wrong type": mutated("meta.symbol", 1),
+    "bool as number": mutated("sizing.notional_usd", True),
+    "below minimum": mutated("sizing.leverage", 0.5),
+    "above maximum": mutated("intent.confidence", 1.5),
+    "integral float": mutated("execution.retry_policy.max_retries", 2.0),
+    "fractional integer": mutated("execution.retry_policy.max_retries", 2.5),
+    "short array": mutated("entry.price_range", [1.0]),
+    "long array": mutated("entry.price_range", [1.0, 2.0, 3.0]),
+    "bad item": mutated("risk.take_profit", [{"price": "high", "size_pct": 0.5}]),
+    "item out of range": mutated("risk.take_profit", [{"price": 1.0, "size_pct": 2}]),
+    "not an object": mutated("sizing", []),
+    "boolean flag": mutated("execution.post_only", 0),
+}
+
+
+@pytest.mark.parametrize("name", PLANS)
+def test_compiled_checker_agrees_with_jsonschema(name):
+    plan = PLANS[name]
+    fast_check = compile_schema(SCHEMA)
+    assert fast_check is not None
+    assert (fast_check(plan) is None) == Draft202012Validator(SCHEMA).is_valid(plan)
+
+
+@pytest.mark.parametrize(
+    "schema, values",
+    [
+        ({"enum": [1]}, [1, 1.0, True, "1", None]),
+        ({"enum": [False, 0]}, [False, 0, 0.0, True, None]),
+        ({"enum": [[1, True], {"a": 1}]}, [[1, True], [1.0, True], [True, True], {"a": True}]),
+    ],
+)
+def test_enum_equality_matches_jsonschema(schema, values):
+    fast_check = compile_schema(schema)
+    validator = Draft202012Validator(schema)
+    for value in values:
+        assert (fast_check(value) is None) == validator.is_valid(value), value
+
+
+def test_union_types_fall_back_to_jsonschema():
+    assert compile_schema({"type": ["string", "null"]}) is None
+    assert compile_schema({"properties": {"note": {"type": ["string", "null"]}}}) is None
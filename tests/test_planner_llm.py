@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from packages.adapters.hub import get_adapter_hub
+from packages.common.repository import MemoryRepository
+from packages.planner import batch
+from packages.planner.llm import FakeLLMBackend, LLMError, PlannerLLM
+from packages.regime.engine import NEUTRAL
+from packages.signals.extractors import Signal
+
+SYMBOLS = ["BTC-USDT-SWAP", "ETH-USDT-SWAP"]
+
+
+def features(symbol: str) -> batch.SymbolFeatures:
+    # Fixed inputs, so the batch never reads candles or order books.
+    return batch.SymbolFeatures(
+        symbol=symbol,
+        signals=[Signal("momentum", 0.1, 0.5)],
+        regime=NEUTRAL,
+        context=get_adapter_hub().snapshot(symbol),
+    )
+
+
+def per_symbol(broken):
+    # Valid flat plans for BTC; ETH gets whatever `broken` does.
+    def respond(request: dict):
+        if request["symbol"] == "BTC-USDT-SWAP":
+            return FakeLLMBackend._flat_plan(request)
+        return broken(request)
+
+    return respond
+
+
+def raise_error(request: dict):
+    raise LLMError("upstream 503")
+
+
+@pytest.fixture
+def plan_batch(monkeypatch):
+    def run(llm: PlannerLLM) -> dict[str, dict]:
+        monkeypatch.setattr(batch, "get_planner_llm", lambda: llm)
+        monkeypatch.setattr(batch, "extract_features", features)
+        results = asyncio.run(
+            batch.generate_plans_batch(
+                SYMBOLS, use_llm=True, refresh_context=False, repository=MemoryRepository()
+            )
+        )
+        return {result["plan"]["meta"]["symbol"]: result for result in results}
+
+    return run
+
+
+@pytest.mark.parametrize(
+    "responder",
+    [per_symbol(lambda request: "not a plan"), per_symbol(raise_error)],
+    ids=["invalid", "error"],
+)
+def test_failed_llm_call_falls_back_to_the_rule_plan(plan_batch, responder):
+    results = plan_batch(PlannerLLM(FakeLLMBackend(responder)))
+    assert results["BTC-USDT-SWAP"]["plan"]["meta"]["plan_id"].startswith("llm-btc-usdt-swap-")
+    assert results["ETH-USDT-SWAP"]["plan"]["meta"]["plan_id"].startswith("rule-eth-usdt-swap-")
+    assert all(result["schema_valid"] for result in results.values())
+
+
+def test_timed_out_llm_call_falls_back_to_the_rule_plan(plan_batch):
+    llm = PlannerLLM(FakeLLMBackend(chunk_chars=8, delay_sec=0.05), timeout_sec=0.1)
+    results = plan_batch(llm)
+    assert all(result["plan"]["meta"]["plan_id"].startswith("rule-") for result in results.values())
+    assert llm.backend.calls == len(SYMBOLS)
+
+
+def test_failed_calls_are_not_cached(plan_batch):
+    backend = FakeLLMBackend(per_symbol(raise_error))
+    llm = PlannerLLM(backend)
+    plan_batch(llm)
+    results = plan_batch(llm)
+    # BTC is answered from the cache; ETH goes back to the backend.
+    assert backend.calls == 3
+    assert results["BTC-USDT-SWAP"]["plan"]["meta"]["plan_id"].startswith("llm-")